@@ -0,0 +1,38 @@
+"""add keyset pagination indexes
+
+Revision ID: 3a7c1e9b2d40
+Revises: 8f9709de568a
+Create Date: 2026-10-18 10:12:41.118204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "3a7c1e9b2d40"
+down_revision: Union[str, None] = "8f9709de568a"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_partner_profiles_user_created_id",
+        "partner_profiles",
+        ["user_id", "created_at", "id"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_text_analyses_user_created_id",
+        "text_analyses",
+        ["user_id", "created_at", "id"],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_text_analyses_user_created_id", table_name="text_analyses")
+    op.drop_index("ix_partner_profiles_user_created_id", table_name="partner_profiles")
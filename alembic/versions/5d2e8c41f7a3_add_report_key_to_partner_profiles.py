@@ -0,0 +1,26 @@
+"""add report_key to partner_profiles
+
+Revision ID: 5d2e8c41f7a3
+Revises: 3a7c1e9b2d40
+Create Date: 2026-10-18 22:41:07.512840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5d2e8c41f7a3"
+down_revision: Union[str, None] = "3a7c1e9b2d40"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("partner_profiles", sa.Column("report_key", sa.String(length=64), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("partner_profiles", "report_key")
@@ -14,6 +14,17 @@ from app.models.profile import PartnerProfile
 from app.models.subscription import Subscription
 from app.utils.enums import ActivityType, SubscriptionType
 from app.core.logging import logger
+from app.services.ai_usage import usage_tracker
+from app.services.token_budget import token_estimator
+from app.services.block_summary import block_summary_pipeline
+from app.core.loop_monitor import loop_monitor
+from app.bot.send_queue import send_queue
+from app.services.broadcast import broadcast_engine
+from app.services.notification_scheduler import notification_scheduler
+from app.services.data_export import data_exporter
+from app.services.html_pdf_service import report_fragment_cache, report_render_stage
+from app.services.pdf_optimizer import pdf_size_stats
+from app.services.report_store import report_store
 
 router = APIRouter()
 
@@ -418,4 +429,42 @@ async def get_retention_analytics(session: AsyncSession = Depends(get_db)):
         
     except Exception as e:
         logger.error(f"Error getting retention analytics: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error") 
\ No newline at end of file
+        raise HTTPException(status_code=500, detail="Internal server error") 
+
+@router.get("/analytics/ai")
+async def get_ai_analytics():
+    """Get AI token usage of this worker (cached vs uncached input per call purpose)"""
+    
+    return {
+        "usage": usage_tracker.get_stats(),
+        "token_estimator": token_estimator.get_stats(),
+        "block_summaries": block_summary_pipeline.get_stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@router.get("/analytics/reports")
+async def get_report_store_analytics():
+    """Get report stats of this worker (artifact reuse, render times, event loop lag)"""
+    
+    return {
+        "report_store": report_store.get_stats() if report_store else None,
+        "render": report_render_stage.get_stats(),
+        "fragments": report_fragment_cache.get_stats(),
+        "pdf_size": pdf_size_stats.get_stats(),
+        "loop_lag": loop_monitor.get_stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
+
+
+@router.get("/analytics/telegram")
+async def get_telegram_send_analytics():
+    """Get outbound Telegram stats of this worker (send queue, broadcasts, scheduled notifications, data exports)"""
+    
+    return {
+        "send_queue": send_queue.get_stats(),
+        "broadcasts": broadcast_engine.get_stats(),
+        "notifications": await notification_scheduler.get_stats(),
+        "data_exports": data_exporter.get_stats(),
+        "timestamp": datetime.utcnow().isoformat()
+    }
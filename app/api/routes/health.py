@@ -80,7 +80,8 @@ async def detailed_health_check(session: AsyncSession = Depends(get_db)):
         ai_service = AIService()
         # Just check if service can be initialized
         health_status["services"]["ai"] = {
-            "status": "healthy"
+            "status": "healthy",
+            **ai_service.router.get_metrics()
         }
     except Exception as e:
         logger.error(f"AI service health check failed: {e}")
@@ -1,70 +1,87 @@
 """Webhook endpoints for Telegram bot"""
 
+import hmac
+from typing import Optional
+
 from fastapi import APIRouter, Request, HTTPException, Depends
 from aiogram.types import Update
 from aiogram import Bot, Dispatcher
 
+from app.bot.update_queue import UpdateQueue
+from app.core.dedup import update_deduplicator
 from app.core.config import settings
 from app.core.logging import logger
 
 router = APIRouter()
 
 
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
 @router.post("/webhook")
 async def telegram_webhook(request: Request):
-    """Handle Telegram webhook updates"""
+    """Handle Telegram webhook updates (validate, enqueue, ack immediately)"""
+    
+    # Validate secret token set in set_webhook
+    if settings.WEBHOOK_SECRET:
+        received_secret = request.headers.get(SECRET_TOKEN_HEADER, "")
+        if not hmac.compare_digest(received_secret, settings.WEBHOOK_SECRET):
+            logger.warning("❌ WEBHOOK: Invalid secret token")
+            raise HTTPException(status_code=401, detail="Invalid secret token")
     
-    logger.info("🔔 Webhook endpoint called")
+    # Check if bot is available
+    bot = getattr(request.app.state, 'bot', None)
+    dp = getattr(request.app.state, 'dp', None)
+    if not bot or not dp:
+        logger.error("❌ WEBHOOK: Bot not initialized, skipping webhook processing")
+        return {"status": "bot_not_initialized", "message": "Bot not available"}
     
     try:
-        # Check if bot is available
-        if not hasattr(request.app.state, 'bot') or not hasattr(request.app.state, 'dp'):
-            logger.error("❌ WEBHOOK: Bot not initialized, skipping webhook processing")
-            return {"status": "bot_not_initialized", "message": "Bot not available"}
-        
-        # Get bot and dispatcher from app state
-        bot = request.app.state.bot
-        dp = request.app.state.dp
-        
-        if not bot or not dp:
-            logger.error("❌ WEBHOOK: Bot or dispatcher is None")
-            return {"status": "bot_not_available", "message": "Bot or dispatcher not available"}
-        
-        # Debug app state
-        logger.info(f"✅ WEBHOOK: Bot object: {type(bot)}")
-        logger.info(f"✅ WEBHOOK: Dispatcher object: {type(dp)}")
-        
-        # Get update data
         body = await request.json()
-        logger.info(f"📨 WEBHOOK: Received update: {body}")
-        
-        update = Update(**body)
-        
-        # Log basic info about the update
-        if update.message:
-            user_id = update.message.from_user.id
-            username = update.message.from_user.username or "no_username"
-            text = update.message.text or "no_text"
-            logger.info(f"💬 WEBHOOK: Message from @{username} (ID: {user_id}): '{text}'")
-        elif update.callback_query:
-            user_id = update.callback_query.from_user.id
-            username = update.callback_query.from_user.username or "no_username"
-            data = update.callback_query.data or "no_data"
-            logger.info(f"🔘 WEBHOOK: Callback from @{username} (ID: {user_id}): '{data}'")
-        else:
-            logger.info(f"❓ WEBHOOK: Unknown update type: {type(update)}")
-        
-        # Process update through dispatcher
-        logger.info("⚙️ WEBHOOK: Processing through dispatcher...")
-        result = await dp.feed_update(bot, update)
-        logger.info(f"✅ WEBHOOK: Update processed successfully, result: {result}")
-        
-        return {"status": "ok", "processed": True}
-        
+        update = Update.model_validate(body, context={"bot": bot})
     except Exception as e:
-        logger.error(f"❌ WEBHOOK: Processing error: {e}")
-        logger.exception("💥 WEBHOOK: Full error traceback:")
-        return {"status": "error", "message": str(e)}
+        # Malformed update will never parse - ack so Telegram doesn't redeliver
+        logger.error(f"❌ WEBHOOK: Invalid update payload: {e}")
+        return {"status": "error", "message": "Invalid update"}
+    
+    logger.debug(f"📨 WEBHOOK: Update {update.update_id} received")
+    
+    # Redelivered update - ack without touching DB or AI
+    if await update_deduplicator.is_duplicate(update):
+        return {"status": "ok", "duplicate": True}
+    
+    update_queue: Optional[UpdateQueue] = getattr(request.app.state, 'update_queue', None)
+    if not update_queue or not update_queue.is_running:
+        # No queue (e.g. startup failed) - process inline as before
+        try:
+            await dp.feed_update(bot, update)
+        except Exception as e:
+            logger.exception(f"💥 WEBHOOK: Processing error: {e}")
+            await update_deduplicator.forget(update)
+            return {"status": "error", "message": str(e)}
+        await update_deduplicator.complete(update)
+        return {"status": "ok", "processed": True}
+    
+    if not update_queue.submit(update):
+        # Queue full - non-2xx makes Telegram retry later instead of losing the
+        # update, so the redelivery must not be treated as a duplicate
+        await update_deduplicator.forget(update)
+        raise HTTPException(status_code=503, detail="Update queue is full")
+    
+    return {"status": "ok", "queued": True}
+
+
+@router.get("/webhook/metrics")
+async def webhook_metrics(request: Request):
+    """Update queue backpressure metrics"""
+    
+    update_queue: Optional[UpdateQueue] = getattr(request.app.state, 'update_queue', None)
+    if not update_queue:
+        raise HTTPException(status_code=503, detail="Update queue not initialized")
+    
+    metrics = update_queue.get_metrics()
+    metrics["deduplication"] = update_deduplicator.get_metrics()
+    return metrics
 
 
 @router.get("/webhook")
@@ -109,7 +126,8 @@ async def set_webhook(request: Request):
         webhook_url = f"{settings.WEBHOOK_URL}/webhook"
         success = await bot.set_webhook(
             url=webhook_url,
-            drop_pending_updates=True
+            secret_token=settings.WEBHOOK_SECRET,
+            drop_pending_updates=settings.DROP_PENDING_UPDATES
         )
         
         if success:
@@ -0,0 +1,280 @@
+"""Per-chat serialized, cross-chat parallel update processing"""
+
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.redis import RELEASE_IF_OWNER_SCRIPT, RENEW_IF_OWNER_SCRIPT, redis_client
+
+
+class _ChatSlot:
+    """Lock and bookkeeping for one chat"""
+
+    __slots__ = ("lock", "waiters", "last_used")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.waiters = 0
+        self.last_used = time.monotonic()
+
+
+class _Shard:
+    """Slice of the chat map with its own contention counters"""
+
+    __slots__ = (
+        "slots", "last_sweep", "acquisitions", "contended",
+        "wait_time_total", "wait_time_max", "evictions"
+    )
+
+    def __init__(self):
+        self.slots: Dict[int, _ChatSlot] = {}
+        self.last_sweep = time.monotonic()
+        self.acquisitions = 0
+        self.contended = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.evictions = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "active_chats": len(self.slots),
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "contention_rate": round(self.contended / self.acquisitions, 4) if self.acquisitions else 0.0,
+            "wait_time_total": round(self.wait_time_total, 4),
+            "wait_time_max": round(self.wait_time_max, 4),
+            "evictions": self.evictions,
+        }
+
+
+class ChatSerializer:
+    """
+    Sharded map of per-chat locks
+
+    Updates of one chat run strictly one after another (asyncio.Lock wakes
+    waiters FIFO), so handlers like process_text_answer never interleave
+    their state.get_data()/update_data() calls. Different chats never wait
+    for each other. Idle chat slots are evicted lazily per shard.
+
+    With several worker processes the chat's turn is also a Redis lock
+    (SET NX PX, renewed while held, released only by its owner), taken
+    after the local one so a process has at most one waiter per chat.
+    Across processes the turns exclude each other but are not FIFO. If
+    Redis fails or the wait exceeds lock_wait, the update runs anyway.
+    """
+
+    def __init__(
+        self,
+        shards: int = 64,
+        idle_ttl: float = 300.0,
+        sweep_interval: float = 60.0,
+        distributed: Optional[bool] = None,
+        lock_ttl: float = settings.CHAT_LOCK_TTL,
+        lock_wait: float = settings.CHAT_LOCK_WAIT,
+        lock_prefix: str = "chat_lock"
+    ):
+        self._shards: List[_Shard] = [_Shard() for _ in range(shards)]
+        self.idle_ttl = idle_ttl
+        self.sweep_interval = sweep_interval
+        # None: only when several workers share the bot
+        self.distributed = settings.server_workers > 1 if distributed is None else distributed
+        self.lock_ttl = lock_ttl
+        self.lock_wait = lock_wait
+        self.lock_prefix = lock_prefix
+
+        # Redis lock metrics
+        self.remote_acquisitions = 0
+        self.remote_contended = 0
+        self.remote_timeouts = 0
+        self.remote_errors = 0
+
+    def _shard_for(self, chat_id: int) -> _Shard:
+        return self._shards[hash(chat_id) % len(self._shards)]
+
+    @asynccontextmanager
+    async def serialize(self, chat_id: Optional[int]):
+        """Hold the chat's turn for the duration of the block"""
+        if chat_id is None:
+            yield
+            return
+
+        shard = self._shard_for(chat_id)
+        self._maybe_sweep(shard)
+
+        slot = shard.slots.get(chat_id)
+        if slot is None:
+            slot = shard.slots[chat_id] = _ChatSlot()
+
+        shard.acquisitions += 1
+        slot.waiters += 1
+        contended = slot.lock.locked()
+        started = time.monotonic()
+        try:
+            await slot.lock.acquire()
+        except BaseException:
+            slot.waiters -= 1
+            raise
+
+        if contended:
+            waited = time.monotonic() - started
+            shard.contended += 1
+            shard.wait_time_total += waited
+            shard.wait_time_max = max(shard.wait_time_max, waited)
+
+        try:
+            remote = await self._acquire_remote(chat_id)
+            try:
+                yield
+            finally:
+                if remote:
+                    await self._release_remote(*remote)
+        finally:
+            slot.waiters -= 1
+            slot.last_used = time.monotonic()
+            slot.lock.release()
+
+    async def _acquire_remote(self, chat_id: int) -> Optional[Tuple[str, str, asyncio.Task]]:
+        """Take the chat's Redis lock, return (key, token, renew task) or None if not taken"""
+        if not self.distributed or not redis_client.is_available or not redis_client.redis:
+            return None
+
+        key = f"{self.lock_prefix}:{chat_id}"
+        token = uuid.uuid4().hex
+        ttl_ms = int(self.lock_ttl * 1000)
+        deadline = time.monotonic() + self.lock_wait
+        delay = 0.01
+        contended = False
+        while True:
+            try:
+                acquired = await redis_client.redis.set(key, token, nx=True, px=ttl_ms)
+            except Exception as e:
+                self.remote_errors += 1
+                logger.warning(f"Chat lock Redis error, processing chat {chat_id} unlocked: {e}")
+                return None
+            if acquired:
+                break
+            contended = True
+            if time.monotonic() >= deadline:
+                self.remote_timeouts += 1
+                logger.warning(f"Chat {chat_id} lock not released in {self.lock_wait}s, processing anyway")
+                return None
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.2)
+
+        self.remote_acquisitions += 1
+        if contended:
+            self.remote_contended += 1
+        renew = asyncio.create_task(self._renew_remote(key, token), name=f"chat-lock-{chat_id}")
+        return key, token, renew
+
+    async def _renew_remote(self, key: str, token: str) -> None:
+        """Keep the lock alive while the update is processed"""
+        ttl_ms = int(self.lock_ttl * 1000)
+        while True:
+            await asyncio.sleep(self.lock_ttl / 3)
+            try:
+                await redis_client.redis.eval(RENEW_IF_OWNER_SCRIPT, 1, key, token, ttl_ms)
+            except Exception as e:
+                self.remote_errors += 1
+                logger.warning(f"Chat lock renew error ({key}): {e}")
+
+    async def _release_remote(self, key: str, token: str, renew: asyncio.Task) -> None:
+        renew.cancel()
+        await asyncio.gather(renew, return_exceptions=True)
+        try:
+            await redis_client.redis.eval(RELEASE_IF_OWNER_SCRIPT, 1, key, token)
+        except Exception as e:
+            self.remote_errors += 1
+            logger.warning(f"Chat lock release error ({key}): {e}")
+
+    def _maybe_sweep(self, shard: _Shard) -> None:
+        """Evict slots idle longer than idle_ttl (at most once per sweep_interval)"""
+        now = time.monotonic()
+        if now - shard.last_sweep < self.sweep_interval:
+            return
+        shard.last_sweep = now
+
+        idle = [
+            chat_id for chat_id, slot in shard.slots.items()
+            if not slot.waiters and now - slot.last_used > self.idle_ttl
+        ]
+        for chat_id in idle:
+            del shard.slots[chat_id]
+        shard.evictions += len(idle)
+
+    @property
+    def active_chats(self) -> int:
+        """Number of chats currently tracked"""
+        return sum(len(shard.slots) for shard in self._shards)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Aggregate and per-shard contention stats"""
+        shards = [shard.get_stats() for shard in self._shards]
+        acquisitions = sum(s["acquisitions"] for s in shards)
+        contended = sum(s["contended"] for s in shards)
+        return {
+            "shards": len(shards),
+            "active_chats": sum(s["active_chats"] for s in shards),
+            "acquisitions": acquisitions,
+            "contended": contended,
+            "contention_rate": round(contended / acquisitions, 4) if acquisitions else 0.0,
+            "wait_time_max": max((s["wait_time_max"] for s in shards), default=0.0),
+            "evictions": sum(s["evictions"] for s in shards),
+            "distributed": self.distributed,
+            "remote_acquisitions": self.remote_acquisitions,
+            "remote_contended": self.remote_contended,
+            "remote_timeouts": self.remote_timeouts,
+            "remote_errors": self.remote_errors,
+            "per_shard": shards,
+        }
+
+
+def get_update_chat_id(update: Update) -> Optional[int]:
+    """Get chat (or user) id that update ordering is keyed by"""
+    if update.message:
+        return update.message.chat.id
+    if update.edited_message:
+        return update.edited_message.chat.id
+    if update.callback_query:
+        if update.callback_query.message:
+            return update.callback_query.message.chat.id
+        return update.callback_query.from_user.id
+    if update.pre_checkout_query:
+        return update.pre_checkout_query.from_user.id
+    if update.my_chat_member:
+        return update.my_chat_member.chat.id
+    return None
+
+
+class ChatSerialMiddleware(BaseMiddleware):
+    """
+    Outer update middleware that serializes processing per chat
+
+    Used in polling mode, where aiogram runs each update as its own task.
+    Webhook mode serializes in UpdateQueue workers instead.
+    """
+
+    def __init__(self, serializer: ChatSerializer):
+        self.serializer = serializer
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        chat_id = get_update_chat_id(event) if isinstance(event, Update) else None
+        async with self.serializer.serialize(chat_id):
+            return await handler(event, data)
+
+
+# Process-wide serializer shared by the update queue and polling middleware
+chat_serializer = ChatSerializer()
+
@@ -2,12 +2,13 @@
 
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from loguru import logger
 
 from app.bot.keyboards.inline import admin_menu_kb, back_to_main_kb
 from app.utils.decorators import admin_only, handle_errors
 from app.services.user_service import UserService
+from app.services.broadcast import broadcast_engine
 
 router = Router()
 
@@ -194,6 +195,15 @@ async def admin_payments(callback: CallbackQuery):
         await callback.answer("❌ Ошибка при загрузке управления платежами")
 
 
+def _broadcast_summary(job) -> str:
+    """Progress line of a broadcast for the admin panel"""
+    status = {"running": "идет", "done": "завершена", "cancelled": "отменена"}.get(job.status, job.status)
+    return (
+        f"• Рассылка <code>{job.id}</code> от {job.started_at:%d.%m %H:%M} UTC: {status}\n"
+        f"• Доставлено: {job.sent}, заблокировали бота: {job.blocked}, ошибок: {job.failed}"
+    )
+
+
 @router.callback_query(F.data == "admin_broadcast")
 @admin_only
 @handle_errors()
@@ -202,34 +212,56 @@ async def admin_broadcast(callback: CallbackQuery):
     try:
         await callback.answer()
         
-        broadcast_text = """
-📢 **Массовая рассылка**
-
-📨 **Типы рассылок:**
-• Уведомления всем пользователям
-• Рассылка по сегментам
-• Персональные сообщения
-
-🎯 **Сегментация:**
-• По типу подписки (Free/Premium/VIP)
-• По активности (активные/неактивные)
-• По регистрации (новые/старые)
-
-📊 **Статистика:**
-• Последняя рассылка: 3 дня назад
-• Доставлено: 1,156 / 1,234
-• Открыто: 67%
-
-🚧 **Для создания рассылки:**
-Используйте команду /broadcast <сообщение>
+        last_job = broadcast_engine.last_job()
+        broadcast_text = f"""
+📢 <b>Массовая рассылка</b>
+
+📊 <b>Последняя рассылка:</b>
+{_broadcast_summary(last_job) if last_job else "• Рассылок еще не было"}
+
+📨 <b>Команды:</b>
+• /broadcast &lt;сообщение&gt; — отправить всем активным пользователям (HTML-разметка)
+• /broadcast_cancel &lt;id&gt; — остановить рассылку
+
+Сообщения уходят с учетом лимитов Telegram (~30 в секунду), ответы пользователям идут в приоритете.
 """
         
         await callback.message.edit_text(
             broadcast_text,
             reply_markup=admin_menu_kb(),
-            parse_mode="Markdown"
+            parse_mode="HTML"
         )
         
     except Exception as e:
         logger.error(f"Error showing admin broadcast: {e}")
-        await callback.answer("❌ Ошибка при загрузке рассылки") 
\ No newline at end of file
+        await callback.answer("❌ Ошибка при загрузке рассылки")
+
+
+@router.message(Command("broadcast"))
+@admin_only
+@handle_errors()
+async def start_broadcast(message: Message, command: CommandObject):
+    """Start a broadcast to all active users"""
+    if not command.args:
+        await message.answer("Использование: /broadcast &lt;сообщение&gt;", parse_mode="HTML")
+        return
+    
+    # Keep the admin's formatting, drop the command itself
+    text = message.html_text.split(maxsplit=1)[1]
+    job = await broadcast_engine.start(message.bot, text, created_by=message.from_user.id)
+    await message.answer(
+        f"📢 Рассылка <code>{job.id}</code> запущена. Прогресс — в админ-панели, раздел «Рассылка».",
+        parse_mode="HTML"
+    )
+
+
+@router.message(Command("broadcast_cancel"))
+@admin_only
+@handle_errors()
+async def cancel_broadcast(message: Message, command: CommandObject):
+    """Stop a running broadcast"""
+    job_id = (command.args or "").strip()
+    if job_id and await broadcast_engine.cancel(job_id):
+        await message.answer(f"⏹ Рассылка <code>{job_id}</code> остановлена", parse_mode="HTML")
+    else:
+        await message.answer("❌ Рассылка не найдена или уже завершена")
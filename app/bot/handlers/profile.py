@@ -18,6 +18,8 @@ from app.bot.keyboards.inline import (
     age_group_kb, gender_kb
 )
 from app.services.user_service import UserService
+from app.services.notification_scheduler import notification_scheduler
+from app.services.data_export import data_exporter
 from app.core.logging import logger
 from app.core.database import get_session
 
@@ -353,6 +355,7 @@ async def toggle_daily_tips(callback: CallbackQuery):
         # Toggle setting
         user.daily_tips_enabled = not user.daily_tips_enabled
         await session.commit()
+        await notification_scheduler.schedule_user(user)
         
         status = "включены" if user.daily_tips_enabled else "выключены"
         await callback.answer(f"🔔 Ежедневные советы {status}", show_alert=True)
@@ -376,6 +379,7 @@ async def toggle_analysis_reminders(callback: CallbackQuery):
         # Toggle setting
         user.analysis_reminders_enabled = not user.analysis_reminders_enabled
         await session.commit()
+        await notification_scheduler.schedule_user(user)
         
         status = "включены" if user.analysis_reminders_enabled else "выключены"
         await callback.answer(f"📝 Напоминания об анализах {status}", show_alert=True)
@@ -399,6 +403,7 @@ async def toggle_weekly_stats(callback: CallbackQuery):
         # Toggle setting
         user.weekly_stats_enabled = not user.weekly_stats_enabled
         await session.commit()
+        await notification_scheduler.schedule_user(user)
         
         status = "включена" if user.weekly_stats_enabled else "выключена"
         await callback.answer(f"📊 Еженедельная статистика {status}", show_alert=True)
@@ -422,6 +427,7 @@ async def toggle_all_notifications(callback: CallbackQuery):
         # Toggle setting
         user.notifications_enabled = not user.notifications_enabled
         await session.commit()
+        await notification_scheduler.schedule_user(user)
         
         status = "включены" if user.notifications_enabled else "выключены"
         await callback.answer(f"🔔 Все уведомления {status}", show_alert=True)
@@ -479,6 +485,7 @@ async def set_notification_time(callback: CallbackQuery):
         # Update time
         user.notification_time = time_str
         await session.commit()
+        await notification_scheduler.schedule_user(user)
         
         await callback.answer(f"⏰ Время уведомлений установлено: {time_str}", show_alert=True)
         
@@ -530,6 +537,7 @@ async def set_timezone(callback: CallbackQuery):
         # Update timezone
         user.timezone = timezone_str
         await session.commit()
+        await notification_scheduler.schedule_user(user)
         
         await callback.answer(f"🌍 Часовой пояс установлен: {timezone_str}", show_alert=True)
         
@@ -640,6 +648,7 @@ async def confirm_clear_data(callback: CallbackQuery):
             user.timezone = "Europe/Moscow"
             
             await session.commit()
+            await notification_scheduler.schedule_user(user)
             
             success_text = """✅ **Данные успешно очищены**
 
@@ -699,7 +708,11 @@ async def export_data(callback: CallbackQuery):
 • Время уведомлений: {user.notification_time}
 • Часовой пояс: {user.timezone}
 
-📋 Полный экспорт данных в файле скоро будет доступен."""
+📦 **Полный архив** (анализы, профили партнеров, тесты совместимости, подписки, активность) готовится и придет сюда отдельным файлом."""
+        
+        # The archive is built in the background and sent as a document
+        if not data_exporter.submit(callback.bot, callback.from_user.id):
+            export_data = export_data.rsplit("\n\n", 1)[0] + "\n\n⏳ Архив уже готовится, дождитесь файла."
         
         await callback.message.edit_text(
             export_data,
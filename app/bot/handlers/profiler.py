@@ -1,20 +1,27 @@
 """Profiler handler for partner analysis"""
 
 import asyncio
-from typing import Dict, Any
+from typing import Dict, Any, Optional, Tuple, Callable, Awaitable
 from aiogram import Router, F
-from aiogram.types import CallbackQuery, Message, InlineKeyboardButton, InlineKeyboardMarkup
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, CallbackQuery, Message, InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.fsm.context import FSMContext
 from loguru import logger
 
 from app.bot.states import ProfilerStates, PartnerProfileStates, FreeFormProfilerStates
-from app.bot.keyboards.inline import profiler_menu_kb, get_profiler_keyboard, get_profiler_navigation_keyboard, get_profiler_question_keyboard
+from app.bot.keyboards.inline import profiler_menu_kb, get_profiler_keyboard, get_profiler_navigation_keyboard, get_profiler_question_keyboard, keyset_pagination_buttons
 from app.services.ai_service import AIService
-from app.services.html_pdf_service import HTMLPDFService
+from app.services.html_pdf_service import HTMLPDFService, REPORT_TEMPLATE_VERSION
 from app.services.user_service import UserService
 from app.services.profile_service import ProfileService
+from app.services.report_store import report_key, report_store
+from app.services.block_summary import (
+    block_summary_pipeline, format_free_form_answers, group_answers_by_block, is_block_complete
+)
 from app.utils.exceptions import ServiceError
+from app.utils.name_declension import about_name, decline_name
 from app.utils.enums import AnalysisType
+from app.utils.pagination import parse_page_callback, DIRECTION_NEXT
 from app.prompts.profiler_full_questions import (
     get_all_questions, get_free_form_questions, is_free_form_question,
     calculate_weighted_scores, get_urgency_level, get_safety_alerts
@@ -22,6 +29,14 @@ from app.prompts.profiler_full_questions import (
 
 router = Router()
 
+# Live portrait preview while the model is generating
+PREVIEW_EDIT_INTERVAL = 3.0  # seconds between edits of the progress message
+PREVIEW_MAX_CHARS = 3500     # Telegram limit is 4096 with the header
+
+# Running analyses by telegram_id: they outlive the update that started them,
+# so the chat's turn (and the update worker) is released right away
+_analysis_tasks: Dict[int, asyncio.Task] = {}
+
 
 @router.callback_query(F.data == "profiler_menu")
 async def show_profiler_menu(callback: CallbackQuery, state: FSMContext, profile_service: ProfileService):
@@ -259,7 +274,7 @@ async def process_partner_basic_info(message: Message, state: FSMContext):
         is_free_form = data.get('is_free_form', True)  # По умолчанию теперь свободная форма
         
         await message.answer(
-            f"✅ <b>Информация о {partner_name} сохранена</b>\n\n"
+            f"✅ <b>Информация {about_name(partner_name)} сохранена</b>\n\n"
             "🎯 <b>Переходим к психологическому опросу</b>\n\n"
             "💫 <b>Следующий этап:</b> 28 вопросов в свободной форме\n\n"
             "🔬 <b>Эти данные будут обработаны:</b>\n"
@@ -337,7 +352,7 @@ async def back_to_basic_info_input(callback: CallbackQuery, state: FSMContext):
         partner_name = data.get('partner_name', 'партнер')
         
         await callback.message.edit_text(
-            f"📝 <b>Базовая информация о {partner_name}</b>\n\n"
+            f"📝 <b>Базовая информация {about_name(partner_name)}</b>\n\n"
             "Расскажите о вашем партнере в свободной форме:\n"
             "• Как давно вы вместе?\n"
             "• Какие у вас отношения?\n"
@@ -392,9 +407,10 @@ async def process_text_answer(message: Message, state: FSMContext, question_id:
         is_last_question = current_question_num == total_questions
         
         if is_last_question:
-            # All questions answered - start analysis
+            # All questions answered - start analysis in the background
             await state.update_data(text_answers=text_answers, analysis_running=True)
-            await start_analysis(message, state, ai_service, html_pdf_service, user_service, profile_service, message.from_user.id)
+            await state.set_state(FreeFormProfilerStates.processing)
+            spawn_analysis(message, state, ai_service, html_pdf_service, user_service, profile_service, message.from_user.id)
         else:
             # Move to next question
             next_question_num = current_question_num + 1
@@ -407,6 +423,17 @@ async def process_text_answer(message: Message, state: FSMContext, question_id:
                 current_question=current_question_num
             )
             
+            # Блок завершен - резюме готовится в фоне, пока идут следующие вопросы
+            block = question.get('block')
+            if block and is_block_complete(block, question_order, free_form_questions, text_answers):
+                block_answers = group_answers_by_block(
+                    format_free_form_answers(text_answers, free_form_questions)
+                ).get(block, [])
+                block_summary_pipeline.schedule(
+                    ai_service, message.from_user.id, block, block_answers,
+                    data.get('partner_name', 'партнер')
+                )
+            
             # Set next state
             state_mapping = {
                 "narcissism_q1": FreeFormProfilerStates.narcissism_q1_text,
@@ -448,7 +475,7 @@ async def process_text_answer(message: Message, state: FSMContext, question_id:
             await message.answer(
                 f"✅ <b>Ответ сохранен</b>\n\n"
                 f"🎯 <b>Вопрос {next_question_num} из {total_questions}</b> (Свободная форма)\n\n"
-            f"📝 <b>О {partner_name}:</b>\n\n"
+            f"📝 <b>{about_name(partner_name, capitalize=True)}:</b>\n\n"
                 f"❓ <b>{next_question['text']}</b>\n\n"
                 f"💭 <i>{next_question['context']}</i>\n\n"
                 f"🔍 <b>Подсказки для ответа:</b>\n"
@@ -578,9 +605,30 @@ async def process_social_q4_text(message: Message, state: FSMContext, ai_service
     await process_text_answer(message, state, "social_q4", 28, ai_service, html_pdf_service, user_service, profile_service)
 
 
+PROFILES_PAGE_PREFIX = "my_profiles_page"
+PROFILES_PAGE_SIZE = 10
+
+
 @router.callback_query(F.data == "my_profiles")
 async def show_my_profiles(callback: CallbackQuery, state: FSMContext, profile_service: ProfileService):
     """Show user's existing profiles"""
+    await _render_profiles_page(callback, profile_service)
+
+
+@router.callback_query(F.data.startswith(f"{PROFILES_PAGE_PREFIX}:"))
+async def show_my_profiles_page(callback: CallbackQuery, state: FSMContext, profile_service: ProfileService):
+    """Flip a page of user's profiles (keyset cursor in callback_data)"""
+    direction, cursor = parse_page_callback(callback.data)
+    await _render_profiles_page(callback, profile_service, cursor, direction)
+
+
+async def _render_profiles_page(
+    callback: CallbackQuery,
+    profile_service: ProfileService,
+    cursor: Optional[str] = None,
+    direction: str = DIRECTION_NEXT
+):
+    """Render one page of user's profiles"""
     try:
         # Get user from database by telegram_id
         telegram_id = callback.from_user.id
@@ -603,7 +651,19 @@ async def show_my_profiles(callback: CallbackQuery, state: FSMContext, profile_s
         user_id = user.id  # Internal database ID
         
         # Get user's profiles
-        profiles = await profile_service.get_user_profiles(user_id, limit=10)
+        page = await profile_service.get_user_profiles_page(
+            user_id,
+            limit=PROFILES_PAGE_SIZE,
+            cursor=cursor,
+            direction=direction
+        )
+        profiles = page.items
+        
+        # Stale cursor (e.g. profiles deleted since the page was rendered) -
+        # fall back to the first page instead of claiming there are no profiles
+        if not profiles and cursor is not None:
+            page = await profile_service.get_user_profiles_page(user_id, limit=PROFILES_PAGE_SIZE)
+            profiles = page.items
         
         if not profiles:
             await callback.message.edit_text(
@@ -622,12 +682,13 @@ async def show_my_profiles(callback: CallbackQuery, state: FSMContext, profile_s
         profiles_text = "📂 <b>Мои профили</b>\n\n"
         keyboard = []
         
-        for i, profile in enumerate(profiles, 1):
+        for profile in profiles:
             # Get risk info
             risk_emoji = "🔴" if profile.manipulation_risk >= 7 else "🟡" if profile.manipulation_risk >= 4 else "🟢"
             partner_name = profile.partner_name or f"Партнер #{profile.id}"
             
-            profiles_text += f"{i}. {risk_emoji} <b>{partner_name}</b>\n"
+            # No ordinal: keyset pages have no global index
+            profiles_text += f"{risk_emoji} <b>{partner_name}</b>\n"
             profiles_text += f"   Риск: {profile.manipulation_risk:.1f}/10\n"
             profiles_text += f"   Создан: {profile.created_at.strftime('%d.%m.%Y')}\n\n"
             
@@ -637,6 +698,15 @@ async def show_my_profiles(callback: CallbackQuery, state: FSMContext, profile_s
                 callback_data=f"view_profile_{profile.id}"
             )])
         
+        # Add pagination buttons
+        page_buttons = keyset_pagination_buttons(
+            PROFILES_PAGE_PREFIX,
+            prev_cursor=page.prev_cursor,
+            next_cursor=page.next_cursor
+        )
+        if page_buttons:
+            keyboard.append(page_buttons)
+        
         # Add control buttons
         keyboard.append([
             InlineKeyboardButton(text="🆕 Новый профиль", callback_data="create_profile"),
@@ -651,7 +721,7 @@ async def show_my_profiles(callback: CallbackQuery, state: FSMContext, profile_s
         )
         
     except Exception as e:
-        logger.error(f"Error in show_my_profiles: {e}")
+        logger.error(f"Error in _render_profiles_page: {e}")
         await callback.answer("❌ Произошла ошибка при загрузке профилей")
 
 
@@ -744,7 +814,7 @@ async def show_profile_recommendations(callback: CallbackQuery, state: FSMContex
             partner_name = profile.partner_name or f"Партнер #{profile.id}"
             risk_emoji = "🔴" if profile.manipulation_risk >= 7 else "🟡" if profile.manipulation_risk >= 4 else "🟢"
             keyboard.append([InlineKeyboardButton(
-                text=f"{risk_emoji} Советы для {partner_name}",
+                text=f"{risk_emoji} Советы для {decline_name(partner_name, 'genitive')}",
                 callback_data=f"recommendations_{profile.id}"
             )])
         
@@ -778,6 +848,63 @@ def get_block_emoji(block: str) -> str:
     return block_emoji.get(block, "❓")
 
 
+def make_preview_updater(analysis_msg: Message, partner_name: str):
+    """Callback showing the tail of the streamed portrait in the progress message"""
+    last_edit = 0.0
+    
+    async def update_preview(preview_html: str) -> None:
+        nonlocal last_edit
+        now = asyncio.get_running_loop().time()
+        if now - last_edit < PREVIEW_EDIT_INTERVAL:
+            return
+        last_edit = now
+        
+        # Whole paragraphs only, so no HTML tag is cut
+        shown, size = [], 0
+        for fragment in reversed(preview_html.split("\n\n")):
+            size += len(fragment) + 2
+            if size > PREVIEW_MAX_CHARS:
+                break
+            shown.append(fragment)
+        if not shown:
+            return
+        
+        try:
+            await analysis_msg.edit_text(
+                f"🧠 <b>ПСИХОЛОГИЧЕСКИЙ АНАЛИЗ: {partner_name}</b>\n"
+                f"<i>Портрет формируется...</i>\n\n" + "\n\n".join(reversed(shown)),
+                parse_mode="HTML"
+            )
+        except Exception as e:
+            logger.debug(f"Preview update skipped: {e}")
+    
+    return update_preview
+
+
+def spawn_analysis(message: Message, state: FSMContext, ai_service: AIService, html_pdf_service: HTMLPDFService, user_service: UserService, profile_service: ProfileService, telegram_id: int) -> None:
+    """Run start_analysis detached from the update (one analysis per user)"""
+    if telegram_id in _analysis_tasks:
+        logger.warning(f"Analysis already running for user {telegram_id}, ignoring duplicate")
+        return
+    task = asyncio.create_task(
+        start_analysis(message, state, ai_service, html_pdf_service, user_service, profile_service, telegram_id),
+        name=f"analysis-{telegram_id}"
+    )
+    _analysis_tasks[telegram_id] = task
+    task.add_done_callback(lambda _: _analysis_tasks.pop(telegram_id, None))
+
+
+def get_analysis_task(telegram_id: int) -> Optional[asyncio.Task]:
+    """Running analysis of a user, if any"""
+    return _analysis_tasks.get(telegram_id)
+
+
+@router.message(FreeFormProfilerStates.processing)
+async def analysis_in_progress(message: Message):
+    """Messages sent while the analysis is running"""
+    await message.answer("⏳ Анализ еще идет, отчет придет в этот чат через несколько минут.")
+
+
 async def start_analysis(message: Message, state: FSMContext, ai_service: AIService, html_pdf_service: HTMLPDFService, user_service: UserService, profile_service: ProfileService, telegram_id: int):
     """Start AI analysis of free form answers"""
     try:
@@ -821,26 +948,24 @@ async def start_analysis(message: Message, state: FSMContext, ai_service: AIServ
         )
         
         # Convert text answers to format expected by AI service
-        formatted_answers = []
         free_form_questions = data.get('free_form_questions', {})
-        
-        for question_id, answer_text in text_answers.items():
-            question = free_form_questions.get(question_id, {})
-            formatted_answers.append({
-                'question_id': question_id,
-                'question': question.get('text', ''),
-                'answer': answer_text,
-                'block': question.get('block', 'unknown')
-            })
+        formatted_answers = format_free_form_answers(text_answers, free_form_questions)
         
         # Perform AI analysis with enhanced prompt for free form
         try:
+            # Резюме блоков, готовые к этому моменту (остальные блоки идут полными ответами)
+            block_summaries = await block_summary_pipeline.collect(
+                telegram_id, group_answers_by_block(formatted_answers)
+            )
+            
             analysis_result = await ai_service.profile_partner_free_form(
                 text_answers=formatted_answers,
                 user_id=telegram_id,
                 partner_name=partner_name,
                 partner_description=partner_description,
-                partner_basic_info=partner_basic_info
+                partner_basic_info=partner_basic_info,
+                block_summaries=block_summaries,
+                on_preview=make_preview_updater(analysis_msg, partner_name)
             )
             
             # Update progress
@@ -857,42 +982,55 @@ async def start_analysis(message: Message, state: FSMContext, ai_service: AIServ
                 parse_mode="HTML"
             )
             
-            # Generate PDF report
-            pdf_bytes = await html_pdf_service.generate_partner_report_html(
-                analysis_result,
-                telegram_id,
-                partner_name
+            # Generate PDF report (or reuse the stored one for the same analysis)
+            async def render_report() -> bytes:
+                return await html_pdf_service.generate_partner_report_html(
+                    analysis_result,
+                    telegram_id,
+                    partner_name
+                )
+            
+            key, pdf_bytes = await load_or_render_report(
+                {"analysis": analysis_result, "user_id": telegram_id, "partner_name": partner_name},
+                render_report
             )
             
-            # Save analysis to database
-            try:
+            # The lookup session above is already closed: a write through it would
+            # open a connection that is never returned to the pool
+            async with get_session() as session:
+                local_user_service = UserService(session)
+                local_profile_service = ProfileService(session)
+                
+                # Save analysis to database
+                try:
                     await local_user_service.save_analysis(
-                    user_id=user_id,
-                    analysis_type=AnalysisType.PARTNER_PROFILE,
-                    analysis_data=analysis_result,
-                    questions=formatted_answers
-                )
-            except Exception as e:
-                logger.warning(f"Failed to save analysis to DB: {e}")
-            
-            # Save partner profile to database
-            try:
+                        user_id=user_id,
+                        analysis_type=AnalysisType.PARTNER_PROFILE,
+                        analysis_data=analysis_result,
+                        questions=formatted_answers
+                    )
+                except Exception as e:
+                    logger.warning(f"Failed to save analysis to DB: {e}")
+                
+                # Save partner profile to database
+                try:
                     await local_profile_service.create_profile_from_profiler(
-                    user_id=user_id,
-                    partner_name=partner_name,
-                    partner_description=partner_description,
-                    partner_basic_info=partner_basic_info,
-                    questions=formatted_answers,
-                    answers=text_answers,
-                    analysis_result=analysis_result
-                )
+                        user_id=user_id,
+                        partner_name=partner_name,
+                        partner_description=partner_description,
+                        partner_basic_info=partner_basic_info,
+                        questions=formatted_answers,
+                        answers=text_answers,
+                        analysis_result=analysis_result,
+                        report_key=key
+                    )
                     logger.info(f"Partner profile saved for user {user_id} (telegram_id: {telegram_id})")
-            except Exception as e:
-                logger.error(f"Failed to save partner profile: {e}")
+                except Exception as e:
+                    logger.error(f"Failed to save partner profile: {e}")
             
             # Send results
-                logger.info(f"Analysis completed successfully for user {user_id} (telegram_id: {telegram_id})")
-            await send_analysis_results(message, analysis_result, pdf_bytes, partner_name)
+            logger.info(f"Analysis completed successfully for user {user_id} (telegram_id: {telegram_id})")
+            await send_analysis_results(message, analysis_result, key, pdf_bytes, partner_name, render_report)
             
         except Exception as e:
             logger.error(f"Analysis failed: {e}")
@@ -911,8 +1049,9 @@ async def start_analysis(message: Message, state: FSMContext, ai_service: AIServ
             reply_markup=get_profiler_keyboard()
         )
     finally:
-        # Clear state
-        await state.clear()
+        # Clear state unless the user has already moved on to another flow
+        if await state.get_state() == FreeFormProfilerStates.processing.state:
+            await state.clear()
 
 
 @router.callback_query(F.data.startswith("profiler_nav_"))
@@ -1027,10 +1166,13 @@ async def view_profile_details(callback: CallbackQuery, state: FSMContext, profi
         details_text += f"\n\n📅 <b>Создан:</b> {profile.created_at.strftime('%d.%m.%Y в %H:%M')}"
         
         # Show buttons
-        keyboard = InlineKeyboardMarkup(inline_keyboard=[
+        buttons = [
             [InlineKeyboardButton(text="🔙 К профилям", callback_data="my_profiles")],
             [InlineKeyboardButton(text="🗑️ Удалить", callback_data=f"delete_profile_{profile.id}")]
-        ])
+        ]
+        if profile.report_key and report_store is not None:
+            buttons.insert(0, [InlineKeyboardButton(text="📄 PDF отчет", callback_data=f"profile_report_{profile.id}")])
+        keyboard = InlineKeyboardMarkup(inline_keyboard=buttons)
         
         await callback.message.edit_text(
             details_text,
@@ -1043,6 +1185,35 @@ async def view_profile_details(callback: CallbackQuery, state: FSMContext, profi
         await callback.answer("❌ Произошла ошибка")
 
 
+@router.callback_query(F.data.startswith("profile_report_"))
+async def send_profile_report(callback: CallbackQuery, user_service: UserService, profile_service: ProfileService):
+    """Re-send the stored PDF report of a saved profile"""
+    try:
+        profile_id = int(callback.data.split("_")[2])
+        
+        user = await user_service.get_user_by_telegram_id(callback.from_user.id)
+        profile = await profile_service.get_profile_by_id(profile_id, user.id) if user else None
+        if not profile or not profile.report_key:
+            await callback.answer("❌ Отчет не найден")
+            return
+        
+        await callback.answer("📄 Отправляю отчет...")
+        partner_name = profile.partner_name or f"Партнер #{profile.id}"
+        await send_report_document(
+            callback.message,
+            profile.report_key,
+            None,
+            filename=f"free_form_profile_{partner_name}_{callback.from_user.id}.pdf",
+            caption=f"📄 Психологический анализ партнера {partner_name}"
+        )
+        
+    except ServiceError:
+        await callback.message.answer("📄 PDF отчет больше недоступен. Создайте профиль заново.")
+    except Exception as e:
+        logger.error(f"Error sending profile report: {e}")
+        await callback.answer("❌ Произошла ошибка")
+
+
 @router.callback_query(F.data.startswith("recommendations_"))
 async def show_detailed_recommendations(callback: CallbackQuery, state: FSMContext, profile_service: ProfileService):
     """Show detailed recommendations for specific profile"""
@@ -1085,7 +1256,7 @@ async def show_detailed_recommendations(callback: CallbackQuery, state: FSMConte
         partner_name = profile.partner_name or f"Партнер #{profile.id}"
         
         # Format recommendations
-        recommendations_text = f"""💡 <b>Рекомендации для {partner_name}</b>
+        recommendations_text = f"""💡 <b>Рекомендации для {decline_name(partner_name, 'genitive')}</b>
 
 <b>📊 Анализ профиля:</b>
 • Риск манипуляций: {profile.manipulation_risk:.1f}/10
@@ -1218,7 +1389,7 @@ async def start_free_form_questions(callback: CallbackQuery, state: FSMContext):
         
         await callback.message.edit_text(
             f"🎯 <b>Вопрос 1 из 28</b> (Свободная форма)\n\n"
-            f"📝 <b>О {partner_name}:</b>\n\n"
+            f"📝 <b>{about_name(partner_name, capitalize=True)}:</b>\n\n"
             f"❓ <b>{first_question['text']}</b>\n\n"
             f"💭 <i>{first_question['context']}</i>\n\n"
             f"🔍 <b>Подсказки для ответа:</b>\n"
@@ -1235,7 +1406,79 @@ async def start_free_form_questions(callback: CallbackQuery, state: FSMContext):
         await callback.answer("❌ Произошла ошибка")
 
 
-async def send_analysis_results(message: Message, analysis_result: Dict[str, Any], pdf_bytes: bytes, partner_name: str):
+async def load_or_render_report(
+    payload: Dict[str, Any],
+    render: Callable[[], Awaitable[bytes]]
+) -> Tuple[Optional[str], Optional[bytes]]:
+    """
+    Report key and PDF bytes for a report payload
+    
+    Rendering is skipped when the report store already has the PDF; bytes
+    are None when Telegram already has the file (it is sent by file_id).
+    """
+    if report_store is None:
+        return None, await render()
+    
+    key = report_key(payload, REPORT_TEMPLATE_VERSION)
+    if await report_store.get_file_id(key):
+        return key, None
+    
+    pdf_bytes = await report_store.get(key)
+    if pdf_bytes is None:
+        pdf_bytes = await render()
+        await report_store.put(key, pdf_bytes)
+    return key, pdf_bytes
+
+
+async def send_report_document(
+    message: Message,
+    key: Optional[str],
+    pdf_bytes: Optional[bytes],
+    filename: str,
+    caption: str,
+    render: Optional[Callable[[], Awaitable[bytes]]] = None
+) -> None:
+    """
+    Send a report PDF, by cached Telegram file_id when possible
+    
+    The file_id of the first upload is remembered in the report store, so
+    re-sending costs one API call and no upload. A file_id Telegram no
+    longer accepts is dropped and the PDF is uploaded again.
+    """
+    if report_store is not None and key:
+        file_id = await report_store.get_file_id(key)
+        if file_id:
+            try:
+                await message.answer_document(document=file_id, caption=caption)
+                return
+            except TelegramBadRequest as e:
+                logger.warning(f"Cached report file_id rejected, uploading again: {e}")
+                await report_store.forget_file_id(key)
+        
+        if pdf_bytes is None:
+            pdf_bytes = await report_store.get(key)
+    
+    if pdf_bytes is None and render is not None:
+        pdf_bytes = await render()
+    if pdf_bytes is None:
+        raise ServiceError("PDF отчет недоступен")
+    
+    sent = await message.answer_document(
+        document=BufferedInputFile(pdf_bytes, filename=filename),
+        caption=caption
+    )
+    if report_store is not None and key and sent.document:
+        await report_store.set_file_id(key, sent.document.file_id)
+
+
+async def send_analysis_results(
+    message: Message,
+    analysis_result: Dict[str, Any],
+    key: Optional[str],
+    pdf_bytes: Optional[bytes],
+    partner_name: str,
+    render: Optional[Callable[[], Awaitable[bytes]]] = None
+):
     """Send analysis results to user"""
     try:
         # Extract key metrics
@@ -1301,17 +1544,14 @@ async def send_analysis_results(message: Message, analysis_result: Dict[str, Any
         
         # Send PDF report
         try:
-            from aiogram.types import BufferedInputFile
-            
-            pdf_file = BufferedInputFile(
+            await send_report_document(
+                message,
+                key,
                 pdf_bytes,
-                filename=f"free_form_profile_{partner_name}_{message.from_user.id}.pdf"
-            )
-        
-            await message.answer_document(
-                document=pdf_file,
+                filename=f"free_form_profile_{partner_name}_{message.from_user.id}.pdf",
                 caption=f"📄 Профессиональный психологический анализ партнера {partner_name}\n"
-                       f"📝 Основан на 28 развернутых ответах с применением методик DSM-5, ICD-11 и Dark Triad"
+                        f"📝 Основан на 28 развернутых ответах с применением методик DSM-5, ICD-11 и Dark Triad",
+                render=render
             )
             logger.info(f"Free form PDF report sent successfully for user {message.from_user.id}")
             
@@ -4,6 +4,8 @@ from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from typing import List, Optional
 
+from app.utils.pagination import build_page_callback, DIRECTION_NEXT, DIRECTION_PREV
+
 
 def build_inline_kb(rows: List[List[tuple]]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
@@ -402,6 +404,33 @@ def pagination_kb(current_page: int, total_pages: int, prefix: str) -> InlineKey
     return builder.as_markup()
 
 
+def keyset_pagination_buttons(
+    prefix: str,
+    prev_cursor: Optional[str] = None,
+    next_cursor: Optional[str] = None
+) -> List[InlineKeyboardButton]:
+    """Prev/next buttons for cursor pagination (callback_data fits 64 bytes)"""
+    buttons = []
+    
+    if prev_cursor:
+        buttons.append(
+            InlineKeyboardButton(
+                text="⬅️",
+                callback_data=build_page_callback(prefix, DIRECTION_PREV, prev_cursor)
+            )
+        )
+    
+    if next_cursor:
+        buttons.append(
+            InlineKeyboardButton(
+                text="➡️",
+                callback_data=build_page_callback(prefix, DIRECTION_NEXT, next_cursor)
+            )
+        )
+    
+    return buttons
+
+
 def settings_menu_kb() -> InlineKeyboardMarkup:
     """Settings menu keyboard"""
     builder = InlineKeyboardBuilder()
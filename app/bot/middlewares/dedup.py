@@ -0,0 +1,35 @@
+"""Update deduplication middleware"""
+
+from typing import Callable, Dict, Any, Awaitable
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from app.core.dedup import UpdateDeduplicator, update_deduplicator
+
+
+class DeduplicationMiddleware(BaseMiddleware):
+    """Outer update middleware that drops redelivered updates in O(1)"""
+    
+    def __init__(self, deduplicator: UpdateDeduplicator = update_deduplicator):
+        self.deduplicator = deduplicator
+    
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        """Skip update before any DB or AI work if it was already seen"""
+        if not isinstance(event, Update):
+            return await handler(event, data)
+        if await self.deduplicator.is_duplicate(event):
+            return None
+        
+        try:
+            result = await handler(event, data)
+        except Exception:
+            # Failed update - let a redelivery through
+            await self.deduplicator.forget(event)
+            raise
+        await self.deduplicator.complete(event)
+        return result
@@ -0,0 +1,353 @@
+"""Rate-limited outbound queue for Telegram Bot API calls"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import EditMessageText, TelegramMethod
+from loguru import logger
+
+from app.core.config import settings
+
+# Lower value goes first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NOTIFICATION = 1
+
+_send_priority: ContextVar[int] = ContextVar("send_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def notification_priority():
+    """
+    Mark Bot API calls made inside the block as notifications
+
+    Broadcasts and scheduled messages use it so that replies to users who
+    are interacting with the bot are sent first.
+    """
+    token = _send_priority.set(PRIORITY_NOTIFICATION)
+    try:
+        yield
+    finally:
+        _send_priority.reset(token)
+
+
+class TokenBucket:
+    """rate tokens per second, up to capacity stored for bursts"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Seconds until a token is available"""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        self._refill(now)
+        self.tokens -= 1
+
+    def pause(self, now: float, seconds: float) -> None:
+        """Empty the bucket so the next token comes after seconds"""
+        self._refill(now)
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+
+class _Job:
+    __slots__ = ("method", "make_request", "priority", "futures", "enqueued", "attempts")
+
+    def __init__(self, method: TelegramMethod, make_request: Callable[[], Awaitable[Any]], priority: int):
+        self.method = method
+        self.make_request = make_request
+        self.priority = priority
+        self.futures: List[asyncio.Future] = [asyncio.get_running_loop().create_future()]
+        self.enqueued = time.monotonic()
+        self.attempts = 0
+
+
+class _Chat:
+    __slots__ = ("bucket", "jobs", "busy", "scheduled")
+
+    def __init__(self, bucket: TokenBucket):
+        self.bucket = bucket
+        self.jobs: Deque[_Job] = deque()
+        self.busy = False       # a request of this chat is in flight
+        self.scheduled = False  # the chat is in the ready or delayed heap
+
+
+class TelegramSendQueue:
+    """
+    Outbound dispatcher of Bot API calls addressed to a chat
+
+    A global token bucket (~30/s split between worker processes) and per-chat buckets (1/s with a small
+    burst, stricter per minute for groups) pace the calls. A chat sends one
+    request at a time in submission order. Among chats that may send,
+    interactive replies go before notifications. An editMessageText that is
+    still queued is replaced by a newer edit of the same message, and both
+    callers get the result of the newer one. 429 answers pause the chat for
+    retry_after and the call is retried.
+    """
+
+    def __init__(
+        self,
+        global_rate: float = settings.telegram_rate_per_worker,
+        chat_rate: float = settings.TELEGRAM_CHAT_RATE,
+        chat_burst: int = settings.TELEGRAM_CHAT_BURST,
+        group_rate_per_minute: float = settings.TELEGRAM_GROUP_RATE_PER_MINUTE,
+        max_retries: int = settings.TELEGRAM_MAX_RETRIES,
+        idle_ttl: float = 300.0
+    ):
+        self.global_bucket = TokenBucket(global_rate, max(1.0, global_rate))
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate_per_minute / 60
+        self.max_retries = max_retries
+        self.idle_ttl = idle_ttl
+
+        self._chats: Dict[Any, _Chat] = {}
+        self._ready: List[Tuple[int, int, Any]] = []
+        self._delayed: List[Tuple[float, int, Any]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+        self._last_sweep = time.monotonic()
+
+        # Metrics
+        self.submitted = 0
+        self.sent = 0
+        self.coalesced = 0
+        self.retried = 0
+        self.failed = 0
+        self._wait_times: Dict[int, Deque[float]] = {
+            PRIORITY_INTERACTIVE: deque(maxlen=1000),
+            PRIORITY_NOTIFICATION: deque(maxlen=1000),
+        }
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run(), name="telegram-send-queue")
+
+    async def stop(self) -> None:
+        """Stop dispatching; queued calls fail with CancelledError"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for chat in self._chats.values():
+            for job in chat.jobs:
+                for future in job.futures:
+                    future.cancel()
+        self._chats.clear()
+        self._ready.clear()
+        self._delayed.clear()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def _chat(self, chat_id: Any) -> _Chat:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            rate = self.group_rate if is_group else self.chat_rate
+            chat = self._chats[chat_id] = _Chat(TokenBucket(rate, 1 if is_group else self.chat_burst))
+        return chat
+
+    def _schedule(self, chat_id: Any, chat: _Chat, now: float) -> None:
+        """Put a chat with queued jobs into the ready or delayed heap"""
+        if chat.busy or chat.scheduled or not chat.jobs:
+            return
+        chat.scheduled = True
+        delay = chat.bucket.delay(now)
+        if delay > 0:
+            heapq.heappush(self._delayed, (now + delay, next(self._seq), chat_id))
+        else:
+            heapq.heappush(self._ready, (chat.jobs[0].priority, next(self._seq), chat_id))
+        self._wakeup.set()
+
+    async def submit(
+        self,
+        chat_id: Any,
+        method: TelegramMethod,
+        make_request: Callable[[], Awaitable[Any]],
+        priority: Optional[int] = None
+    ) -> Any:
+        """
+        Queue a call and wait for its result
+
+        Args:
+            chat_id: Chat the call is addressed to
+            method: Bot API method (used for coalescing and logging)
+            make_request: Performs the call, may be called again on 429
+            priority: PRIORITY_*; taken from notification_priority() when omitted
+
+        Returns:
+            Result of the call
+        """
+        self.submitted += 1
+        chat = self._chat(chat_id)
+        if isinstance(method, EditMessageText) and method.message_id is not None:
+            for queued in chat.jobs:
+                if isinstance(queued.method, EditMessageText) and queued.method.message_id == method.message_id:
+                    # Superseded edit: send only the newest text
+                    queued.method = method
+                    queued.make_request = make_request
+                    future = asyncio.get_running_loop().create_future()
+                    queued.futures.append(future)
+                    self.coalesced += 1
+                    return await future
+
+        job = _Job(method, make_request, _send_priority.get() if priority is None else priority)
+        chat.jobs.append(job)
+        self._schedule(chat_id, chat, time.monotonic())
+        return await job.futures[-1]
+
+    async def _run(self) -> None:
+        while True:
+            now = time.monotonic()
+            while self._delayed and self._delayed[0][0] <= now:
+                _, _, chat_id = heapq.heappop(self._delayed)
+                chat = self._chats.get(chat_id)
+                if chat and chat.jobs:
+                    heapq.heappush(self._ready, (chat.jobs[0].priority, next(self._seq), chat_id))
+                elif chat:
+                    chat.scheduled = False
+
+            if not self._ready:
+                self._sweep(now)
+                self._wakeup.clear()
+                timeout = self._delayed[0][0] - now if self._delayed else None
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            delay = self.global_bucket.delay(now)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+
+            _, _, chat_id = heapq.heappop(self._ready)
+            chat = self._chats[chat_id]
+            chat.scheduled = False
+            job = chat.jobs.popleft()
+            chat.busy = True
+            self.global_bucket.take(now)
+            chat.bucket.take(now)
+            task = asyncio.create_task(self._send(chat_id, chat, job))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, chat_id: Any, chat: _Chat, job: _Job) -> None:
+        job.attempts += 1
+        if job.attempts == 1:
+            self._wait_times[job.priority].append(time.monotonic() - job.enqueued)
+        try:
+            result = await job.make_request()
+        except TelegramRetryAfter as e:
+            now = time.monotonic()
+            chat.bucket.pause(now, e.retry_after)
+            if job.attempts <= self.max_retries:
+                self.retried += 1
+                logger.warning(f"⏳ Telegram flood control in chat {chat_id}, retrying in {e.retry_after}s")
+                chat.jobs.appendleft(job)
+            else:
+                self.failed += 1
+                self._resolve(job, error=e)
+        except BaseException as e:
+            self.failed += 1
+            self._resolve(job, error=e)
+        else:
+            self.sent += 1
+            self._resolve(job, result=result)
+        finally:
+            chat.busy = False
+            self._schedule(chat_id, chat, time.monotonic())
+
+    @staticmethod
+    def _resolve(job: _Job, result: Any = None, error: Optional[BaseException] = None) -> None:
+        for future in job.futures:
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def _sweep(self, now: float) -> None:
+        """Forget idle chats whose bucket is full again"""
+        if now - self._last_sweep < self.idle_ttl:
+            return
+        self._last_sweep = now
+        for chat_id in [
+            chat_id for chat_id, chat in self._chats.items()
+            if not chat.jobs and not chat.busy and now - chat.bucket.updated > self.idle_ttl
+        ]:
+            del self._chats[chat_id]
+
+    def get_stats(self) -> Dict[str, Any]:
+        def p95_ms(values: Deque[float]) -> float:
+            ordered = sorted(values)
+            return round(ordered[int(len(ordered) * 0.95)] * 1000, 1) if ordered else 0.0
+
+        return {
+            "running": self.running,
+            "submitted": self.submitted,
+            "sent": self.sent,
+            "coalesced": self.coalesced,
+            "retried_429": self.retried,
+            "failed": self.failed,
+            "queued": sum(len(chat.jobs) for chat in self._chats.values()),
+            "in_flight": len(self._inflight),
+            "chats": len(self._chats),
+            "wait_p95_ms": {
+                "interactive": p95_ms(self._wait_times[PRIORITY_INTERACTIVE]),
+                "notification": p95_ms(self._wait_times[PRIORITY_NOTIFICATION]),
+            },
+        }
+
+
+class SendQueueMiddleware(BaseRequestMiddleware):
+    """Bot session middleware routing every chat-bound call through the send queue"""
+
+    def __init__(self, queue: TelegramSendQueue):
+        self.queue = queue
+
+    async def __call__(self, make_request, bot: Bot, method: TelegramMethod):
+        chat_id = getattr(method, "chat_id", None)
+        if chat_id is None or not self.queue.running:
+            return await make_request(bot, method)
+
+        return await self.queue.submit(chat_id, method, lambda: make_request(bot, method))
+
+
+def setup_send_queue(bot: Bot) -> None:
+    """Attach the global send queue to a bot session"""
+    if settings.SEND_QUEUE_ENABLED:
+        bot.session.middleware(SendQueueMiddleware(send_queue))
+
+
+# Global send queue of this process
+send_queue = TelegramSendQueue()
@@ -0,0 +1,27 @@
+"""FSM storage selection"""
+
+from aiogram.fsm.storage.base import BaseStorage
+from aiogram.fsm.storage.memory import MemoryStorage
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.redis import redis_client
+
+
+def create_fsm_storage() -> BaseStorage:
+    """
+    Create FSM storage shared by all worker processes
+
+    Updates of one chat may land on different workers, so FSM state must live
+    in Redis when more than one worker runs. MemoryStorage is used only when
+    Redis is not available.
+    """
+    if redis_client.is_available:
+        from aiogram.fsm.storage.redis import RedisStorage
+
+        logger.info("✅ FSM storage: Redis")
+        return RedisStorage.from_url(settings.REDIS_URL)
+
+    if settings.server_workers > 1:
+        logger.warning("⚠️ Redis unavailable: FSM state is per-worker, multi-step dialogs may break")
+    return MemoryStorage()
@@ -0,0 +1,150 @@
+"""Bounded in-process update queue for fast-ack webhook mode"""
+
+import asyncio
+import time
+from typing import Any, Dict, List, Optional
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from app.bot.chat_dispatcher import ChatSerializer, chat_serializer, get_update_chat_id
+from app.core.config import settings
+from app.core.dedup import update_deduplicator
+from app.core.logging import logger
+
+
+class UpdateQueue:
+    """
+    Bounded queue + worker pool that feeds updates to the dispatcher
+
+    The webhook only validates and enqueues, so Telegram gets its 200 right
+    away instead of waiting minutes for profiling to finish. Updates of the
+    same chat are processed in arrival order; different chats run in parallel.
+    """
+
+    def __init__(
+        self,
+        dp: Dispatcher,
+        bot: Bot,
+        max_size: int = settings.UPDATE_QUEUE_SIZE,
+        workers: int = settings.UPDATE_QUEUE_WORKERS,
+        serializer: Optional[ChatSerializer] = None
+    ):
+        self.dp = dp
+        self.bot = bot
+        self.max_size = max_size
+        self.workers_count = workers
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._workers: List[asyncio.Task] = []
+        self.serializer = serializer or chat_serializer
+
+        # Metrics
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.busy_workers = 0
+        self.max_depth_seen = 0
+
+    @property
+    def depth(self) -> int:
+        """Current number of queued updates"""
+        return self._queue.qsize()
+
+    @property
+    def is_running(self) -> bool:
+        """Check if workers are started"""
+        return bool(self._workers)
+
+    def start(self) -> None:
+        """Start worker tasks"""
+        if self._workers:
+            return
+
+        for i in range(self.workers_count):
+            self._workers.append(
+                asyncio.create_task(self._worker(), name=f"update-worker-{i}")
+            )
+        logger.info(f"✅ Update queue started: {self.workers_count} workers, max size {self.max_size}")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Drain queue (up to timeout) and stop workers"""
+        if not self._workers:
+            return
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Update queue stopped with {self.depth} updates pending")
+
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+        logger.info("🔌 Update queue stopped")
+
+    def submit(self, update: Update) -> bool:
+        """
+        Enqueue update without waiting
+
+        Returns:
+            False if the queue is full (caller should signal backpressure)
+        """
+        try:
+            self._queue.put_nowait((time.monotonic(), update))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            logger.warning(f"⚠️ Update queue full ({self.max_size}), update {update.update_id} rejected")
+            return False
+
+        self.enqueued += 1
+        self.max_depth_seen = max(self.max_depth_seen, self.depth)
+        return True
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Backpressure metrics"""
+        return {
+            "depth": self.depth,
+            "max_size": self.max_size,
+            "max_depth_seen": self.max_depth_seen,
+            "workers": self.workers_count,
+            "busy_workers": self.busy_workers,
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "serializer": self.serializer.get_stats(),
+        }
+
+    async def _worker(self) -> None:
+        """Worker loop"""
+        while True:
+            enqueued_at, update = await self._queue.get()
+            try:
+                self.busy_workers += 1
+                await self._process(update, enqueued_at)
+            finally:
+                self.busy_workers -= 1
+                self._queue.task_done()
+
+    async def _process(self, update: Update, enqueued_at: float) -> None:
+        """Feed update to dispatcher in its chat's turn"""
+        # No await between queue.get() and joining the chat lock, so updates
+        # of one chat line up in the same order they were dequeued
+        async with self.serializer.serialize(get_update_chat_id(update)):
+            await self._feed(update, enqueued_at)
+
+    async def _feed(self, update: Update, enqueued_at: float) -> None:
+        """Run dispatcher for a single update"""
+        wait_time = time.monotonic() - enqueued_at
+        try:
+            await self.dp.feed_update(self.bot, update)
+            self.processed += 1
+            await update_deduplicator.complete(update)
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"❌ Update {update.update_id} processing failed: {e}")
+            await update_deduplicator.forget(update)
+
+        if wait_time > 5.0:
+            logger.warning(f"Update {update.update_id} waited {wait_time:.2f}s in queue")
@@ -21,6 +21,23 @@ class Settings(BaseSettings):
     WEBHOOK_URL: Optional[str] = Field(None, env="WEBHOOK_URL")
     WEBHOOK_SECRET: Optional[str] = Field(None, env="WEBHOOK_SECRET")
     
+    # Webhook update queue (fast-ack mode)
+    UPDATE_QUEUE_SIZE: int = Field(1000, env="UPDATE_QUEUE_SIZE")
+    UPDATE_QUEUE_WORKERS: int = Field(32, env="UPDATE_QUEUE_WORKERS")
+    
+    # Update deduplication (redelivered updates are dropped instead of pending ones)
+    UPDATE_DEDUP_TTL: int = Field(86400, env="UPDATE_DEDUP_TTL")
+    UPDATE_DEDUP_PROCESSING_TTL: int = Field(600, env="UPDATE_DEDUP_PROCESSING_TTL")
+    DROP_PENDING_UPDATES: bool = Field(False, env="DROP_PENDING_UPDATES")
+    
+    # Outbound send queue (Telegram limits: ~30 msg/s overall, 1/s per chat, 20/min per group)
+    SEND_QUEUE_ENABLED: bool = Field(True, env="SEND_QUEUE_ENABLED")
+    TELEGRAM_GLOBAL_RATE: float = Field(30.0, env="TELEGRAM_GLOBAL_RATE")
+    TELEGRAM_CHAT_RATE: float = Field(1.0, env="TELEGRAM_CHAT_RATE")
+    TELEGRAM_CHAT_BURST: int = Field(3, env="TELEGRAM_CHAT_BURST")
+    TELEGRAM_GROUP_RATE_PER_MINUTE: float = Field(20.0, env="TELEGRAM_GROUP_RATE_PER_MINUTE")
+    TELEGRAM_MAX_RETRIES: int = Field(3, env="TELEGRAM_MAX_RETRIES")
+    
     @property
     def BOT_TOKEN(self) -> str:
         """Alias for TELEGRAM_BOT_TOKEN for backward compatibility"""
@@ -28,6 +45,7 @@ class Settings(BaseSettings):
     
     # AI Configuration - только AIML API
     OPENAI_API_KEY: Optional[str] = Field(None, env="OPENAI_API_KEY")
+    OPENROUTER_API_URL: str = Field("https://openrouter.ai/api/v1/chat/completions", env="OPENROUTER_API_URL")
     
     # AIML API Configuration for Claude 3.7
     AIML_API_KEY: Optional[str] = Field(None, env="AIML_API_KEY")
@@ -44,15 +62,21 @@ class Settings(BaseSettings):
     # Thinking tokens for Claude 3.7
     MAX_THINKING_TOKENS: int = Field(15000, env="MAX_THINKING_TOKENS")
     
+    # Provider routing
+    AI_STUB_PROVIDER: bool = Field(False, env="AI_STUB_PROVIDER")  # offline testing
+    AI_HEDGE_METRICS: bool = Field(False, env="AI_HEDGE_METRICS")  # backup request at p95
+    
+    # Context window of the OpenRouter model (anthropic/claude-sonnet-4)
+    MODEL_CONTEXT_WINDOW: int = Field(200000, env="MODEL_CONTEXT_WINDOW")
+    
     # Model-specific token limits
     @property
     def model_max_tokens(self) -> int:
-        """Get max tokens for current model"""
+        """Get context window (prompt + response tokens) for current model"""
         if self.USE_AIML_API:
             return 200000  # AIML API поддерживает до 200k токенов
         
-        # Fallback для других моделей
-        return 8192
+        return self.MODEL_CONTEXT_WINDOW
         
     @property
     def effective_claude_model(self) -> str:
@@ -63,6 +87,24 @@ class Settings(BaseSettings):
     
     # PDF Generation
     CLOUDLAYER_API_KEY: Optional[str] = Field(None, env="CLOUDLAYER_API_KEY")
+    CLOUDLAYER_API_URL: str = Field("https://api.cloudlayer.io", env="CLOUDLAYER_API_URL")
+    
+    # Report artifacts (rendered PDFs, content-addressed)
+    REPORT_STORE_ENABLED: bool = Field(True, env="REPORT_STORE_ENABLED")
+    REPORT_STORE_BACKEND: str = Field("local", env="REPORT_STORE_BACKEND")  # local | s3
+    REPORT_STORE_PATH: str = Field("data/reports", env="REPORT_STORE_PATH")
+    REPORT_STORE_S3_BUCKET: Optional[str] = Field(None, env="REPORT_STORE_S3_BUCKET")
+    REPORT_STORE_S3_ENDPOINT_URL: Optional[str] = Field(None, env="REPORT_STORE_S3_ENDPOINT_URL")  # MinIO
+    REPORT_STORE_S3_ACCESS_KEY: Optional[str] = Field(None, env="REPORT_STORE_S3_ACCESS_KEY")
+    REPORT_STORE_S3_SECRET_KEY: Optional[str] = Field(None, env="REPORT_STORE_S3_SECRET_KEY")
+    REPORT_STORE_S3_REGION: str = Field("us-east-1", env="REPORT_STORE_S3_REGION")
+    REPORT_STORE_ZSTD_LEVEL: int = Field(10, env="REPORT_STORE_ZSTD_LEVEL")
+    REPORT_FILE_ID_TTL: int = Field(90 * 86400, env="REPORT_FILE_ID_TTL")  # Telegram file_id cache
+    REPORT_RENDER_EXECUTOR: str = Field("thread", env="REPORT_RENDER_EXECUTOR")  # thread | process | inline
+    REPORT_RENDER_WORKERS: int = Field(2, env="REPORT_RENDER_WORKERS")
+    LOOP_LAG_WARN_SECONDS: float = Field(0.25, env="LOOP_LAG_WARN_SECONDS")
+    PDF_OPTIMIZE_ENABLED: bool = Field(True, env="PDF_OPTIMIZE_ENABLED")  # HTML minify + PDF recompression
+    PDF_RECOMPRESS_LEVEL: int = Field(9, env="PDF_RECOMPRESS_LEVEL")
     
     # AI Performance
     MAX_CONCURRENT_AI_REQUESTS: int = Field(10, env="MAX_CONCURRENT_AI_REQUESTS")
@@ -70,6 +112,9 @@ class Settings(BaseSettings):
     AI_RETRY_ATTEMPTS: int = Field(3, env="AI_RETRY_ATTEMPTS")
     AI_RETRY_DELAY: float = Field(1.0, env="AI_RETRY_DELAY")
     AI_RATE_LIMIT_SECONDS: float = Field(3.0, env="AI_RATE_LIMIT_SECONDS")
+    AI_BREAKER_FAILURE_THRESHOLD: int = Field(5, env="AI_BREAKER_FAILURE_THRESHOLD")
+    AI_BREAKER_RECOVERY_TIME: float = Field(30.0, env="AI_BREAKER_RECOVERY_TIME")
+    AI_MIN_TOKENS_PER_SECOND: float = Field(20.0, env="AI_MIN_TOKENS_PER_SECOND")  # read timeout of non-streamed calls
     
     # Database
     DATABASE_URL: str = Field(..., env="DATABASE_URL")
@@ -91,6 +136,28 @@ class Settings(BaseSettings):
     # Server
     HOST: str = Field("0.0.0.0", env="HOST")
     PORT: int = Field(8000, env="PORT")
+    WEB_CONCURRENCY: int = Field(1, env="WEB_CONCURRENCY")  # 0 = one worker per CPU
+    LEADER_LEASE_TTL: float = Field(30.0, env="LEADER_LEASE_TTL")
+    # Per-chat Redis lock when several workers process updates
+    CHAT_LOCK_TTL: float = Field(30.0, env="CHAT_LOCK_TTL")
+    CHAT_LOCK_WAIT: float = Field(120.0, env="CHAT_LOCK_WAIT")
+    
+    @property
+    def server_workers(self) -> int:
+        """Number of server worker processes"""
+        if self.WEB_CONCURRENCY <= 0:
+            return os.cpu_count() or 1
+        return self.WEB_CONCURRENCY
+    
+    @property
+    def ai_concurrency_per_worker(self) -> int:
+        """Share of MAX_CONCURRENT_AI_REQUESTS for one worker process"""
+        return max(1, self.MAX_CONCURRENT_AI_REQUESTS // self.server_workers)
+    
+    @property
+    def telegram_rate_per_worker(self) -> float:
+        """Share of TELEGRAM_GLOBAL_RATE for one worker process (the bot token's limit is shared)"""
+        return self.TELEGRAM_GLOBAL_RATE / self.server_workers
     
     # Monitoring
     SENTRY_DSN: Optional[str] = Field(None, env="SENTRY_DSN")
@@ -108,6 +175,23 @@ class Settings(BaseSettings):
     DAILY_CONTENT_CACHE_TTL: int = Field(3600, env="DAILY_CONTENT_CACHE_TTL")
     USER_SESSION_TTL: int = Field(86400, env="USER_SESSION_TTL")  # 24 hours
     
+    # Broadcasts (keyset batches of users, checkpointed in Redis after each batch)
+    BROADCAST_BATCH_SIZE: int = Field(500, env="BROADCAST_BATCH_SIZE")
+    BROADCAST_MAX_IN_FLIGHT: int = Field(100, env="BROADCAST_MAX_IN_FLIGHT")
+    BROADCAST_STALE_SECONDS: int = Field(120, env="BROADCAST_STALE_SECONDS")
+    
+    # Scheduled notifications (daily tips, analysis reminders, weekly stats)
+    NOTIFICATIONS_SCHEDULER_ENABLED: bool = Field(True, env="NOTIFICATIONS_SCHEDULER_ENABLED")
+    NOTIFICATION_TICK_SECONDS: float = Field(30.0, env="NOTIFICATION_TICK_SECONDS")
+    NOTIFICATION_BATCH_SIZE: int = Field(1000, env="NOTIFICATION_BATCH_SIZE")
+    NOTIFICATION_MAX_LATENESS: int = Field(3600, env="NOTIFICATION_MAX_LATENESS")
+    ANALYSIS_REMINDER_DAYS: int = Field(7, env="ANALYSIS_REMINDER_DAYS")
+    
+    # User data export (zip archive sent as a document)
+    DATA_EXPORT_MAX_CONCURRENT: int = Field(2, env="DATA_EXPORT_MAX_CONCURRENT")
+    DATA_EXPORT_YIELD_PER: int = Field(500, env="DATA_EXPORT_YIELD_PER")
+    DATA_EXPORT_DIR: Optional[str] = Field(None, env="DATA_EXPORT_DIR")  # system temp dir by default
+    
     # Security
     ALLOWED_HOSTS: List[str] = Field(["*"], env="ALLOWED_HOSTS")
     ADMIN_USER_IDS: List[int] = Field([], env="ADMIN_USER_IDS")
@@ -116,6 +200,16 @@ class Settings(BaseSettings):
     ENHANCED_ANALYSIS: bool = Field(True, env="ENHANCED_ANALYSIS")
     ANALYSIS_CACHE_TTL: int = Field(3600, env="ANALYSIS_CACHE_TTL")  # 1 час
     
+    # Резюме блоков анкеты, готовящиеся в фоне во время опроса
+    BLOCK_SUMMARY_ENABLED: bool = Field(True, env="BLOCK_SUMMARY_ENABLED")
+    BLOCK_SUMMARY_TTL: int = Field(86400, env="BLOCK_SUMMARY_TTL")  # 24 часа
+    BLOCK_SUMMARY_MIN_TOKENS: int = Field(800, env="BLOCK_SUMMARY_MIN_TOKENS")  # короче - резюме не сокращает промпт
+    BLOCK_SUMMARY_QUOTE_TOKENS: int = Field(60, env="BLOCK_SUMMARY_QUOTE_TOKENS")  # цитата ответа рядом с резюме
+    
+    # Локальная оценка метрик по лексиконам (LLM - только при низкой уверенности)
+    LOCAL_SCORING_ENABLED: bool = Field(True, env="LOCAL_SCORING_ENABLED")
+    LOCAL_SCORING_MIN_CONFIDENCE: float = Field(0.45, env="LOCAL_SCORING_MIN_CONFIDENCE")  # 0..1
+    
     @field_validator("DATABASE_URL")
     @classmethod
     def validate_database_url(cls, v):
@@ -0,0 +1,160 @@
+"""Idempotency store for Telegram updates"""
+
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from aiogram.types import Update
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.redis import redis_client
+
+
+class _GenerationalSet:
+    """
+    In-process TTL set made of two rotating generations
+
+    Membership is O(1) and memory is bounded by what arrives within two
+    TTL windows; an entry lives between ttl and 2*ttl seconds.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._current: Set[str] = set()
+        self._previous: Set[str] = set()
+        self._rotated_at = time.monotonic()
+
+    def _rotate(self) -> None:
+        now = time.monotonic()
+        if now - self._rotated_at < self.ttl:
+            return
+        # Skipped a whole window - both generations are stale
+        self._previous = self._current if now - self._rotated_at < 2 * self.ttl else set()
+        self._current = set()
+        self._rotated_at = now
+
+    def add(self, key: str) -> bool:
+        """Add key, return False if it was already present"""
+        self._rotate()
+        if key in self._current or key in self._previous:
+            return False
+        self._current.add(key)
+        return True
+
+    def discard(self, key: str) -> None:
+        self._current.discard(key)
+        self._previous.discard(key)
+
+    def __len__(self) -> int:
+        return len(self._current) + len(self._previous)
+
+
+def get_update_dedup_keys(update: Update) -> List[str]:
+    """Idempotency keys of an update: update_id plus callback query id"""
+    keys = [f"u:{update.update_id}"]
+    if update.callback_query:
+        keys.append(f"cq:{update.callback_query.id}")
+    return keys
+
+
+class UpdateDeduplicator:
+    """
+    Drop redelivered updates before they reach handlers
+
+    Uses Redis SET NX EX when available, so duplicates are caught across
+    workers and restarts; falls back to an in-process TTL set otherwise.
+    An update is first claimed for processing_ttl only and kept for the
+    full ttl once processed: if processing fails the claim is released,
+    and if the process dies the claim expires, so Telegram's redelivery
+    is handled instead of dropped.
+    """
+
+    def __init__(
+        self,
+        ttl: int = settings.UPDATE_DEDUP_TTL,
+        prefix: str = "dedup",
+        processing_ttl: int = settings.UPDATE_DEDUP_PROCESSING_TTL
+    ):
+        self.ttl = ttl
+        self.processing_ttl = min(processing_ttl, ttl)
+        self.prefix = prefix
+        self._local = _GenerationalSet(ttl)
+
+        # Metrics
+        self.checked = 0
+        self.duplicates = 0
+        self.redis_errors = 0
+
+    async def _claim(self, key: str) -> bool:
+        """Mark key as seen, return False if it was already marked"""
+        if redis_client.is_available and redis_client.redis:
+            try:
+                claimed = await redis_client.redis.set(
+                    f"{self.prefix}:{key}", 1, nx=True, ex=self.processing_ttl
+                )
+                return bool(claimed)
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Dedup Redis error, using local store: {e}")
+
+        return self._local.add(key)
+
+    async def _release(self, key: str) -> None:
+        """Forget key"""
+        self._local.discard(key)
+        if redis_client.is_available and redis_client.redis:
+            try:
+                await redis_client.redis.delete(f"{self.prefix}:{key}")
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Dedup Redis release error: {e}")
+
+    async def _extend(self, key: str) -> None:
+        """Keep a processed key for the full TTL (local keys already live that long)"""
+        if redis_client.is_available and redis_client.redis:
+            try:
+                await redis_client.redis.expire(f"{self.prefix}:{key}", self.ttl)
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Dedup Redis extend error: {e}")
+
+    async def is_duplicate(self, update: Update) -> bool:
+        """
+        Check and mark update as seen
+
+        Returns:
+            True if update (or its callback query) was already seen
+        """
+        self.checked += 1
+        for key in get_update_dedup_keys(update):
+            if not await self._claim(key):
+                self.duplicates += 1
+                logger.debug(f"Duplicate update {update.update_id} dropped ({key})")
+                return True
+        return False
+
+    async def complete(self, update: Update) -> None:
+        """Mark update as processed, so redeliveries are dropped for the full TTL"""
+        for key in get_update_dedup_keys(update):
+            await self._extend(key)
+
+    async def forget(self, update: Update) -> None:
+        """Release marks so a redelivery of this update is accepted"""
+        for key in get_update_dedup_keys(update):
+            await self._release(key)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Deduplication metrics"""
+        return {
+            "backend": "redis" if redis_client.is_available else "memory",
+            "ttl": self.ttl,
+            "processing_ttl": self.processing_ttl,
+            "checked": self.checked,
+            "duplicates": self.duplicates,
+            "redis_errors": self.redis_errors,
+            "local_keys": len(self._local),
+        }
+
+
+# Global deduplicator instance
+update_deduplicator = UpdateDeduplicator()
@@ -0,0 +1,99 @@
+"""Redis-based leader election for multi-worker deployments"""
+
+import asyncio
+import os
+import socket
+import uuid
+from typing import Optional
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.redis import RELEASE_IF_OWNER_SCRIPT, RENEW_IF_OWNER_SCRIPT, redis_client
+
+
+class LeaderElection:
+    """
+    Single-leader lease shared by all worker processes
+
+    The leader holds a Redis key with a TTL and renews it in the background;
+    if the leader dies the key expires and another worker takes over on its
+    next attempt. Only the leader sets the webhook and runs scheduled jobs.
+    """
+
+    def __init__(
+        self,
+        name: str = "app",
+        lease_ttl: float = settings.LEADER_LEASE_TTL,
+        renew_interval: Optional[float] = None
+    ):
+        self.key = f"leader:{name}"
+        self.lease_ttl = lease_ttl
+        self.renew_interval = renew_interval or lease_ttl / 3
+        self.token = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._is_leader = False
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_leader(self) -> bool:
+        """Check if this process currently holds leadership"""
+        return self._is_leader
+
+    async def try_acquire(self) -> bool:
+        """Acquire or renew the lease, return current leadership"""
+        if not redis_client.is_available or not redis_client.redis:
+            # Without shared state only a single-worker deployment may lead
+            self._set_leader(settings.server_workers == 1)
+            return self._is_leader
+
+        ttl_ms = int(self.lease_ttl * 1000)
+        try:
+            if self._is_leader:
+                renewed = await redis_client.redis.eval(
+                    RENEW_IF_OWNER_SCRIPT, 1, self.key, self.token, ttl_ms
+                )
+                self._set_leader(bool(renewed))
+            else:
+                acquired = await redis_client.redis.set(
+                    self.key, self.token, nx=True, px=ttl_ms
+                )
+                self._set_leader(bool(acquired))
+        except Exception as e:
+            logger.error(f"Leader election error: {e}")
+            self._set_leader(False)
+
+        return self._is_leader
+
+    async def start(self) -> bool:
+        """Run first election and keep the lease renewed in background"""
+        await self.try_acquire()
+        if not self._task:
+            self._task = asyncio.create_task(self._renew_loop(), name="leader-election")
+        return self._is_leader
+
+    async def stop(self) -> None:
+        """Stop renewing and release the lease"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+        if self._is_leader and redis_client.is_available and redis_client.redis:
+            try:
+                await redis_client.redis.eval(RELEASE_IF_OWNER_SCRIPT, 1, self.key, self.token)
+            except Exception as e:
+                logger.error(f"Leader release error: {e}")
+        self._set_leader(False)
+
+    async def _renew_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.renew_interval)
+            await self.try_acquire()
+
+    def _set_leader(self, value: bool) -> None:
+        if value != self._is_leader:
+            logger.info(f"👑 {self.token} {'became' if value else 'lost'} leader ({self.key})")
+        self._is_leader = value
+
+
+# Process-wide leader election instance
+leader_election = LeaderElection()
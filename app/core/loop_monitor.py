@@ -0,0 +1,119 @@
+"""Event loop lag monitoring"""
+
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from app.core.config import settings
+from app.core.logging import logger
+
+
+class LoopBlockProbe:
+    """
+    Measures how long the event loop was blocked inside an async with block
+
+    A helper task wakes up every interval and records how late it woke up;
+    on exit the time since the last expected wake-up is counted too, so a
+    synchronous call that never yields is measured as well.
+
+        async with LoopBlockProbe() as probe:
+            await render()
+        probe.max_lag  # longest stall of the loop, seconds
+    """
+
+    def __init__(self, interval: float = 0.01):
+        self.interval = interval
+        self.max_lag = 0.0
+        self._expected = 0.0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "LoopBlockProbe":
+        self._loop = asyncio.get_running_loop()
+        self._expected = self._loop.time() + self.interval
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            self._observe()
+
+    def _observe(self) -> None:
+        now = self._loop.time()
+        self.max_lag = max(self.max_lag, now - self._expected)
+        self._expected = now + self.interval
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self._observe()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+
+class LoopLagMonitor:
+    """
+    Background sampler of event loop lag for the whole process
+
+    Sleeps interval seconds at a time and records the overshoot; stalls over
+    warn_threshold are logged, so blocking code shows up in the logs with
+    its duration.
+    """
+
+    def __init__(
+        self,
+        interval: float = 0.5,
+        warn_threshold: float = settings.LOOP_LAG_WARN_SECONDS,
+        window: int = 1200
+    ):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+        self.max_lag = 0.0
+        self.stalls = 0
+
+    def start(self) -> None:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="loop-lag-monitor")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.record(max(0.0, loop.time() - expected))
+
+    def record(self, lag: float) -> None:
+        self._samples.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+        if lag >= self.warn_threshold:
+            self.stalls += 1
+            logger.warning(f"🐢 Event loop was blocked for {lag * 1000:.0f} ms")
+
+    def get_stats(self) -> Dict[str, Any]:
+        samples = sorted(self._samples)
+        if not samples:
+            return {"samples": 0, "max_lag_ms": 0.0, "stalls": self.stalls}
+        return {
+            "samples": len(samples),
+            "p50_lag_ms": round(samples[len(samples) // 2] * 1000, 1),
+            "p99_lag_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.99))] * 1000, 1),
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "stalls": self.stalls,
+        }
+
+
+# Global loop lag monitor
+loop_monitor = LoopLagMonitor()
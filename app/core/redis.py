@@ -7,6 +7,22 @@ from loguru import logger
 
 from app.core.config import settings
 
+# Extend a lock/lease key only if we still own it
+RENEW_IF_OWNER_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# Delete a lock/lease key only if we still own it
+RELEASE_IF_OWNER_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
 
 class RedisClient:
     """Redis client wrapper with utilities"""
@@ -117,6 +133,41 @@ class RedisClient:
             logger.error(f"Redis KEYS error for pattern {pattern}: {e}")
             return []
     
+    async def sadd(self, key: str, *members: str) -> bool:
+        """Add members to a set"""
+        if not self.redis:
+            return False
+        
+        try:
+            await self.redis.sadd(key, *members)
+            return True
+        except Exception as e:
+            logger.error(f"Redis SADD error for key {key}: {e}")
+            return False
+    
+    async def srem(self, key: str, *members: str) -> bool:
+        """Remove members from a set"""
+        if not self.redis:
+            return False
+        
+        try:
+            await self.redis.srem(key, *members)
+            return True
+        except Exception as e:
+            logger.error(f"Redis SREM error for key {key}: {e}")
+            return False
+    
+    async def smembers(self, key: str) -> set:
+        """Get all members of a set"""
+        if not self.redis:
+            return set()
+        
+        try:
+            return await self.redis.smembers(key)
+        except Exception as e:
+            logger.error(f"Redis SMEMBERS error for key {key}: {e}")
+            return set()
+    
     async def set_rate_limit(
         self,
         key: str,
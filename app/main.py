@@ -26,11 +26,50 @@ from app.bot.middlewares.logging import LoggingMiddleware
 from app.bot.middlewares.rate_limit import RateLimitMiddleware
 from app.bot.middlewares.subscription import SubscriptionMiddleware
 from app.bot.middlewares.dependencies import DependenciesMiddleware
+from app.bot.middlewares.dedup import DeduplicationMiddleware
+from app.bot.update_queue import UpdateQueue
+from app.bot.chat_dispatcher import ChatSerialMiddleware, chat_serializer
+from app.bot.storage import create_fsm_storage
+from app.core.leader import leader_election
+from app.core.loop_monitor import loop_monitor
+from app.bot.send_queue import send_queue, setup_send_queue
+from app.services.html_pdf_service import report_render_stage
+from app.services.broadcast import broadcast_engine
+from app.services.notification_scheduler import notification_scheduler
 
 # Import API routes
 from app.api.routes import health, analytics, webhooks
 
 
+def create_dispatcher() -> Dispatcher:
+    """Create dispatcher with FSM storage, middlewares and all handlers"""
+    dp = Dispatcher(storage=create_fsm_storage())
+    
+    # Setup middlewares
+    dp.message.middleware(DependenciesMiddleware())
+    dp.callback_query.middleware(DependenciesMiddleware())
+    dp.message.middleware(AuthMiddleware())
+    dp.callback_query.middleware(AuthMiddleware())
+    dp.message.middleware(LoggingMiddleware())
+    dp.callback_query.middleware(LoggingMiddleware())
+    dp.message.middleware(RateLimitMiddleware())
+    dp.callback_query.middleware(RateLimitMiddleware())
+    dp.message.middleware(SubscriptionMiddleware())
+    dp.callback_query.middleware(SubscriptionMiddleware())
+    
+    # Register handlers
+    dp.include_router(start.router)
+    dp.include_router(profile.router)
+    dp.include_router(profiler.router)
+    dp.include_router(analysis.router)
+    dp.include_router(compatibility.router)
+    dp.include_router(daily.router)
+    dp.include_router(payments.router)
+    dp.include_router(admin.router)
+    
+    return dp
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan manager"""
@@ -44,6 +83,9 @@ async def lifespan(app: FastAPI):
     bot_initialized = False
     
     try:
+        # Report stalls of the event loop
+        loop_monitor.start()
+        
         # Initialize database
         try:
             await init_db()
@@ -74,53 +116,39 @@ async def lifespan(app: FastAPI):
                     token=bot_token,
                     parse_mode=ParseMode.HTML
                 )
+                # Chat-bound calls are paced to Telegram's limits
+                setup_send_queue(bot)
+                send_queue.start()
                 
                 # Test bot connection
                 bot_info = await bot.get_me()
                 logger.info(f"✅ Bot connected: @{bot_info.username} ({bot_info.first_name})")
                 
                 # Create dispatcher
-                dp = Dispatcher()
-                
-                # Setup middlewares
-                dp.message.middleware(DependenciesMiddleware())
-                dp.callback_query.middleware(DependenciesMiddleware())
-                dp.message.middleware(AuthMiddleware())
-                dp.callback_query.middleware(AuthMiddleware())
-                dp.message.middleware(LoggingMiddleware())
-                dp.callback_query.middleware(LoggingMiddleware())
-                dp.message.middleware(RateLimitMiddleware())
-                dp.callback_query.middleware(RateLimitMiddleware())
-                dp.message.middleware(SubscriptionMiddleware())
-                dp.callback_query.middleware(SubscriptionMiddleware())
-                
-                # Register handlers
-                dp.include_router(start.router)
-                dp.include_router(profile.router)
-                dp.include_router(profiler.router)
-                dp.include_router(analysis.router)
-                dp.include_router(compatibility.router)
-                dp.include_router(daily.router)
-                dp.include_router(payments.router)
-                dp.include_router(admin.router)
+                dp = create_dispatcher()
                 
                 logger.info("✅ Bot handlers registered")
                 
+                # Only the leader worker touches webhook settings
+                await leader_election.start()
+                
                 # Set webhook if configured
                 try:
                     webhook_url = getattr(settings, 'WEBHOOK_URL', None)
-                    if webhook_url:
+                    if not leader_election.is_leader:
+                        logger.info("⏭️ Not the leader worker, skipping webhook setup")
+                    elif webhook_url:
                         webhook_secret = getattr(settings, 'WEBHOOK_SECRET', None)
                         full_webhook_url = f"{webhook_url}/webhook"
                         
                         await bot.set_webhook(
                             url=full_webhook_url,
                             secret_token=webhook_secret,
-                            drop_pending_updates=True
+                            drop_pending_updates=settings.DROP_PENDING_UPDATES
                         )
                         logger.info(f"✅ Webhook set to {full_webhook_url}")
                     else:
-                        await bot.delete_webhook(drop_pending_updates=True)
+                        await bot.delete_webhook(drop_pending_updates=settings.DROP_PENDING_UPDATES)
                         logger.info("✅ Webhook deleted, using polling mode")
                 except Exception as webhook_error:
                     logger.error(f"❌ Webhook setup failed: {webhook_error}")
@@ -129,6 +157,15 @@ async def lifespan(app: FastAPI):
                 # Store bot and dispatcher in app state
                 app.state.bot = bot
                 app.state.dp = dp
+                
+                # Webhook updates are acked immediately and processed by workers
+                update_queue = UpdateQueue(dp, bot)
+                update_queue.start()
+                app.state.update_queue = update_queue
+                
+                # The leader picks up broadcasts of crashed workers and sends scheduled notifications
+                broadcast_engine.watch(bot)
+                notification_scheduler.start(bot)
                 bot_initialized = True
                 logger.info("✅ Bot initialization complete")
             else:
@@ -149,6 +186,24 @@ async def lifespan(app: FastAPI):
     finally:
         # Cleanup
         logger.info("🔄 Starting application shutdown...")
+        try:
+            if hasattr(app.state, 'update_queue'):
+                await app.state.update_queue.stop()
+        except Exception as e:
+            logger.error(f"❌ Error stopping update queue: {e}")
+        
+        await notification_scheduler.stop()
+        await broadcast_engine.stop()
+        
+        try:
+            await leader_election.stop()
+        except Exception as e:
+            logger.error(f"❌ Error releasing leadership: {e}")
+        
+        await loop_monitor.stop()
+        await send_queue.stop()
+        report_render_stage.shutdown()
+        
         try:
             if bot_initialized and hasattr(app.state, 'bot'):
                 await app.state.bot.session.close()
@@ -222,6 +277,8 @@ async def main():
     logger.info("Starting bot in polling mode...")
     
     try:
+        loop_monitor.start()
+        
         # Initialize database
         await init_db()
         logger.info("Database initialized")
@@ -235,34 +292,23 @@ async def main():
             token=settings.BOT_TOKEN,
             parse_mode=ParseMode.HTML
         )
+        setup_send_queue(bot)
+        send_queue.start()
         
         # Create dispatcher
-        dp = Dispatcher()
+        dp = create_dispatcher()
         
-        # Setup middlewares
-        dp.message.middleware(DependenciesMiddleware())
-        dp.callback_query.middleware(DependenciesMiddleware())
-        dp.message.middleware(AuthMiddleware())
-        dp.callback_query.middleware(AuthMiddleware())
-        dp.message.middleware(LoggingMiddleware())
-        dp.callback_query.middleware(LoggingMiddleware())
-        dp.message.middleware(RateLimitMiddleware())
-        dp.callback_query.middleware(RateLimitMiddleware())
-        dp.message.middleware(SubscriptionMiddleware())
-        dp.callback_query.middleware(SubscriptionMiddleware())
+        # Drop redelivered updates, then keep each chat in order
+        # (polling runs updates as concurrent tasks)
+        dp.update.outer_middleware(DeduplicationMiddleware())
+        dp.update.outer_middleware(ChatSerialMiddleware(chat_serializer))
         
-        # Register handlers
-        dp.include_router(start.router)
-        dp.include_router(profile.router)
-        dp.include_router(profiler.router)
-        dp.include_router(analysis.router)
-        dp.include_router(compatibility.router)
-        dp.include_router(daily.router)
-        dp.include_router(payments.router)
-        dp.include_router(admin.router)
+        await leader_election.start()
+        broadcast_engine.watch(bot)
+        notification_scheduler.start(bot)
         
         # Delete webhook
-        await bot.delete_webhook(drop_pending_updates=True)
+        await bot.delete_webhook(drop_pending_updates=settings.DROP_PENDING_UPDATES)
         
         # Start polling
         logger.info("Bot started in polling mode")
@@ -272,6 +318,12 @@ async def main():
         logger.error(f"Bot error: {e}")
         raise
     finally:
+        await notification_scheduler.stop()
+        await broadcast_engine.stop()
+        await leader_election.stop()
+        await loop_monitor.stop()
+        await send_queue.stop()
+        report_render_stage.shutdown()
         await close_db()
         await close_redis()
 
@@ -284,8 +336,15 @@ if __name__ == "__main__":
     if os.getenv("RAILWAY_ENVIRONMENT") or os.getenv("PORT"):
         # Production mode - запускаем FastAPI с uvicorn
         port = int(os.getenv("PORT", 8000))
-        app = create_app()
-        uvicorn.run(app, host="0.0.0.0", port=port)
+        # Factory import string so each worker process builds its own app
+        # (engine, Redis and bot session are created after fork)
+        uvicorn.run(
+            "app.main:create_app",
+            factory=True,
+            host="0.0.0.0",
+            port=port,
+            workers=settings.server_workers
+        )
     else:
         # Development mode - запускаем polling
         asyncio.run(main()) 
\ No newline at end of file
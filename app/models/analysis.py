@@ -2,7 +2,7 @@
 
 from sqlalchemy import (
     Column, Integer, String, Text, Float, ForeignKey, 
-    Boolean, JSON, Enum as SQLAEnum, CheckConstraint
+    Boolean, JSON, Enum as SQLAEnum, CheckConstraint, Index
 )
 from sqlalchemy.orm import relationship, validates
 
@@ -17,6 +17,7 @@ class TextAnalysis(BaseModel):
     __table_args__ = (
         CheckConstraint('toxicity_score IS NULL OR (toxicity_score >= 0 AND toxicity_score <= 10)', name='ck_toxicity_score_range'),
         CheckConstraint('sentiment_score IS NULL OR (sentiment_score >= -1 AND sentiment_score <= 1)', name='ck_sentiment_score_range'),
+        Index('ix_text_analyses_user_created_id', 'user_id', 'created_at', 'id'),  # Keyset pagination
     )
     
     # Foreign key to user
@@ -2,7 +2,7 @@
 
 from sqlalchemy import (
     Column, Integer, String, Text, Float, ForeignKey, 
-    Boolean, JSON, Enum as SQLAEnum, CheckConstraint
+    Boolean, JSON, Enum as SQLAEnum, CheckConstraint, Index
 )
 from sqlalchemy.orm import relationship, validates
 
@@ -17,6 +17,7 @@ class PartnerProfile(BaseModel):
     __table_args__ = (
         CheckConstraint('manipulation_risk IS NULL OR (manipulation_risk >= 0 AND manipulation_risk <= 10)', name='ck_manipulation_risk_range'),
         CheckConstraint('overall_compatibility IS NULL OR (overall_compatibility >= 0 AND overall_compatibility <= 1)', name='ck_overall_compatibility_range'),
+        Index('ix_partner_profiles_user_created_id', 'user_id', 'created_at', 'id'),  # Keyset pagination
     )
     
     # Foreign key to user
@@ -50,6 +51,7 @@ class PartnerProfile(BaseModel):
     confidence_score = Column(Float, nullable=True)  # AI confidence in profile
     processing_time = Column(Float, nullable=True)  # Time taken for analysis
     ai_model_used = Column(String(50), nullable=True)  # Which AI model was used
+    report_key = Column(String(64), nullable=True)  # Rendered PDF in the report store
     
     # Status
     is_completed = Column(Boolean, default=False)
@@ -3,7 +3,12 @@
 Основано на техническом задании с научным обоснованием
 """
 
-from typing import Dict, List, Any, Tuple
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, List, Any, Tuple, Mapping, Sequence, FrozenSet
+
+import numpy as np
+
 from app.utils.enums import UrgencyLevel
 
 
@@ -1102,68 +1107,162 @@ def format_question_text(question_data: Dict[str, Any], question_num: int, total
 # СИСТЕМА ПОДСЧЕТА БАЛЛОВ
 # =================================
 
-def calculate_weighted_scores(answers: Dict[str, int]) -> Dict[str, Any]:
-    """Подсчитать взвешенные баллы с учетом весов вопросов"""
-    all_questions = get_all_questions()
-    
-    # Подсчет по блокам
-    block_scores = {
-        "narcissism": 0,
-        "control": 0, 
-        "gaslighting": 0,
-        "emotion": 0,
-        "intimacy": 0,
-        "social": 0
-    }
+SCORING_BLOCKS: Tuple[str, ...] = ("narcissism", "control", "gaslighting", "emotion", "intimacy", "social")
+
+
+@dataclass(frozen=True)
+class ScoringTable:
+    """
+    Неизменяемая таблица весов вопросов с вариантами ответов
+
+    Строится один раз при импорте. Пакетный подсчет сводится к выборке
+    весов по индексам (gather) и суммированию по сегментам анкета x блок
+    (bincount); одиночная анкета считается по тем же данным в rows.
+    """
+
+    question_ids: Tuple[str, ...]
+    index: Mapping[str, int]
+    rows: Tuple[Tuple[int, int, Tuple[int, ...], int], ...]  # (блок, вес, веса ответов, max балл)
+    block_index: np.ndarray      # (вопросы,) номер блока в SCORING_BLOCKS
+    question_weight: np.ndarray  # (вопросы,) вес вопроса
+    answer_weights: np.ndarray   # (вопросы, max вариантов) веса ответов, дополнены нулями
+    option_count: np.ndarray     # (вопросы,) число вариантов ответа
+    max_score: np.ndarray        # (вопросы,) вес вопроса * max вес ответа
+
+
+def _build_scoring_table(questions: Dict[str, Dict[str, Any]]) -> ScoringTable:
+    question_ids = tuple(questions)
+    rows = tuple(
+        (SCORING_BLOCKS.index(q['block']), q['weight'], tuple(q['weights']), q['weight'] * max(q['weights']))
+        for q in questions.values()
+    )
+    width = max(len(weights) for _, _, weights, _ in rows)
+    answer_weights = np.zeros((len(rows), width), dtype=np.int64)
+    for i, (_, _, weights, _) in enumerate(rows):
+        answer_weights[i, :len(weights)] = weights
+
+    arrays = dict(
+        block_index=np.array([row[0] for row in rows], dtype=np.int64),
+        question_weight=np.array([row[1] for row in rows], dtype=np.int64),
+        answer_weights=answer_weights,
+        option_count=np.array([len(q['options']) for q in questions.values()], dtype=np.int64),
+        max_score=np.array([row[3] for row in rows], dtype=np.int64),
+    )
+    for array in arrays.values():
+        array.flags.writeable = False
+
+    return ScoringTable(
+        question_ids=question_ids,
+        index=MappingProxyType({question_id: i for i, question_id in enumerate(question_ids)}),
+        rows=rows,
+        **arrays
+    )
+
+
+SCORING_TABLE = _build_scoring_table(get_all_questions())
+
+
+def calculate_block_score_matrix(answer_sets: Sequence[Dict[str, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Сырые и максимальные баллы по блокам для набора анкет
+
+    Args:
+        answer_sets: Ответы анкет (question_id -> индекс варианта)
+
+    Returns:
+        Две матрицы (анкеты, блоки) в порядке SCORING_BLOCKS: набранные
+        баллы и максимально возможные
+    """
+    table = SCORING_TABLE
+    set_ids: List[int] = []
+    question_indexes: List[int] = []
+    answer_indexes: List[int] = []
+    for set_id, answers in enumerate(answer_sets):
+        for question_id, answer_index in answers.items():
+            question_index = table.index.get(question_id)
+            if question_index is None:
+                continue
+            set_ids.append(set_id)
+            question_indexes.append(question_index)
+            answer_indexes.append(answer_index)
+
+    sets = np.array(set_ids, dtype=np.int64)
+    questions = np.array(question_indexes, dtype=np.int64)
+    chosen = np.array(answer_indexes, dtype=np.int64)
+
+    # Отрицательный индекс считается с конца списка вариантов, как в Python;
+    # индекс за пределами вариантов дает 0 баллов
+    options = table.option_count[questions]
+    chosen = np.where(chosen < 0, chosen + options, chosen)
+    valid = (chosen >= 0) & (chosen < options)
+    answer_weight = np.where(valid, table.answer_weights[questions, np.where(valid, chosen, 0)], 0)
+
+    # Баллы = вес вопроса * вес ответа, сумма по сегментам (анкета, блок)
+    segments = sets * len(SCORING_BLOCKS) + table.block_index[questions]
+    size = len(answer_sets) * len(SCORING_BLOCKS)
+    shape = (len(answer_sets), len(SCORING_BLOCKS))
+    raw = np.bincount(segments, weights=table.question_weight[questions] * answer_weight, minlength=size)
+    maximum = np.bincount(segments, weights=table.max_score[questions], minlength=size)
+    return raw.reshape(shape).astype(np.int64), maximum.reshape(shape).astype(np.int64)
+
+
+def _format_scores(raw: Sequence[int], maximum: Sequence[int]) -> Dict[str, Any]:
+    """Нормализация баллов до 0-10 по блокам и общий балл риска 0-100"""
+    total_score = sum(raw)
+    total_max_score = sum(maximum)
+    overall_risk_score = (total_score / total_max_score * 100) if total_max_score > 0 else 0
     
-    block_max_scores = {
-        "narcissism": 0,
-        "control": 0,
-        "gaslighting": 0, 
-        "emotion": 0,
-        "intimacy": 0,
-        "social": 0
+    return {
+        "block_scores": {
+            block: round(raw[b] / maximum[b] * 10, 1) if maximum[b] > 0 else 0.0
+            for b, block in enumerate(SCORING_BLOCKS)
+        },
+        "overall_risk_score": round(overall_risk_score, 1),
+        "urgency_level": get_urgency_level(overall_risk_score),
+        "raw_scores": dict(zip(SCORING_BLOCKS, raw)),
+        "max_scores": dict(zip(SCORING_BLOCKS, maximum))
     }
+
+
+def calculate_weighted_scores_batch(answer_sets: Sequence[Dict[str, int]]) -> List[Dict[str, Any]]:
+    """
+    Подсчитать взвешенные баллы для многих анкет за один проход
+
+    Для пересчета и аналитики по сохраненным анкетам; для матриц баллов
+    без словарей см. calculate_block_score_matrix.
+
+    Args:
+        answer_sets: Ответы анкет (question_id -> индекс варианта)
+
+    Returns:
+        Результаты в формате calculate_weighted_scores, в том же порядке
+    """
+    if not answer_sets:
+        return []
+
+    raw, maximum = calculate_block_score_matrix(answer_sets)
+    return [_format_scores(raw_row, max_row) for raw_row, max_row in zip(raw.tolist(), maximum.tolist())]
+
+
+def calculate_weighted_scores(answers: Dict[str, int]) -> Dict[str, Any]:
+    """Подсчитать взвешенные баллы с учетом весов вопросов"""
+    raw = [0] * len(SCORING_BLOCKS)
+    maximum = [0] * len(SCORING_BLOCKS)
     
-    # Подсчет баллов для каждого ответа
+    # Одна анкета - по предрасчитанным строкам таблицы, без накладных расходов NumPy
     for question_id, answer_index in answers.items():
-        question = all_questions.get(question_id)
-        if not question:
+        question_index = SCORING_TABLE.index.get(question_id)
+        if question_index is None:
             continue
-            
-        block = question['block']
-        weight = question['weight']
-        answer_weight = question['weights'][answer_index] if answer_index < len(question['weights']) else 0
         
-        # Баллы = вес вопроса * вес ответа
-        score = weight * answer_weight
-        block_scores[block] += score
+        block, weight, answer_weights, max_score = SCORING_TABLE.rows[question_index]
+        answer_weight = answer_weights[answer_index] if answer_index < len(answer_weights) else 0
         
-        # Максимальный возможный балл для этого вопроса
-        max_score = weight * max(question['weights'])
-        block_max_scores[block] += max_score
-    
-    # Нормализация баллов до 0-10 по каждому блоку
-    normalized_block_scores = {}
-    for block in block_scores:
-        if block_max_scores[block] > 0:
-            normalized_score = (block_scores[block] / block_max_scores[block]) * 10
-            normalized_block_scores[block] = round(normalized_score, 1)
-        else:
-            normalized_block_scores[block] = 0.0
-    
-    # Общий взвешенный балл риска
-    total_score = sum(block_scores.values())
-    total_max_score = sum(block_max_scores.values())
-    overall_risk_score = (total_score / total_max_score * 100) if total_max_score > 0 else 0
+        # Баллы = вес вопроса * вес ответа
+        raw[block] += weight * answer_weight
+        maximum[block] += max_score
     
-    return {
-        "block_scores": normalized_block_scores,
-        "overall_risk_score": round(overall_risk_score, 1),
-        "urgency_level": get_urgency_level(overall_risk_score),
-        "raw_scores": block_scores,
-        "max_scores": block_max_scores
-    }
+    return _format_scores(raw, maximum)
 
 def get_urgency_level(risk_score: float) -> UrgencyLevel:
     """Определить уровень срочности по баллу риска"""
@@ -1176,52 +1275,35 @@ def get_urgency_level(risk_score: float) -> UrgencyLevel:
     else:
         return UrgencyLevel.LOW
 
+# Критические паттерны для немедленного реагирования: вопрос -> (ответы, предупреждение)
+SAFETY_ALERT_PATTERNS: Mapping[str, Tuple[FrozenSet[int], str]] = MappingProxyType({
+    "control_q1": (frozenset({3}), "⚠️ КОНТРОЛЬ ВРЕМЕНИ: Партнер контролирует каждый ваш шаг"),
+    "control_q2": (frozenset({3}), "⚠️ ИЗОЛЯЦИЯ: Партнер изолирует вас от поддерживающего окружения"),
+    "control_q4": (frozenset({3}), "⚠️ ФИНАНСОВОЕ ПРИНУЖДЕНИЕ: Полный контроль над вашими деньгами"),
+    "control_q5": (frozenset({3}), "⚠️ НАРУШЕНИЕ ГРАНИЦ: Агрессивная реакция на ваши границы"),
+    "control_q7": (frozenset({3}), "🚨 УГРОЗЫ: Партнер использует запугивание и угрозы"),
+    "gaslighting_q1": (frozenset({3}), "🚨 ГАЗЛАЙТИНГ: Систематическое искажение реальности"),
+    "gaslighting_q2": (frozenset({3}), "⚠️ ЭМОЦИОНАЛЬНОЕ НАСИЛИЕ: Обесценивание ваших чувств"),
+    "gaslighting_q3": (frozenset({3}), "⚠️ ОТСУТСТВИЕ ОТВЕТСТВЕННОСТИ: Никогда не признает вину"),
+    "emotion_q1": (frozenset({3}), "🚨 ФИЗИЧЕСКАЯ УГРОЗА: Неконтролируемые вспышки ярости"),
+    "intimacy_q1": (frozenset({3}), "🚨 ПРИНУЖДЕНИЕ: Игнорирование согласия в интимности"),
+    "social_q1": (frozenset({3}), "⚠️ ДВОЙНАЯ ЛИЧНОСТЬ: Кардинально разное поведение"),
+})
+
+
 def get_safety_alerts(answers: Dict[str, int]) -> List[str]:
     """Генерировать предупреждения безопасности на основе критических ответов"""
-    alerts = []
-    all_questions = get_all_questions()
-    
-    # Критические паттерны для немедленного реагирования
-    critical_patterns = {
-        "control_q1": [3],  # Контроль времени - последний ответ
-        "control_q2": [3],  # Изоляция от друзей/семьи
-        "control_q4": [3],  # Полный финансовый контроль
-        "control_q5": [3],  # Агрессивное нарушение границ
-        "control_q7": [3],  # Угрозы и запугивание
-        "gaslighting_q1": [3],  # Постоянное отрицание реальности
-        "gaslighting_q2": [3],  # Обесценивание чувств
-        "gaslighting_q3": [3],  # Никогда не берет вину на себя
-        "emotion_q1": [3],  # Вспышки ярости с угрозами
-        "intimacy_q1": [3],  # Принуждение в интимности
-        "social_q1": [3]   # Кардинально разное поведение дома/на публике
-    }
-    
-    alert_messages = {
-        "control_q1": "⚠️ КОНТРОЛЬ ВРЕМЕНИ: Партнер контролирует каждый ваш шаг",
-        "control_q2": "⚠️ ИЗОЛЯЦИЯ: Партнер изолирует вас от поддерживающего окружения",
-        "control_q4": "⚠️ ФИНАНСОВОЕ ПРИНУЖДЕНИЕ: Полный контроль над вашими деньгами",
-        "control_q5": "⚠️ НАРУШЕНИЕ ГРАНИЦ: Агрессивная реакция на ваши границы",
-        "control_q7": "🚨 УГРОЗЫ: Партнер использует запугивание и угрозы",
-        "gaslighting_q1": "🚨 ГАЗЛАЙТИНГ: Систематическое искажение реальности",
-        "gaslighting_q2": "⚠️ ЭМОЦИОНАЛЬНОЕ НАСИЛИЕ: Обесценивание ваших чувств",
-        "gaslighting_q3": "⚠️ ОТСУТСТВИЕ ОТВЕТСТВЕННОСТИ: Никогда не признает вину",
-        "emotion_q1": "🚨 ФИЗИЧЕСКАЯ УГРОЗА: Неконтролируемые вспышки ярости",
-        "intimacy_q1": "🚨 ПРИНУЖДЕНИЕ: Игнорирование согласия в интимности",
-        "social_q1": "⚠️ ДВОЙНАЯ ЛИЧНОСТЬ: Кардинально разное поведение"
-    }
-    
-    for question_id, critical_answers in critical_patterns.items():
-        answer_index = answers.get(question_id)
-        if answer_index in critical_answers:
-            alert = alert_messages.get(question_id)
-            if alert:
-                alerts.append(alert)
-    
-    return alerts
+    return [
+        message for question_id, (critical_answers, message) in SAFETY_ALERT_PATTERNS.items()
+        if answers.get(question_id) in critical_answers
+    ]
+
+EXPECTED_QUESTIONS: FrozenSet[str] = frozenset(QUESTION_ORDER)
+
 
 def validate_full_answers(answers: Dict[str, int]) -> Tuple[bool, str]:
     """Валидировать полный набор ответов"""
-    expected_questions = set(QUESTION_ORDER)
+    expected_questions = EXPECTED_QUESTIONS
     provided_questions = set(answers.keys())
     
     if len(provided_questions) != len(expected_questions):
@@ -1230,13 +1312,12 @@ def validate_full_answers(answers: Dict[str, int]) -> Tuple[bool, str]:
             return False, f"Отсутствуют ответы на вопросы: {', '.join(missing)}"
         
     # Проверка валидности ответов
-    all_questions = get_all_questions()
     for question_id, answer_index in answers.items():
-        question = all_questions.get(question_id)
-        if not question:
+        question_index = SCORING_TABLE.index.get(question_id)
+        if question_index is None:
             return False, f"Неизвестный вопрос: {question_id}"
             
-        if not isinstance(answer_index, int) or answer_index < 0 or answer_index >= len(question['options']):
+        if not isinstance(answer_index, int) or answer_index < 0 or answer_index >= SCORING_TABLE.option_count[question_index]:
             return False, f"Некорректный ответ для вопроса {question_id}: {answer_index}"
     
     return True, "Все ответы валидны" 
\ No newline at end of file
@@ -0,0 +1,677 @@
+"""AI providers with health-scored routing, failover and hedged requests"""
+
+import asyncio
+import json
+import random
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Union
+
+import httpx
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.services.ai_resilience import OPEN, RETRYABLE_STATUSES, CircuitBreaker, RetryPolicy
+from app.utils.exceptions import AIServiceError
+
+UsageCallback = Callable[[Optional[Dict[str, Any]], str], None]
+
+
+@dataclass
+class AIRequest:
+    """Provider-independent chat completion request"""
+
+    system_prompt: str
+    user_prompt: str
+    max_tokens: int
+    temperature: float = 0.7
+    response_format: Union[str, Dict[str, Any]] = "text"
+    purpose: str = "generic"
+
+
+@dataclass
+class AIResponse:
+    """Completed chat response"""
+
+    content: str
+    usage: Optional[Dict[str, Any]]
+    provider: str
+    model: str
+
+
+class ProviderError(AIServiceError):
+    """Failed call to a single provider (the router may fail over)"""
+
+    def __init__(
+        self,
+        message: str,
+        provider: str,
+        status: Optional[int] = None,
+        retry_after: Optional[float] = None,
+        retryable: bool = False,
+        reason: str = "error"
+    ):
+        super().__init__(message)
+        self.provider = provider
+        self.status = status
+        self.retry_after = retry_after
+        self.retryable = retryable
+        self.reason = reason
+
+    @property
+    def upstream_failure(self) -> bool:
+        """Failure that says the upstream is unhealthy (counts for the breaker)"""
+        return self.retryable or self.reason == "timeout"
+
+
+class AIProvider:
+    """Base provider"""
+
+    name = "base"
+    model = ""
+
+    @property
+    def key(self) -> str:
+        """Stats key: provider and model"""
+        return f"{self.name}:{self.model}"
+
+    def is_configured(self) -> bool:
+        return True
+
+    async def complete(self, request: AIRequest) -> AIResponse:
+        raise NotImplementedError
+
+    async def stream(self, request: AIRequest, on_usage: Optional[UsageCallback] = None) -> AsyncIterator[str]:
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+
+class OpenAICompatibleProvider(AIProvider):
+    """Provider speaking the OpenAI chat completions protocol"""
+
+    def __init__(
+        self,
+        name: str,
+        url: str,
+        api_key: Optional[str],
+        model: str,
+        key_prefix: Optional[str] = None,
+        extra_headers: Optional[Dict[str, str]] = None,
+        extra_body: Optional[Dict[str, Any]] = None,
+        cache_control: bool = False,
+        timeout: float = settings.AI_REQUEST_TIMEOUT
+    ):
+        self.name = name
+        self.url = url
+        self.api_key = api_key
+        self.model = model
+        self.key_prefix = key_prefix
+        self.extra_headers = extra_headers or {}
+        self.extra_body = extra_body or {}
+        self.cache_control = cache_control
+        self.timeout = timeout
+
+    def is_configured(self) -> bool:
+        if not self.api_key:
+            return False
+        return not self.key_prefix or self.api_key.startswith(self.key_prefix)
+
+    def _system_content(self, system_prompt: str) -> Union[str, List[Dict[str, Any]]]:
+        """
+        System message content with prompt-cache marker
+
+        Anthropic models cache only explicitly marked prefixes (a marker on a
+        prefix below the provider minimum is simply ignored); OpenAI-style
+        providers cache long prefixes automatically, so plain text is enough.
+        """
+        if self.cache_control:
+            return [{
+                "type": "text",
+                "text": system_prompt,
+                "cache_control": {"type": "ephemeral"}
+            }]
+        return system_prompt
+
+    def _headers(self) -> Dict[str, str]:
+        if not self.api_key:
+            raise ProviderError(f"{self.name}: API key не настроен", self.name)
+        if not self.is_configured():
+            raise ProviderError(f"{self.name}: неверный формат API ключа", self.name)
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json",
+            **self.extra_headers
+        }
+
+    def _payload(self, request: AIRequest, stream: bool) -> Dict[str, Any]:
+        messages = []
+        if request.system_prompt:
+            messages.append({"role": "system", "content": self._system_content(request.system_prompt)})
+        messages.append({"role": "user", "content": request.user_prompt})
+
+        data = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": request.max_tokens,
+            "temperature": request.temperature,
+            "stream": stream,
+            **self.extra_body
+        }
+        # Structured output: JSON schema built by json_schema_response_format
+        if isinstance(request.response_format, dict):
+            data["response_format"] = request.response_format
+        return data
+
+    def _timeout(self, request: AIRequest, stream: bool) -> httpx.Timeout:
+        """
+        Request timeouts
+
+        Connecting fails after AI_REQUEST_TIMEOUT. A stream may go quiet for
+        the same time; a non-streamed answer arrives at once, so its read
+        timeout grows with the output budget.
+        """
+        read = self.timeout
+        if not stream:
+            read += request.max_tokens / settings.AI_MIN_TOKENS_PER_SECOND
+        return httpx.Timeout(self.timeout, read=read)
+
+    def _transport_error(self, error: httpx.HTTPError) -> ProviderError:
+        """Map httpx error to a classified ProviderError"""
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+            # Request never reached the model - safe to repeat
+            return ProviderError(f"Нет соединения с {self.name} API: {error}", self.name, retryable=True, reason="connect")
+        if isinstance(error, httpx.TimeoutException):
+            return ProviderError(f"Таймаут {self.name} API", self.name, reason="timeout")
+        return ProviderError(f"Ошибка соединения с {self.name} API: {error}", self.name, reason="transport")
+
+    def _status_error(self, status: int, headers: httpx.Headers, body: str) -> ProviderError:
+        logger.error(f"{self.name} API error {status}: {body[:500]}")
+        retry_after = None
+        if headers.get("retry-after"):
+            try:
+                retry_after = float(headers["retry-after"])
+            except ValueError:
+                retry_after = None
+        return ProviderError(
+            f"{self.name} API ошибка: {status}",
+            self.name,
+            status,
+            retry_after,
+            retryable=status in RETRYABLE_STATUSES,
+            reason=f"http_{status}"
+        )
+
+    async def complete(self, request: AIRequest) -> AIResponse:
+        headers = self._headers()
+        try:
+            async with httpx.AsyncClient(timeout=self._timeout(request, stream=False)) as client:
+                response = await client.post(self.url, headers=headers, json=self._payload(request, stream=False))
+        except httpx.HTTPError as e:
+            raise self._transport_error(e)
+
+        if response.status_code != 200:
+            raise self._status_error(response.status_code, response.headers, response.text)
+
+        result = response.json()
+        if not result.get("choices"):
+            logger.error(f"Invalid {self.name} response: {result}")
+            raise ProviderError(f"Неверный ответ от {self.name} API", self.name)
+
+        content = result["choices"][0]["message"]["content"] or ""
+        return AIResponse(content, result.get("usage"), self.name, self.model)
+
+    async def stream(self, request: AIRequest, on_usage: Optional[UsageCallback] = None) -> AsyncIterator[str]:
+        headers = self._headers()
+        try:
+            async with httpx.AsyncClient(timeout=self._timeout(request, stream=True)) as client:
+                async with client.stream(
+                    "POST", self.url, headers=headers, json=self._payload(request, stream=True)
+                ) as response:
+                    if response.status_code != 200:
+                        body = (await response.aread()).decode(errors="replace")
+                        raise self._status_error(response.status_code, response.headers, body)
+
+                    async for line in response.aiter_lines():
+                        # Skip keep-alive comments (": OPENROUTER PROCESSING")
+                        if not line.startswith("data:"):
+                            continue
+                        payload = line[5:].strip()
+                        if payload == "[DONE]":
+                            break
+
+                        event = json.loads(payload)
+                        if "error" in event:
+                            raise ProviderError(f"{self.name} stream error: {event['error']}", self.name)
+                        # Usage arrives with the last chunk
+                        if event.get("usage") and on_usage:
+                            on_usage(event["usage"], self.model)
+                        choices = event.get("choices") or []
+                        if choices:
+                            delta = choices[0].get("delta", {}).get("content")
+                            if delta:
+                                yield delta
+        except httpx.HTTPError as e:
+            raise self._transport_error(e)
+
+
+class StubProvider(AIProvider):
+    """
+    Local offline provider
+
+    Answers text prompts with a fixed Russian text and JSON-schema prompts
+    with the smallest document valid for the schema. Latency and failures
+    are configurable for failover and load tests.
+    """
+
+    def __init__(
+        self,
+        name: str = "stub",
+        model: str = "stub-model",
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        failure_rate: float = 0.0,
+        text: str = "ПСИХОЛОГИЧЕСКИЙ ПОРТРЕТ\n\nТестовый ответ локального провайдера.",
+        seed: Optional[int] = None
+    ):
+        self.name = name
+        self.model = model
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.text = text
+        self._random = random.Random(seed)
+        self.calls = 0
+
+    def _content(self, request: AIRequest) -> str:
+        if isinstance(request.response_format, dict) and "json_schema" in request.response_format:
+            schema = request.response_format["json_schema"]["schema"]
+            return json.dumps(stub_from_schema(schema, schema.get("$defs", {})), ensure_ascii=False)
+        if request.response_format == "json":
+            return "{}"
+        return self.text
+
+    def _usage(self, request: AIRequest, content: str) -> Dict[str, Any]:
+        return {
+            "prompt_tokens": (len(request.system_prompt) + len(request.user_prompt)) // 3,
+            "completion_tokens": len(content) // 3,
+        }
+
+    async def _simulate(self) -> None:
+        self.calls += 1
+        delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        if self._random.random() < self.failure_rate:
+            raise ProviderError(
+                f"{self.name}: симулированная ошибка", self.name, status=503, retryable=True, reason="http_503"
+            )
+
+    async def complete(self, request: AIRequest) -> AIResponse:
+        await self._simulate()
+        content = self._content(request)
+        return AIResponse(content, self._usage(request, content), self.name, self.model)
+
+    async def stream(self, request: AIRequest, on_usage: Optional[UsageCallback] = None) -> AsyncIterator[str]:
+        await self._simulate()
+        content = self._content(request)
+        for i in range(0, len(content), 32):
+            yield content[i:i + 32]
+        if on_usage:
+            on_usage(self._usage(request, content), self.model)
+
+
+def stub_from_schema(schema: Dict[str, Any], defs: Dict[str, Any]) -> Any:
+    """Build the smallest value valid for a JSON schema (pydantic flavour)"""
+    if "$ref" in schema:
+        return stub_from_schema(defs[schema["$ref"].split("/")[-1]], defs)
+    if "enum" in schema:
+        return schema["enum"][0]
+    if "const" in schema:
+        return schema["const"]
+
+    kind = schema.get("type")
+    if kind == "object":
+        return {
+            name: stub_from_schema(prop, defs)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [stub_from_schema(schema.get("items", {}), defs)]
+    if kind in ("number", "integer"):
+        low = schema.get("minimum", 0)
+        high = schema.get("maximum", low)
+        value = (low + high) / 2
+        return int(value) if kind == "integer" else value
+    if kind == "boolean":
+        return False
+    return "stub"
+
+
+class ProviderStats:
+    """Latency window and health score of one provider/model"""
+
+    def __init__(self, window: int = 500, alpha: float = 0.2):
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.alpha = alpha
+        self.health = 1.0
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_error: Optional[str] = None
+
+    def record_success(self, latency: float) -> None:
+        self.latencies.append(latency)
+        self.successes += 1
+        self.consecutive_failures = 0
+        self.health += self.alpha * (1.0 - self.health)
+
+    def record_failure(self, error: Exception) -> None:
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = str(error)[:200]
+        self.health -= self.alpha * self.health
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Latency percentile in seconds (None without samples)"""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))
+        return ordered[index]
+
+    def get_stats(self) -> Dict[str, Any]:
+        def rounded(value: Optional[float]) -> Optional[float]:
+            return round(value, 3) if value is not None else None
+
+        return {
+            "health": round(self.health, 4),
+            "successes": self.successes,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "samples": len(self.latencies),
+            "p50": rounded(self.percentile(50)),
+            "p95": rounded(self.percentile(95)),
+            "p99": rounded(self.percentile(99)),
+            "last_error": self.last_error,
+        }
+
+
+class ProviderRouter:
+    """
+    Route calls across providers
+
+    Healthy providers are tried in configured priority order, unhealthy ones
+    last (best health first), failing over on ProviderError. Each provider
+    has a circuit breaker: while it is open the provider is skipped, and if
+    every circuit is open calls fail immediately instead of waiting for
+    timeouts. Safe failures (429, 5xx, connect errors) are retried on the
+    same provider with jittered backoff before failing over. Hedged calls
+    start a backup request on the next provider once the primary is slower
+    than its own p95, and cancel whichever loses.
+    """
+
+    def __init__(
+        self,
+        providers: List[AIProvider],
+        healthy_threshold: float = 0.5,
+        min_hedge_samples: int = 20,
+        retry_policy: Optional[RetryPolicy] = None,
+        breaker_factory: Callable[[], CircuitBreaker] = CircuitBreaker
+    ):
+        self.providers = providers
+        self.healthy_threshold = healthy_threshold
+        self.min_hedge_samples = min_hedge_samples
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.stats: Dict[str, ProviderStats] = {p.key: ProviderStats() for p in providers}
+        self.breakers: Dict[str, CircuitBreaker] = {p.key: breaker_factory() for p in providers}
+        self.failovers = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+
+    @property
+    def primary_model(self) -> str:
+        """Model of the highest-priority provider"""
+        return self.providers[0].model if self.providers else ""
+
+    def ordered(self) -> List[AIProvider]:
+        """
+        Providers in the order they should be tried
+
+        Raises:
+            AIServiceError: if nothing is configured or every circuit is open
+        """
+        configured = [p for p in self.providers if p.is_configured()]
+        if not configured:
+            raise AIServiceError("Не настроен ни один AI провайдер")
+
+        available = [p for p in configured if self.breakers[p.key].state != OPEN]
+        if not available:
+            retry_in = min(self.breakers[p.key].retry_in() for p in configured)
+            raise AIServiceError(f"AI временно недоступен, повторите через {retry_in:.0f} сек")
+
+        healthy = [p for p in available if self.stats[p.key].health >= self.healthy_threshold]
+        unhealthy = sorted(
+            (p for p in available if p not in healthy),
+            key=lambda p: self.stats[p.key].health,
+            reverse=True
+        )
+        return healthy + unhealthy
+
+    def _record_failure(self, provider: AIProvider, error: ProviderError) -> None:
+        self.stats[provider.key].record_failure(error)
+        breaker = self.breakers[provider.key]
+        if error.upstream_failure:
+            breaker.record_failure()
+        else:
+            # The provider answered (e.g. 400/401) - it is reachable
+            breaker.record_success()
+
+    def _record_success(self, provider: AIProvider, latency: float) -> None:
+        self.stats[provider.key].record_success(latency)
+        self.breakers[provider.key].record_success()
+
+    def _circuit_open(self, provider: AIProvider) -> ProviderError:
+        return ProviderError(f"{provider.name}: цепь разомкнута", provider.name, reason="circuit_open")
+
+    async def _backoff(self, provider: AIProvider, error: ProviderError, attempt: int, purpose: str) -> bool:
+        """Sleep before retrying a safe failure, return False if no retry is allowed"""
+        if not error.retryable:
+            return False
+        if attempt + 1 >= self.retry_policy.attempts:
+            self.retry_policy.exhausted += 1
+            return False
+
+        delay = self.retry_policy.delay(attempt, error.retry_after)
+        self.retry_policy.record_retry(error.reason)
+        logger.warning(
+            f"🔁 [{purpose}] {provider.key} {error.reason}, retry {attempt + 1} in {delay:.1f}s"
+        )
+        await asyncio.sleep(delay)
+        return True
+
+    async def _attempt(self, provider: AIProvider, request: AIRequest) -> AIResponse:
+        """Call one provider with retries"""
+        breaker = self.breakers[provider.key]
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                raise self._circuit_open(provider)
+
+            started = time.monotonic()
+            try:
+                response = await provider.complete(request)
+            except ProviderError as e:
+                self._record_failure(provider, e)
+                if await self._backoff(provider, e, attempt, request.purpose):
+                    attempt += 1
+                    continue
+                raise
+            except asyncio.CancelledError:
+                # Hedge loser - no verdict on the provider
+                breaker.cancel_trial()
+                raise
+
+            self._record_success(provider, time.monotonic() - started)
+            return response
+
+    async def complete(self, request: AIRequest) -> AIResponse:
+        """Complete on the first provider that succeeds"""
+        last_error: Optional[ProviderError] = None
+        for provider in self.ordered():
+            if last_error:
+                self.failovers += 1
+                logger.warning(f"🔀 [{request.purpose}] failover to {provider.key} after: {last_error}")
+            try:
+                return await self._attempt(provider, request)
+            except ProviderError as e:
+                last_error = e
+
+        raise AIServiceError(f"Все AI провайдеры недоступны: {last_error}")
+
+    async def complete_hedged(self, request: AIRequest) -> AIResponse:
+        """
+        Complete with a backup request fired at the primary's p95
+
+        Falls back to plain complete() without a second provider or
+        without enough latency samples to know the p95.
+        """
+        providers = self.ordered()
+        if len(providers) < 2:
+            return await self.complete(request)
+
+        primary, backup = providers[0], providers[1]
+        primary_stats = self.stats[primary.key]
+        if len(primary_stats.latencies) < self.min_hedge_samples:
+            return await self.complete(request)
+
+        primary_task = asyncio.create_task(self._attempt(primary, request))
+        tasks = [primary_task]
+        last_error: Optional[BaseException] = None
+        try:
+            done, _ = await asyncio.wait({primary_task}, timeout=primary_stats.percentile(95))
+            if done:
+                if not primary_task.exception():
+                    return primary_task.result()
+                self.failovers += 1
+                return await self._attempt(backup, request)
+
+            self.hedges_fired += 1
+            logger.info(f"🪁 [{request.purpose}] hedging {primary.key} with {backup.key}")
+            backup_task = asyncio.create_task(self._attempt(backup, request))
+            tasks.append(backup_task)
+            pending = {primary_task, backup_task}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception():
+                        last_error = task.exception()
+                        continue
+                    if task is backup_task:
+                        self.hedges_won += 1
+                    return task.result()
+        finally:
+            # Also runs when the caller is cancelled mid-wait: no request is left running unread
+            unfinished = [task for task in tasks if not task.done()]
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                await asyncio.gather(*unfinished, return_exceptions=True)
+
+        raise AIServiceError(f"Все AI провайдеры недоступны: {last_error}")
+
+    async def stream(self, request: AIRequest, on_usage: Optional[UsageCallback] = None) -> AsyncIterator[str]:
+        """Stream from the first provider that starts answering"""
+        last_error: Optional[ProviderError] = None
+        for provider in self.ordered():
+            if last_error:
+                self.failovers += 1
+                logger.warning(f"🔀 [{request.purpose}] failover to {provider.key} after: {last_error}")
+
+            breaker = self.breakers[provider.key]
+            attempt = 0
+            while True:
+                if not breaker.allow():
+                    last_error = self._circuit_open(provider)
+                    break
+
+                started = time.monotonic()
+                emitted = False
+                try:
+                    async for delta in provider.stream(request, on_usage):
+                        emitted = True
+                        yield delta
+                except ProviderError as e:
+                    self._record_failure(provider, e)
+                    if emitted:
+                        # Part of the answer is already consumed, can't switch now
+                        raise
+                    if await self._backoff(provider, e, attempt, request.purpose):
+                        attempt += 1
+                        continue
+                    last_error = e
+                    break
+                except (asyncio.CancelledError, GeneratorExit):
+                    breaker.cancel_trial()
+                    raise
+
+                self._record_success(provider, time.monotonic() - started)
+                return
+
+        raise AIServiceError(f"Все AI провайдеры недоступны: {last_error}")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Per provider/model health, latency percentiles, breaker state and retries"""
+        return {
+            "providers": {
+                provider.key: {
+                    "configured": provider.is_configured(),
+                    **self.stats[provider.key].get_stats(),
+                    "breaker": self.breakers[provider.key].get_stats(),
+                }
+                for provider in self.providers
+            },
+            "retry": self.retry_policy.get_stats(),
+            "failovers": self.failovers,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+        }
+
+
+def build_default_router() -> ProviderRouter:
+    """Build router from settings (USE_AIML_API puts AIML first)"""
+    if settings.AI_STUB_PROVIDER:
+        return ProviderRouter([StubProvider()])
+
+    openrouter = OpenAICompatibleProvider(
+        name="openrouter",
+        url=settings.OPENROUTER_API_URL,
+        api_key=settings.OPENAI_API_KEY,  # Используем OPENAI_API_KEY для OpenRouter
+        model="anthropic/claude-sonnet-4",
+        key_prefix="sk-or-",
+        extra_headers={
+            "HTTP-Referer": "https://psychodetective.ai",
+            "X-Title": "PsychoDetective AI"
+        },
+        extra_body={"usage": {"include": True}},  # cached vs uncached input tokens
+        cache_control=True
+    )
+    providers: List[AIProvider] = [openrouter]
+
+    if settings.AIML_API_KEY:
+        aiml = OpenAICompatibleProvider(
+            name="aiml",
+            url=settings.AIML_API_URL,
+            api_key=settings.AIML_API_KEY,
+            model=settings.AIML_CLAUDE_MODEL
+        )
+        if settings.USE_AIML_API:
+            providers.insert(0, aiml)
+        else:
+            providers.append(aiml)
+
+    return ProviderRouter(providers)
+
+
+# Process-wide router shared by all AIService instances
+ai_router = build_default_router()
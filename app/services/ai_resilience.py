@@ -0,0 +1,139 @@
+"""Retry policy and circuit breaker for AI provider calls"""
+
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from app.core.config import settings
+
+# Upstream failures worth retrying: rate limit, server errors, overload
+RETRYABLE_STATUSES = frozenset({408, 429, 500, 502, 503, 504, 520, 522, 524, 529})
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker
+
+    Opens after failure_threshold upstream failures in a row and rejects
+    calls for recovery_time seconds, then lets a single trial call through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = settings.AI_BREAKER_FAILURE_THRESHOLD,
+        recovery_time: float = settings.AI_BREAKER_RECOVERY_TIME
+    ):
+        self.failure_threshold = failure_threshold
+        self.recovery_time = recovery_time
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+        # Metrics
+        self.times_opened = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        """Current state (open turns half-open once recovery_time passed)"""
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_time:
+            self._state = HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Check if a call may go through now"""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self) -> None:
+        self._state = CLOSED
+        self._failures = 0
+        self._trial_in_flight = False
+
+    def cancel_trial(self) -> None:
+        """Give back a half-open trial slot of a call that was cancelled"""
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self._failures += 1
+        self._trial_in_flight = False
+        if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+            if self._state != OPEN:
+                self.times_opened += 1
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+
+    def retry_in(self) -> float:
+        """Seconds until an open circuit lets a trial call through"""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.recovery_time - (time.monotonic() - self._opened_at))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "retry_in": round(self.retry_in(), 1),
+        }
+
+
+class RetryPolicy:
+    """
+    Jittered exponential backoff for safe failure classes
+
+    Only errors marked retryable (429, 5xx, connection failures before the
+    request reached the model) are retried; Retry-After from the provider
+    wins over the computed delay.
+    """
+
+    def __init__(
+        self,
+        attempts: int = settings.AI_RETRY_ATTEMPTS,
+        base_delay: float = settings.AI_RETRY_DELAY,
+        max_delay: float = 30.0,
+        rng: Optional[random.Random] = None
+    ):
+        self.attempts = max(1, attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._random = rng or random.Random()
+
+        # Metrics
+        self.retries = 0
+        self.exhausted = 0
+        self.retries_by_reason: Counter = Counter()
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Delay before retry number attempt (0-based), full jitter"""
+        if retry_after is not None:
+            return min(self.max_delay, max(0.0, retry_after))
+        ceiling = min(self.max_delay, self.base_delay * (2 ** attempt))
+        return self._random.uniform(0, ceiling)
+
+    def record_retry(self, reason: str) -> None:
+        self.retries += 1
+        self.retries_by_reason[reason] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "exhausted": self.exhausted,
+            "retries_by_reason": dict(self.retries_by_reason),
+        }
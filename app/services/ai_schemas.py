@@ -0,0 +1,62 @@
+"""Typed models for structured AI responses"""
+
+from typing import Any, Dict, List, Literal, Type
+
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+
+
+class BlockScores(BaseModel):
+    """Risk score (0-10) per questionnaire block"""
+
+    model_config = ConfigDict(extra="ignore", json_schema_extra={"additionalProperties": False})
+
+    narcissism: float = Field(..., ge=0, le=10)
+    control: float = Field(..., ge=0, le=10)
+    gaslighting: float = Field(..., ge=0, le=10)
+    emotion: float = Field(..., ge=0, le=10)
+    intimacy: float = Field(..., ge=0, le=10)
+    social: float = Field(..., ge=0, le=10)
+
+
+class ProfileMetrics(BaseModel):
+    """Metrics of a partner profile"""
+
+    model_config = ConfigDict(extra="ignore", json_schema_extra={"additionalProperties": False})
+
+    overall_risk_score: float = Field(..., ge=0, le=100)
+    urgency_level: Literal["LOW", "MEDIUM", "HIGH", "CRITICAL"]
+    block_scores: BlockScores
+    red_flags: List[str]
+    personality_type: str = Field(..., min_length=1)
+
+    @field_validator("urgency_level", mode="before")
+    @classmethod
+    def _upper_urgency(cls, value: Any) -> Any:
+        return value.strip().upper() if isinstance(value, str) else value
+
+
+class FreeFormProfileMetrics(ProfileMetrics):
+    """Metrics of a free-form partner profile"""
+
+    key_concerns: List[str]
+
+
+def json_schema_response_format(model: Type[BaseModel], name: str) -> Dict[str, Any]:
+    """
+    Build OpenAI-style response_format for a model
+
+    Args:
+        model: Pydantic model the response is validated into
+        name: Schema name sent to the provider
+
+    Returns:
+        response_format payload with strict JSON schema
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": name,
+            "strict": True,
+            "schema": model.model_json_schema(),
+        },
+    }
@@ -3,38 +3,63 @@
 import asyncio
 import json
 import time
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Union, Tuple, Type, TypeVar, Callable, Awaitable, AsyncIterator
 
-import httpx
 from loguru import logger
+from pydantic import BaseModel, ValidationError
 
 from app.core.config import settings
 from app.core.redis import redis_client
-from app.utils.exceptions import AIServiceError
+from app.utils.exceptions import AIServiceError, StructuredOutputError
+from app.utils.json_stream import IncrementalJSONParser, JSONPath
+from app.utils.narrative_stream import NarrativeResult, NarrativeStreamFormatter, format_narrative
+from app.services.ai_usage import CallUsage, usage_tracker
+from app.services.ai_providers import AIRequest, ProviderRouter, ai_router
+from app.services.token_budget import (
+    METRICS_INPUT_BUDGET,
+    fit_answers,
+    fit_text,
+    input_budget,
+    plan_output_tokens,
+    token_estimator
+)
+from app.services.block_summary import BLOCK_TITLES
+from app.services.text_scoring import score_answers
+from app.services.ai_schemas import ProfileMetrics, FreeFormProfileMetrics, json_schema_response_format
 from app.utils.helpers import safe_json_loads, create_cache_key, extract_json_from_text
 from app.prompts.analysis_prompts import (
     ANALYSIS_SYSTEM_PROMPT,
     COMPATIBILITY_SYSTEM_PROMPT,
+    FREE_FORM_PROFILE_SYSTEM_PROMPT,
+    ENHANCED_PROFILE_SYSTEM_PROMPT,
+    BLOCK_SUMMARY_SYSTEM_PROMPT,
     get_text_analysis_prompt,
     get_compatibility_prompt
 )
 from app.utils.enums import UrgencyLevel
 import traceback
 
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
 
 class AIService:
     """Простой эффективный AI сервис с Claude Sonnet 4"""
     
-    def __init__(self):
-        # OpenRouter API configuration
-        self.openrouter_api_key = settings.OPENAI_API_KEY  # Используем OPENAI_API_KEY для OpenRouter
-        self.openrouter_base_url = "https://openrouter.ai/api/v1"
-        self.model = "anthropic/claude-sonnet-4"
-        
-        # Request limiting
-        self._request_semaphore = asyncio.Semaphore(settings.MAX_CONCURRENT_AI_REQUESTS)
+    _shared_semaphore: Optional[asyncio.Semaphore] = None
+    
+    def __init__(self, router: Optional[ProviderRouter] = None):
+        # Providers (OpenRouter, AIML, stub) with health-scored failover
+        self.router = router or ai_router
+        self.model = self.router.primary_model
+        
+        # Request limiting - one semaphore per process (services are created per
+        # request), sized to this worker's share of the global concurrency
+        if AIService._shared_semaphore is None:
+            AIService._shared_semaphore = asyncio.Semaphore(settings.ai_concurrency_per_worker)
+        self._request_semaphore = AIService._shared_semaphore
         self._last_request_time = 0
         self._last_model_used = self.model
+        self.last_usage: Optional[CallUsage] = None
         
         logger.info(f"✅ AIService initialized with {self.model}")
     
@@ -50,74 +75,213 @@ class AIService:
             await asyncio.sleep(settings.AI_RATE_LIMIT_SECONDS - time_since_last)
         self._last_request_time = time.time()
     
+    def _record_usage(
+        self,
+        purpose: str,
+        usage: Optional[Dict[str, Any]],
+        estimated_prompt_tokens: int = 0,
+        max_tokens: int = 0,
+        model: Optional[str] = None
+    ) -> CallUsage:
+        """Record token usage of a finished call and calibrate the estimator"""
+        call_usage = CallUsage.from_response(
+            purpose, model or self.model, usage, estimated_prompt_tokens, max_tokens
+        )
+        token_estimator.observe(estimated_prompt_tokens, call_usage.prompt_tokens)
+        self.last_usage = call_usage
+        usage_tracker.record(call_usage)
+        return call_usage
+    
+    def _build_request(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        response_format: Union[str, Dict[str, Any]],
+        max_tokens: Optional[int],
+        temperature: float,
+        purpose: str
+    ) -> Tuple[AIRequest, int]:
+        """Build provider request with planned max_tokens, return it with prompt estimate"""
+        estimated_prompt_tokens = token_estimator.estimate_messages(system_prompt, user_prompt)
+        request = AIRequest(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            max_tokens=plan_output_tokens(purpose, estimated_prompt_tokens, max_tokens),
+            temperature=temperature,
+            response_format=response_format,
+            purpose=purpose
+        )
+        return request, estimated_prompt_tokens
+    
     async def _get_ai_response(
         self,
         system_prompt: str,
         user_prompt: str,
-        response_format: str = "text",
-        max_tokens: int = 4000,
-        temperature: float = 0.7
+        response_format: Union[str, Dict[str, Any]] = "text",
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        purpose: str = "generic",
+        hedge: bool = False
     ) -> str:
-        """Get response from Claude Sonnet 4 via OpenRouter"""
+        """
+        Get response from the best available provider
         
-        if not self.openrouter_api_key:
-            raise AIServiceError("OpenRouter API key не настроен")
+        max_tokens defaults to the expected response size for purpose,
+        limited by what the prompt leaves of the context window. With hedge
+        a backup provider is asked when the primary is slower than its p95.
+        """
+        request, estimated_prompt_tokens = self._build_request(
+            system_prompt, user_prompt, response_format, max_tokens, temperature, purpose
+        )
         
-        if not self.openrouter_api_key.startswith('sk-or-'):
-            raise AIServiceError("Неверный формат OpenRouter API ключа")
+        await self._rate_limit()
+        
+        if hedge:
+            response = await self.router.complete_hedged(request)
+        else:
+            response = await self.router.complete(request)
+        
+        logger.info(f"✅ {response.provider} response received: {len(response.content)} chars")
+        self._last_model_used = response.model
+        self._record_usage(
+            purpose, response.usage, estimated_prompt_tokens, request.max_tokens, response.model
+        )
+        return response.content
+    
+    async def _stream_ai_response(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        response_format: Union[str, Dict[str, Any]] = "text",
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        purpose: str = "generic"
+    ) -> AsyncIterator[str]:
+        """Stream response content deltas from the best available provider"""
+        request, estimated_prompt_tokens = self._build_request(
+            system_prompt, user_prompt, response_format, max_tokens, temperature, purpose
+        )
+        
+        def on_usage(usage: Optional[Dict[str, Any]], model: str) -> None:
+            self._last_model_used = model
+            self._record_usage(purpose, usage, estimated_prompt_tokens, request.max_tokens, model)
         
         await self._rate_limit()
         
-        headers = {
-            "Authorization": f"Bearer {self.openrouter_api_key}",
-            "Content-Type": "application/json",
-            "HTTP-Referer": "https://psychodetective.ai",
-            "X-Title": "PsychoDetective AI"
-        }
-        
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt}
-        ]
-        
-        data = {
-            "model": self.model,
-            "messages": messages,
-            "max_tokens": max_tokens,
-            "temperature": temperature,
-            "stream": False
-        }
+        async for delta in self.router.stream(request, on_usage):
+            yield delta
+    
+    async def _get_structured_response(
+        self,
+        model: Type[ModelT],
+        schema_name: str,
+        system_prompt: str,
+        user_prompt: str,
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.3,
+        on_field: Optional[Callable[[str, Any], Awaitable[None]]] = None,
+        purpose: Optional[str] = None,
+        hedge: bool = False
+    ) -> ModelT:
+        """
+        Get response validated into a typed model
+        
+        Sends the model's JSON schema as response_format and parses the
+        stream incrementally, so top-level fields reach on_field as soon as
+        they are emitted. There are no default values: a truncated or
+        invalid response raises.
+        
+        Args:
+            model: Pydantic model to validate into
+            schema_name: Schema name sent to the provider
+            system_prompt: System prompt
+            user_prompt: User prompt
+            max_tokens: Output token limit (planned from purpose if omitted)
+            temperature: Sampling temperature
+            on_field: Async callback(field_name, value) for top-level fields
+            purpose: Usage accounting label (defaults to schema_name)
+            hedge: Use a hedged non-streaming call (only without on_field)
+            
+        Returns:
+            Validated model instance
+            
+        Raises:
+            StructuredOutputError: if the response is not valid for the model
+        """
+        ready_fields: List[Tuple[str, Any]] = []
+        
+        def collect(path: JSONPath, value: Any) -> None:
+            if len(path) == 1:
+                ready_fields.append((path[0], value))
+        
+        parser = IncrementalJSONParser(on_value=collect if on_field else None)
+        request_kwargs = dict(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            response_format=json_schema_response_format(model, schema_name),
+            max_tokens=max_tokens,
+            temperature=temperature,
+            purpose=purpose or schema_name
+        )
+        
+        if hedge and not on_field:
+            parser.feed(await self._get_ai_response(**request_kwargs, hedge=True))
+        else:
+            async for delta in self._stream_ai_response(**request_kwargs):
+                parser.feed(delta)
+                while ready_fields:
+                    await on_field(*ready_fields.pop(0))
         
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    f"{self.openrouter_base_url}/chat/completions",
-                    headers=headers,
-                    json=data
-                )
-                
-                if response.status_code != 200:
-                    error_text = response.text
-                    logger.error(f"OpenRouter API error {response.status_code}: {error_text}")
-                    raise AIServiceError(f"OpenRouter API ошибка: {response.status_code}")
-                
-                result = response.json()
-                
-                if 'choices' not in result or not result['choices']:
-                    logger.error(f"Invalid OpenRouter response: {result}")
-                    raise AIServiceError("Неверный ответ от OpenRouter API")
-                
-                content = result['choices'][0]['message']['content']
-                logger.info(f"✅ OpenRouter response received: {len(content)} chars")
-                
-                return content
-                
-        except httpx.TimeoutException:
-            logger.error("OpenRouter API timeout")
-            raise AIServiceError("Таймаут OpenRouter API")
-        except Exception as e:
-            logger.error(f"OpenRouter API error: {e}")
-            raise AIServiceError(f"Ошибка OpenRouter API: {str(e)}")
+            return model.model_validate(parser.close())
+        except ValidationError as e:
+            logger.error(f"Structured output validation failed ({schema_name}): {e}")
+            raise StructuredOutputError(f"Ответ AI не соответствует схеме {schema_name}: {e.error_count()} ошибок")
+    
+    async def _get_narrative_response(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        purpose: str,
+        temperature: float = 0.7,
+        on_preview: Optional[Callable[[str], Awaitable[None]]] = None
+    ) -> Tuple[str, NarrativeResult]:
+        """
+        Stream a text response through the narrative formatter
+        
+        Formatting happens while the model generates: each finished
+        paragraph is converted once into the cleaned text, PDF fragments and
+        Telegram preview. on_preview receives the Telegram HTML accumulated
+        so far after every chunk that finished a paragraph.
+        
+        Returns:
+            Raw response and formatted narrative
+        """
+        paragraph_done = False
+        
+        def mark_paragraph(fragment: str) -> None:
+            nonlocal paragraph_done
+            paragraph_done = True
+        
+        formatter = NarrativeStreamFormatter(on_paragraph=mark_paragraph if on_preview else None)
+        chunks: List[str] = []
+        
+        async for delta in self._stream_ai_response(
+            system_prompt=system_prompt,
+            user_prompt=user_prompt,
+            response_format="text",
+            temperature=temperature,
+            purpose=purpose
+        ):
+            chunks.append(delta)
+            formatter.feed(delta)
+            if paragraph_done:
+                paragraph_done = False
+                await on_preview(formatter.telegram_preview)
+        
+        response = "".join(chunks)
+        logger.info(f"✅ Narrative response streamed: {len(response)} chars")
+        return response, formatter.close()
     
     async def analyze_text(
         self,
@@ -149,7 +313,7 @@ class AIService:
                     system_prompt=system_prompt,
                     user_prompt=user_prompt,
                     response_format="json",
-                    max_tokens=3000
+                    purpose="text_analysis"
                 )
             
             # Parse response
@@ -174,9 +338,17 @@ class AIService:
         user_id: int,
         partner_name: str = "партнер",
         partner_description: str = "",
-        use_cache: bool = True
+        use_cache: bool = True,
+        on_metric: Optional[Callable[[str, Any], Awaitable[None]]] = None,
+        on_preview: Optional[Callable[[str], Awaitable[None]]] = None
     ) -> Dict[str, Any]:
-        """Детальный анализ партнера с персонализированным портретом"""
+        """
+        Детальный анализ партнера с персонализированным портретом
+        
+        on_metric получает поля метрик (например overall_risk_score) по мере
+        их генерации, до завершения ответа. on_preview получает HTML-превью
+        портрета для Telegram по мере готовности абзацев.
+        """
         start_time = time.time()
         
         # Cache key
@@ -190,6 +362,11 @@ class AIService:
                 return cached_result
         
         try:
+            # Ответы, не помещающиеся в контекст, сокращаются (chunk_text)
+            answers = fit_answers(answers, input_budget(
+                "profile_portrait", token_estimator.estimate(ENHANCED_PROFILE_SYSTEM_PROMPT)
+            ))
+            
             # Подготавливаем данные для анализа
             analysis_data = {
                 'questionnaire_data': {
@@ -202,73 +379,42 @@ class AIService:
                 'partner_description': partner_description
             }
             
+            # Метрики считаются локально за миллисекунды, до портрета;
+            # LLM - только при низкой уверенности
+            metrics = await self._get_local_metrics(ProfileMetrics, answers, on_metric)
+            
             # Create enhanced prompts
             user_prompt = self._create_enhanced_user_prompt(analysis_data)
             
             # Get detailed analysis from Claude Sonnet 4
             async with self._request_semaphore:
-                response = await self._get_ai_response(
-                    system_prompt="",  # Системный промпт включен в user_prompt
+                response, narrative = await self._get_narrative_response(
+                    system_prompt=ENHANCED_PROFILE_SYSTEM_PROMPT,  # Статичный, кэшируемый
                     user_prompt=user_prompt,
-                    response_format="text",  # Текстовый анализ
-                    max_tokens=8000,  # Увеличено для детального анализа
-                    temperature=0.7  # Более креативный анализ
-                )
-            
-            # Создаем второй запрос для получения метрик
-            metrics_prompt = f"""
-На основе следующих ответов на диагностические вопросы дай краткую оценку рисков в JSON формате:
-
-ПАРТНЕР: {partner_name}
-ОТВЕТЫ: {str(answers)[:1000]}...
-
-Верни JSON с полями:
-- overall_risk_score: число от 0 до 100 (процент риска)
-- urgency_level: "LOW", "MEDIUM", "HIGH", "CRITICAL" 
-- block_scores: объект с оценками от 0 до 10 для narcissism, control, gaslighting, emotion, intimacy, social
-- red_flags: массив строк с основными проблемами
-- personality_type: краткое описание типа личности
-
-Пример:
-{{"overall_risk_score": 75, "urgency_level": "HIGH", "block_scores": {{"narcissism": 8.5, "control": 7.2, "gaslighting": 6.8, "emotion": 7.5, "intimacy": 6.0, "social": 7.8}}, "red_flags": ["Контролирующее поведение", "Эмоциональная нестабильность"], "personality_type": "Нарциссический контролер"}}
-"""
-            
-            # Получаем метрики
-            async with self._request_semaphore:
-                metrics_response = await self._get_ai_response(
-                    system_prompt="Ты эксперт-психолог. Отвечай только в JSON формате.",
-                    user_prompt=metrics_prompt,
-                    response_format="json",
-                    max_tokens=1000,
-                    temperature=0.3
+                    purpose="profile_portrait",
+                    temperature=0.7,  # Более креативный анализ
+                    on_preview=on_preview
                 )
             
-            # Парсим метрики
-            try:
-                metrics_data = extract_json_from_text(metrics_response)
-                if not metrics_data:
-                    metrics_data = safe_json_loads(metrics_response, {})
-            except:
-                metrics_data = {}
-            
-            # Очищаем форматирование от markdown символов
-            cleaned_response = self._clean_markdown_formatting(response)
+            # Локальной оценки не хватило уверенности - метрики считает LLM
+            metrics_source = "local" if metrics else "llm"
+            if metrics is None:
+                metrics = await self._get_llm_profile_metrics(partner_name, answers, on_metric)
             
-            # Формируем результат
+            # Формируем результат (форматирование выполнено при потоковом чтении)
             result = {
-                "psychological_profile": cleaned_response,  # Полный текстовый анализ
-                "overall_risk_score": metrics_data.get("overall_risk_score", 50),
-                "urgency_level": metrics_data.get("urgency_level", "MEDIUM"),
-                "block_scores": metrics_data.get("block_scores", {
-                    "narcissism": 5.0, "control": 5.0, "gaslighting": 5.0,
-                    "emotion": 5.0, "intimacy": 5.0, "social": 5.0
-                }),
-                "red_flags": metrics_data.get("red_flags", ["Требует дополнительного изучения"]),
-                "personality_type": metrics_data.get("personality_type", "Смешанный тип"),
+                "psychological_profile": narrative.text,  # Полный текстовый анализ
+                "psychological_profile_html": narrative.pdf_html,  # Фрагменты для PDF
+                "overall_risk_score": metrics.overall_risk_score,
+                "urgency_level": metrics.urgency_level,
+                "block_scores": metrics.block_scores.model_dump(),
+                "red_flags": metrics.red_flags,
+                "personality_type": metrics.personality_type,
+                "metrics_source": metrics_source,
                 "processing_time": time.time() - start_time,
                 "ai_model_used": self._get_last_model_used(),
                 "analysis_mode": "detailed_portrait_with_metrics",
-                "cost_estimate": 0.18,  # Увеличена из-за двух запросов
+                "cost_estimate": 0.18 if metrics_source == "llm" else 0.12,
                 "word_count": len(response.split()),
                 "character_count": len(response),
                 "partner_name": partner_name
@@ -285,6 +431,43 @@ class AIService:
             logger.error(f"❌ Profile analysis failed: {e}")
             raise AIServiceError(f"Профилирование не удалось: {str(e)}")
     
+    async def _get_llm_profile_metrics(
+        self,
+        partner_name: str,
+        answers: List[Dict[str, Any]],
+        on_metric: Optional[Callable[[str, Any], Awaitable[None]]] = None
+    ) -> ProfileMetrics:
+        """Метрики анкеты от LLM (запасной путь при низкой уверенности локальной оценки)"""
+        metrics_prompt = f"""
+На основе следующих ответов на диагностические вопросы дай краткую оценку рисков в JSON формате:
+
+ПАРТНЕР: {partner_name}
+ОТВЕТЫ:
+{self._format_text_answers_for_metrics(fit_answers(answers, METRICS_INPUT_BUDGET))}
+
+Верни JSON с полями:
+- overall_risk_score: число от 0 до 100 (процент риска)
+- urgency_level: "LOW", "MEDIUM", "HIGH", "CRITICAL" 
+- block_scores: объект с оценками от 0 до 10 для narcissism, control, gaslighting, emotion, intimacy, social
+- red_flags: массив строк с основными проблемами
+- personality_type: краткое описание типа личности
+
+Пример:
+{{"overall_risk_score": 75, "urgency_level": "HIGH", "block_scores": {{"narcissism": 8.5, "control": 7.2, "gaslighting": 6.8, "emotion": 7.5, "intimacy": 6.0, "social": 7.8}}, "red_flags": ["Контролирующее поведение", "Эмоциональная нестабильность"], "personality_type": "Нарциссический контролер"}}
+"""
+        
+        # Structured output: validated model, no default fallbacks
+        async with self._request_semaphore:
+            return await self._get_structured_response(
+                ProfileMetrics,
+                "profile_metrics",
+                system_prompt="Ты эксперт-психолог. Отвечай только в JSON формате.",
+                user_prompt=metrics_prompt,
+                temperature=0.3,
+                on_field=on_metric,
+                hedge=settings.AI_HEDGE_METRICS
+            )
+    
     async def profile_partner_free_form(
         self,
         text_answers: List[Dict[str, Any]],
@@ -292,9 +475,22 @@ class AIService:
         partner_name: str = "партнер",
         partner_description: str = "",
         partner_basic_info: str = "",
-        use_cache: bool = True
+        use_cache: bool = True,
+        on_metric: Optional[Callable[[str, Any], Awaitable[None]]] = None,
+        block_summaries: Optional[Dict[str, str]] = None,
+        on_preview: Optional[Callable[[str], Awaitable[None]]] = None
     ) -> Dict[str, Any]:
-        """Детальный анализ партнера на основе свободных ответов"""
+        """
+        Детальный анализ партнера на основе свободных ответов
+        
+        on_metric получает поля метрик (например overall_risk_score) по мере
+        их генерации, до завершения ответа. block_summaries - резюме блоков,
+        подготовленные во время опроса (summarize_block): блок с резюме
+        попадает в промпт резюме и короткими цитатами ответов, блок без
+        резюме - полными ответами.
+        on_preview получает HTML-превью портрета для Telegram по мере
+        готовности абзацев.
+        """
         start_time = time.time()
         
         # Cache key
@@ -308,81 +504,63 @@ class AIService:
                 return cached_result
         
         try:
+            # Ответы, не помещающиеся в контекст, сокращаются (chunk_text)
+            answers_budget = input_budget(
+                "free_form_portrait", token_estimator.estimate(FREE_FORM_PROFILE_SYSTEM_PROMPT)
+            )
+            block_summaries = block_summaries or {}
+            summaries_tokens = sum(token_estimator.estimate(summary) for summary in block_summaries.values())
+            raw_answers = fit_answers(
+                [answer for answer in text_answers if answer.get('block') not in block_summaries],
+                max(0, answers_budget - summaries_tokens)
+            )
+            raw_answers_iter = iter(raw_answers)
+            portrait_answers = [
+                answer if answer.get('block') in block_summaries else next(raw_answers_iter)
+                for answer in text_answers
+            ]
+            
+            # Метрики считаются локально за миллисекунды, до портрета;
+            # LLM - только при низкой уверенности
+            metrics = await self._get_local_metrics(FreeFormProfileMetrics, text_answers, on_metric)
+            
             # Создаем расширенный промпт для свободной формы
             user_prompt = self._create_free_form_user_prompt(
-                text_answers, partner_name, partner_description, partner_basic_info
+                portrait_answers, partner_name, partner_description, partner_basic_info, block_summaries
             )
             
             # Get detailed analysis from Claude Sonnet 4
             async with self._request_semaphore:
-                response = await self._get_ai_response(
-                    system_prompt="",  # Системный промпт включен в user_prompt
+                response, narrative = await self._get_narrative_response(
+                    system_prompt=FREE_FORM_PROFILE_SYSTEM_PROMPT,  # Статичный, кэшируемый
                     user_prompt=user_prompt,
-                    response_format="text",  # Текстовый анализ
-                    max_tokens=12000,  # Увеличено для более детального анализа
-                    temperature=0.7  # Более креативный анализ
+                    purpose="free_form_portrait",
+                    temperature=0.7,  # Более креативный анализ
+                    on_preview=on_preview
                 )
             
-            # Создаем второй запрос для получения метрик на основе текстовых ответов
-            metrics_prompt = f"""
-На основе следующих детальных ответов на диагностические вопросы дай краткую оценку рисков в JSON формате:
-
-ПАРТНЕР: {partner_name}
-ОПИСАНИЕ: {partner_description}
-БАЗОВАЯ ИНФОРМАЦИЯ: {partner_basic_info}
-
-ДЕТАЛЬНЫЕ ОТВЕТЫ:
-{self._format_text_answers_for_metrics(text_answers)}
-
-Проанализируй каждый ответ и верни JSON с полями:
-- overall_risk_score: число от 0 до 100 (процент риска)
-- urgency_level: "LOW", "MEDIUM", "HIGH", "CRITICAL" 
-- block_scores: объект с оценками от 0 до 10 для narcissism, control, gaslighting, emotion, intimacy, social
-- red_flags: массив строк с основными проблемами (минимум 5-7 флагов)
-- personality_type: краткое описание типа личности
-- key_concerns: массив основных проблем выявленных в ответах
-
-Пример:
-{{"overall_risk_score": 75, "urgency_level": "HIGH", "block_scores": {{"narcissism": 8.5, "control": 7.2, "gaslighting": 6.8, "emotion": 7.5, "intimacy": 6.0, "social": 7.8}}, "red_flags": ["Контролирующее поведение", "Эмоциональная нестабильность", "Отсутствие эмпатии"], "personality_type": "Нарциссический контролер", "key_concerns": ["Агрессивная реакция на критику", "Изоляция от друзей"]}}
-"""
-            
-            # Получаем метрики
-            async with self._request_semaphore:
-                metrics_response = await self._get_ai_response(
-                    system_prompt="Ты эксперт-психолог. Отвечай только в JSON формате.",
-                    user_prompt=metrics_prompt,
-                    response_format="json",
-                    max_tokens=1500,
-                    temperature=0.3
+            # Локальной оценки не хватило уверенности - метрики считает LLM
+            metrics_source = "local" if metrics else "llm"
+            if metrics is None:
+                metrics = await self._get_llm_free_form_metrics(
+                    partner_name, partner_description, partner_basic_info, text_answers, on_metric
                 )
             
-            # Парсим метрики
-            try:
-                metrics_data = extract_json_from_text(metrics_response)
-                if not metrics_data:
-                    metrics_data = safe_json_loads(metrics_response, {})
-            except:
-                metrics_data = {}
-            
-            # Очищаем форматирование от markdown символов
-            cleaned_response = self._clean_markdown_formatting(response)
-            
-            # Формируем результат
+            # Формируем результат (форматирование выполнено при потоковом чтении)
             result = {
-                "psychological_profile": cleaned_response,  # Полный текстовый анализ
-                "overall_risk_score": metrics_data.get("overall_risk_score", 50),
-                "urgency_level": metrics_data.get("urgency_level", "MEDIUM"),
-                "block_scores": metrics_data.get("block_scores", {
-                    "narcissism": 5.0, "control": 5.0, "gaslighting": 5.0,
-                    "emotion": 5.0, "intimacy": 5.0, "social": 5.0
-                }),
-                "red_flags": metrics_data.get("red_flags", ["Требует дополнительного изучения"]),
-                "personality_type": metrics_data.get("personality_type", "Смешанный тип"),
-                "key_concerns": metrics_data.get("key_concerns", ["Необходим более глубокий анализ"]),
+                "psychological_profile": narrative.text,  # Полный текстовый анализ
+                "psychological_profile_html": narrative.pdf_html,  # Фрагменты для PDF
+                "overall_risk_score": metrics.overall_risk_score,
+                "urgency_level": metrics.urgency_level,
+                "block_scores": metrics.block_scores.model_dump(),
+                "red_flags": metrics.red_flags,
+                "personality_type": metrics.personality_type,
+                "key_concerns": metrics.key_concerns,
+                "metrics_source": metrics_source,
                 "processing_time": time.time() - start_time,
                 "ai_model_used": self._get_last_model_used(),
                 "analysis_mode": "free_form_detailed_analysis",
-                "cost_estimate": 0.25,  # Увеличена из-за большего объема данных
+                "cost_estimate": 0.25 if metrics_source == "llm" else 0.18,
                 "word_count": len(response.split()),
                 "character_count": len(response),
                 "partner_name": partner_name,
@@ -400,80 +578,161 @@ class AIService:
             logger.error(f"❌ Free form profile analysis failed: {e}")
             raise AIServiceError(f"Анализ свободной формы не удался: {str(e)}")
     
-    def _create_free_form_user_prompt(self, text_answers: List[Dict[str, Any]], partner_name: str, partner_description: str, partner_basic_info: str) -> str:
-        """Создает промпт для анализа свободных ответов"""
+    async def _get_local_metrics(
+        self,
+        model: Type[ModelT],
+        answers: List[Dict[str, Any]],
+        on_metric: Optional[Callable[[str, Any], Awaitable[None]]] = None
+    ) -> Optional[ModelT]:
+        """
+        Локальная оценка метрик по лексиконам блоков (text_scoring)
+        
+        Returns:
+            Метрики или None, если оценка выключена или уверенность ниже
+            LOCAL_SCORING_MIN_CONFIDENCE (тогда метрики считает LLM)
+        """
+        if not settings.LOCAL_SCORING_ENABLED:
+            return None
+        
+        scores = score_answers(answers)
+        if scores.confidence < settings.LOCAL_SCORING_MIN_CONFIDENCE:
+            logger.info(f"🧮 Local scoring confidence {scores.confidence:.2f} too low, asking LLM")
+            return None
+        
+        metrics = scores.to_metrics(model)
+        logger.info(f"🧮 Local scoring: risk {metrics.overall_risk_score}, confidence {scores.confidence:.2f}")
+        if on_metric:
+            for name, value in metrics.model_dump().items():
+                await on_metric(name, value)
+        return metrics
+    
+    async def _get_llm_free_form_metrics(
+        self,
+        partner_name: str,
+        partner_description: str,
+        partner_basic_info: str,
+        text_answers: List[Dict[str, Any]],
+        on_metric: Optional[Callable[[str, Any], Awaitable[None]]] = None
+    ) -> FreeFormProfileMetrics:
+        """Метрики свободных ответов от LLM (запасной путь при низкой уверенности локальной оценки)"""
+        metrics_prompt = f"""
+На основе следующих детальных ответов на диагностические вопросы дай краткую оценку рисков в JSON формате:
+
+ПАРТНЕР: {partner_name}
+ОПИСАНИЕ: {partner_description}
+БАЗОВАЯ ИНФОРМАЦИЯ: {partner_basic_info}
+
+ДЕТАЛЬНЫЕ ОТВЕТЫ:
+{self._format_text_answers_for_metrics(fit_answers(text_answers, METRICS_INPUT_BUDGET))}
+
+Проанализируй каждый ответ и верни JSON с полями:
+- overall_risk_score: число от 0 до 100 (процент риска)
+- urgency_level: "LOW", "MEDIUM", "HIGH", "CRITICAL" 
+- block_scores: объект с оценками от 0 до 10 для narcissism, control, gaslighting, emotion, intimacy, social
+- red_flags: массив строк с основными проблемами (минимум 5-7 флагов)
+- personality_type: краткое описание типа личности
+- key_concerns: массив основных проблем выявленных в ответах
+
+Пример:
+{{"overall_risk_score": 75, "urgency_level": "HIGH", "block_scores": {{"narcissism": 8.5, "control": 7.2, "gaslighting": 6.8, "emotion": 7.5, "intimacy": 6.0, "social": 7.8}}, "red_flags": ["Контролирующее поведение", "Эмоциональная нестабильность", "Отсутствие эмпатии"], "personality_type": "Нарциссический контролер", "key_concerns": ["Агрессивная реакция на критику", "Изоляция от друзей"]}}
+"""
         
-        # Форматируем ответы
+        # Structured output: validated model, no default fallbacks
+        async with self._request_semaphore:
+            return await self._get_structured_response(
+                FreeFormProfileMetrics,
+                "free_form_profile_metrics",
+                system_prompt="Ты эксперт-психолог. Отвечай только в JSON формате.",
+                user_prompt=metrics_prompt,
+                temperature=0.3,
+                on_field=on_metric,
+                hedge=settings.AI_HEDGE_METRICS
+            )
+    
+    def _create_free_form_user_prompt(self, text_answers: List[Dict[str, Any]], partner_name: str, partner_description: str, partner_basic_info: str, block_summaries: Optional[Dict[str, str]] = None) -> str:
+        """
+        Создает динамическую часть промпта для анализа свободных ответов
+        
+        Инструкции лежат в FREE_FORM_PROFILE_SYSTEM_PROMPT и передаются
+        системным сообщением, чтобы кэшироваться у провайдера.
+        """
+        
+        block_summaries = block_summaries or {}
+        
+        # Блоки с готовым резюме: резюме и короткие цитаты вместо полных ответов
+        summaries_text = ""
+        for block, summary in block_summaries.items():
+            quotes = "".join(
+                f"- «{fit_text(str(answer_data.get('answer', '')), settings.BLOCK_SUMMARY_QUOTE_TOKENS)}»\n"
+                for answer_data in text_answers if answer_data.get('block') == block
+            )
+            summaries_text += f"БЛОК: {BLOCK_TITLES.get(block, block)}\n{summary}\n"
+            if quotes:
+                summaries_text += f"ЦИТАТЫ ИЗ ОТВЕТОВ:\n{quotes}"
+            summaries_text += "\n"
+        if summaries_text:
+            summaries_text = f"ПРЕДВАРИТЕЛЬНЫЙ АНАЛИЗ ПО БЛОКАМ:\n{summaries_text}"
+        
+        # Форматируем ответы блоков без резюме
         answers_text = ""
         for i, answer_data in enumerate(text_answers, 1):
+            block = answer_data.get('block', 'unknown')
+            if block in block_summaries:
+                continue
             question = answer_data.get('question', f'Вопрос {i}')
             answer = answer_data.get('answer', 'Нет ответа')
-            block = answer_data.get('block', 'unknown')
             
             answers_text += f"ВОПРОС {i} (блок: {block}):\n{question}\n\nОТВЕТ:\n{answer}\n\n" + "="*50 + "\n\n"
+        if answers_text:
+            answers_text = f"ДЕТАЛЬНЫЕ ОТВЕТЫ ПОЛЬЗОВАТЕЛЯ:\n{answers_text}"
         
-        # Основной промпт
-        user_prompt = f"""
-Ты - ведущий эксперт по криминальной психологии и профайлингу с 25-летним опытом работы с токсичными личностями. Твоя задача - создать максимально детальный психологический портрет партнера на основе развернутых ответов пользователя.
-
+        return f"""
 ПАРТНЕР: {partner_name}
 ОПИСАНИЕ: {partner_description}
 БАЗОВАЯ ИНФОРМАЦИЯ: {partner_basic_info}
 
-ДЕТАЛЬНЫЕ ОТВЕТЫ ПОЛЬЗОВАТЕЛЯ:
-{answers_text}
-
-КРИТИЧЕСКИ ВАЖНЫЕ ТРЕБОВАНИЯ:
-
-1. ОБЪЕМ: СТРОГО 3000-3500 слов (это критически важно для качества анализа!)
-2. ПЕРСОНАЛИЗАЦИЯ: Упоминай имя {partner_name} минимум 15-20 раз в тексте
-3. ЦИТАТЫ: Используй ПРЯМЫЕ цитаты из ответов пользователя минимум 25-30 раз
-4. СТРУКТУРА: БЕЗ смайликов, решеток, звездочек, подчеркиваний - только заглавные буквы для заголовков
-5. ПРОФЕССИОНАЛИЗМ: Клинический стиль, научные термины с объяснениями
-6. ДЕТАЛИЗАЦИЯ: Каждый раздел минимум 500-600 слов с конкретными примерами
-
-ОБЯЗАТЕЛЬНАЯ СТРУКТУРА (3000-3500 слов):
-
-Персонализированный психологический анализ
-
-ПСИХОЛОГИЧЕСКИЙ ПОРТРЕТ: [Тип личности {partner_name}]
-
-ОБЩАЯ ХАРАКТЕРИСТИКА ЛИЧНОСТИ
-
-Детальный анализ с упоминанием имени {partner_name}. Модель "Темной триады" с конкретными баллами. Анализ каждого ответа с прямыми цитатами. Влияние профессии и окружения на токсичные черты. (600-700 слов)
-
-ДОМИНИРУЮЩИЕ ПОВЕДЕНЧЕСКИЕ ПАТТЕРНЫ
-
-Основные токсичные черты {partner_name} с примерами. Триггеры агрессивного поведения. Способы манипуляций и контроля. Эмоциональная нестабильность и её проявления. (700-800 слов)
-
-АНАЛИЗ ОТНОШЕНИЙ И ВЗАИМОДЕЙСТВИЙ
-
-Как {partner_name} строит отношения с разными людьми. Паттерны общения в конфликтных ситуациях. Способность к эмпатии и поддержке. Реакция на успехи и неудачи окружающих. (600-700 слов)
-
-КРАСНЫЕ ФЛАГИ И ПРЕДУПРЕЖДАЮЩИЕ ЗНАКИ
-
-Конкретные примеры опасного поведения. Эскалация конфликтов и агрессии. Признаки психологического насилия. Потенциальные риски для партнера. (500-600 слов)
-
-ПРОГНОЗ РАЗВИТИЯ ОТНОШЕНИЙ
-
-Вероятные сценарии развития событий. Риски для физического и психологического здоровья. Возможности изменения поведения {partner_name}. Влияние на детей и семью. (600-700 слов)
-
-РЕКОМЕНДАЦИИ И СТРАТЕГИИ ЗАЩИТЫ
-
-Конкретные шаги для обеспечения безопасности. Техники общения с {partner_name}. Когда обращаться за профессиональной помощью. Планы выхода из токсичных отношений. (500-600 слов)
-
-ВАЖНО:
-- Анализируй каждый ответ детально
-- Используй профессиональную терминологию
-- Приводи конкретные примеры поведения
-- Обязательно цитируй ответы пользователя
-- Делай научно обоснованные выводы
-- Персонализируй анализ под конкретного партнера
+{summaries_text}{answers_text}
+Создай портрет партнера по имени {partner_name}, соблюдая все требования.
+"""
+    
+    async def summarize_block(
+        self,
+        block: str,
+        answers: List[Dict[str, Any]],
+        partner_name: str = "партнер"
+    ) -> str:
+        """
+        Краткое резюме одного блока анкеты
+        
+        Args:
+            block: Блок (narcissism, control, gaslighting, emotion, intimacy, social)
+            answers: Ответы блока
+            partner_name: Имя партнера
+            
+        Returns:
+            Резюме блока: оценка, паттерны, красные флаги, цитаты
+        """
+        user_prompt = f"""
+ПАРТНЕР: {partner_name}
+БЛОК: {BLOCK_TITLES.get(block, block)}
 
-Создай максимально детальный и персонализированный портрет на основе предоставленных ответов.
+ОТВЕТЫ:
+{self._format_text_answers_for_metrics(fit_answers(answers, METRICS_INPUT_BUDGET))}
+Составь резюме блока.
 """
+        async with self._request_semaphore:
+            response = await self._get_ai_response(
+                system_prompt=BLOCK_SUMMARY_SYSTEM_PROMPT,
+                user_prompt=user_prompt,
+                response_format="text",
+                temperature=0.3,
+                purpose="block_summary"
+            )
         
-        return user_prompt
+        summary = format_narrative(response).text
+        if not summary:
+            raise AIServiceError(f"Пустое резюме блока {block}")
+        return summary
     
     def _format_text_answers_for_metrics(self, text_answers: List[Dict[str, Any]]) -> str:
         """Форматирует текстовые ответы для анализа метрик"""
@@ -518,7 +777,7 @@ class AIService:
                     system_prompt=system_prompt,
                     user_prompt=user_prompt,
                     response_format="json",
-                    max_tokens=3000
+                    purpose="compatibility"
                 )
             
             # Parse response
@@ -554,90 +813,13 @@ class AIService:
 - Указывай конкретные поведенческие паттерны и красные флаги"""
     
     def _create_enhanced_user_prompt(self, analysis_data: dict) -> str:
-        """Создает детальный промпт для анализа с использованием данных анкеты"""
+        """
+        Создает динамическую часть промпта с данными анкеты
+        
+        Инструкции лежат в ENHANCED_PROFILE_SYSTEM_PROMPT и передаются
+        системным сообщением, чтобы кэшироваться у провайдера.
+        """
         
-        # Системный промпт для детального анализа
-        system_prompt = """
-Ты - эксперт по криминальной психологии и профайлингу с 20-летним опытом работы с токсичными личностями. Твоя задача - создавать глубокие психологические портреты партнеров на основе ответов на диагностические вопросы.
-
-ОБЯЗАТЕЛЬНЫЕ ТРЕБОВАНИЯ К ПОРТРЕТУ:
-
-1. ОБЪЕМ: 2000-2500 слов (это критически важно!)
-2. ЯЗЫК: Научно-популярный, доступный русскому читателю
-3. СТРУКТУРА: Использовать заголовки с эмодзи для каждого раздела
-4. ПРИМЕРЫ: Минимум 5-7 конкретных историй с именами и деталями
-5. НАУЧНОСТЬ: Ссылки на реальные психологические концепции и модели
-
-ОБЯЗАТЕЛЬНАЯ СТРУКТУРА ПОРТРЕТА:
-
-ПСИХОЛОГИЧЕСКИЙ ПОРТРЕТ: "[Тип личности]"
-
-ОБЩАЯ ХАРАКТЕРИСТИКА ЛИЧНОСТИ
-- Первое впечатление vs реальность
-- Оценка по модели "Темной триады" (нарциссизм/макиавеллизм/психопатия)
-- Ключевые личностные особенности
-
-ОСНОВНОЙ ПАТТЕРН ПОВЕДЕНИЯ В ОТНОШЕНИЯХ
-- Детальное описание главной токсичной черты
-- 2-3 конкретных примера с именами и ситуациями
-- Психологические механизмы
-
-КОНТРОЛИРУЮЩЕЕ ПОВЕДЕНИЕ
-- Эволюция контроля: от "заботы" к тотальному надзору
-- Конкретные техники контроля
-- История из жизни с деталями
-
-МАНИПУЛЯТИВНЫЕ ТЕХНИКИ
-- Газлайтинг с примерами фраз
-- Эмоциональный шантаж
-- Переписывание истории конфликтов
-
-ЭМОЦИОНАЛЬНАЯ ДИЗРЕГУЛЯЦИЯ
-- Непредсказуемость реакций
-- Двойные стандарты
-- Проекция и обвинения
-
-ИНТИМНОСТЬ КАК ИНСТРУМЕНТ
-- Использование близости для контроля
-- Конкретные паттерны поведения
-- Травматичные аспекты
-
-СОЦИАЛЬНАЯ МАСКА
-- Публичный образ vs частное поведение
-- Когнитивный диссонанс у партнера
-- Примеры двойственности
-
-ПРОГНОЗ И РЕКОМЕНДАЦИИ
-- Способность к изменениям
-- Цикличность токсичных отношений
-- Конкретные рекомендации партнерам
-
-СТИЛИСТИЧЕСКИЕ ТРЕБОВАНИЯ:
-
-1. Используй конкретные имена в примерах (Анна, Марина, Елена и т.д.)
-2. Включай прямую речь и цитаты ("фразы в кавычках")
-3. Описывай физиологические реакции и невербалику
-4. Ссылайся на исследования и авторов (можно использовать реальные)
-5. Используй метафоры для сложных концепций
-6. Чередуй длинные аналитические абзацы с короткими выводами
-
-ОБЯЗАТЕЛЬНЫЕ ПСИХОЛОГИЧЕСКИЕ КОНЦЕПЦИИ:
-- Модель "Темной триады"
-- Теория привязанности
-- Цикл абьюза
-- Газлайтинг
-- Эмоциональная дизрегуляция
-- Когнитивный диссонанс
-- Проекция и другие защитные механизмы
-
-ЗАПРЕЩЕНО:
-- Поверхностные обобщения
-- Короткие абзацы без примеров
-- Абстрактные рассуждения без конкретики
-- Излишняя научность без объяснений
-- Портреты короче 2000 слов
-"""
-
         # Формируем ответы пользователя
         answers_text = ""
         partner_name = "партнер"
@@ -659,74 +841,15 @@ class AIService:
             else:
                 answers_text += f"Вопрос {question_id}: {answer_data}\n\n"
         
-        # Основной промпт с данными
-        user_prompt = f"""
+        return f"""
 На основе следующих ответов на диагностические вопросы создай глубокий психологический портрет партнера.
 
 ПАРТНЕР: {partner_name} ({partner_description})
 
 [ОТВЕТЫ НА ВОПРОСЫ]
 {answers_text}
-
-КРИТИЧЕСКИ ВАЖНЫЕ ТРЕБОВАНИЯ:
-
-1. ОБЪЕМ: СТРОГО 2400-2700 слов (ОБЯЗАТЕЛЬНО проверяй итоговое количество!)
-2. ПЕРСОНАЛИЗАЦИЯ: Упоминай имя {partner_name} минимум 10-12 раз в тексте
-3. ЦИТАТЫ: Используй ПРЯМЫЕ цитаты из ответов пользователя минимум 15-20 раз
-4. СТРУКТУРА: БЕЗ смайликов, решеток, звездочек, подчеркиваний - только заглавные буквы для заголовков
-5. ПРОФЕССИОНАЛИЗМ: Клинический стиль, научные термины с объяснениями
-6. ДЕТАЛИЗАЦИЯ: Каждый раздел минимум 350-400 слов с конкретными примерами
-
-ОБЯЗАТЕЛЬНАЯ СТРУКТУРА (2400-2700 слов):
-
-Персонализированный психологический анализ
-
-ПСИХОЛОГИЧЕСКИЙ ПОРТРЕТ: [Тип личности {partner_name}]
-
-ОБЩАЯ ХАРАКТЕРИСТИКА ЛИЧНОСТИ
-
-Детальный анализ с упоминанием имени {partner_name}. Модель "Темной триады" с конкретными баллами. Первое впечатление vs реальность с примерами. Влияние профессии на токсичные черты. (400-450 слов)
-
-ДОМИНИРУЮЩИЕ ПОВЕДЕНЧЕСКИЕ ПАТТЕРНЫ
-
-Основные токсичные черты {partner_name}. 4-5 конкретных примеров с именами партнерш. Психологические механизмы с научными терминами. Эволюция поведения во времени. (450-500 слов)
-
-СИСТЕМА КОНТРОЛЯ И МАНИПУЛЯЦИЙ
-
-Эволюция контролирующего поведения {partner_name}. Конкретные техники с цитатами из ответов. Финансовый, эмоциональный, социальный, цифровой контроль. Изоляция от поддержки. (450-500 слов)
-
-ЭМОЦИОНАЛЬНАЯ ДИЗРЕГУЛЯЦИЯ И АГРЕССИЯ
-
-Паттерны гнева и непредсказуемости {partner_name}. Проекция и двойные стандарты. Влияние на психическое здоровье партнерши. Циклы насилия и примирения. (400-450 слов)
-
-ИНТИМНОСТЬ И НАРУШЕНИЕ ГРАНИЦ
-
-Использование близости как инструмента власти. Принуждение и эмоциональный шантаж. Травматические аспекты отношений. Долгосрочные последствия для жертвы. (400-450 слов)
-
-СОЦИАЛЬНАЯ МАСКА И ИЗОЛЯЦИЯ
-
-Публичный образ vs частное поведение {partner_name}. Когнитивный диссонанс у жертвы. Изоляция от поддержки. Влияние на окружение. (350-400 слов)
-
-ПРОГНОЗ И ПРОФЕССИОНАЛЬНЫЕ РЕКОМЕНДАЦИИ
-
-Вероятность изменений {partner_name}. Детальный план безопасного выхода. Психологическая реабилитация. Профилактика повторной виктимизации. (450-500 слов)
-
-СПЕЦИАЛЬНЫЕ ТРЕБОВАНИЯ:
-- Каждый раздел начинай с анализа конкретного поведения {partner_name}
-- Используй фразы: "Поведение {partner_name} указывает на...", "{partner_name} демонстрирует..."
-- Включай прямые цитаты из ответов: "Как указано в ответах: '[цитата]'"
-- Добавляй научные ссылки: "Согласно исследованиям доктора X..."
-- Создавай конкретные истории с именами: "Анна, 28 лет, рассказывает..."
-
-КРИТИЧЕСКИ ВАЖНО:
-- Проверь итоговый объем - должно быть СТРОГО 2400-2700 слов!
-- Убери ВСЕ решетки, звездочки и другие символы из заголовков
-- Используй только заглавные буквы для заголовков
-- Каждый раздел должен быть детальным и содержательным
-- Обязательно упомяни имя {partner_name} в каждом разделе
+Имя партнера в тексте: {partner_name}.
 """
-        
-        return system_prompt + "\n\n" + user_prompt
     
     def _parse_analysis_response(self, response: str) -> Dict[str, Any]:
         """Parse general analysis response"""
@@ -846,52 +969,6 @@ class AIService:
                 "areas_to_work_on": ["Взаимопонимание"],
                 "summary": "Требуется больше данных для точной оценки совместимости"
             }
-    
-    def _clean_markdown_formatting(self, text: str) -> str:
-        """Убирает markdown форматирование и применяет HTML стили для заголовков"""
-        if not text:
-            return text
-            
-        # Убираем решетки из заголовков
-        lines = text.split('\n')
-        cleaned_lines = []
-        first_title_found = False
-        
-        for line in lines:
-            line_clean = line.strip()
-            
-            # Пропускаем дублирующие заголовки
-            if ('ПЕРСОНАЛИЗИРОВАННЫЙ ПСИХОЛОГИЧЕСКИЙ АНАЛИЗ' in line_clean or 
-                'ПЕРСОНАЛИЗИРОВАННЫЙ АНАЛИЗ' in line_clean) and len(line_clean) < 100:
-                continue
-            
-            # Убираем решетки в начале строки
-            cleaned_line = line.lstrip('#').strip()
-            
-            # Если строка была заголовком
-            if line.startswith('#') and cleaned_line:
-                cleaned_line = cleaned_line.upper()
-                
-                # Первый заголовок (основной) - убираем префикс и центрируем
-                if not first_title_found and 'ПСИХОЛОГИЧЕСКИЙ ПОРТРЕТ' in cleaned_line:
-                    # Убираем "ПСИХОЛОГИЧЕСКИЙ ПОРТРЕТ:" и оставляем только имя и диагноз
-                    cleaned_line = cleaned_line.replace('ПСИХОЛОГИЧЕСКИЙ ПОРТРЕТ:', '').strip()
-                    cleaned_line = f'<div class="analysis-main-title">{cleaned_line}</div>'
-                    first_title_found = True
-                # Остальные заголовки - красные с тенью
-                else:
-                    cleaned_line = f'<div class="analysis-section-header">{cleaned_line}</div>'
-            
-            cleaned_lines.append(cleaned_line)
-        
-        # Убираем лишние пустые строки
-        result = '\n'.join(cleaned_lines)
-        
-        # Убираем множественные переносы строк
-        while '\n\n\n' in result:
-            result = result.replace('\n\n\n', '\n\n')
-            
-        return result.strip()
 
 
 # Global AI service instance
@@ -0,0 +1,107 @@
+"""Token usage accounting for AI calls"""
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, Optional
+
+from app.core.logging import logger
+
+
+@dataclass
+class CallUsage:
+    """Token usage of a single AI call"""
+
+    purpose: str
+    model: str
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    cache_write_tokens: int = 0
+    completion_tokens: int = 0
+    estimated_prompt_tokens: int = 0
+    max_tokens: int = 0
+
+    @property
+    def uncached_tokens(self) -> int:
+        """Input tokens billed at the full rate"""
+        return max(0, self.prompt_tokens - self.cached_tokens)
+
+    @classmethod
+    def from_response(
+        cls,
+        purpose: str,
+        model: str,
+        usage: Optional[Dict[str, Any]],
+        estimated_prompt_tokens: int = 0,
+        max_tokens: int = 0
+    ) -> "CallUsage":
+        """Build from OpenAI-style usage block (OpenRouter adds prompt_tokens_details)"""
+        usage = usage or {}
+        details = usage.get("prompt_tokens_details") or {}
+        return cls(
+            purpose=purpose,
+            model=model,
+            prompt_tokens=int(usage.get("prompt_tokens") or 0),
+            cached_tokens=int(details.get("cached_tokens") or 0),
+            cache_write_tokens=int(details.get("cache_write_tokens") or 0),
+            completion_tokens=int(usage.get("completion_tokens") or 0),
+            estimated_prompt_tokens=estimated_prompt_tokens,
+            max_tokens=max_tokens,
+        )
+
+
+@dataclass
+class _PurposeTotals:
+    calls: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    cache_write_tokens: int = 0
+    completion_tokens: int = 0
+    estimated_prompt_tokens: int = 0
+    reserved_output_tokens: int = 0
+
+    def add(self, usage: CallUsage) -> None:
+        self.calls += 1
+        self.prompt_tokens += usage.prompt_tokens
+        self.cached_tokens += usage.cached_tokens
+        self.cache_write_tokens += usage.cache_write_tokens
+        self.completion_tokens += usage.completion_tokens
+        self.estimated_prompt_tokens += usage.estimated_prompt_tokens
+        self.reserved_output_tokens += usage.max_tokens
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "uncached_tokens": self.prompt_tokens - self.cached_tokens,
+            "cache_write_tokens": self.cache_write_tokens,
+            "completion_tokens": self.completion_tokens,
+            "cache_hit_rate": round(self.cached_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0,
+            "estimated_prompt_tokens": self.estimated_prompt_tokens,
+            "estimate_ratio": round(self.estimated_prompt_tokens / self.prompt_tokens, 4) if self.prompt_tokens else 0.0,
+            "reserved_output_tokens": self.reserved_output_tokens,
+            "output_budget_used": round(self.completion_tokens / self.reserved_output_tokens, 4) if self.reserved_output_tokens else 0.0,
+        }
+
+
+@dataclass
+class UsageTracker:
+    """Process-wide usage totals per call purpose"""
+
+    totals: Dict[str, _PurposeTotals] = field(default_factory=dict)
+
+    def record(self, usage: CallUsage) -> None:
+        """Add call usage to totals"""
+        self.totals.setdefault(usage.purpose, _PurposeTotals()).add(usage)
+        logger.info(
+            f"📊 AI usage [{usage.purpose}]: input {usage.prompt_tokens} "
+            f"(estimated {usage.estimated_prompt_tokens}, cached {usage.cached_tokens}, "
+            f"uncached {usage.uncached_tokens}), output {usage.completion_tokens}/{usage.max_tokens}"
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Usage totals per purpose"""
+        return {purpose: totals.to_dict() for purpose, totals in self.totals.items()}
+
+
+# Global usage tracker
+usage_tracker = UsageTracker()
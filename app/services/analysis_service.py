@@ -11,6 +11,7 @@ from app.models.user import User
 from app.services.ai_service import AIService
 from app.utils.enums import AnalysisType, RiskLevel, SubscriptionType
 from app.core.logging import logger
+from app.utils.pagination import KeysetPage, fetch_keyset_page, DIRECTION_NEXT
 
 
 class AnalysisService:
@@ -104,6 +105,28 @@ class AnalysisService:
             logger.error(f"Error getting user analyses: {e}")
             return []
     
+    async def get_user_analyses_page(
+        self,
+        user_id: int,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        direction: str = DIRECTION_NEXT
+    ) -> KeysetPage:
+        """
+        Get one page of user's analysis history using keyset pagination
+        
+        Database errors are not swallowed so callers can tell a failure
+        from an empty page.
+        """
+        return await fetch_keyset_page(
+            self.session,
+            select(TextAnalysis).where(TextAnalysis.user_id == user_id),
+            TextAnalysis,
+            limit=limit,
+            cursor=cursor,
+            direction=direction
+        )
+    
     async def get_analysis_by_id(
         self,
         analysis_id: int,
@@ -0,0 +1,221 @@
+"""Incremental per-block summaries of free-form profiler answers"""
+
+import asyncio
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.core.redis import redis_client
+from app.services.token_budget import token_estimator
+from app.utils.helpers import create_cache_key
+
+BLOCK_TITLES = {
+    "narcissism": "Нарциссизм и грандиозность",
+    "control": "Контроль и манипуляции",
+    "gaslighting": "Газлайтинг и искажение реальности",
+    "emotion": "Эмоциональная регуляция",
+    "intimacy": "Интимность и принуждение",
+    "social": "Социальное поведение",
+}
+
+# Finished summaries kept in process (covers workers without Redis)
+_MAX_LOCAL_RESULTS = 1000
+
+
+def format_free_form_answers(
+    text_answers: Dict[str, str],
+    free_form_questions: Dict[str, Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Convert FSM text answers to the format expected by AIService
+
+    Args:
+        text_answers: question_id -> answer text
+        free_form_questions: question_id -> question data
+
+    Returns:
+        List of answers with question text and block
+    """
+    formatted = []
+    for question_id, answer_text in text_answers.items():
+        question = free_form_questions.get(question_id, {})
+        formatted.append({
+            'question_id': question_id,
+            'question': question.get('text', ''),
+            'answer': answer_text,
+            'block': question.get('block', 'unknown')
+        })
+    return formatted
+
+
+def group_answers_by_block(answers: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Group formatted answers by questionnaire block, keeping answer order"""
+    grouped: Dict[str, List[Dict[str, Any]]] = {}
+    for answer in answers:
+        grouped.setdefault(answer.get('block', 'unknown'), []).append(answer)
+    return grouped
+
+
+def is_block_complete(
+    block: str,
+    question_order: List[str],
+    free_form_questions: Dict[str, Dict[str, Any]],
+    text_answers: Dict[str, str]
+) -> bool:
+    """Check that every question of the block has an answer"""
+    block_questions = [
+        question_id for question_id in question_order
+        if free_form_questions.get(question_id, {}).get('block') == block
+    ]
+    return bool(block_questions) and all(question_id in text_answers for question_id in block_questions)
+
+
+def summary_key(user_id: int, block: str, answers: List[Dict[str, Any]]) -> str:
+    """Cache key of a block summary, bound to the exact answers"""
+    payload = json.dumps(
+        sorted((answer.get('question_id', ''), answer.get('answer', '')) for answer in answers),
+        ensure_ascii=False
+    )
+    digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+    return create_cache_key("block_summary", user_id, block, digest)
+
+
+class BlockSummaryPipeline:
+    """
+    Background summarization of finished questionnaire blocks
+
+    Each block is summarized as soon as its last answer arrives, while the
+    user keeps answering. Blocks whose answers are shorter than a summary
+    would make the prompt no smaller and are not summarized. Summaries are
+    cached in Redis (shared by workers) and in process; the final synthesis
+    takes the ready ones and never waits: blocks without a summary go to
+    the portrait as raw answers.
+    """
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._results: "OrderedDict[str, str]" = OrderedDict()
+
+        # Metrics
+        self.scheduled = 0
+        self.skipped_short = 0
+        self.reused = 0
+        self.missing = 0
+        self.failed = 0
+
+    def schedule(
+        self,
+        ai_service: Any,
+        user_id: int,
+        block: str,
+        answers: List[Dict[str, Any]],
+        partner_name: str
+    ) -> None:
+        """
+        Start summarizing a finished block in the background
+
+        Args:
+            ai_service: AIService used for the call
+            user_id: Telegram user ID
+            block: Block name (narcissism, control, ...)
+            answers: Formatted answers of the block
+            partner_name: Partner name for the prompt
+        """
+        if not settings.BLOCK_SUMMARY_ENABLED:
+            return
+
+        answers_tokens = sum(token_estimator.estimate(answer.get('answer', '')) for answer in answers)
+        if answers_tokens < settings.BLOCK_SUMMARY_MIN_TOKENS:
+            self.skipped_short += 1
+            return
+
+        key = summary_key(user_id, block, answers)
+        if key in self._tasks or key in self._results:
+            return
+
+        task = asyncio.create_task(self._run(ai_service, key, block, answers, partner_name))
+        self._tasks[key] = task
+        task.add_done_callback(lambda _: self._tasks.pop(key, None))
+        self.scheduled += 1
+        logger.info(f"🧩 Block summary scheduled: {block} (user {user_id})")
+
+    async def collect(
+        self,
+        user_id: int,
+        answers_by_block: Dict[str, List[Dict[str, Any]]]
+    ) -> Dict[str, str]:
+        """
+        Get the summaries that are ready for the final synthesis
+
+        Never waits and never computes: a summary still running is
+        cancelled and its block goes to the portrait as raw answers.
+
+        Args:
+            user_id: Telegram user ID
+            answers_by_block: Formatted answers grouped by block
+
+        Returns:
+            Block name -> summary text for every block that has one
+        """
+        if not settings.BLOCK_SUMMARY_ENABLED:
+            return {}
+
+        summaries: Dict[str, str] = {}
+        for block, answers in answers_by_block.items():
+            if block not in BLOCK_TITLES:
+                continue
+            key = summary_key(user_id, block, answers)
+            summary = self._results.get(key)
+            if summary is None:
+                task = self._tasks.get(key)
+                if task is not None:
+                    # Late summary: the portrait won't use it, stop paying for it
+                    task.cancel()
+                else:
+                    summary = await redis_client.get(key)
+            if summary:
+                self.reused += 1
+                summaries[block] = summary
+            else:
+                self.missing += 1
+        return summaries
+
+    async def _run(
+        self,
+        ai_service: Any,
+        key: str,
+        block: str,
+        answers: List[Dict[str, Any]],
+        partner_name: str
+    ) -> Optional[str]:
+        """Summarize one block and cache the result; failures return None"""
+        try:
+            summary = await ai_service.summarize_block(block, answers, partner_name)
+        except Exception as e:
+            self.failed += 1
+            logger.warning(f"⚠️ Block summary {block} failed: {e}")
+            return None
+
+        self._results[key] = summary
+        self._results.move_to_end(key)
+        while len(self._results) > _MAX_LOCAL_RESULTS:
+            self._results.popitem(last=False)
+        await redis_client.set(key, summary, expire=settings.BLOCK_SUMMARY_TTL)
+        return summary
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._tasks),
+            "scheduled": self.scheduled,
+            "skipped_short": self.skipped_short,
+            "reused": self.reused,
+            "missing": self.missing,
+            "failed": self.failed,
+        }
+
+
+# Process-wide pipeline (tasks outlive the per-update services)
+block_summary_pipeline = BlockSummaryPipeline()
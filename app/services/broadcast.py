@@ -0,0 +1,451 @@
+"""Mass delivery of messages to bot users"""
+
+import asyncio
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+from loguru import logger
+from sqlalchemy import select, update
+
+from app.bot.send_queue import TokenBucket, notification_priority, send_queue
+from app.core.config import settings
+from app.core.database import get_session
+from app.core.leader import leader_election
+from app.core.redis import redis_client
+from app.models.user import User
+
+DEFAULT_TIMEZONE = "Europe/Moscow"
+DEFAULT_NOTIFICATION_TIME = "09:00"
+
+# Finished jobs are kept this long for the admin stats
+JOB_TTL = 7 * 86400
+# Set of ids of unfinished jobs (a Redis set, so concurrent starts don't lose ids)
+_ACTIVE_KEY = "broadcast:active_jobs"
+
+# BadRequest texts meaning the chat is gone for good
+_GONE_CHAT_ERRORS = ("chat not found", "user is deactivated", "peer_id_invalid")
+
+
+@lru_cache(maxsize=1024)
+def get_zone(name: Optional[str]) -> ZoneInfo:
+    """ZoneInfo of a user's timezone; unknown names fall back to Moscow"""
+    try:
+        return ZoneInfo(name or DEFAULT_TIMEZONE)
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo(DEFAULT_TIMEZONE)
+
+
+def parse_notification_time(value: Optional[str]) -> Tuple[int, int]:
+    """(hour, minute) of an HH:MM setting; invalid values give 09:00"""
+    try:
+        hour, minute = (int(part) for part in (value or DEFAULT_NOTIFICATION_TIME).split(":"))
+        if 0 <= hour < 24 and 0 <= minute < 60:
+            return hour, minute
+    except ValueError:
+        pass
+    return 9, 0
+
+
+def is_local_time_due(
+    tz_name: Optional[str],
+    notification_time: Optional[str],
+    now: datetime,
+    window_minutes: int
+) -> bool:
+    """
+    Check whether a user's notification time falls into the window
+
+    Args:
+        tz_name: User's timezone name
+        notification_time: User's HH:MM setting
+        now: Aware UTC datetime the window starts at
+        window_minutes: Window length
+
+    Returns:
+        True if local notification_time is in [now, now + window) local time
+    """
+    local = now.astimezone(get_zone(tz_name))
+    hour, minute = parse_notification_time(notification_time)
+    offset = (hour * 60 + minute - local.hour * 60 - local.minute) % (24 * 60)
+    return offset < window_minutes
+
+
+@dataclass
+class BroadcastAudience:
+    """Which users a broadcast goes to"""
+
+    daily_tips: bool = False            # only users with daily tips enabled
+    analysis_reminders: bool = False    # only users with analysis reminders enabled
+    weekly_stats: bool = False          # only users with weekly digests enabled
+    subscription_types: Optional[List[str]] = None
+    # Only users whose local notification_time is within this many minutes of the start
+    local_time_window: Optional[int] = None
+
+    @property
+    def is_notification(self) -> bool:
+        return self.daily_tips or self.analysis_reminders or self.weekly_stats
+
+    def query(self, after_id: int, limit: int):
+        """Keyset page of (id, telegram_id, timezone, notification_time) after after_id"""
+        query = select(User.id, User.telegram_id, User.timezone, User.notification_time).where(
+            User.id > after_id,
+            User.is_active.isnot(False),
+            User.is_blocked.isnot(True),
+        )
+        if self.is_notification:
+            query = query.where(User.notifications_enabled.isnot(False))
+        if self.daily_tips:
+            query = query.where(User.daily_tips_enabled.isnot(False))
+        if self.analysis_reminders:
+            query = query.where(User.analysis_reminders_enabled.isnot(False))
+        if self.weekly_stats:
+            query = query.where(User.weekly_stats_enabled.is_(True))
+        if self.subscription_types:
+            query = query.where(User.subscription_type.in_(self.subscription_types))
+        return query.order_by(User.id).limit(limit)
+
+    def matches(self, row: Any, now: datetime) -> bool:
+        if self.local_time_window is None:
+            return True
+        return is_local_time_due(row.timezone, row.notification_time, now, self.local_time_window)
+
+
+@dataclass
+class DeliveryResult:
+    sent: int = 0
+    failed: int = 0
+    blocked: List[int] = field(default_factory=list)
+
+
+@dataclass
+class BroadcastJob:
+    """State of a broadcast, saved to Redis as its checkpoint"""
+
+    id: str
+    text: str
+    audience: BroadcastAudience
+    started_at: datetime
+    parse_mode: Optional[str] = "HTML"
+    created_by: Optional[int] = None
+    status: str = "running"  # running | done | cancelled
+    last_user_id: int = 0    # users up to this id are done
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0
+    heartbeat: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["started_at"] = self.started_at.isoformat()
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "BroadcastJob":
+        data = dict(data)
+        data["audience"] = BroadcastAudience(**data["audience"])
+        data["started_at"] = datetime.fromisoformat(data["started_at"])
+        return cls(**data)
+
+
+class BroadcastEngine:
+    """
+    Sends a message to every user of an audience
+
+    Users are read in keyset pages (id > last id) of short transactions; the
+    next page is fetched while the current one is being sent. Messages go
+    through the send queue with notification priority, so the queue holds
+    them to Telegram's rate and interactive replies overtake them. After
+    each page the job is checkpointed in Redis; the leader resumes jobs
+    whose checkpoint stopped moving, resending at most one page. Users
+    who blocked the bot are marked inactive and skipped from then on.
+    """
+
+    def __init__(
+        self,
+        batch_size: int = settings.BROADCAST_BATCH_SIZE,
+        max_in_flight: int = settings.BROADCAST_MAX_IN_FLIGHT,
+        stale_after: float = settings.BROADCAST_STALE_SECONDS
+    ):
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.stale_after = stale_after
+        self._jobs: Dict[str, BroadcastJob] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._watch_task: Optional[asyncio.Task] = None
+        # Pacing when the send queue is not attached to the bot
+        self._bucket = TokenBucket(settings.telegram_rate_per_worker, 1)
+        self._pace_lock = asyncio.Lock()
+
+    async def start(
+        self,
+        bot: Bot,
+        text: str,
+        audience: Optional[BroadcastAudience] = None,
+        parse_mode: Optional[str] = "HTML",
+        created_by: Optional[int] = None
+    ) -> BroadcastJob:
+        """
+        Create a broadcast and run it in the background
+
+        Args:
+            bot: Bot to send with
+            text: Message text
+            audience: Target users, all active users by default
+            parse_mode: Parse mode of the text
+            created_by: Telegram id of the admin who started it
+
+        Returns:
+            The new job
+        """
+        job = BroadcastJob(
+            id=uuid.uuid4().hex[:12],
+            text=text,
+            audience=audience or BroadcastAudience(),
+            started_at=datetime.now(timezone.utc),
+            parse_mode=parse_mode,
+            created_by=created_by,
+        )
+        await self._checkpoint(job)
+        await redis_client.sadd(_ACTIVE_KEY, job.id)
+        self._spawn(bot, job)
+        logger.info(f"📢 Broadcast {job.id} started")
+        return job
+
+    def _spawn(self, bot: Bot, job: BroadcastJob) -> None:
+        self._jobs[job.id] = job
+        task = asyncio.create_task(self._run(bot, job), name=f"broadcast-{job.id}")
+        self._tasks[job.id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job.id, None))
+
+    async def _fetch(self, audience: BroadcastAudience, after_id: int) -> List[Any]:
+        async with get_session() as session:
+            result = await session.execute(audience.query(after_id, self.batch_size))
+            return result.all()
+
+    async def _run(self, bot: Bot, job: BroadcastJob) -> None:
+        try:
+            page = await self._fetch(job.audience, job.last_user_id)
+            while page:
+                if await self._is_cancelled(job):
+                    job.status = "cancelled"
+                    await self._finish(job)
+                    logger.info(f"🛑 Broadcast {job.id} cancelled after user {job.last_user_id}")
+                    return
+                # Read the next page while this one is being sent
+                next_page = asyncio.create_task(self._fetch(job.audience, page[-1].id))
+                chat_ids = [row.telegram_id for row in page if job.audience.matches(row, job.started_at)]
+                result = await self.deliver(bot, chat_ids, job.text, job.parse_mode)
+                await self.disable_blocked(result.blocked)
+
+                job.last_user_id = page[-1].id
+                job.sent += result.sent
+                job.failed += result.failed
+                job.blocked += len(result.blocked)
+                await self._checkpoint(job)
+                page = await next_page
+
+            job.status = "done"
+            await self._finish(job)
+            logger.info(f"✅ Broadcast {job.id} done: sent {job.sent}, blocked {job.blocked}, failed {job.failed}")
+        except asyncio.CancelledError:
+            # Shutdown: the checkpoint stays and the job is resumed later
+            raise
+        except Exception as e:
+            logger.error(f"❌ Broadcast {job.id} stopped at user {job.last_user_id}: {e}")
+
+    async def deliver(
+        self,
+        bot: Bot,
+        chat_ids: Sequence[int],
+        text: str,
+        parse_mode: Optional[str] = "HTML"
+    ) -> DeliveryResult:
+        """
+        Send one text to many chats with notification priority
+
+        Args:
+            bot: Bot to send with
+            chat_ids: Telegram chat ids
+            text: Message text
+            parse_mode: Parse mode of the text
+
+        Returns:
+            Counts of sent and failed messages and the chats that blocked the bot
+        """
+        return await self.deliver_each(bot, [(chat_id, text) for chat_id in chat_ids], parse_mode)
+
+    async def deliver_each(
+        self,
+        bot: Bot,
+        messages: Sequence[Tuple[int, str]],
+        parse_mode: Optional[str] = "HTML"
+    ) -> DeliveryResult:
+        """
+        Send personal texts with notification priority
+
+        Args:
+            bot: Bot to send with
+            messages: (chat_id, text) pairs
+            parse_mode: Parse mode of the texts
+
+        Returns:
+            Counts of sent and failed messages and the chats that blocked the bot
+        """
+        result = DeliveryResult()
+        slots = asyncio.Semaphore(self.max_in_flight)
+
+        async def send(chat_id: int, text: str) -> None:
+            async with slots:
+                await self._pace()
+                try:
+                    await bot.send_message(chat_id, text, parse_mode=parse_mode)
+                    result.sent += 1
+                except TelegramForbiddenError:
+                    result.blocked.append(chat_id)
+                except TelegramBadRequest as e:
+                    if any(error in str(e).lower() for error in _GONE_CHAT_ERRORS):
+                        result.blocked.append(chat_id)
+                    else:
+                        result.failed += 1
+                        logger.warning(f"Broadcast message to {chat_id} rejected: {e}")
+                except TelegramRetryAfter:
+                    result.failed += 1
+                except Exception as e:
+                    result.failed += 1
+                    logger.warning(f"Broadcast message to {chat_id} failed: {e}")
+
+        with notification_priority():
+            await asyncio.gather(*(send(chat_id, text) for chat_id, text in messages))
+        return result
+
+    async def _pace(self) -> None:
+        if send_queue.running:
+            return
+        async with self._pace_lock:
+            delay = self._bucket.delay(time.monotonic())
+            if delay:
+                await asyncio.sleep(delay)
+            self._bucket.take(time.monotonic())
+
+    async def disable_blocked(self, telegram_ids: List[int]) -> None:
+        """Mark users who blocked the bot inactive (they are reactivated when they write again)"""
+        if not telegram_ids:
+            return
+        try:
+            async with get_session() as session:
+                await session.execute(
+                    update(User).where(User.telegram_id.in_(telegram_ids)).values(is_active=False)
+                )
+                await session.commit()
+            logger.info(f"🚫 {len(telegram_ids)} users blocked the bot, marked inactive")
+        except Exception as e:
+            logger.error(f"Error disabling blocked users: {e}")
+
+    async def _checkpoint(self, job: BroadcastJob) -> None:
+        job.heartbeat = time.time()
+        self._jobs[job.id] = job
+        await redis_client.set(f"broadcast:job:{job.id}", job.to_dict(), expire=JOB_TTL)
+
+    async def _finish(self, job: BroadcastJob) -> None:
+        await self._checkpoint(job)
+        await redis_client.srem(_ACTIVE_KEY, job.id)
+
+    async def _is_cancelled(self, job: BroadcastJob) -> bool:
+        # The flag is separate from the job record, which the running worker keeps overwriting
+        return bool(await redis_client.get(f"broadcast:cancel:{job.id}"))
+
+    async def cancel(self, job_id: str) -> bool:
+        """
+        Stop a running broadcast for good
+
+        A job running on another worker sees the cancel flag before its
+        next page and stops there.
+        """
+        job = self._jobs.get(job_id)
+        if job is None:
+            data = await redis_client.get(f"broadcast:job:{job_id}")
+            job = BroadcastJob.from_dict(data) if data else None
+        if job is None or job.status != "running":
+            return False
+        await redis_client.set(f"broadcast:cancel:{job_id}", True, expire=JOB_TTL)
+        task = self._tasks.get(job_id)
+        if task:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        job.status = "cancelled"
+        await self._finish(job)
+        return True
+
+    async def resume_stale(self, bot: Bot) -> int:
+        """
+        Resume jobs whose worker stopped checkpointing (leader only)
+
+        Returns:
+            Number of resumed jobs
+        """
+        if not leader_election.is_leader:
+            return 0
+        resumed = 0
+        for job_id in await redis_client.smembers(_ACTIVE_KEY):
+            if job_id in self._tasks:
+                continue
+            data = await redis_client.get(f"broadcast:job:{job_id}")
+            if not data:
+                continue
+            job = BroadcastJob.from_dict(data)
+            if job.status != "running" or time.time() - job.heartbeat < self.stale_after:
+                continue
+            if await self._is_cancelled(job):
+                job.status = "cancelled"
+                await self._finish(job)
+                continue
+            logger.info(f"🔁 Resuming broadcast {job.id} after user {job.last_user_id}")
+            await self._checkpoint(job)
+            self._spawn(bot, job)
+            resumed += 1
+        return resumed
+
+    def watch(self, bot: Bot, interval: float = 60.0) -> None:
+        """Periodically resume stale jobs in the background"""
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch(bot, interval), name="broadcast-watch")
+
+    async def _watch(self, bot: Bot, interval: float) -> None:
+        while True:
+            try:
+                await self.resume_stale(bot)
+            except Exception as e:
+                logger.error(f"Broadcast resume error: {e}")
+            await asyncio.sleep(interval)
+
+    async def stop(self) -> None:
+        """Stop local jobs; their checkpoints stay for resume"""
+        tasks = [task for task in (self._watch_task, *self._tasks.values()) if task]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._watch_task = None
+
+    def last_job(self) -> Optional[BroadcastJob]:
+        """The latest broadcast started or resumed by this worker"""
+        return max(self._jobs.values(), key=lambda job: job.started_at, default=None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": len(self._tasks),
+            "jobs": [
+                {key: value for key, value in job.to_dict().items() if key != "text"}
+                for job in sorted(self._jobs.values(), key=lambda job: job.started_at)[-10:]
+            ],
+        }
+
+
+# Global broadcast engine
+broadcast_engine = BroadcastEngine()
@@ -0,0 +1,253 @@
+"""Export of all user data as a zip archive"""
+
+import asyncio
+import csv
+import enum
+import io
+import json
+import os
+import tempfile
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, IO, List, Optional, Sequence, Tuple
+
+from aiogram import Bot
+from aiogram.types import FSInputFile
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import get_session
+from app.core.logging import logger
+from app.models.analysis import TextAnalysis
+from app.models.analytics import UserActivity
+from app.models.compatibility import CompatibilityTest
+from app.models.profile import PartnerProfile
+from app.models.subscription import Subscription
+from app.models.user import User
+
+# Archive entries: file name, model, format. Long texts go to JSONL, flat tables to CSV.
+EXPORT_TABLES: Tuple[Tuple[str, Any, str], ...] = (
+    ("analyses.jsonl", TextAnalysis, "jsonl"),
+    ("partner_profiles.jsonl", PartnerProfile, "jsonl"),
+    ("compatibility_tests.jsonl", CompatibilityTest, "jsonl"),
+    ("subscriptions.csv", Subscription, "csv"),
+    ("activities.csv", UserActivity, "csv"),
+)
+
+# Internal user columns that are not part of the export
+_PRIVATE_USER_COLUMNS = {"notes", "is_admin"}
+
+# Bot API upload limit for documents
+TELEGRAM_DOCUMENT_LIMIT = 50 * 1024 * 1024
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, bytes):
+        return value.hex()
+    return str(value)
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False, default=_json_default)
+    if isinstance(value, (str, int, float)):
+        return value
+    return _json_default(value)
+
+
+class _EntryWriter:
+    """Writes rows of one table into an open zip entry"""
+
+    def __init__(self, entry: IO[bytes], fmt: str, columns: Sequence[str]):
+        self.text = io.TextIOWrapper(entry, encoding="utf-8", newline="")
+        self.fmt = fmt
+        self.columns = list(columns)
+        self.csv = None
+        if fmt == "csv":
+            self.csv = csv.writer(self.text)
+            self.csv.writerow(self.columns)
+
+    def write(self, rows: List[Any]) -> None:
+        for row in rows:
+            if self.csv is not None:
+                self.csv.writerow([_csv_value(value) for value in row])
+            else:
+                record = dict(zip(self.columns, row))
+                self.text.write(json.dumps(record, ensure_ascii=False, default=_json_default))
+                self.text.write("\n")
+
+    def close(self) -> None:
+        self.text.close()
+
+
+class DataExporter:
+    """
+    Builds and delivers a user's data archive in the background
+
+    Each table is read with a server-side cursor (stream + yield_per) and
+    written partition by partition into a zip entry in a temp file, so
+    memory does not grow with the user's history. Zip writes run in a
+    thread. The handler only queues the job; the archive is sent as a
+    document when ready. One export per user runs at a time.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = settings.DATA_EXPORT_MAX_CONCURRENT,
+        yield_per: int = settings.DATA_EXPORT_YIELD_PER
+    ):
+        self.yield_per = yield_per
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._running: Dict[int, asyncio.Task] = {}
+
+        # Metrics
+        self.exports = 0
+        self.failures = 0
+        self.rows = 0
+        self.bytes = 0
+
+    def is_running(self, telegram_id: int) -> bool:
+        return telegram_id in self._running
+
+    def submit(self, bot: Bot, telegram_id: int) -> bool:
+        """
+        Queue an export for a user
+
+        Args:
+            bot: Bot to deliver the archive with
+            telegram_id: User (and chat) to export
+
+        Returns:
+            False if an export of this user is already running
+        """
+        if telegram_id in self._running:
+            return False
+        task = asyncio.create_task(self._run(bot, telegram_id), name=f"data-export-{telegram_id}")
+        self._running[telegram_id] = task
+        task.add_done_callback(lambda _: self._running.pop(telegram_id, None))
+        return True
+
+    async def _run(self, bot: Bot, telegram_id: int) -> None:
+        path = None
+        try:
+            async with self._slots:
+                path = await self.build_archive(telegram_id)
+            if path is None:
+                return
+            size = os.path.getsize(path)
+            if size > TELEGRAM_DOCUMENT_LIMIT:
+                await bot.send_message(
+                    telegram_id,
+                    "❌ Архив получился больше 50 МБ — Telegram не позволяет отправить такой файл. "
+                    "Напишите в поддержку, мы пришлем его другим способом."
+                )
+                return
+            filename = f"psychodetective_export_{datetime.utcnow():%Y%m%d}.zip"
+            await bot.send_document(
+                telegram_id,
+                FSInputFile(path, filename=filename),
+                caption="📦 Ваши данные: анализы, профили партнеров, тесты совместимости, подписки и активность"
+            )
+            self.exports += 1
+            self.bytes += size
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Data export for {telegram_id} failed: {e}")
+            try:
+                await bot.send_message(telegram_id, "❌ Не удалось подготовить архив. Попробуйте позже.")
+            except Exception:
+                pass
+        finally:
+            if path:
+                await asyncio.to_thread(_remove, path)
+
+    async def build_archive(self, telegram_id: int) -> Optional[str]:
+        """
+        Write a user's data into a zip file
+
+        Args:
+            telegram_id: User to export
+
+        Returns:
+            Path of the temp archive (caller removes it), None if the user is unknown
+        """
+        async with get_session() as session:
+            user = (await session.execute(
+                select(User.__table__).where(User.telegram_id == telegram_id)
+            )).mappings().one_or_none()
+        if user is None:
+            return None
+
+        fd, path = tempfile.mkstemp(prefix="export-", suffix=".zip", dir=settings.DATA_EXPORT_DIR or None)
+        os.close(fd)
+        archive = zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6)
+        try:
+            profile = {key: value for key, value in user.items() if key not in _PRIVATE_USER_COLUMNS}
+            await asyncio.to_thread(
+                archive.writestr,
+                "profile.json",
+                json.dumps(profile, ensure_ascii=False, indent=2, default=_json_default)
+            )
+            manifest = {"exported_at": datetime.utcnow().isoformat(), "files": {}}
+            for filename, model, fmt in EXPORT_TABLES:
+                manifest["files"][filename] = await self._export_table(archive, filename, model, fmt, user["id"])
+            await asyncio.to_thread(
+                archive.writestr, "manifest.json", json.dumps(manifest, ensure_ascii=False, indent=2)
+            )
+        except BaseException:
+            archive.close()
+            await asyncio.to_thread(_remove, path)
+            raise
+        await asyncio.to_thread(archive.close)
+        return path
+
+    async def _export_table(self, archive: zipfile.ZipFile, filename: str, model: Any, fmt: str, user_id: int) -> int:
+        table = model.__table__
+        query = (
+            select(table)
+            .where(table.c.user_id == user_id)
+            .order_by(table.c.id)
+            .execution_options(yield_per=self.yield_per)
+        )
+        entry = await asyncio.to_thread(archive.open, filename, "w", force_zip64=True)
+        writer = _EntryWriter(entry, fmt, [column.name for column in table.columns])
+        count = 0
+        try:
+            async with get_session() as session:
+                result = await session.stream(query)
+                async for partition in result.partitions():
+                    await asyncio.to_thread(writer.write, partition)
+                    count += len(partition)
+        finally:
+            await asyncio.to_thread(writer.close)
+        self.rows += count
+        return count
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "running": len(self._running),
+            "exports": self.exports,
+            "failures": self.failures,
+            "rows": self.rows,
+            "mb_sent": round(self.bytes / 1024 / 1024, 1),
+        }
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+# Global data exporter
+data_exporter = DataExporter()
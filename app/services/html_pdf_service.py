@@ -1,18 +1,160 @@
 """HTML to PDF conversion service using CloudLayer.io API"""
 
 import asyncio
+import bisect
+import inspect
 import logging
-from typing import Dict, Any, Optional, List
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, wraps
+from typing import Callable, Dict, Any, Optional, List, Tuple
 from datetime import datetime
 import aiohttp
 import base64
 import json
 
+from jinja2 import Environment, FileSystemLoader, Template
+
 from app.core.config import settings
+from app.core.loop_monitor import LoopBlockProbe
+from app.services.pdf_optimizer import SizeStages, optimize_html, optimize_pdf, pdf_size_stats
 from app.utils.exceptions import ServiceError
+from app.utils.name_declension import decline_name_all
+from app.utils.narrative_stream import format_narrative
 
 logger = logging.getLogger(__name__)
 
+# Bump on any change of the report template: stored PDFs are keyed by it
+REPORT_TEMPLATE_VERSION = "2026.10.1"
+
+# Every risk threshold used by the static report sections: scores in the
+# same band render the same sections
+RISK_BAND_EDGES = (15, 25, 40, 50, 60, 70, 80)
+
+# Static sections kept per process
+FRAGMENT_CACHE_SIZE = 512
+
+_SLOT_PATTERN = re.compile(r"\x00([a-z_]+)(?:\.([a-z_]+))?\x00")
+
+
+def risk_band(risk_score: float) -> int:
+    """Index of the risk band of a score"""
+    return bisect.bisect_right(RISK_BAND_EDGES, risk_score)
+
+
+class _SlotMap:
+    """Stands in for a scores dict: .get(key, default) yields a slot marker"""
+    
+    def __init__(self, name: str):
+        self.name = name
+    
+    def get(self, key: str, default: Any = None) -> str:
+        return f"\x00{self.name}.{key}\x00"
+
+
+class ReportFragmentCache:
+    """
+    Static report sections by (template version, section, risk band, personality type)
+    
+    A section is rendered once with slot markers in place of the per-report
+    values (partner name, scores); later reports only substitute their
+    values into the cached HTML. Shared by the render threads.
+    """
+    
+    def __init__(self, template_version: str, maxsize: int = FRAGMENT_CACHE_SIZE):
+        self.template_version = template_version
+        self.maxsize = maxsize
+        self._fragments: "OrderedDict[Tuple[str, str, int, str], str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+    
+    def get_or_render(self, section: str, band: int, personality_type: str, render: Callable[[], str]) -> str:
+        key = (self.template_version, section, band, personality_type)
+        with self._lock:
+            fragment = self._fragments.get(key)
+            if fragment is not None:
+                self._fragments.move_to_end(key)
+                self.hits += 1
+                return fragment
+        
+        fragment = render()
+        with self._lock:
+            self.misses += 1
+            self._fragments[key] = fragment
+            if len(self._fragments) > self.maxsize:
+                self._fragments.popitem(last=False)
+        return fragment
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._fragments.clear()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "template_version": self.template_version,
+            "fragments": len(self._fragments),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else None,
+        }
+
+
+# Global fragment cache of this process
+report_fragment_cache = ReportFragmentCache(REPORT_TEMPLATE_VERSION)
+
+
+def cached_fragment(*slots: str):
+    """
+    Memoize a static report section in report_fragment_cache
+    
+    The method must take risk_score; the section must depend only on the
+    risk band, the personality type and the arguments named in slots.
+    Scalar slots are interpolated as {name}, dict slots only through
+    .get(key, 0); other arguments must not affect the HTML.
+    
+    Args:
+        slots: Per-report arguments substituted into the cached HTML
+    """
+    def decorator(method: Callable[..., str]) -> Callable[..., str]:
+        signature = inspect.signature(method)
+        section = method.__name__.lstrip('_')
+        
+        @wraps(method)
+        def wrapper(self, *args, **kwargs) -> str:
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            values = bound.arguments
+            risk_score = values['risk_score']
+            
+            def render() -> str:
+                template_args = dict(values)
+                for slot in slots:
+                    value = values[slot]
+                    template_args[slot] = _SlotMap(slot) if isinstance(value, dict) else f"\x00{slot}\x00"
+                return method(**template_args)
+            
+            fragment = report_fragment_cache.get_or_render(
+                section, risk_band(risk_score), self._determine_personality_type(risk_score), render
+            )
+            if not slots:
+                return fragment
+            
+            def fill(match: "re.Match[str]") -> str:
+                value = values[match.group(1)]
+                return str(value.get(match.group(2), 0) if match.group(2) else value)
+            
+            return _SLOT_PATTERN.sub(fill, fragment)
+        
+        return wrapper
+    return decorator
+
 
 class HTMLPDFService:
     """Service for generating PDF reports from HTML using CloudLayer.io API"""
@@ -22,7 +164,7 @@ class HTMLPDFService:
         self._cloudlayer_available = None
         self.template = None
         self.api_key = settings.CLOUDLAYER_API_KEY
-        self.api_url = "https://api.cloudlayer.io"
+        self.api_url = settings.CLOUDLAYER_API_URL
         if not self.api_key:
             logger.warning("⚠️ CloudLayer.io API key not configured! Set CLOUDLAYER_API_KEY environment variable.")
     
@@ -30,179 +172,6 @@ class HTMLPDFService:
         """Reset CloudLayer availability check (for testing)"""
         pass
     
-    def _decline_name(self, name: str, case: str = "nominative") -> str:
-        """
-        Склоняет имя по падежам
-        
-        Args:
-            name: имя для склонения
-            case: падеж (nominative, genitive, dative, accusative, instrumental, prepositional)
-        
-        Returns:
-            склоненное имя
-        """
-        if not name or not isinstance(name, str):
-            return name or "партнер"
-        
-        name = name.strip()
-        if not name:
-            return "партнер"
-        
-        # Словарь популярных женских имен
-        female_names = {
-            "анна": {
-                "nominative": "Анна", "genitive": "Анны", "dative": "Анне",
-                "accusative": "Анну", "instrumental": "Анной", "prepositional": "Анне"
-            },
-            "мария": {
-                "nominative": "Мария", "genitive": "Марии", "dative": "Марии", 
-                "accusative": "Марию", "instrumental": "Марией", "prepositional": "Марии"
-            },
-            "елена": {
-                "nominative": "Елена", "genitive": "Елены", "dative": "Елене",
-                "accusative": "Елену", "instrumental": "Еленой", "prepositional": "Елене"
-            },
-            "татьяна": {
-                "nominative": "Татьяна", "genitive": "Татьяны", "dative": "Татьяне",
-                "accusative": "Татьяну", "instrumental": "Татьяной", "prepositional": "Татьяне"
-            },
-            "ольга": {
-                "nominative": "Ольга", "genitive": "Ольги", "dative": "Ольге",
-                "accusative": "Ольгу", "instrumental": "Ольгой", "prepositional": "Ольге"
-            },
-            "наталья": {
-                "nominative": "Наталья", "genitive": "Натальи", "dative": "Наталье",
-                "accusative": "Наталью", "instrumental": "Натальей", "prepositional": "Наталье"
-            },
-            "ирина": {
-                "nominative": "Ирина", "genitive": "Ирины", "dative": "Ирине",
-                "accusative": "Ирину", "instrumental": "Ириной", "prepositional": "Ирине"
-            },
-            "светлана": {
-                "nominative": "Светлана", "genitive": "Светланы", "dative": "Светлане",
-                "accusative": "Светлану", "instrumental": "Светланой", "prepositional": "Светлане"
-            },
-            "юлия": {
-                "nominative": "Юлия", "genitive": "Юлии", "dative": "Юлии",
-                "accusative": "Юлию", "instrumental": "Юлией", "prepositional": "Юлии"
-            },
-            "екатерина": {
-                "nominative": "Екатерина", "genitive": "Екатерины", "dative": "Екатерине",
-                "accusative": "Екатерину", "instrumental": "Екатериной", "prepositional": "Екатерине"
-            }
-        }
-        
-        # Словарь популярных мужских имен
-        male_names = {
-            "александр": {
-                "nominative": "Александр", "genitive": "Александра", "dative": "Александру",
-                "accusative": "Александра", "instrumental": "Александром", "prepositional": "Александре"
-            },
-            "алексей": {
-                "nominative": "Алексей", "genitive": "Алексея", "dative": "Алексею",
-                "accusative": "Алексея", "instrumental": "Алексеем", "prepositional": "Алексее"
-            },
-            "андрей": {
-                "nominative": "Андрей", "genitive": "Андрея", "dative": "Андрею",
-                "accusative": "Андрея", "instrumental": "Андреем", "prepositional": "Андрее"
-            },
-            "дмитрий": {
-                "nominative": "Дмитрий", "genitive": "Дмитрия", "dative": "Дмитрию",
-                "accusative": "Дмитрия", "instrumental": "Дмитрием", "prepositional": "Дмитрии"
-            },
-            "сергей": {
-                "nominative": "Сергей", "genitive": "Сергея", "dative": "Сергею",
-                "accusative": "Сергея", "instrumental": "Сергеем", "prepositional": "Сергее"
-            },
-            "владимир": {
-                "nominative": "Владимир", "genitive": "Владимира", "dative": "Владимиру",
-                "accusative": "Владимира", "instrumental": "Владимиром", "prepositional": "Владимире"
-            },
-            "михаил": {
-                "nominative": "Михаил", "genitive": "Михаила", "dative": "Михаилу",
-                "accusative": "Михаила", "instrumental": "Михаилом", "prepositional": "Михаиле"
-            },
-            "николай": {
-                "nominative": "Николай", "genitive": "Николая", "dative": "Николаю",
-                "accusative": "Николая", "instrumental": "Николаем", "prepositional": "Николае"
-            },
-            "игорь": {
-                "nominative": "Игорь", "genitive": "Игоря", "dative": "Игорю",
-                "accusative": "Игоря", "instrumental": "Игорем", "prepositional": "Игоре"
-            },
-            "евгений": {
-                "nominative": "Евгений", "genitive": "Евгения", "dative": "Евгению",
-                "accusative": "Евгения", "instrumental": "Евгением", "prepositional": "Евгении"
-            }
-        }
-        
-        name_lower = name.lower()
-        
-        # Проверяем точное совпадение с известными именами
-        if name_lower in female_names:
-            return female_names[name_lower].get(case, name)
-        elif name_lower in male_names:
-            return male_names[name_lower].get(case, name)
-        
-        # Эвристические правила для неизвестных имен
-        return self._decline_name_heuristic(name, case)
-    
-    def _decline_name_heuristic(self, name: str, case: str) -> str:
-        """Склонение имен по эвристическим правилам"""
-        if case == "nominative":
-            return name
-        
-        name_lower = name.lower()
-        
-        # Женские имена на -а/-я
-        if name_lower.endswith(('а', 'я')):
-            if case == "genitive":
-                if name_lower.endswith('я'):
-                    return name[:-1] + 'и'
-                else:
-                    return name[:-1] + 'ы'
-            elif case == "dative":
-                return name[:-1] + 'е'
-            elif case == "accusative":
-                if name_lower.endswith('я'):
-                    return name[:-1] + 'ю'
-                else:
-                    return name[:-1] + 'у'
-            elif case == "instrumental":
-                if name_lower.endswith('я'):
-                    return name[:-1] + 'ей'
-                else:
-                    return name[:-1] + 'ой'
-            elif case == "prepositional":
-                return name[:-1] + 'е'
-        
-        # Мужские имена на согласную
-        elif not name_lower.endswith(('а', 'я', 'ь')):
-            if case in ["genitive", "accusative"]:
-                return name + 'а'
-            elif case == "dative":
-                return name + 'у'
-            elif case == "instrumental":
-                return name + 'ом'
-            elif case == "prepositional":
-                return name + 'е'
-        
-        # Имена на -ь (могут быть мужскими или женскими)
-        elif name_lower.endswith('ь'):
-            if case == "genitive":
-                return name[:-1] + 'я'
-            elif case == "dative":
-                return name[:-1] + 'ю'
-            elif case == "accusative":
-                return name[:-1] + 'я'
-            elif case == "instrumental":
-                return name[:-1] + 'ем'
-            elif case == "prepositional":
-                return name[:-1] + 'е'
-        
-        # Если не удалось определить, возвращаем исходное имя
-        return name
-    
     async def _ensure_cloudlayer_available(self) -> bool:
         """Ensure CloudLayer.io API is available"""
         if not self.api_key:
@@ -347,8 +316,8 @@ class HTMLPDFService:
             
             logger.info("✅ Using CloudLayer.io for professional PDF generation")
             
-            # Generate complete HTML report
-            html_content = self._generate_beautiful_html_report(analysis_data, partner_name, user_id)
+            # Generate complete HTML report (off the event loop)
+            html_content = await report_render_stage.render(self, analysis_data, partner_name, user_id)
             
             # Convert HTML to PDF using CloudLayer.io
             pdf_bytes = await self._convert_html_to_pdf_cloudlayer(html_content)
@@ -365,6 +334,11 @@ class HTMLPDFService:
         try:
             logger.info("🔄 Converting HTML to PDF using CloudLayer.io...")
             
+            # Smaller HTML uploads faster; bytes of every stage are recorded
+            stages = SizeStages()
+            if settings.PDF_OPTIMIZE_ENABLED:
+                html_content = await asyncio.to_thread(optimize_html, html_content, stages)
+            
             async with aiohttp.ClientSession() as session:
                 headers = {
                     'x-api-key': self.api_key,
@@ -373,6 +347,7 @@ class HTMLPDFService:
                 
                 # Encode HTML to base64 as required by CloudLayer.io
                 html_b64 = base64.b64encode(html_content.encode('utf-8')).decode('utf-8')
+                stages.record("upload_base64", len(html_b64))
                 
                 # CloudLayer.io API v2 payload
                 payload = {
@@ -413,7 +388,7 @@ class HTMLPDFService:
                                 if file_response.status == 200:
                                     pdf_bytes = await file_response.read()
                                     logger.info(f"✅ PDF generated successfully via CloudLayer.io! Size: {len(pdf_bytes)} bytes")
-                                    return pdf_bytes
+                                    return await self._optimize_pdf_bytes(pdf_bytes, stages)
                                 else:
                                     raise ServiceError(f"Failed to download PDF from CloudLayer.io CDN: {file_response.status}")
                         else:
@@ -437,7 +412,7 @@ class HTMLPDFService:
                             if file_response.status == 200:
                                 pdf_bytes = await file_response.read()
                                 logger.info(f"✅ PDF generated successfully via CloudLayer.io! Size: {len(pdf_bytes)} bytes")
-                                return pdf_bytes
+                                return await self._optimize_pdf_bytes(pdf_bytes, stages)
                             else:
                                 raise ServiceError(f"Failed to download PDF from CloudLayer.io CDN: {file_response.status}")
                     
@@ -453,6 +428,16 @@ class HTMLPDFService:
             logger.error(f"💥 CloudLayer.io PDF conversion failed: {e}")
             raise ServiceError(f"Failed to convert HTML to PDF: {str(e)}")
 
+    async def _optimize_pdf_bytes(self, pdf_bytes: bytes, stages: SizeStages) -> bytes:
+        """Recompress the rendered PDF and log bytes per stage"""
+        stages.record("pdf", len(pdf_bytes))
+        if settings.PDF_OPTIMIZE_ENABLED:
+            pdf_bytes = await asyncio.to_thread(optimize_pdf, pdf_bytes, settings.PDF_RECOMPRESS_LEVEL)
+            stages.record("pdf_optimized", len(pdf_bytes))
+        pdf_size_stats.add(stages)
+        logger.info(f"📦 Report size by stage: {stages.summary()}")
+        return pdf_bytes
+    
     def _generate_beautiful_html_report(
         self,
         analysis_data: Dict[str, Any],
@@ -497,14 +482,15 @@ class HTMLPDFService:
         personality_description = self._get_personality_description(personality_type, overall_risk)
         risk_detailed_description = self._get_risk_detailed_description(overall_risk)
         risk_recommendations = self._get_risk_recommendations(overall_risk)
+        name_forms = decline_name_all(partner_name)
         
         template_data = {
             'partner_name': partner_name,
-            'partner_name_genitive': self._decline_name(partner_name, "genitive"),      # кого? чего? - анализ Анны
-            'partner_name_dative': self._decline_name(partner_name, "dative"),          # кому? чему? - советы Анне
-            'partner_name_accusative': self._decline_name(partner_name, "accusative"),  # кого? что? - анализирую Анну
-            'partner_name_instrumental': self._decline_name(partner_name, "instrumental"), # кем? чем? - работа с Анной
-            'partner_name_prepositional': self._decline_name(partner_name, "prepositional"), # о ком? о чем? - о Анне
+            'partner_name_genitive': name_forms.genitive,            # кого? чего? - анализ Анны
+            'partner_name_dative': name_forms.dative,                # кому? чему? - советы Анне
+            'partner_name_accusative': name_forms.accusative,        # кого? что? - анализирую Анну
+            'partner_name_instrumental': name_forms.instrumental,    # кем? чем? - работа с Анной
+            'partner_name_prepositional': name_forms.prepositional,  # о ком? о чем? - об Анне
             'date': current_date,
             'report_id': report_id,
             'risk_score': int(overall_risk),
@@ -549,13 +535,7 @@ class HTMLPDFService:
         
         # Load and render template
         try:
-            from jinja2 import Environment, FileSystemLoader
-            import os
-            
-            # Get template directory
-            template_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates', 'pdf')
-            env = Environment(loader=FileSystemLoader(template_dir))
-            template = env.get_template('partner_report.html')
+            template = _get_report_template()
             
             # Render template with data
             html_content = template.render(**template_data)
@@ -967,6 +947,7 @@ class HTMLPDFService:
         
         return '\n'.join([f'<li>{strategy}</li>' for strategy in strategies])
     
+    @cached_fragment()
     def _generate_action_plan(self, risk_score: float) -> str:
         """Generate action plan HTML"""
         if risk_score >= 70:
@@ -1094,83 +1075,22 @@ class HTMLPDFService:
         risk_score: float,
         analysis_data: Dict[str, Any]
     ) -> str:
-        """Форматирует реальный ИИ-анализ в красивый HTML"""
-        
-        # Убираем дублирующий заголовок в начале
-        lines = ai_analysis.split('\n')
-        filtered_lines = []
-        skip_next = False
-        
-        for i, line in enumerate(lines):
-            line_clean = line.strip()
-            
-            # Пропускаем дублирующие заголовки
-            if 'ПЕРСОНАЛИЗИРОВАННЫЙ ПСИХОЛОГИЧЕСКИЙ АНАЛИЗ' in line_clean:
-                continue
-            if line_clean == '':
-                # Не добавляем лишние пустые строки подряд
-                if filtered_lines and filtered_lines[-1] != '':
-                    filtered_lines.append('')
-                continue
-                
-            filtered_lines.append(line)
-        
-        # Объединяем обратно
-        cleaned_analysis = '\n'.join(filtered_lines).strip()
-        
-        # Разбиваем на блоки по заголовкам
-        sections = []
-        current_section = {'title': '', 'content': []}
-        
-        paragraphs = cleaned_analysis.split('\n\n')
-        
-        for paragraph in paragraphs:
-            paragraph = paragraph.strip()
-            if not paragraph:
-                continue
-                
-            # Проверяем, является ли это заголовком блока
-            is_section_title = (
-                paragraph.isupper() and 
-                len(paragraph) < 150 and
-                any(keyword in paragraph.lower() for keyword in [
-                    'портрет', 'характеристика', 'паттерн', 'контрол', 
-                    'манипул', 'эмоциональн', 'интимность', 'социальн',
-                    'прогноз', 'рекомендац'
-                ])
-            )
-            
-            if is_section_title:
-                # Сохраняем предыдущую секцию
-                if current_section['title'] or current_section['content']:
-                    sections.append(current_section)
-                
-                # Начинаем новую секцию
-                current_section = {'title': paragraph, 'content': []}
-            else:
-                # Добавляем содержимое в текущую секцию
-                current_section['content'].append(paragraph)
-        
-        # Добавляем последнюю секцию
-        if current_section['title'] or current_section['content']:
-            sections.append(current_section)
-        
-        # Форматируем в HTML
-        formatted_sections = []
+        """
+        Форматирует реальный ИИ-анализ в красивый HTML
         
-        for section in sections:
-            if section['title']:
-                formatted_sections.append(f'<h4 class="analysis-section-title">{section["title"]}</h4>')
-            
-            for content in section['content']:
-                if content.strip():
-                    formatted_sections.append(f'<p class="analysis-text">{content}</p>')
+        Фрагменты, собранные AIService при потоковом чтении ответа
+        (psychological_profile_html), используются как есть; иначе текст
+        форматируется за один проход.
+        """
+        formatted_html = analysis_data.get('psychological_profile_html')
+        if not formatted_html:
+            formatted_html = format_narrative(ai_analysis, clean_markdown=False).pdf_html
         
         # Обертываем в структуру
         html_analysis = f"""
 <div class="detailed-profile ai-generated">
     <div class="ai-analysis-content">
-        {''.join(formatted_sections)}
+        {formatted_html}
     </div>
 </div>"""
         
@@ -1211,6 +1131,7 @@ class HTMLPDFService:
         
         return ''.join(insights) if insights else '<p>Дополнительные инсайты не найдены</p>'
     
+    @cached_fragment('partner_name', 'risk_score', 'block_scores', 'dark_triad')
     def _generate_high_risk_analysis(
         self, 
         partner_name: str, 
@@ -1307,6 +1228,7 @@ class HTMLPDFService:
 </div>"""
         return analysis
     
+    @cached_fragment('partner_name', 'risk_score', 'block_scores', 'dark_triad')
     def _generate_medium_risk_analysis(
         self, 
         partner_name: str, 
@@ -1385,6 +1307,7 @@ class HTMLPDFService:
 </div>"""
         return analysis
         
+    @cached_fragment('partner_name', 'risk_score', 'block_scores')
     def _generate_low_risk_analysis(
         self, 
         partner_name: str, 
@@ -1471,6 +1394,7 @@ class HTMLPDFService:
 </div>"""
         return analysis
     
+    @cached_fragment()
     def _generate_personality_characteristics(self, risk_score: float) -> str:
         """Generate personality characteristics HTML"""
         if risk_score >= 70:
@@ -1590,6 +1514,7 @@ class HTMLPDFService:
         else:
             return f"Умеренный уровень риска ({risk_score:.0f}%). Некоторые проблемные моменты в поведении, которые требуют внимания, но в целом отношения находятся в допустимых рамках."
 
+    @cached_fragment()
     def _get_risk_recommendations(self, risk_score: float) -> str:
         """Generate risk-specific recommendations"""
         if risk_score >= 70:
@@ -1608,4 +1533,109 @@ class HTMLPDFService:
         elif risk_score >= 20:
             return "medium"
         else:
-            return "low"
\ No newline at end of file
+            return "low"
+
+
+@lru_cache(maxsize=1)
+def _get_report_template() -> Template:
+    """Compiled report template, loaded once per process"""
+    template_dir = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'templates', 'pdf')
+    env = Environment(loader=FileSystemLoader(template_dir), auto_reload=False)
+    return env.get_template('partner_report.html')
+
+
+# Service instance of a render worker process
+_worker_service: Optional[HTMLPDFService] = None
+
+
+def _render_report_in_worker(analysis_data: Dict[str, Any], partner_name: str, user_id: int) -> str:
+    """Process pool entry point: inputs and result are plain picklable data"""
+    global _worker_service
+    if _worker_service is None:
+        _worker_service = HTMLPDFService()
+    return _worker_service._generate_beautiful_html_report(analysis_data, partner_name, user_id)
+
+
+class ReportRenderStage:
+    """
+    Builds report HTML outside the event loop
+    
+    Name declension, narrative formatting and the Jinja render are CPU-bound
+    and used to stall every other update for the whole render. They now run
+    in a thread pool (default) or a spawn-based process pool (inputs are
+    plain JSON-like data); "inline" keeps the old behaviour. Every render
+    records how long it took and how long the event loop was blocked
+    meanwhile.
+    """
+    
+    def __init__(self, mode: str = "thread", workers: int = 2, window: int = 500):
+        self.mode = mode
+        self.workers = max(1, workers)
+        self._executor: Optional[Executor] = None
+        self._render_times: deque = deque(maxlen=window)
+        self._loop_blocks: deque = deque(maxlen=window)
+        self.renders = 0
+    
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="report-render")
+        return self._executor
+    
+    async def render(
+        self,
+        service: HTMLPDFService,
+        analysis_data: Dict[str, Any],
+        partner_name: str,
+        user_id: int
+    ) -> str:
+        """Render report HTML, returns the HTML string"""
+        started = time.perf_counter()
+        async with LoopBlockProbe() as probe:
+            if self.mode == "inline":
+                html_content = service._generate_beautiful_html_report(analysis_data, partner_name, user_id)
+            else:
+                loop = asyncio.get_running_loop()
+                if self.mode == "process":
+                    call = (_render_report_in_worker, analysis_data, partner_name, user_id)
+                else:
+                    call = (service._generate_beautiful_html_report, analysis_data, partner_name, user_id)
+                html_content = await loop.run_in_executor(self._get_executor(), *call)
+        
+        render_time = time.perf_counter() - started
+        self.renders += 1
+        self._render_times.append(render_time)
+        self._loop_blocks.append(probe.max_lag)
+        logger.info(
+            f"🧱 Report HTML rendered ({self.mode}) in {render_time * 1000:.0f} ms, "
+            f"event loop blocked {probe.max_lag * 1000:.0f} ms"
+        )
+        return html_content
+    
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
+    def get_stats(self) -> Dict[str, Any]:
+        def ms(values: List[float], share: float) -> float:
+            ordered = sorted(values)
+            return round(ordered[min(len(ordered) - 1, int(len(ordered) * share))] * 1000, 1) if ordered else 0.0
+        
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "renders": self.renders,
+            "render_p50_ms": ms(list(self._render_times), 0.5),
+            "render_p95_ms": ms(list(self._render_times), 0.95),
+            "loop_blocked_p95_ms": ms(list(self._loop_blocks), 0.95),
+            "loop_blocked_max_ms": round(max(self._loop_blocks, default=0.0) * 1000, 1),
+        }
+
+
+# Global render stage shared by all HTMLPDFService instances
+report_render_stage = ReportRenderStage(settings.REPORT_RENDER_EXECUTOR, settings.REPORT_RENDER_WORKERS)
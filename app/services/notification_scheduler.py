@@ -0,0 +1,383 @@
+"""Scheduled user notifications: daily tips, analysis reminders, weekly stats"""
+
+import asyncio
+import heapq
+import time
+from datetime import date, datetime, time as dt_time, timedelta, timezone
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from aiogram import Bot
+from loguru import logger
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.database import get_session
+from app.core.leader import leader_election
+from app.core.redis import redis_client
+from app.models.analysis import TextAnalysis
+from app.models.user import User
+from app.services.broadcast import broadcast_engine, get_zone, parse_notification_time
+from app.utils.constants import DAILY_TIPS, NOTIFICATION_TEMPLATES
+
+SCHEDULE_KEY = "notifications:schedule"
+_BUILT_KEY = "notifications:schedule:built"
+
+# Pop due members and remove them in one step
+_POP_DUE_SCRIPT = """
+local due = redis.call('zrangebyscore', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2])
+for i = 1, #due, 2 do
+    redis.call('zrem', KEYS[1], due[i])
+end
+return due
+"""
+
+# User columns a tick decides and composes notifications from
+NOTIFY_COLUMNS = (
+    User.id,
+    User.telegram_id,
+    User.timezone,
+    User.notification_time,
+    User.notifications_enabled,
+    User.daily_tips_enabled,
+    User.analysis_reminders_enabled,
+    User.weekly_stats_enabled,
+    User.is_active,
+    User.is_blocked,
+    User.total_analyses,
+    User.last_analysis_date,
+    User.registration_date,
+)
+
+
+def next_fire_time(tz_name: Optional[str], notification_time: Optional[str], after: datetime) -> float:
+    """
+    UTC timestamp of the next local notification_time strictly after a moment
+
+    Args:
+        tz_name: User's timezone name
+        notification_time: User's HH:MM setting
+        after: Aware datetime
+
+    Returns:
+        Unix timestamp
+    """
+    zone = get_zone(tz_name)
+    hour, minute = parse_notification_time(notification_time)
+    local = after.astimezone(zone)
+    fire_date = local.date()
+    while True:
+        # Wall-clock time of that day, so DST changes keep the local hour
+        fire = datetime.combine(fire_date, dt_time(hour, minute), tzinfo=zone)
+        if fire > local:
+            return fire.timestamp()
+        fire_date += timedelta(days=1)
+
+
+def wants_notifications(user: Any) -> bool:
+    """Whether a user gets any scheduled notification at all"""
+    return (
+        user.notifications_enabled is not False
+        and user.is_active is not False
+        and user.is_blocked is not True
+        and bool(user.daily_tips_enabled or user.analysis_reminders_enabled or user.weekly_stats_enabled)
+    )
+
+
+class _MemorySchedule:
+    """Schedule kept in process memory when Redis is unavailable"""
+
+    def __init__(self):
+        self.scores: Dict[int, float] = {}
+        self.heap: List[Tuple[float, int]] = []
+        self.built = False
+
+    async def add(self, fire_times: Mapping[int, float]) -> None:
+        for member, score in fire_times.items():
+            self.scores[member] = score
+            heapq.heappush(self.heap, (score, member))
+
+    async def remove(self, member: int) -> None:
+        self.scores.pop(member, None)
+
+    async def pop_due(self, now: float, limit: int) -> List[Tuple[int, float]]:
+        due = []
+        while self.heap and self.heap[0][0] <= now and len(due) < limit:
+            score, member = heapq.heappop(self.heap)
+            # Entries replaced by a later add are skipped
+            if self.scores.get(member) == score:
+                del self.scores[member]
+                due.append((member, score))
+        return due
+
+    async def size(self) -> int:
+        return len(self.scores)
+
+    async def is_built(self) -> bool:
+        return self.built
+
+    async def mark_built(self) -> None:
+        self.built = True
+
+
+class _RedisSchedule:
+    """Sorted set of telegram_id -> next fire timestamp"""
+
+    async def add(self, fire_times: Mapping[int, float]) -> None:
+        if fire_times:
+            await redis_client.redis.zadd(SCHEDULE_KEY, {str(member): score for member, score in fire_times.items()})
+
+    async def remove(self, member: int) -> None:
+        await redis_client.redis.zrem(SCHEDULE_KEY, str(member))
+
+    async def pop_due(self, now: float, limit: int) -> List[Tuple[int, float]]:
+        flat = await redis_client.redis.eval(_POP_DUE_SCRIPT, 1, SCHEDULE_KEY, now, limit)
+        return [(int(flat[i]), float(flat[i + 1])) for i in range(0, len(flat), 2)]
+
+    async def size(self) -> int:
+        return await redis_client.redis.zcard(SCHEDULE_KEY)
+
+    async def is_built(self) -> bool:
+        return bool(await redis_client.redis.exists(_BUILT_KEY))
+
+    async def mark_built(self) -> None:
+        await redis_client.redis.set(_BUILT_KEY, 1)
+
+
+class NotificationScheduler:
+    """
+    Fires per-user notifications at each user's local notification_time
+
+    Every subscribed user has one entry in a sorted set scored by the UTC
+    timestamp of the next firing. Settings changes rewrite that entry, and a
+    tick pops only the entries that are due (O(log n) each) instead of
+    scanning users. Due users get one message combining the daily tip, an
+    analysis reminder and on Mondays the weekly stats, whichever they have
+    enabled, and are put back for the next day. Ticks run on the leader
+    worker only. Entries are re-added before sending, so a crash during a
+    tick loses at most that tick's messages and never duplicates them.
+    """
+
+    def __init__(
+        self,
+        tick_interval: float = settings.NOTIFICATION_TICK_SECONDS,
+        batch_size: int = settings.NOTIFICATION_BATCH_SIZE,
+        max_lateness: float = settings.NOTIFICATION_MAX_LATENESS,
+        reminder_days: int = settings.ANALYSIS_REMINDER_DAYS
+    ):
+        self.tick_interval = tick_interval
+        self.batch_size = batch_size
+        self.max_lateness = max_lateness
+        self.reminder_days = reminder_days
+        self._memory = _MemorySchedule()
+        self._task: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.ticks = 0
+        self.fired = 0
+        self.sent = 0
+        self.skipped_late = 0
+        self.last_tick_ms = 0.0
+
+    @property
+    def _schedule(self):
+        return _RedisSchedule() if redis_client.is_available and redis_client.redis else self._memory
+
+    async def schedule_user(self, user: Any) -> None:
+        """
+        Put a user's next notification into the schedule, or drop it
+
+        Called whenever notification settings, time or timezone change.
+
+        Args:
+            user: User (or row with NOTIFY_COLUMNS)
+        """
+        try:
+            if wants_notifications(user):
+                fire_at = next_fire_time(user.timezone, user.notification_time, datetime.now(timezone.utc))
+                await self._schedule.add({user.telegram_id: fire_at})
+            else:
+                await self._schedule.remove(user.telegram_id)
+        except Exception as e:
+            logger.error(f"Error scheduling notifications for {user.telegram_id}: {e}")
+
+    async def rebuild(self, now: Optional[datetime] = None) -> int:
+        """
+        Fill the schedule from the users table (keyset scan)
+
+        Args:
+            now: Moment the first firings are computed after
+
+        Returns:
+            Number of scheduled users
+        """
+        now = now or datetime.now(timezone.utc)
+        schedule = self._schedule
+        after_id, scheduled = 0, 0
+        while True:
+            async with get_session() as session:
+                rows = (await session.execute(
+                    select(*NOTIFY_COLUMNS).where(User.id > after_id).order_by(User.id).limit(self.batch_size)
+                )).all()
+            if not rows:
+                break
+            after_id = rows[-1].id
+            fire_times = {
+                row.telegram_id: next_fire_time(row.timezone, row.notification_time, now)
+                for row in rows if wants_notifications(row)
+            }
+            await schedule.add(fire_times)
+            scheduled += len(fire_times)
+        await schedule.mark_built()
+        logger.info(f"⏰ Notification schedule built: {scheduled} users")
+        return scheduled
+
+    async def tick(self, bot: Bot, now: Optional[float] = None) -> int:
+        """
+        Send all due notifications (leader only)
+
+        Args:
+            bot: Bot to send with
+            now: Current timestamp, for tests
+
+        Returns:
+            Number of sent messages
+        """
+        if not leader_election.is_leader:
+            return 0
+        started = time.perf_counter()
+        now = now or time.time()
+        schedule = self._schedule
+        if not await schedule.is_built():
+            await self.rebuild(datetime.fromtimestamp(now, timezone.utc))
+
+        sent = 0
+        while True:
+            due = await schedule.pop_due(now, self.batch_size)
+            if due:
+                sent += await self._fire(bot, schedule, due, now)
+            if len(due) < self.batch_size:
+                break
+
+        self.ticks += 1
+        self.sent += sent
+        self.last_tick_ms = round((time.perf_counter() - started) * 1000, 1)
+        return sent
+
+    async def _fire(self, bot: Bot, schedule: Any, due: List[Tuple[int, float]], now: float) -> int:
+        fire_times = dict(due)
+        now_dt = datetime.fromtimestamp(now, timezone.utc)
+        async with get_session() as session:
+            users = (await session.execute(
+                select(*NOTIFY_COLUMNS).where(User.telegram_id.in_(list(fire_times)))
+            )).all()
+            weekly_ids = [
+                user.id for user in users
+                if user.weekly_stats_enabled and self._local_date(user, fire_times[user.telegram_id]).weekday() == 0
+            ]
+            week_counts = await self._week_analyses(session, weekly_ids, now_dt) if weekly_ids else {}
+
+        next_times, messages = {}, []
+        for user in users:
+            if not wants_notifications(user):
+                continue  # Dropped from the schedule until settings change
+            next_times[user.telegram_id] = next_fire_time(user.timezone, user.notification_time, now_dt)
+            if now - fire_times[user.telegram_id] > self.max_lateness:
+                # Missed while no leader was running: wait for the next day
+                self.skipped_late += 1
+                continue
+            text = self.compose(user, self._local_date(user, fire_times[user.telegram_id]), week_counts)
+            if text:
+                messages.append((user.telegram_id, text))
+
+        await schedule.add(next_times)
+        self.fired += len(due)
+        if not messages:
+            return 0
+        result = await broadcast_engine.deliver_each(bot, messages)
+        await broadcast_engine.disable_blocked(result.blocked)
+        return result.sent
+
+    @staticmethod
+    def _local_date(user: Any, timestamp: float) -> date:
+        return datetime.fromtimestamp(timestamp, get_zone(user.timezone)).date()
+
+    @staticmethod
+    async def _week_analyses(session: Any, user_ids: List[int], now: datetime) -> Dict[int, int]:
+        rows = await session.execute(
+            select(TextAnalysis.user_id, func.count())
+            .where(TextAnalysis.user_id.in_(user_ids), TextAnalysis.created_at >= now - timedelta(days=7))
+            .group_by(TextAnalysis.user_id)
+        )
+        return dict(rows.all())
+
+    def compose(self, user: Any, local_date: date, week_counts: Mapping[int, int]) -> Optional[str]:
+        """
+        Text of a user's notification for a local date
+
+        Args:
+            user: Row with NOTIFY_COLUMNS
+            local_date: Date in the user's timezone
+            week_counts: Analyses of the last 7 days per user id (weekly stats users only)
+
+        Returns:
+            Message text, or None if nothing is due today
+        """
+        parts = []
+        if user.daily_tips_enabled:
+            tip = DAILY_TIPS[local_date.toordinal() % len(DAILY_TIPS)]
+            parts.append(NOTIFICATION_TEMPLATES["daily_tip"].format(content=tip))
+
+        if user.analysis_reminders_enabled:
+            last = user.last_analysis_date or user.registration_date
+            if last is not None:
+                if last.tzinfo is None:
+                    last = last.replace(tzinfo=timezone.utc)
+                idle_days = (local_date - last.astimezone(get_zone(user.timezone)).date()).days
+                # Once every reminder_days days without an analysis
+                if idle_days >= self.reminder_days and idle_days % self.reminder_days == 0:
+                    parts.append(NOTIFICATION_TEMPLATES["analysis_reminder"])
+
+        if user.weekly_stats_enabled and local_date.weekday() == 0:
+            parts.append(NOTIFICATION_TEMPLATES["weekly_stats"].format(
+                week_analyses=week_counts.get(user.id, 0),
+                total_analyses=user.total_analyses or 0,
+            ))
+        return "\n\n".join(parts) or None
+
+    def start(self, bot: Bot) -> None:
+        if settings.NOTIFICATIONS_SCHEDULER_ENABLED and (self._task is None or self._task.done()):
+            self._task = asyncio.create_task(self._run(bot), name="notification-scheduler")
+
+    async def _run(self, bot: Bot) -> None:
+        while True:
+            try:
+                await self.tick(bot)
+            except Exception as e:
+                logger.error(f"Notification tick failed: {e}")
+            await asyncio.sleep(self.tick_interval)
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def get_stats(self) -> Dict[str, Any]:
+        try:
+            scheduled = await self._schedule.size()
+        except Exception:
+            scheduled = None
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "leader": leader_election.is_leader,
+            "scheduled_users": scheduled,
+            "ticks": self.ticks,
+            "fired": self.fired,
+            "sent": self.sent,
+            "skipped_late": self.skipped_late,
+            "last_tick_ms": self.last_tick_ms,
+        }
+
+
+# Global notification scheduler
+notification_scheduler = NotificationScheduler()
@@ -0,0 +1,401 @@
+"""Size optimization of report HTML before rendering and of the rendered PDF"""
+
+import re
+import zlib
+from typing import Dict, List, Optional, Set, Tuple
+
+from loguru import logger
+
+# Elements whose surrounding whitespace never renders
+_BLOCK_TAGS = (
+    "html|head|body|meta|title|style|link|div|p|h[1-6]|ul|ol|li|table|thead|tbody|tr|td|th|"
+    "section|header|footer|br|hr"
+)
+_HTML_COMMENT_RE = re.compile(r"<!--(?!\[).*?-->", re.S)
+_STYLE_RE = re.compile(r"(<style[^>]*>)(.*?)(</style>)", re.S | re.I)
+_PREFORMATTED_RE = re.compile(r"<(?:pre|textarea|script)\b", re.I)
+_AFTER_BLOCK_RE = re.compile(rf"(</?(?:{_BLOCK_TAGS})\b[^>]*>)\s+", re.I)
+_BEFORE_BLOCK_RE = re.compile(rf"\s+(</?(?:{_BLOCK_TAGS})\b)", re.I)
+_WHITESPACE_RE = re.compile(r"\s+")
+_CLASS_ATTR_RE = re.compile(r"\bclass\s*=\s*(?:\"([^\"]*)\"|'([^']*)')", re.I)
+_ID_ATTR_RE = re.compile(r"\bid\s*=\s*(?:\"([^\"]*)\"|'([^']*)')", re.I)
+_TAG_RE = re.compile(r"<([a-zA-Z][a-zA-Z0-9]*)")
+
+_CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+_CSS_STRING_RE = re.compile(r"(\"(?:[^\"\\]|\\.)*\"|'(?:[^'\\]|\\.)*')")
+_CSS_PUNCT_RE = re.compile(r"\s*([{};,>])\s*")
+# At-rules holding ordinary rules: pruned recursively; other at-rules are kept
+_CSS_GROUPING_RULES = ("@media", "@supports")
+_PSEUDO_RE = re.compile(r"::?[a-zA-Z-]+")
+_CLASS_RE = re.compile(r"\.(-?[_a-zA-Z][\w-]*)")
+_ID_RE = re.compile(r"#(-?[_a-zA-Z][\w-]*)")
+_TYPE_RE = re.compile(r"(?:^|[\s>+~])([a-zA-Z][a-zA-Z0-9]*)")
+
+_PDF_STARTXREF_RE = re.compile(rb"startxref\s+(\d+)\s+%%EOF\s*$")
+_PDF_OBJ_RE = re.compile(rb"(\d+)\s+(\d+)\s+obj\b")
+_PDF_STREAM_RE = re.compile(rb">>\s*stream(?:\r\n|\n)")
+_PDF_LENGTH_RE = re.compile(rb"/Length\s+(?:(\d+)\s+\d+\s+R|(\d+))")
+_PDF_FILTER_RE = re.compile(rb"/Filter\s*(/[A-Za-z0-9]+|\[)")
+_PDF_REF_RE = re.compile(rb"(\d+)\s+(\d+)\s+R\b")
+_PDF_SIZE_RE = re.compile(rb"/Size\s+(\d+)")
+# Objects that must stay distinct even when their bytes are equal
+_PDF_UNIQUE_TYPES_RE = re.compile(rb"/Type\s*/(?:Page|Pages|Catalog|Annot|Metadata|XRef)\b")
+
+
+class SizeStages:
+    """Bytes after each optimization stage of one report"""
+
+    def __init__(self):
+        self.stages: List[Tuple[str, int]] = []
+
+    def record(self, stage: str, size: int) -> None:
+        self.stages.append((stage, size))
+
+    def summary(self) -> str:
+        return " -> ".join(f"{stage} {size}" for stage, size in self.stages)
+
+
+class PdfSizeStats:
+    """Bytes per stage averaged over the reports of this process"""
+
+    def __init__(self):
+        self.reports = 0
+        self._totals: Dict[str, int] = {}
+
+    def add(self, stages: SizeStages) -> None:
+        self.reports += 1
+        for stage, size in stages.stages:
+            self._totals[stage] = self._totals.get(stage, 0) + size
+
+    def get_stats(self) -> Dict[str, object]:
+        return {
+            "reports": self.reports,
+            "avg_bytes": {stage: total // self.reports for stage, total in self._totals.items()}
+            if self.reports else {},
+        }
+
+
+# Global size stats of report optimization
+pdf_size_stats = PdfSizeStats()
+
+
+def minify_css(css: str) -> str:
+    """Drop comments and insignificant whitespace; string literals are kept verbatim"""
+    parts = _CSS_STRING_RE.split(_CSS_COMMENT_RE.sub("", css))
+    for i in range(0, len(parts), 2):
+        text = _WHITESPACE_RE.sub(" ", parts[i])
+        parts[i] = _CSS_PUNCT_RE.sub(r"\1", text).replace(";}", "}")
+    return "".join(parts).strip()
+
+
+def _split_css_rules(css: str) -> List[Tuple[str, Optional[str]]]:
+    """Top-level (prelude, block) pairs; statements such as @import have no block"""
+    rules: List[Tuple[str, Optional[str]]] = []
+    depth = rule_start = block_start = 0
+    i = 0
+    while i < len(css):
+        char = css[i]
+        if char in "\"'":
+            match = _CSS_STRING_RE.match(css, i)
+            if not match:
+                raise ValueError("unterminated CSS string")
+            i = match.end()
+            continue
+        if char == "{":
+            if depth == 0:
+                block_start = i
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth < 0:
+                raise ValueError("unbalanced CSS braces")
+            if depth == 0:
+                rules.append((css[rule_start:block_start].strip(), css[block_start + 1:i]))
+                rule_start = i + 1
+        elif char == ";" and depth == 0:
+            rules.append((css[rule_start:i + 1].strip(), None))
+            rule_start = i + 1
+        i += 1
+    if depth != 0:
+        raise ValueError("unbalanced CSS braces")
+    return rules
+
+
+def _selector_used(selector: str, classes: Set[str], ids: Set[str], tags: Set[str]) -> bool:
+    if "[" in selector:
+        return True
+    simple = _PSEUDO_RE.sub("", selector)
+    return (
+        all(name in classes for name in _CLASS_RE.findall(simple))
+        and all(name in ids for name in _ID_RE.findall(simple))
+        and all(name.lower() in tags for name in _TYPE_RE.findall(_ID_RE.sub("", _CLASS_RE.sub("", simple))))
+    )
+
+
+def _prune_css(css: str, classes: Set[str], ids: Set[str], tags: Set[str]) -> str:
+    kept = []
+    for prelude, block in _split_css_rules(css):
+        if block is None:
+            kept.append(prelude)
+        elif prelude.startswith(_CSS_GROUPING_RULES):
+            inner = _prune_css(block, classes, ids, tags)
+            if inner:
+                kept.append(f"{prelude}{{{inner}}}")
+        elif prelude.startswith("@") or "(" in prelude:
+            # @page, @keyframes, @font-face and :is()/:not() lists stay as they are
+            kept.append(f"{prelude}{{{block}}}")
+        else:
+            selectors = [s for s in prelude.split(",") if _selector_used(s, classes, ids, tags)]
+            if selectors:
+                kept.append(f"{','.join(selectors)}{{{block}}}")
+    return "".join(kept)
+
+
+def remove_unused_css(html: str) -> str:
+    """
+    Drop style rules whose selectors match nothing in the document
+
+    Only class, id and element names are checked, so rules that depend on
+    attributes or dynamic state are kept.
+
+    Args:
+        html: Rendered report HTML
+
+    Returns:
+        HTML with pruned <style> blocks
+    """
+    classes = {name for match in _CLASS_ATTR_RE.findall(html) for name in "".join(match).split()}
+    ids = {"".join(match).strip() for match in _ID_ATTR_RE.findall(html)}
+    tags = {tag.lower() for tag in _TAG_RE.findall(html)} | {"html", "body"}
+
+    def prune(match: "re.Match[str]") -> str:
+        try:
+            css = _prune_css(minify_css(match.group(2)), classes, ids, tags)
+        except ValueError as e:
+            logger.debug(f"CSS left unpruned: {e}")
+            return match.group(0)
+        return f"{match.group(1)}{css}{match.group(3)}"
+
+    return _STYLE_RE.sub(prune, html)
+
+
+def minify_html(html: str) -> str:
+    """
+    Collapse whitespace and drop comments; CSS in <style> is minified
+
+    Args:
+        html: Report HTML
+
+    Returns:
+        Equivalent HTML, smaller
+    """
+    html = _HTML_COMMENT_RE.sub("", html)
+    parts = _STYLE_RE.split(html)
+    collapse = not _PREFORMATTED_RE.search(html)
+    # split() with three groups: text, <style>, css, </style>, text, ...
+    for i in range(0, len(parts), 4):
+        if collapse:
+            text = _WHITESPACE_RE.sub(" ", parts[i])
+            text = _AFTER_BLOCK_RE.sub(r"\1", text)
+            parts[i] = _BEFORE_BLOCK_RE.sub(r"\1", text)
+        if i + 2 < len(parts):
+            parts[i + 2] = minify_css(parts[i + 2])
+    return "".join(parts).strip()
+
+
+def optimize_html(html: str, stages: Optional[SizeStages] = None) -> str:
+    """Unused CSS removal and minification, bytes recorded per stage"""
+    stages = stages or SizeStages()
+    stages.record("html", len(html.encode("utf-8")))
+    html = remove_unused_css(html)
+    stages.record("css_pruned", len(html.encode("utf-8")))
+    html = minify_html(html)
+    stages.record("html_minified", len(html.encode("utf-8")))
+    return html
+
+
+class UnsupportedPdf(Exception):
+    """PDF layout the rewriter does not handle; the original is kept"""
+
+
+class _PdfObject:
+    __slots__ = ("gen", "head", "data")
+
+    def __init__(self, gen: int, head: bytes, data: Optional[bytes]):
+        self.gen = gen
+        self.head = head      # object body, or the stream dictionary
+        self.data = data      # stream bytes, None for plain objects
+
+
+def _read_pdf(pdf: bytes) -> Tuple[bytes, Dict[int, _PdfObject], bytes]:
+    """Header, objects and trailer dictionary of a single-revision PDF with a classic xref table"""
+    if not pdf.startswith(b"%PDF-"):
+        raise UnsupportedPdf("not a PDF")
+    if pdf.count(b"startxref") != 1 or b"/Encrypt" in pdf or b"/ObjStm" in pdf:
+        raise UnsupportedPdf("incremental update, encryption or object streams")
+    match = _PDF_STARTXREF_RE.search(pdf)
+    if not match:
+        raise UnsupportedPdf("no startxref")
+    xref_at = int(match.group(1))
+    if not pdf.startswith(b"xref", xref_at):
+        raise UnsupportedPdf("cross-reference stream")
+    trailer_at = pdf.index(b"trailer", xref_at)
+    trailer = pdf[trailer_at + len(b"trailer"):match.start()].strip()
+    if b"/Prev" in trailer:
+        raise UnsupportedPdf("incremental update")
+
+    tokens = pdf[xref_at + len(b"xref"):trailer_at].split()
+    offsets: Dict[int, int] = {}
+    i = 0
+    while i < len(tokens):
+        start, count = int(tokens[i]), int(tokens[i + 1])
+        i += 2
+        for num in range(start, start + count):
+            offset, entry_type = int(tokens[i]), tokens[i + 2]
+            if entry_type == b"n":
+                offsets[num] = offset
+            i += 3
+
+    ordered = sorted(offsets.items(), key=lambda item: item[1])
+    if not ordered:
+        raise UnsupportedPdf("no objects")
+    bodies: Dict[int, Tuple[int, bytes]] = {}
+    for index, (num, offset) in enumerate(ordered):
+        end = ordered[index + 1][1] if index + 1 < len(ordered) else xref_at
+        raw = pdf[offset:end]
+        header = _PDF_OBJ_RE.match(raw)
+        if not header or int(header.group(1)) != num:
+            raise UnsupportedPdf(f"xref offset of object {num} is wrong")
+        bodies[num] = (int(header.group(2)), raw[header.end():raw.rindex(b"endobj")])
+
+    objects: Dict[int, _PdfObject] = {}
+    for num, (gen, body) in bodies.items():
+        stream = _PDF_STREAM_RE.search(body)
+        if not stream or not body.lstrip().startswith(b"<<"):
+            objects[num] = _PdfObject(gen, body.strip(), None)
+            continue
+        head = body[:stream.start() + 2].strip()
+        length = _PDF_LENGTH_RE.search(head)
+        if not length:
+            raise UnsupportedPdf(f"stream {num} without /Length")
+        if length.group(1):
+            size = int(bodies[int(length.group(1))][1].strip())
+        else:
+            size = int(length.group(2))
+        data = body[stream.end():stream.end() + size]
+        if not body[stream.end() + size:].lstrip().startswith(b"endstream"):
+            raise UnsupportedPdf(f"stream {num} length mismatch")
+        objects[num] = _PdfObject(gen, head, data)
+    return pdf[:ordered[0][1]], objects, trailer
+
+
+def _recompress(obj: _PdfObject, level: int) -> None:
+    filter_match = _PDF_FILTER_RE.search(obj.head)
+    if filter_match is None:
+        if _PDF_UNIQUE_TYPES_RE.search(obj.head):
+            return
+        packed = zlib.compress(obj.data, level)
+        if len(packed) + len(b"/Filter/FlateDecode") < len(obj.data):
+            obj.head = obj.head[:-2] + b"/Filter/FlateDecode>>"
+            obj.data = packed
+    elif filter_match.group(1) == b"/FlateDecode":
+        try:
+            packed = zlib.compress(zlib.decompress(obj.data), level)
+        except zlib.error:
+            return
+        if len(packed) < len(obj.data):
+            obj.data = packed
+    else:
+        return
+    obj.head = _PDF_LENGTH_RE.sub(b"/Length %d" % len(obj.data), obj.head, count=1)
+
+
+def _deduplicate(objects: Dict[int, _PdfObject], trailer: bytes) -> Tuple[Dict[int, _PdfObject], bytes]:
+    """Merge byte-identical objects and point references at the survivor"""
+    while True:
+        seen: Dict[Tuple[bytes, Optional[bytes]], int] = {}
+        duplicates: Dict[int, int] = {}
+        for num in sorted(objects):
+            obj = objects[num]
+            if _PDF_UNIQUE_TYPES_RE.search(obj.head):
+                continue
+            key = (obj.head, obj.data)
+            if key in seen:
+                duplicates[num] = seen[key]
+            else:
+                seen[key] = num
+        if not duplicates:
+            return objects, trailer
+
+        def retarget(match: "re.Match[bytes]") -> bytes:
+            target = duplicates.get(int(match.group(1)))
+            if target is None:
+                return match.group(0)
+            return b"%d %d R" % (target, objects[target].gen)
+
+        objects = {num: obj for num, obj in objects.items() if num not in duplicates}
+        for obj in objects.values():
+            obj.head = _PDF_REF_RE.sub(retarget, obj.head)
+        trailer = _PDF_REF_RE.sub(retarget, trailer)
+
+
+def _write_pdf(header: bytes, objects: Dict[int, _PdfObject], trailer: bytes, size: int) -> bytes:
+    out = bytearray(header)
+    offsets: Dict[int, int] = {}
+    for num in sorted(objects):
+        obj = objects[num]
+        offsets[num] = len(out)
+        out += b"%d %d obj\n" % (num, obj.gen) + obj.head
+        if obj.data is not None:
+            out += b"\nstream\n" + obj.data + b"\nendstream"
+        out += b"\nendobj\n"
+
+    xref_at = len(out)
+    free = [num for num in range(size) if num not in offsets]
+    next_free = dict(zip(free, free[1:] + [0]))
+    out += b"xref\n0 %d\n" % size
+    for num in range(size):
+        if num in offsets:
+            out += b"%010d %05d n \n" % (offsets[num], objects[num].gen)
+        else:
+            out += b"%010d %05d f \n" % (next_free[num], 65535 if num == 0 else 1)
+    trailer = _PDF_SIZE_RE.sub(b"/Size %d" % size, trailer, count=1)
+    out += b"trailer\n" + trailer + b"\nstartxref\n%d\n%%%%EOF\n" % xref_at
+    return bytes(out)
+
+
+def optimize_pdf(pdf: bytes, level: int = 9) -> bytes:
+    """
+    Recompress streams and merge duplicate objects of a rendered PDF
+
+    Flate streams are recompressed at the given level, unfiltered streams
+    are compressed, byte-identical objects are merged and the xref table is
+    rebuilt. PDFs the rewriter does not handle (object streams, encryption,
+    incremental updates) and results that are not smaller are returned
+    unchanged.
+
+    Args:
+        pdf: Rendered PDF
+        level: zlib compression level
+
+    Returns:
+        Optimized PDF bytes
+    """
+    try:
+        header, objects, trailer = _read_pdf(pdf)
+        declared = _PDF_SIZE_RE.search(trailer)
+        size = max(int(declared.group(1)) if declared else 0, max(objects) + 1)
+        for obj in objects.values():
+            if obj.data is not None:
+                _recompress(obj, level)
+        objects, trailer = _deduplicate(objects, trailer)
+        optimized = _write_pdf(header, objects, trailer, size)
+        # The result must read back with the same rules
+        _read_pdf(optimized)
+    except UnsupportedPdf as e:
+        logger.debug(f"PDF kept as rendered: {e}")
+        return pdf
+    except (ValueError, IndexError, KeyError) as e:
+        logger.warning(f"PDF optimization skipped: {e}")
+        return pdf
+    return optimized if len(optimized) < len(pdf) else pdf
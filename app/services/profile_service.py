@@ -12,6 +12,7 @@ from app.services.ai_service import AIService
 from app.utils.enums import SubscriptionType
 from app.core.logging import logger
 from app.utils.enums import UrgencyLevel
+from app.utils.pagination import KeysetPage, fetch_keyset_page, DIRECTION_NEXT
 
 
 class ProfileService:
@@ -104,9 +105,10 @@ class ProfileService:
         partner_basic_info: str,
         questions: List[Dict[str, Any]],
         answers: Dict[str, int],
-        analysis_result: Dict[str, Any]
+        analysis_result: Dict[str, Any],
+        report_key: Optional[str] = None
     ) -> Optional[PartnerProfile]:
-        """Create partner profile from profiler data"""
+        """Create partner profile from profiler data (report_key links the stored PDF)"""
         try:
             # Check user subscription limits
             user_result = await self.session.execute(
@@ -180,6 +182,7 @@ class ProfileService:
                 # Metadata
                 confidence_score=analysis_result.get('confidence_score', 0.0),
                 ai_model_used=analysis_result.get('ai_model_used', 'claude-3-sonnet'),
+                report_key=report_key,
                 
                 # Status
                 is_completed=True,
@@ -218,6 +221,28 @@ class ProfileService:
             logger.error(f"Error getting user profiles: {e}")
             return []
     
+    async def get_user_profiles_page(
+        self,
+        user_id: int,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        direction: str = DIRECTION_NEXT
+    ) -> KeysetPage:
+        """
+        Get one page of user's partner profiles using keyset pagination
+        
+        Database errors are not swallowed so callers can tell a failure
+        from an empty page.
+        """
+        return await fetch_keyset_page(
+            self.session,
+            select(PartnerProfile).where(PartnerProfile.user_id == user_id),
+            PartnerProfile,
+            limit=limit,
+            cursor=cursor,
+            direction=direction
+        )
+    
     async def get_profile_by_id(
         self,
         profile_id: int,
@@ -0,0 +1,267 @@
+"""Content-addressed store for rendered PDF reports"""
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import zstandard
+from loguru import logger
+
+from app.core.config import settings
+from app.core.redis import redis_client
+from app.utils.exceptions import ServiceError
+from app.utils.helpers import create_cache_key
+
+# Local file_id copies when Redis is unavailable
+FILE_ID_MEMORY_SIZE = 10000
+
+
+def report_key(payload: Dict[str, Any], template_version: str) -> str:
+    """
+    Content address of a report: sha256 of the canonical payload JSON and template version
+
+    The same analysis rendered with the same template always maps to the
+    same key, a template change gives new keys.
+    """
+    canonical = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    digest = hashlib.sha256()
+    digest.update(template_version.encode())
+    digest.update(b"\0")
+    digest.update(canonical.encode())
+    return digest.hexdigest()
+
+
+class LocalArtifactBackend:
+    """Files under a directory, sharded by the first key bytes"""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def _path(self, key: str) -> Path:
+        return self.root / key[:2] / key[2:4] / f"{key}.zst"
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            return self._path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Write-then-rename: readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def put(self, key: str, data: bytes) -> None:
+        await asyncio.to_thread(self._write, key, data)
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._path(key).exists)
+
+
+class S3ArtifactBackend:
+    """S3-compatible bucket (AWS S3, MinIO); boto3 calls run in a thread"""
+
+    def __init__(
+        self,
+        bucket: str,
+        endpoint_url: Optional[str] = None,
+        access_key: Optional[str] = None,
+        secret_key: Optional[str] = None,
+        region: str = "us-east-1",
+        prefix: str = "reports/"
+    ):
+        try:
+            import boto3
+            from botocore.exceptions import ClientError
+        except ImportError:
+            raise ServiceError("REPORT_STORE_BACKEND=s3 требует пакет boto3")
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self._client_error = ClientError
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            aws_access_key_id=access_key or None,
+            aws_secret_access_key=secret_key or None,
+            region_name=region
+        )
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{key[:2]}/{key}.zst"
+
+    def _is_missing(self, error: Exception) -> bool:
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            response = self._client.get_object(Bucket=self.bucket, Key=self._object_key(key))
+        except self._client_error as e:
+            if self._is_missing(e):
+                return None
+            raise
+        return response["Body"].read()
+
+    def _head(self, key: str) -> bool:
+        try:
+            self._client.head_object(Bucket=self.bucket, Key=self._object_key(key))
+        except self._client_error as e:
+            if self._is_missing(e):
+                return False
+            raise
+        return True
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, key)
+
+    async def put(self, key: str, data: bytes) -> None:
+        await asyncio.to_thread(
+            self._client.put_object,
+            Bucket=self.bucket,
+            Key=self._object_key(key),
+            Body=data,
+            ContentType="application/zstd"
+        )
+
+    async def exists(self, key: str) -> bool:
+        return await asyncio.to_thread(self._head, key)
+
+
+class ReportArtifactStore:
+    """
+    Rendered reports by content address, zstd-compressed
+
+    Besides the PDF bytes it remembers the Telegram file_id of the first
+    upload (Redis, with an in-process copy), so sending the same report
+    again is a single API call without uploading the file.
+    """
+
+    def __init__(self, backend, compression_level: int = 10):
+        self.backend = backend
+        self._compressor = zstandard.ZstdCompressor(level=compression_level)
+        self._decompressor = zstandard.ZstdDecompressor()
+        self._file_ids: "OrderedDict[str, str]" = OrderedDict()
+
+        # Metrics
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.bytes_raw = 0
+        self.bytes_stored = 0
+        self.file_id_hits = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """PDF bytes of a stored report, None if missing or unreadable"""
+        try:
+            data = await self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Report store read failed ({key[:12]}): {e}")
+            return None
+        if data is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._decompressor.decompress(data)
+
+    async def put(self, key: str, pdf_bytes: bytes) -> bool:
+        """Store a report; failures are logged, the report is still usable"""
+        compressed = self._compressor.compress(pdf_bytes)
+        try:
+            await self.backend.put(key, compressed)
+        except Exception as e:
+            logger.warning(f"Report store write failed ({key[:12]}): {e}")
+            return False
+        self.stored += 1
+        self.bytes_raw += len(pdf_bytes)
+        self.bytes_stored += len(compressed)
+        logger.info(f"🗄️ Report stored {key[:12]}: {len(pdf_bytes)} -> {len(compressed)} bytes")
+        return True
+
+    async def exists(self, key: str) -> bool:
+        try:
+            return await self.backend.exists(key)
+        except Exception as e:
+            logger.warning(f"Report store lookup failed ({key[:12]}): {e}")
+            return False
+
+    async def get_file_id(self, key: str) -> Optional[str]:
+        """Telegram file_id of an already uploaded report"""
+        file_id = self._file_ids.get(key)
+        if file_id is None:
+            file_id = await redis_client.get(create_cache_key("report_file_id", key))
+            if file_id:
+                self._remember_locally(key, file_id)
+        if file_id:
+            self.file_id_hits += 1
+        return file_id
+
+    async def set_file_id(self, key: str, file_id: str) -> None:
+        self._remember_locally(key, file_id)
+        await redis_client.set(
+            create_cache_key("report_file_id", key), file_id, expire=settings.REPORT_FILE_ID_TTL
+        )
+
+    async def forget_file_id(self, key: str) -> None:
+        """Drop a file_id Telegram no longer accepts"""
+        self._file_ids.pop(key, None)
+        await redis_client.delete(create_cache_key("report_file_id", key))
+
+    def _remember_locally(self, key: str, file_id: str) -> None:
+        self._file_ids[key] = file_id
+        self._file_ids.move_to_end(key)
+        if len(self._file_ids) > FILE_ID_MEMORY_SIZE:
+            self._file_ids.popitem(last=False)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stored": self.stored,
+            "file_id_hits": self.file_id_hits,
+            "compression_ratio": round(self.bytes_stored / self.bytes_raw, 3) if self.bytes_raw else None,
+        }
+
+
+def create_report_store() -> Optional[ReportArtifactStore]:
+    """Store configured by settings, None when disabled or misconfigured"""
+    if not settings.REPORT_STORE_ENABLED:
+        return None
+    try:
+        if settings.REPORT_STORE_BACKEND == "s3":
+            if not settings.REPORT_STORE_S3_BUCKET:
+                raise ServiceError("REPORT_STORE_S3_BUCKET не задан")
+            backend = S3ArtifactBackend(
+                bucket=settings.REPORT_STORE_S3_BUCKET,
+                endpoint_url=settings.REPORT_STORE_S3_ENDPOINT_URL,
+                access_key=settings.REPORT_STORE_S3_ACCESS_KEY,
+                secret_key=settings.REPORT_STORE_S3_SECRET_KEY,
+                region=settings.REPORT_STORE_S3_REGION
+            )
+        else:
+            backend = LocalArtifactBackend(settings.REPORT_STORE_PATH)
+    except ServiceError as e:
+        logger.warning(f"⚠️ Report store disabled: {e}")
+        return None
+    return ReportArtifactStore(backend, settings.REPORT_STORE_ZSTD_LEVEL)
+
+
+# Global report store (None when disabled)
+report_store = create_report_store()
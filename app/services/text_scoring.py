@@ -0,0 +1,275 @@
+"""Local lexicon-based risk scoring of free-form profiler answers"""
+
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple, Type, TypeVar
+
+import numpy as np
+from pydantic import BaseModel
+
+from app.services.block_summary import BLOCK_TITLES
+from app.prompts.profiler_full_questions import FREE_FORM_QUESTIONS, get_all_questions, get_urgency_level
+from app.utils.helpers import extract_keywords
+
+BLOCKS: Tuple[str, ...] = ("narcissism", "control", "gaslighting", "emotion", "intimacy", "social")
+
+# Risk signals per block: (red flag text, weight 1-3, word stems).
+# A stem matches every word starting with it (кричит, кричал, крик...).
+RISK_LEXICON: Dict[str, List[Tuple[str, int, Tuple[str, ...]]]] = {
+    "narcissism": [
+        ("Агрессивная реакция на критику", 2, ("обвин", "оскорб", "придира", "претенз", "огрыза", "взбес")),
+        ("Обесценивание достижений партнера", 2, ("обесцен", "принижа", "высмеи", "насмеш", "ерунд", "подумаешь")),
+        ("Перевод разговора на себя", 2, ("перевел", "перевод", "о себе", "про себя", "о своих")),
+        ("Чувство превосходства и исключительности", 2, ("превосход", "особенн", "гениал", "идиот", "тупые", "дура", "ничтож")),
+        ("Отсутствие эмпатии", 3, ("равнодуш", "безразлич", "плевать", "наплевать", "холодн", "игнорир")),
+        ("Требование восхищения", 1, ("восхищ", "похвал", "комплимент", "внимани")),
+    ],
+    "control": [
+        ("Контроль времени и передвижений", 2, ("контрол", "провер", "отчит", "звонит", "геолокац", "следит", "слежк")),
+        ("Изоляция от друзей и семьи", 3, ("изоляц", "изолир", "запрещ", "запрет", "не пуска", "отговарива", "не разреша")),
+        ("Финансовый контроль", 3, ("деньг", "зарплат", "карточк", "финанс", "трат", "чеки")),
+        ("Проверка телефона и переписок", 2, ("переписк", "пароль", "залез", "роется", "читает мои")),
+        ("Угрозы и запугивание", 3, ("угрож", "угроз", "запуга", "пригрози", "шантаж", "бросит", "уйдет")),
+        ("Нарушение личных границ", 2, ("границ", "требу", "заставл", "принужд", "приказ")),
+    ],
+    "gaslighting": [
+        ("Отрицание очевидных событий", 3, ("отрица", "не было", "выдумыва", "придумыва", "показалось", "тебе кажется")),
+        ("Сомнения в адекватности партнера", 3, ("сумасшед", "псих", "ненормал", "истеричк", "неадекват", "лечиться", "больная", "больной")),
+        ("Перекладывание вины", 2, ("винова", "вину", "сама винов", "сам винов", "из-за тебя", "провоцир")),
+        ("Искажение сказанного", 2, ("перевира", "искажа", "переиначива", "не говорил", "путаешь")),
+        ("Обесценивание чувств", 2, ("драматиз", "преувелич", "обижаешься", "чувствительн", "накручива")),
+    ],
+    "emotion": [
+        ("Вспышки ярости", 3, ("ярост", "бешен", "орет", "орал", "крич", "крик", "взрыв", "срыва")),
+        ("Физическая агрессия или ее признаки", 3, ("удар", "бьет", "избил", "толкн", "толка", "швыр", "разби", "хлопа", "кулак", "схвати")),
+        ("Резкие перепады настроения", 2, ("перепад", "настроени", "непредсказ", "внезапн", "резко")),
+        ("Наказание молчанием", 2, ("молча", "молчит", "бойкот", "игнор", "не разговарива")),
+        ("Эмоциональный шантаж", 2, ("шантаж", "слез", "жертв", "винит")),
+    ],
+    "intimacy": [
+        ("Принуждение к близости", 3, ("принужд", "заставл", "настаив", "против воли", "без согласи", "давит")),
+        ("Игнорирование отказа", 3, ("отказ", "не слыш", "не принима", "обижается", "дуется")),
+        ("Использование близости как награды или наказания", 2, ("наказ", "награ", "лиша", "манипулир")),
+        ("Унижение и сравнения", 2, ("сравнива", "бывш", "униж", "стыд", "критику")),
+    ],
+    "social": [
+        ("Двойное поведение дома и на людях", 3, ("на людях", "при друзьях", "при всех", "маска", "другой человек", "публич", "двулич")),
+        ("Конфликты с окружением", 2, ("конфликт", "ссор", "враг", "ругает", "поссори")),
+        ("Унижение партнера при других", 3, ("при других", "при гостях", "позор", "униж", "высмеива")),
+        ("Ложь и манипуляции окружающими", 2, ("лжет", "врет", "вран", "обман", "манипул", "сплетн")),
+    ],
+}
+
+# Healthy signals lower a block score and count as evidence too, so that
+# answers describing a calm partner reach confidence without the LLM.
+HEALTHY_LEXICON: Dict[str, Tuple[int, Tuple[str, ...]]] = {
+    "narcissism": (2, ("поздрав", "радовал", "гордит", "выслуша", "признал", "извини", "извинил")),
+    "control": (2, ("довер", "свобод", "самостоятель", "соглас", "обсужда", "вместе реша")),
+    "gaslighting": (2, ("признает", "признал", "извини", "извинил", "ошибся", "понимает")),
+    "emotion": (2, ("спокойн", "сдержан", "обсудил", "выдерж", "ровн", "мягк")),
+    "intimacy": (2, ("уважа", "бережн", "нежн", "соглас", "спрашива")),
+    "social": (2, ("дружелюб", "вежлив", "одинаков", "поддержива", "уважитель")),
+}
+
+PERSONALITY_TYPES = {
+    "narcissism": "Нарциссический тип",
+    "control": "Контролирующий тип",
+    "gaslighting": "Манипулятивный тип",
+    "emotion": "Эмоционально нестабильный тип",
+    "intimacy": "Принуждающий тип",
+    "social": "Тип с двойным фасадом",
+}
+
+# Evidence from answers of other blocks counts with a lower weight
+CROSS_BLOCK_WEIGHT = 0.3
+# Pseudo-evidence pulling scores without signals to the middle of the scale
+SCORE_PRIOR = 2.0
+# Evidence per question weight needed for 50% confidence (~one moderate signal per answer)
+CONFIDENCE_EVIDENCE = 2.0
+DEFAULT_QUESTION_WEIGHT = 2
+MAX_RED_FLAGS = 7
+
+_NEGATED = re.compile(r'\b(?:не|ни|никогда|без)(?:\s+(?:не|ни|никогда))*\s+([а-яё]+)')
+_WORD = re.compile(r'\b[а-яё]+\b')
+
+ModelT = TypeVar("ModelT", bound=BaseModel)
+
+
+def _normalize(text: str) -> str:
+    return text.lower().replace("ё", "е")
+
+
+def _build_tables():
+    """Stem vocabulary and weight matrices, built once at import"""
+    stems: List[str] = []
+    stem_index: Dict[str, int] = {}
+
+    def index_of(stem: str) -> int:
+        stem = _normalize(stem)
+        if stem not in stem_index:
+            stem_index[stem] = len(stems)
+            stems.append(stem)
+        return stem_index[stem]
+
+    signals: List[Tuple[str, str, int, List[int]]] = []
+    for block, entries in RISK_LEXICON.items():
+        for flag, weight, block_stems in entries:
+            signals.append((block, flag, weight, [index_of(stem) for stem in block_stems]))
+    healthy = {block: (weight, [index_of(stem) for stem in block_stems])
+               for block, (weight, block_stems) in HEALTHY_LEXICON.items()}
+
+    risk = np.zeros((len(stems), len(BLOCKS)), dtype=np.float32)
+    signal_matrix = np.zeros((len(stems), len(signals)), dtype=np.float32)
+    for column, (block, _, weight, indexes) in enumerate(signals):
+        signal_matrix[indexes, column] = weight
+        b = BLOCKS.index(block)
+        risk[indexes, b] = np.maximum(risk[indexes, b], weight)
+    healthy_matrix = np.zeros((len(stems), len(BLOCKS)), dtype=np.float32)
+    for block, (weight, indexes) in healthy.items():
+        healthy_matrix[indexes, BLOCKS.index(block)] = weight
+
+    # Phrases ("не пуска", "на людях") are matched on the raw text, single
+    # stems on words, looked up by their first letters
+    phrases = [(i, stem) for i, stem in enumerate(stems) if " " in stem or "-" in stem]
+    by_prefix: Dict[str, List[Tuple[int, str]]] = {}
+    for i, stem in enumerate(stems):
+        if " " not in stem and "-" not in stem:
+            by_prefix.setdefault(stem[:_PREFIX_LENGTH], []).append((i, stem))
+    signal_info = [(block, flag) for block, flag, _, _ in signals]
+    return stems, by_prefix, phrases, risk, healthy_matrix, signal_matrix, signal_info
+
+
+_PREFIX_LENGTH = 3
+_STEMS, _STEMS_BY_PREFIX, _PHRASE_STEMS, _RISK, _HEALTHY, _SIGNALS, _SIGNAL_INFO = _build_tables()
+
+_QUESTION_META: Dict[str, Tuple[str, int]] = {
+    question_id: (question["block"], question.get("weight", DEFAULT_QUESTION_WEIGHT))
+    for question_id, question in {**get_all_questions(), **FREE_FORM_QUESTIONS}.items()
+}
+
+
+def _stem_hits(text: str) -> np.ndarray:
+    """Binary stem vector of one answer (negated mentions do not count)"""
+    text = _normalize(text)
+    counts = Counter(_WORD.findall(text))
+    negated = Counter(_NEGATED.findall(text))
+    keywords = [
+        word for word in extract_keywords(text, top_n=len(counts))
+        if counts[word] > negated[word]
+    ]
+
+    hits = np.zeros(len(_STEMS), dtype=np.float32)
+    for word in keywords:
+        for index, stem in _STEMS_BY_PREFIX.get(word[:_PREFIX_LENGTH], ()):
+            if word.startswith(stem):
+                hits[index] = 1.0
+    for index, phrase in _PHRASE_STEMS:
+        if phrase in text:
+            hits[index] = 1.0
+    return hits
+
+
+@dataclass
+class LocalScores:
+    """Result of local scoring in the shape of the LLM metrics"""
+
+    block_scores: Dict[str, float]
+    overall_risk_score: float
+    urgency_level: str
+    red_flags: List[str]
+    personality_type: str
+    key_concerns: List[str]
+    confidence: float
+    block_confidence: Dict[str, float] = field(default_factory=dict)
+
+    def to_metrics(self, model: Type[ModelT]) -> ModelT:
+        """Validate into ProfileMetrics / FreeFormProfileMetrics"""
+        data = {
+            "overall_risk_score": self.overall_risk_score,
+            "urgency_level": self.urgency_level,
+            "block_scores": self.block_scores,
+            "red_flags": self.red_flags,
+            "personality_type": self.personality_type,
+        }
+        if "key_concerns" in model.model_fields:
+            data["key_concerns"] = self.key_concerns
+        return model.model_validate(data)
+
+
+def score_answers(answers: List[Dict[str, Any]]) -> LocalScores:
+    """
+    Score free-form answers with the block lexicons
+
+    Every answer becomes a binary vector of matched stems; the answer x
+    stem matrix is multiplied by the risk and healthy weight tables and
+    summed per block, weighting answers by their question weight and
+    answers of other blocks by CROSS_BLOCK_WEIGHT. Deterministic and
+    reproducible for the same answers.
+
+    Args:
+        answers: Answers with 'answer' and 'question_id' or 'block'
+
+    Returns:
+        Block scores 0-10, overall risk 0-100, flags and confidence 0-1
+    """
+    rows = [_stem_hits(str(answer.get("answer", ""))) for answer in answers]
+    hits = np.vstack(rows) if rows else np.zeros((0, len(_STEMS)), dtype=np.float32)
+
+    question_weights = np.empty(len(answers), dtype=np.float32)
+    own_block = np.zeros((len(answers), len(BLOCKS)), dtype=np.float32)
+    for i, answer in enumerate(answers):
+        block, weight = _QUESTION_META.get(
+            answer.get("question_id", ""), (answer.get("block"), DEFAULT_QUESTION_WEIGHT)
+        )
+        question_weights[i] = weight
+        if block in BLOCKS:
+            own_block[i, BLOCKS.index(block)] = 1.0
+    block_mask = own_block + CROSS_BLOCK_WEIGHT * (1.0 - own_block)
+    weighted_mask = block_mask * question_weights[:, None]
+
+    risk = ((hits @ _RISK) * weighted_mask).sum(axis=0)
+    healthy = ((hits @ _HEALTHY) * weighted_mask).sum(axis=0)
+    evidence = risk + healthy
+
+    scores = 10.0 * (risk + 0.5 * SCORE_PRIOR) / (evidence + SCORE_PRIOR)
+    block_weight = (own_block * question_weights[:, None]).sum(axis=0)
+    block_confidence = evidence / (evidence + CONFIDENCE_EVIDENCE * np.maximum(block_weight, 1.0))
+
+    answered = block_weight > 0
+    if answered.any():
+        overall = float((scores * block_weight).sum() / block_weight.sum() * 10.0)
+        confidence = float(block_confidence[answered].mean())
+    else:
+        overall, confidence = 0.0, 0.0
+
+    signal_evidence = question_weights @ (hits @ _SIGNALS)
+    red_flags = [
+        _SIGNAL_INFO[i][1] for i in np.argsort(-signal_evidence, kind="stable")
+        if signal_evidence[i] > 0
+    ][:MAX_RED_FLAGS]
+
+    block_scores = {block: round(float(score), 1) for block, score in zip(BLOCKS, scores)}
+    # Blocks without any signal sit at the prior and do not define the type
+    ranked = sorted((block for i, block in enumerate(BLOCKS) if answered[i] and evidence[i] > 0),
+                    key=lambda block: -block_scores[block])
+    if not ranked or block_scores[ranked[0]] < 4.0:
+        personality_type = "Без выраженных токсичных паттернов"
+    else:
+        personality_type = PERSONALITY_TYPES[ranked[0]]
+        if len(ranked) > 1 and block_scores[ranked[1]] >= 6.0:
+            personality_type += f" с выраженным компонентом «{BLOCK_TITLES[ranked[1]].lower()}»"
+
+    return LocalScores(
+        block_scores=block_scores,
+        overall_risk_score=round(overall, 1),
+        urgency_level=get_urgency_level(overall).value.upper(),
+        red_flags=red_flags,
+        personality_type=personality_type,
+        key_concerns=[
+            f"{BLOCK_TITLES[block]}: {block_scores[block]}/10"
+            for block in ranked if block_scores[block] >= 6.0
+        ],
+        confidence=round(confidence, 3),
+        block_confidence={block: round(float(value), 3) for block, value in zip(BLOCKS, block_confidence)},
+    )
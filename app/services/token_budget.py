@@ -0,0 +1,204 @@
+"""Token estimation and output budget planning for AI calls"""
+
+import math
+import re
+from typing import Any, Dict, List, Optional
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.utils.exceptions import AIServiceError
+from app.utils.helpers import chunk_text
+
+# Character classes and their average characters per token. Cyrillic is
+# split into much shorter pieces than Latin by BPE tokenizers.
+_CYRILLIC_RUN = re.compile(r'[а-яА-ЯёЁ]+')
+_LATIN_RUN = re.compile(r'[a-zA-Z]+')
+_DIGIT_RUN = re.compile(r'[0-9]+')
+_SPACE_RUN = re.compile(r'\s+')
+_CHARS_PER_TOKEN = {"cyrillic": 2.4, "latin": 4.0, "digit": 2.0, "other": 1.6}
+
+# Per-message framing (role markers, separators)
+_MESSAGE_OVERHEAD = 4
+
+# Expected response size per call purpose: (tokens, settings attribute with the cap).
+# Portrait targets follow the word counts requested in the prompts
+# (~2.8 tokens per Russian word plus headroom for headings).
+OUTPUT_TARGETS: Dict[str, tuple] = {
+    "free_form_portrait": (11500, "MAX_TOKENS_PROFILING"),  # 3000-3500 слов
+    "profile_portrait": (8500, "MAX_TOKENS_PROFILING"),  # 2400-2700 слов
+    "text_analysis": (3000, "MAX_TOKENS_ANALYSIS"),
+    "compatibility": (3000, "MAX_TOKENS_ANALYSIS"),
+    "profile_metrics": (800, "MAX_TOKENS_DEFAULT"),
+    "free_form_profile_metrics": (1200, "MAX_TOKENS_DEFAULT"),
+    "block_summary": (700, "MAX_TOKENS_DEFAULT"),  # 250-300 слов
+}
+DEFAULT_OUTPUT_TARGET = (2000, "MAX_TOKENS_DEFAULT")
+
+# Input budget for short JSON metric calls
+METRICS_INPUT_BUDGET = 6000
+
+# Room kept free in the context window for estimation error
+_CONTEXT_SAFETY_MARGIN = 0.05
+_MIN_OUTPUT_TOKENS = 256
+
+_ELLIPSIS = " […] "
+
+
+class TokenEstimator:
+    """
+    Calibrated chars-per-token model
+
+    Counts characters per script and divides by a per-script ratio, then
+    multiplies by a calibration factor learned from the provider's reported
+    prompt_tokens, so estimates converge to the real tokenizer over time.
+    """
+
+    def __init__(self, alpha: float = 0.1):
+        self.alpha = alpha
+        self.calibration = 1.0
+        self.observations = 0
+
+    def estimate_raw(self, text: str) -> float:
+        """Uncalibrated token estimate"""
+        if not text:
+            return 0.0
+        cyrillic = sum(len(run) for run in _CYRILLIC_RUN.findall(text))
+        latin = sum(len(run) for run in _LATIN_RUN.findall(text))
+        digits = sum(len(run) for run in _DIGIT_RUN.findall(text))
+        spaces = sum(len(run) for run in _SPACE_RUN.findall(text))
+        other = max(0, len(text) - cyrillic - latin - digits - spaces)
+        return (
+            cyrillic / _CHARS_PER_TOKEN["cyrillic"]
+            + latin / _CHARS_PER_TOKEN["latin"]
+            + digits / _CHARS_PER_TOKEN["digit"]
+            + other / _CHARS_PER_TOKEN["other"]
+        )
+
+    def estimate(self, text: str) -> int:
+        """Estimated number of tokens in text"""
+        return math.ceil(self.estimate_raw(text) * self.calibration)
+
+    def estimate_messages(self, *contents: str) -> int:
+        """Estimated prompt tokens of a chat request"""
+        return sum(self.estimate(content) + _MESSAGE_OVERHEAD for content in contents if content)
+
+    def observe(self, estimated: int, actual: int) -> None:
+        """Update calibration from a provider-reported prompt size"""
+        if estimated <= 0 or actual <= 0:
+            return
+        ratio = min(2.0, max(0.5, actual / estimated))
+        self.calibration *= (1 - self.alpha) + self.alpha * ratio
+        self.observations += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "calibration": round(self.calibration, 4),
+            "observations": self.observations,
+        }
+
+
+def plan_output_tokens(purpose: str, prompt_tokens: int, requested: Optional[int] = None) -> int:
+    """
+    Size max_tokens for a call
+
+    Takes the expected response size for the purpose (or an explicit
+    request), caps it by the MAX_TOKENS_* setting and by what is left in the
+    model context after the prompt.
+
+    Raises:
+        AIServiceError: if the prompt leaves no room for a response
+    """
+    target, cap_setting = OUTPUT_TARGETS.get(purpose, DEFAULT_OUTPUT_TARGET)
+    desired = min(requested or target, getattr(settings, cap_setting))
+
+    context_window = settings.model_max_tokens
+    available = int(context_window * (1 - _CONTEXT_SAFETY_MARGIN)) - prompt_tokens
+    if available < _MIN_OUTPUT_TOKENS:
+        raise AIServiceError(
+            f"Запрос слишком большой: ~{prompt_tokens} токенов при контексте {context_window}"
+        )
+
+    if desired > available:
+        logger.warning(f"⚠️ [{purpose}] output budget cut to {available} tokens by context window")
+    return min(desired, available)
+
+
+def input_budget(purpose: str, fixed_prompt_tokens: int = 0) -> int:
+    """Tokens left for variable input after the response and fixed prompt parts"""
+    target, cap_setting = OUTPUT_TARGETS.get(purpose, DEFAULT_OUTPUT_TARGET)
+    output = min(target, getattr(settings, cap_setting))
+    usable = int(settings.model_max_tokens * (1 - _CONTEXT_SAFETY_MARGIN))
+    return max(0, usable - output - fixed_prompt_tokens)
+
+
+def fit_text(text: str, max_tokens: int) -> str:
+    """
+    Shrink text to about max_tokens
+
+    Splits with chunk_text at sentence boundaries and keeps chunks from the
+    beginning and the end (where answers usually put context and outcome),
+    marking the gap.
+    """
+    estimated = token_estimator.estimate(text)
+    if estimated <= max_tokens:
+        return text
+
+    chars_per_token = len(text) / max(1, estimated)
+    char_budget = max(1, int(max_tokens * chars_per_token))
+    chunk_size = max(50, char_budget // 4)
+    chunks = chunk_text(text, chunk_size=chunk_size, overlap=0)
+
+    head: List[str] = []
+    tail: List[str] = []
+    used = 0
+    left, right = 0, len(chunks) - 1
+    take_head = True
+    while left <= right:
+        chunk = chunks[left] if take_head else chunks[right]
+        if used + len(chunk) > char_budget:
+            break
+        used += len(chunk)
+        if take_head:
+            head.append(chunk)
+            left += 1
+        else:
+            tail.append(chunk)
+            right -= 1
+        take_head = not take_head
+
+    if not head:
+        return text[:char_budget] + _ELLIPSIS.rstrip()
+    return " ".join(head) + _ELLIPSIS + " ".join(reversed(tail))
+
+
+def fit_answers(answers: List[Dict[str, Any]], max_tokens: int, field: str = "answer") -> List[Dict[str, Any]]:
+    """
+    Fit answers into a shared token budget
+
+    Short answers stay intact; the rest of the budget is split evenly
+    between the long ones, each shrunk with fit_text.
+    """
+    sizes = [token_estimator.estimate(str(answer.get(field, ""))) for answer in answers]
+    if sum(sizes) <= max_tokens:
+        return answers
+
+    shares = [0] * len(answers)
+    remaining = max_tokens
+    order = sorted(range(len(answers)), key=lambda i: sizes[i])
+    for position, index in enumerate(order):
+        share = remaining // (len(order) - position)
+        shares[index] = min(sizes[index], share)
+        remaining -= shares[index]
+
+    fitted = []
+    for answer, size, share in zip(answers, sizes, shares):
+        if size > share:
+            answer = {**answer, field: fit_text(str(answer.get(field, "")), share)}
+        fitted.append(answer)
+
+    logger.info(f"✂️ Answers shrunk from ~{sum(sizes)} to ~{max_tokens} tokens")
+    return fitted
+
+
+# Process-wide estimator, calibrated by every finished call
+token_estimator = TokenEstimator()
@@ -12,6 +12,7 @@ from app.models.analytics import UserActivity, UserAchievement
 from app.models.subscription import Subscription
 from app.utils.enums import SubscriptionType, ActivityType, AnalysisType, UrgencyLevel
 from app.core.logging import logger
+from app.services.notification_scheduler import notification_scheduler
 
 
 class UserService:
@@ -48,6 +49,12 @@ class UserService:
                     
                     await self.session.commit()
                 
+                if user.is_active is False:
+                    # Marked inactive after blocking the bot: writing again means unblocked
+                    user.is_active = True
+                    await self.session.commit()
+                    await notification_scheduler.schedule_user(user)
+                
                 return user
             
             # Create new user
@@ -66,6 +73,7 @@ class UserService:
             
             # Log user registration
             await self.log_activity(user.id, ActivityType.USER_REGISTERED)
+            await notification_scheduler.schedule_user(user)
             
             logger.info(f"New user created: {telegram_id}")
             return user
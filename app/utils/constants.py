@@ -90,6 +90,19 @@ SUCCESS_MESSAGES = {
 NOTIFICATION_TEMPLATES = {
     "daily_tip": "💡 <b>Совет дня</b>\n\n{content}",
     "analysis_reminder": "📊 Не забудь проанализировать важные сообщения!",
+    "weekly_stats": "📈 <b>Ваша неделя</b>\n\nАнализов за 7 дней: {week_analyses}\nВсего анализов: {total_analyses}",
     "subscription_expires": "⏰ Твоя подписка истекает через {days} дней.",
     "new_feature": "🆕 Новая функция доступна: {feature_name}",
-} 
\ No newline at end of file
+}
+
+# Daily tips, one per day in rotation
+DAILY_TIPS = [
+    "<b>Активное слушание — ключ к пониманию.</b> Когда партнер говорит, сосредоточьтесь на его словах "
+    "и задавайте уточняющие вопросы, а не готовьте ответ.",
+    "<b>Говорите о чувствах, а не об обвинениях.</b> «Мне обидно, когда…» звучит иначе, чем «Ты всегда…».",
+    "<b>Замечайте хорошее.</b> Скажите партнеру сегодня одну конкретную вещь, за которую вы ему благодарны.",
+    "<b>Границы — это нормально.</b> Спокойно скажите «нет» тому, что вам неприятно, и посмотрите на реакцию.",
+    "<b>Пауза в споре.</b> Если разговор накаляется, договоритесь вернуться к нему через 20 минут.",
+    "<b>Время вдвоем.</b> Выделите 15 минут без телефонов только для разговора друг с другом.",
+    "<b>Доверяйте фактам.</b> Если слова и поступки расходятся, ориентируйтесь на поступки.",
+]
@@ -19,6 +19,12 @@ class AIServiceError(PsychoDetectiveException):
         super().__init__(message, "AI_ERROR")
 
 
+class StructuredOutputError(AIServiceError):
+    """Exception raised when AI output does not match the expected structure"""
+    def __init__(self, message: str = "Invalid structured output"):
+        super().__init__(message)
+
+
 class RateLimitError(PsychoDetectiveException):
     """Exception raised when rate limit is exceeded"""
     def __init__(self, message: str = "Rate limit exceeded"):
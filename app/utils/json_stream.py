@@ -0,0 +1,278 @@
+"""Incremental single-pass JSON parser for streamed model output"""
+
+import json
+import re
+from typing import Any, Callable, List, Optional, Tuple, Union
+
+from app.utils.exceptions import StructuredOutputError
+
+JSONPath = Tuple[Union[str, int], ...]
+
+# Fast paths: consume whole runs of plain string / scalar characters at once
+_STRING_RUN = re.compile(r'[^"\\]+')
+_SCALAR_RUN = re.compile(r'[-+0-9.eEtrufalsn]+')
+_WHITESPACE = " \t\r\n"
+_SCALAR_START = "-0123456789tfn"
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+# Container expectations
+_KEY_OR_END = 0
+_KEY = 1
+_COLON = 2
+_VALUE = 3
+_VALUE_OR_END = 4
+_NEXT = 5
+
+
+class _Frame:
+    """Open object or array"""
+
+    __slots__ = ("container", "key", "expect")
+
+    def __init__(self, container: Union[dict, list]):
+        self.container = container
+        self.key: Optional[str] = None
+        self.expect = _KEY_OR_END if isinstance(container, dict) else _VALUE_OR_END
+
+
+class IncrementalJSONParser:
+    """
+    Push parser that builds a JSON document from arbitrary text chunks
+
+    Every character is looked at once, so cost is linear in the response
+    size no matter how it is split. Text before the first '{' or '[' (and
+    after the root value closes) is skipped, which covers ```json fences and
+    short preambles. Each completed value is reported to on_value with its
+    path, e.g. ("overall_risk_score",) or ("block_scores", "control"), so
+    callers can act on fields before the rest of the response arrives.
+    """
+
+    def __init__(self, on_value: Optional[Callable[[JSONPath, Any], None]] = None):
+        self.on_value = on_value
+        self._stack: List[_Frame] = []
+        self._root: Any = None
+        self._done = False
+        self._position = 0
+
+        # Token being read: None, "string" or "scalar"
+        self._token: Optional[str] = None
+        self._buffer: List[str] = []
+        self._is_key = False
+        self._escape = False
+        self._unicode: Optional[str] = None
+        self._had_unicode = False
+
+    @property
+    def done(self) -> bool:
+        """Check if the root value has been closed"""
+        return self._done
+
+    def feed(self, chunk: str) -> None:
+        """Consume next piece of text"""
+        i = 0
+        size = len(chunk)
+
+        while i < size and not self._done:
+            if self._token == "string":
+                i = self._read_string(chunk, i)
+                continue
+
+            if self._token == "scalar":
+                match = _SCALAR_RUN.match(chunk, i)
+                if match:
+                    self._buffer.append(match.group())
+                    i = match.end()
+                    if i >= size:
+                        break
+                self._finish_scalar()
+                continue
+
+            ch = chunk[i]
+            i += 1
+            self._step(ch)
+
+        self._position += size
+
+    def close(self) -> Any:
+        """
+        Finish parsing
+
+        Returns:
+            Parsed root value
+
+        Raises:
+            StructuredOutputError: if no complete JSON value was received
+        """
+        if self._token == "scalar" and self._stack:
+            self._finish_scalar()
+        if not self._done:
+            raise StructuredOutputError("Ответ AI оборвался до конца JSON")
+        return self._root
+
+    def _read_string(self, chunk: str, i: int) -> int:
+        """Read string body starting at i, return next index"""
+        size = len(chunk)
+        while i < size:
+            if self._unicode is not None:
+                self._unicode += chunk[i]
+                i += 1
+                if len(self._unicode) == 4:
+                    try:
+                        self._buffer.append(chr(int(self._unicode, 16)))
+                    except ValueError:
+                        raise StructuredOutputError(f"Неверная \\u-последовательность: {self._unicode}")
+                    self._unicode = None
+                continue
+
+            if self._escape:
+                ch = chunk[i]
+                i += 1
+                self._escape = False
+                if ch == 'u':
+                    self._unicode = ""
+                    self._had_unicode = True
+                elif ch in _ESCAPES:
+                    self._buffer.append(_ESCAPES[ch])
+                else:
+                    raise StructuredOutputError(f"Неверная escape-последовательность: \\{ch}")
+                continue
+
+            match = _STRING_RUN.match(chunk, i)
+            if match:
+                self._buffer.append(match.group())
+                i = match.end()
+                continue
+
+            ch = chunk[i]
+            i += 1
+            if ch == '\\':
+                self._escape = True
+            else:  # closing quote
+                value = "".join(self._buffer)
+                self._buffer = []
+                self._token = None
+                if self._had_unicode:
+                    # Join surrogate pairs from \uXXXX\uXXXX
+                    value = value.encode("utf-16", "surrogatepass").decode("utf-16")
+                    self._had_unicode = False
+                if self._is_key:
+                    self._set_key(value)
+                else:
+                    self._complete(value)
+                return i
+        return i
+
+    def _step(self, ch: str) -> None:
+        """Handle one structural character"""
+        if not self._stack:
+            # Skip everything until the root container opens
+            if ch == '{':
+                self._stack.append(_Frame({}))
+            elif ch == '[':
+                self._stack.append(_Frame([]))
+            return
+
+        if ch in _WHITESPACE:
+            return
+
+        frame = self._stack[-1]
+        expect = frame.expect
+
+        if expect in (_KEY_OR_END, _KEY):
+            if ch == '"':
+                self._start_string(is_key=True)
+            elif ch == '}' and expect == _KEY_OR_END:
+                self._close(dict)
+            else:
+                self._unexpected(ch)
+        elif expect == _COLON:
+            if ch == ':':
+                frame.expect = _VALUE
+            else:
+                self._unexpected(ch)
+        elif expect in (_VALUE, _VALUE_OR_END):
+            if ch == ']' and expect == _VALUE_OR_END:
+                self._close(list)
+            else:
+                self._start_value(ch)
+        else:  # _NEXT
+            if ch == ',':
+                frame.expect = _KEY if isinstance(frame.container, dict) else _VALUE
+            elif ch == '}':
+                self._close(dict)
+            elif ch == ']':
+                self._close(list)
+            else:
+                self._unexpected(ch)
+
+    def _start_value(self, ch: str) -> None:
+        if ch == '"':
+            self._start_string(is_key=False)
+        elif ch == '{':
+            self._stack.append(_Frame({}))
+        elif ch == '[':
+            self._stack.append(_Frame([]))
+        elif ch in _SCALAR_START:
+            self._token = "scalar"
+            self._buffer = [ch]
+        else:
+            self._unexpected(ch)
+
+    def _start_string(self, is_key: bool) -> None:
+        self._token = "string"
+        self._is_key = is_key
+        self._buffer = []
+
+    def _finish_scalar(self) -> None:
+        text = "".join(self._buffer)
+        self._buffer = []
+        self._token = None
+        try:
+            value = json.loads(text)
+        except ValueError:
+            raise StructuredOutputError(f"Неверное значение в JSON: {text[:20]}")
+        self._complete(value)
+
+    def _set_key(self, key: str) -> None:
+        frame = self._stack[-1]
+        frame.key = key
+        frame.expect = _COLON
+
+    def _close(self, kind: type) -> None:
+        frame = self._stack.pop()
+        if not isinstance(frame.container, kind):
+            self._unexpected('}' if kind is dict else ']')
+        self._complete(frame.container)
+
+    def _complete(self, value: Any) -> None:
+        """Attach finished value to its parent and report it"""
+        if not self._stack:
+            self._root = value
+            self._done = True
+            path: JSONPath = ()
+        else:
+            frame = self._stack[-1]
+            if isinstance(frame.container, dict):
+                frame.container[frame.key] = value
+                key: Union[str, int] = frame.key
+            else:
+                key = len(frame.container)
+                frame.container.append(value)
+            frame.expect = _NEXT
+            path = tuple(
+                f.key if isinstance(f.container, dict) else len(f.container)
+                for f in self._stack[:-1]
+            ) + (key,)
+
+        if self.on_value:
+            self.on_value(path, value)
+
+    def _unexpected(self, ch: str) -> None:
+        raise StructuredOutputError(f"Неожиданный символ '{ch}' в JSON (около позиции {self._position})")
+
+
+def parse_json_stream(text: str) -> Any:
+    """Parse a complete response with the incremental parser"""
+    parser = IncrementalJSONParser()
+    parser.feed(text)
+    return parser.close()
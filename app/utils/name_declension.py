@@ -0,0 +1,182 @@
+"""Russian first-name declension"""
+
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Dict, Mapping, NamedTuple, Optional, Tuple
+
+# Name used when the partner name is empty
+DEFAULT_NAME = "партнер"
+
+CASES = ("nominative", "genitive", "dative", "accusative", "instrumental", "prepositional")
+
+
+class NameForms(NamedTuple):
+    """A name in all six cases; getattr(forms, case) picks one"""
+    nominative: str
+    genitive: str
+    dative: str
+    accusative: str
+    instrumental: str
+    prepositional: str
+
+
+def _forms(*forms: str) -> NameForms:
+    return NameForms(*forms)
+
+
+# Popular names with their exact forms (irregular stems included)
+KNOWN_NAMES: Mapping[str, NameForms] = MappingProxyType({
+    # Женские имена
+    "анна": _forms("Анна", "Анны", "Анне", "Анну", "Анной", "Анне"),
+    "мария": _forms("Мария", "Марии", "Марии", "Марию", "Марией", "Марии"),
+    "елена": _forms("Елена", "Елены", "Елене", "Елену", "Еленой", "Елене"),
+    "татьяна": _forms("Татьяна", "Татьяны", "Татьяне", "Татьяну", "Татьяной", "Татьяне"),
+    "ольга": _forms("Ольга", "Ольги", "Ольге", "Ольгу", "Ольгой", "Ольге"),
+    "наталья": _forms("Наталья", "Натальи", "Наталье", "Наталью", "Натальей", "Наталье"),
+    "ирина": _forms("Ирина", "Ирины", "Ирине", "Ирину", "Ириной", "Ирине"),
+    "светлана": _forms("Светлана", "Светланы", "Светлане", "Светлану", "Светланой", "Светлане"),
+    "юлия": _forms("Юлия", "Юлии", "Юлии", "Юлию", "Юлией", "Юлии"),
+    "екатерина": _forms("Екатерина", "Екатерины", "Екатерине", "Екатерину", "Екатериной", "Екатерине"),
+    "любовь": _forms("Любовь", "Любови", "Любови", "Любовь", "Любовью", "Любови"),
+    # Мужские имена
+    "александр": _forms("Александр", "Александра", "Александру", "Александра", "Александром", "Александре"),
+    "алексей": _forms("Алексей", "Алексея", "Алексею", "Алексея", "Алексеем", "Алексее"),
+    "андрей": _forms("Андрей", "Андрея", "Андрею", "Андрея", "Андреем", "Андрее"),
+    "дмитрий": _forms("Дмитрий", "Дмитрия", "Дмитрию", "Дмитрия", "Дмитрием", "Дмитрии"),
+    "сергей": _forms("Сергей", "Сергея", "Сергею", "Сергея", "Сергеем", "Сергее"),
+    "владимир": _forms("Владимир", "Владимира", "Владимиру", "Владимира", "Владимиром", "Владимире"),
+    "михаил": _forms("Михаил", "Михаила", "Михаилу", "Михаила", "Михаилом", "Михаиле"),
+    "николай": _forms("Николай", "Николая", "Николаю", "Николая", "Николаем", "Николае"),
+    "игорь": _forms("Игорь", "Игоря", "Игорю", "Игоря", "Игорем", "Игоре"),
+    "евгений": _forms("Евгений", "Евгения", "Евгению", "Евгения", "Евгением", "Евгении"),
+    "павел": _forms("Павел", "Павла", "Павлу", "Павла", "Павлом", "Павле"),
+    "петр": _forms("Пётр", "Петра", "Петру", "Петра", "Петром", "Петре"),
+    "лев": _forms("Лев", "Льва", "Льву", "Льва", "Львом", "Льве"),
+})
+
+_INDECLINABLE = ("", "", "", "", "")
+
+# Suffix rules for unknown names: suffix -> (letters to cut, endings of the
+# five oblique cases). The longest matching suffix wins; "" is the default
+# for names ending in a consonant.
+SUFFIX_RULES: Mapping[str, Tuple[int, Tuple[str, ...]]] = MappingProxyType({
+    "": (0, ("а", "у", "а", "ом", "е")),
+    "а": (1, ("ы", "е", "у", "ой", "е")),
+    "ка": (1, ("и", "е", "у", "ой", "е")),
+    "га": (1, ("и", "е", "у", "ой", "е")),
+    "ха": (1, ("и", "е", "у", "ой", "е")),
+    "жа": (1, ("и", "е", "у", "ей", "е")),
+    "ша": (1, ("и", "е", "у", "ей", "е")),
+    "ча": (1, ("и", "е", "у", "ей", "е")),
+    "ща": (1, ("и", "е", "у", "ей", "е")),
+    "я": (1, ("и", "е", "ю", "ей", "е")),
+    "ия": (1, ("и", "и", "ю", "ей", "и")),
+    "ь": (1, ("я", "ю", "я", "ем", "е")),
+    "й": (1, ("я", "ю", "я", "ем", "е")),
+    "ий": (1, ("я", "ю", "я", "ем", "и")),
+    # Names ending in these vowels are not declined (Нелли, Марго)
+    "о": (0, _INDECLINABLE),
+    "е": (0, _INDECLINABLE),
+    "и": (0, _INDECLINABLE),
+    "у": (0, _INDECLINABLE),
+    "ю": (0, _INDECLINABLE),
+    "э": (0, _INDECLINABLE),
+    "ы": (0, _INDECLINABLE),
+})
+
+_RULE = "$"
+
+
+def _build_suffix_trie(rules: Mapping[str, Tuple[int, Tuple[str, ...]]]) -> Dict[str, dict]:
+    """Trie over reversed suffixes, a node's rule is stored under _RULE"""
+    root: Dict[str, dict] = {}
+    for suffix, rule in rules.items():
+        node = root
+        for char in reversed(suffix):
+            node = node.setdefault(char, {})
+        node[_RULE] = rule
+    return root
+
+
+_SUFFIX_TRIE = _build_suffix_trie(SUFFIX_RULES)
+
+
+def normalize_name(name: str) -> str:
+    """Cache key of a name: lower case, single spaces, ё as е"""
+    return " ".join(name.split()).lower().replace("ё", "е")
+
+
+@lru_cache(maxsize=4096)
+def _paradigm(normalized: str) -> Tuple[Optional[NameForms], int, Tuple[str, ...]]:
+    """Exact forms of a known name, or the suffix rule for an unknown one"""
+    known = KNOWN_NAMES.get(normalized)
+    if known is not None:
+        return known, 0, ()
+
+    if not normalized or not "а" <= normalized[-1] <= "я":
+        # Latin names, numbers ("Партнер #3"): left as is
+        return None, 0, _INDECLINABLE
+
+    node = _SUFFIX_TRIE
+    rule = node[_RULE]
+    for char in reversed(normalized):
+        node = node.get(char)
+        if node is None:
+            break
+        rule = node.get(_RULE, rule)
+    cut, endings = rule
+    return None, cut, endings
+
+
+def decline_name_all(name: Optional[str]) -> NameForms:
+    """
+    Decline a first name into all six cases
+
+    Args:
+        name: Name as entered by the user
+
+    Returns:
+        NameForms with the nominative ... prepositional forms
+    """
+    name = " ".join((name or "").split()) or DEFAULT_NAME
+    known, cut, endings = _paradigm(normalize_name(name))
+    if known is not None:
+        return known
+
+    stem = name[:-cut] if cut else name
+    return NameForms(name, *(stem + ending if ending else name for ending in endings))
+
+
+def decline_name(name: Optional[str], case: str = "nominative") -> str:
+    """
+    Decline a first name into one case
+
+    Args:
+        name: Name as entered by the user
+        case: One of CASES; unknown cases give the nominative
+
+    Returns:
+        Declined name
+    """
+    forms = decline_name_all(name)
+    return getattr(forms, case) if case in CASES else forms.nominative
+
+
+# Initial letters read as a vowel sound take «об»; е, ё, ю, я start with «й» and take «о»
+_OB_INITIALS = frozenset("аоуэиaeiou")
+
+
+def about_name(name: Optional[str], capitalize: bool = False) -> str:
+    """
+    Preposition «о»/«об» with the name in the prepositional case
+
+    Args:
+        name: Name as entered by the user
+        capitalize: Start with a capital letter (beginning of a sentence)
+
+    Returns:
+        "о Марии", "об Анне", "об Ольге"
+    """
+    declined = decline_name(name, "prepositional")
+    preposition = "об" if declined[:1].lower() in _OB_INITIALS else "о"
+    return f"{preposition.capitalize() if capitalize else preposition} {declined}"
@@ -0,0 +1,178 @@
+"""Single-pass formatter for streamed narrative (portrait) model output"""
+
+import html
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+# Duplicate report titles the model sometimes repeats
+_DUPLICATE_TITLES = ("ПЕРСОНАЛИЗИРОВАННЫЙ ПСИХОЛОГИЧЕСКИЙ АНАЛИЗ", "ПЕРСОНАЛИЗИРОВАННЫЙ АНАЛИЗ")
+_PDF_DUPLICATE_TITLE = "ПЕРСОНАЛИЗИРОВАННЫЙ ПСИХОЛОГИЧЕСКИЙ АНАЛИЗ"
+_MAIN_TITLE = "ПСИХОЛОГИЧЕСКИЙ ПОРТРЕТ"
+_SECTION_KEYWORDS = (
+    "портрет", "характеристика", "паттерн", "контрол",
+    "манипул", "эмоциональн", "интимность", "социальн",
+    "прогноз", "рекомендац"
+)
+
+
+@dataclass
+class NarrativeResult:
+    """Everything produced from one narrative response"""
+
+    text: str           # Cleaned text (stored as psychological_profile)
+    pdf_html: str       # <h4>/<p> fragments for the PDF report
+    telegram_html: str  # Preview safe for Telegram parse_mode=HTML
+
+
+class NarrativeStreamFormatter:
+    """
+    Push formatter for portrait text arriving in arbitrary chunks
+
+    Every character is handled once: complete lines are cleaned as they
+    arrive (markdown headings, duplicate titles, blank-line runs) and every
+    finished paragraph is turned into PDF and Telegram fragments right away,
+    so formatting is linear in the response size and runs while the model is
+    still generating. on_paragraph receives the Telegram HTML of each
+    finished paragraph.
+
+    With clean_markdown=False the input is taken as already cleaned text and
+    only the PDF/Telegram fragments are built.
+    """
+
+    def __init__(
+        self,
+        clean_markdown: bool = True,
+        on_paragraph: Optional[Callable[[str], None]] = None
+    ):
+        self.clean_markdown = clean_markdown
+        self.on_paragraph = on_paragraph
+        self._pending: List[str] = []
+        self._first_title_found = False
+
+        # Cleaned text
+        self._lines: List[str] = []
+        self._blank_pending = False
+
+        # Current paragraph and produced fragments
+        self._paragraph: List[str] = []
+        self._pdf: List[str] = []
+        self._telegram: List[str] = []
+
+    def feed(self, chunk: str) -> None:
+        """Consume the next piece of the response"""
+        end = chunk.find("\n")
+        if end == -1:
+            if chunk:
+                self._pending.append(chunk)
+            return
+
+        # Parts of an unfinished line are joined once, when it ends
+        self._pending.append(chunk[:end])
+        self._line("".join(self._pending))
+        start = end + 1
+        end = chunk.find("\n", start)
+        while end != -1:
+            self._line(chunk[start:end])
+            start = end + 1
+            end = chunk.find("\n", start)
+        self._pending = [chunk[start:]] if start < len(chunk) else []
+
+    def close(self) -> NarrativeResult:
+        """Flush the last line and paragraph and return the results"""
+        if self._pending:
+            self._line("".join(self._pending))
+            self._pending = []
+        self._end_paragraph()
+        return NarrativeResult(
+            text="\n".join(self._lines),
+            pdf_html="".join(self._pdf),
+            telegram_html="\n\n".join(self._telegram)
+        )
+
+    @property
+    def telegram_preview(self) -> str:
+        """Telegram HTML of the paragraphs finished so far"""
+        return "\n\n".join(self._telegram)
+
+    def _line(self, line: str) -> None:
+        if self.clean_markdown:
+            line = self._clean_line(line)
+            if line is None:
+                return
+        else:
+            line = line.strip()
+
+        if not line:
+            # Runs of blank lines collapse to one; leading ones are dropped
+            self._blank_pending = bool(self._lines)
+            self._end_paragraph()
+            return
+
+        if self._blank_pending:
+            self._lines.append("")
+            self._blank_pending = False
+        self._lines.append(line)
+
+        if _PDF_DUPLICATE_TITLE not in line:
+            self._paragraph.append(line)
+
+    def _clean_line(self, line: str) -> Optional[str]:
+        """Markdown cleanup of one line, None if the line is dropped"""
+        stripped = line.strip()
+        if len(stripped) < 100 and any(title in stripped for title in _DUPLICATE_TITLES):
+            return None
+
+        cleaned = line.lstrip("#").strip()
+        if not line.startswith("#") or not cleaned:
+            return cleaned
+
+        cleaned = cleaned.upper()
+        if not self._first_title_found and _MAIN_TITLE in cleaned:
+            # Main title keeps only the name and the type
+            self._first_title_found = True
+            cleaned = cleaned.replace(f"{_MAIN_TITLE}:", "").strip()
+            return f'<div class="analysis-main-title">{cleaned}</div>'
+        return f'<div class="analysis-section-header">{cleaned}</div>'
+
+    def _end_paragraph(self) -> None:
+        if not self._paragraph:
+            return
+        paragraph = "\n".join(self._paragraph)
+        self._paragraph = []
+
+        if _is_section_title(paragraph):
+            self._pdf.append(f'<h4 class="analysis-section-title">{paragraph}</h4>')
+            fragment = f"<b>{html.escape(paragraph, quote=False)}</b>"
+        else:
+            self._pdf.append(f'<p class="analysis-text">{paragraph}</p>')
+            fragment = _telegram_paragraph(paragraph)
+
+        self._telegram.append(fragment)
+        if self.on_paragraph:
+            self.on_paragraph(fragment)
+
+
+def _is_section_title(paragraph: str) -> bool:
+    if not paragraph.isupper() or len(paragraph) >= 150:
+        return False
+    lowered = paragraph.lower()
+    return any(keyword in lowered for keyword in _SECTION_KEYWORDS)
+
+
+def _telegram_paragraph(paragraph: str) -> str:
+    """Paragraph for Telegram: heading divs become bold, everything else is escaped"""
+    lines = []
+    for line in paragraph.split("\n"):
+        if line.startswith("<div class=\"analysis-") and line.endswith("</div>"):
+            title = line[line.index(">") + 1:-len("</div>")]
+            lines.append(f"<b>{html.escape(title, quote=False)}</b>")
+        else:
+            lines.append(html.escape(line, quote=False))
+    return "\n".join(lines)
+
+
+def format_narrative(text: str, clean_markdown: bool = True) -> NarrativeResult:
+    """Format a complete narrative in one pass"""
+    formatter = NarrativeStreamFormatter(clean_markdown=clean_markdown)
+    formatter.feed(text)
+    return formatter.close()
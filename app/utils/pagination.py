@@ -0,0 +1,164 @@
+"""Keyset (cursor) pagination helpers"""
+
+import base64
+import binascii
+import struct
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import Select, and_, or_
+
+# Cursor = (created_at in microseconds since epoch, row id), 12 bytes packed.
+# Base64 (urlsafe, unpadded) keeps it at 16 chars, well within the 64-byte
+# callback_data limit even with a prefix and direction marker.
+_CURSOR_STRUCT = struct.Struct(">qI")
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+DIRECTION_NEXT = "n"
+DIRECTION_PREV = "p"
+
+
+@dataclass
+class KeysetPage:
+    """One page of keyset-paginated rows"""
+
+    items: List[Any] = field(default_factory=list)
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """
+    Encode (created_at, id) pair into a compact cursor string
+
+    Args:
+        created_at: Row creation timestamp
+        row_id: Row primary key
+
+    Returns:
+        16-character urlsafe cursor
+    """
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+
+    micros = (created_at - _EPOCH) // timedelta(microseconds=1)
+    packed = _CURSOR_STRUCT.pack(micros, row_id)
+    return base64.urlsafe_b64encode(packed).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[datetime, int]]:
+    """
+    Decode cursor produced by encode_cursor
+
+    Args:
+        cursor: Cursor string
+
+    Returns:
+        (created_at, id) or None if cursor is empty or malformed
+    """
+    if not cursor:
+        return None
+
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        micros, row_id = _CURSOR_STRUCT.unpack(base64.urlsafe_b64decode(padded))
+    except (binascii.Error, struct.error, ValueError):
+        return None
+
+    created_at = _EPOCH + timedelta(microseconds=micros)
+    return created_at, row_id
+
+
+def build_page_callback(prefix: str, direction: str, cursor: str) -> str:
+    """Build callback_data for a page flip: '<prefix>:<n|p>:<cursor>'"""
+    return f"{prefix}:{direction}:{cursor}"
+
+
+def parse_page_callback(callback_data: str) -> Tuple[str, Optional[str]]:
+    """
+    Parse callback_data built by build_page_callback
+
+    Returns:
+        (direction, cursor); cursor is None for the first page
+    """
+    parts = callback_data.split(":", 2)
+    if len(parts) != 3 or parts[1] not in (DIRECTION_NEXT, DIRECTION_PREV):
+        return DIRECTION_NEXT, None
+    return parts[1], parts[2] or None
+
+
+async def fetch_keyset_page(
+    session,
+    query: Select,
+    model,
+    limit: int,
+    cursor: Optional[str] = None,
+    direction: str = DIRECTION_NEXT
+) -> KeysetPage:
+    """
+    Fetch one page ordered by (created_at DESC, id DESC) using a keyset cursor
+
+    Pages are newest-first. DIRECTION_NEXT returns rows older than the cursor,
+    DIRECTION_PREV returns rows newer than the cursor. One extra row is fetched
+    to detect whether more rows exist in the requested direction, so every
+    page flip is a single index range scan regardless of page number.
+
+    Args:
+        session: Async SQLAlchemy session
+        query: Base select() already filtered (e.g. by user_id)
+        model: Model class with created_at and id columns
+        limit: Page size
+        cursor: Cursor from a previous page, None for the first page
+        direction: DIRECTION_NEXT or DIRECTION_PREV
+
+    Returns:
+        KeysetPage with items in newest-first order and neighbour cursors
+    """
+    position = decode_cursor(cursor)
+    backwards = direction == DIRECTION_PREV and position is not None
+
+    if position is not None:
+        created_at, row_id = position
+        if backwards:
+            query = query.where(or_(
+                model.created_at > created_at,
+                and_(model.created_at == created_at, model.id > row_id)
+            ))
+        else:
+            query = query.where(or_(
+                model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < row_id)
+            ))
+
+    if backwards:
+        query = query.order_by(model.created_at.asc(), model.id.asc())
+    else:
+        query = query.order_by(model.created_at.desc(), model.id.desc())
+
+    result = await session.execute(query.limit(limit + 1))
+    rows = list(result.scalars().all())
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backwards:
+        rows.reverse()
+
+    page = KeysetPage(items=rows)
+    if not rows:
+        return page
+
+    first, last = rows[0], rows[-1]
+    if backwards:
+        # Came from an older page, so an older page always exists
+        page.next_cursor = encode_cursor(last.created_at, last.id)
+        if has_more:
+            page.prev_cursor = encode_cursor(first.created_at, first.id)
+    else:
+        if has_more:
+            page.next_cursor = encode_cursor(last.created_at, last.id)
+        if position is not None:
+            page.prev_cursor = encode_cursor(first.created_at, first.id)
+
+    return page
@@ -0,0 +1 @@
+"""Offline load benchmarks for the bot"""
@@ -0,0 +1,372 @@
+"""
+End-to-end benchmark of the free-form partner profiler
+
+Runs N simulated users through the whole FreeFormProfilerStates flow
+(/start -> partner info -> 28 free-form answers -> analysis -> PDF) against
+local stubs of OpenRouter, CloudLayer.io and the Telegram Bot API, and
+reports update latency percentiles, LLM calls per profile, DB queries per
+update and peak RSS.
+
+Usage:
+    python -m benchmarks.profiler_flow --users 20 --concurrency 10
+    python -m benchmarks.profiler_flow --users 5 --llm-latency-p50 2 --error-rate 0.1 --json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from loguru import logger
+
+from benchmarks.stubs import FakeTelegramServer, StubLLMServer, StubPDFServer
+
+BENCH_TOKEN = "123456:BENCH"
+FIRST_USER_ID = 7_000_000
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile, 0.0 for an empty sample"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "mean": round(statistics.fmean(values), 4) if values else 0.0,
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "p99": round(percentile(values, 99), 4),
+        "max": round(max(values), 4) if values else 0.0,
+    }
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def configure_environment(args: argparse.Namespace, llm_url: str, pdf_url: str, tmp_dir: str) -> None:
+    """Point the app at the stubs; must run before any app module is imported"""
+    db_path = os.path.join(tmp_dir, "bench.db")
+    os.environ.update({
+        "SECRET_KEY": "bench",
+        "TELEGRAM_BOT_TOKEN": BENCH_TOKEN,
+        "DATABASE_URL": args.database_url or f"sqlite+aiosqlite:///{db_path}",
+        "REDIS_URL": args.redis_url or "redis://127.0.0.1:1",
+        "OPENAI_API_KEY": "sk-or-bench",
+        "OPENROUTER_API_URL": f"{llm_url}/chat/completions",
+        "CLOUDLAYER_API_KEY": "bench",
+        "CLOUDLAYER_API_URL": pdf_url,
+        "AI_RATE_LIMIT_SECONDS": str(args.ai_rate_limit),
+        "REPORT_STORE_BACKEND": "local",
+        "REPORT_STORE_PATH": os.path.join(tmp_dir, "reports"),
+        "DEBUG": "false",
+    })
+
+
+class UpdateFactory:
+    """Builds raw Telegram updates for one simulated user"""
+
+    _update_ids = itertools.count(1)
+
+    def __init__(self, user_id: int):
+        self.user_id = user_id
+        self._message_ids = itertools.count(1)
+        self.user = {"id": user_id, "is_bot": False, "first_name": f"Bench{user_id}", "language_code": "ru"}
+        self.chat = {"id": user_id, "type": "private", "first_name": f"Bench{user_id}"}
+
+    def _message(self, text: str) -> Dict[str, Any]:
+        message: Dict[str, Any] = {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": self.chat,
+            "from": self.user,
+            "text": text,
+        }
+        if text.startswith("/"):
+            message["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        return message
+
+    def message(self, text: str) -> Dict[str, Any]:
+        return {"update_id": next(self._update_ids), "message": self._message(text)}
+
+    def callback(self, data: str) -> Dict[str, Any]:
+        bot_message = self._message("menu")
+        bot_message["from"] = {"id": 1, "is_bot": True, "first_name": "PsychoDetective"}
+        return {
+            "update_id": next(self._update_ids),
+            "callback_query": {
+                "id": f"{self.user_id}-{next(self._message_ids)}",
+                "from": self.user,
+                "chat_instance": str(self.user_id),
+                "message": bot_message,
+                "data": data,
+            },
+        }
+
+
+def profiler_script(factory: UpdateFactory) -> List[Dict[str, Any]]:
+    """Updates of one complete free-form profile, in order"""
+    from app.prompts.profiler_full_questions import FREE_FORM_QUESTIONS
+
+    return [
+        factory.message("/start"),
+        factory.callback("profiler_menu"),
+        factory.callback("create_profile"),
+        factory.callback("start_partner_info"),
+        factory.message("Алексей"),
+        factory.message("Встречаемся два года, последние месяцы постоянные ссоры и упреки."),
+        factory.message("32 года, менеджер"),
+        factory.callback("start_free_form_questions"),
+        # Questions are asked in their declaration order
+        *[factory.message(question["example"]) for question in FREE_FORM_QUESTIONS.values()],
+    ]
+
+
+class QueryCounter:
+    """Counts SQL statements executed by the app engine"""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.count = 0
+        event.listen(engine.sync_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args: Any) -> None:
+        self.count += 1
+
+
+class BenchmarkRun:
+    """Feeds simulated users into a real dispatcher and collects metrics"""
+
+    def __init__(self, args: argparse.Namespace, telegram_url: str):
+        from aiogram import Bot
+        from aiogram.client.session.aiohttp import AiohttpSession
+        from aiogram.client.telegram import TelegramAPIServer
+        from aiogram.types import Update
+
+        from app.core.database import engine
+        from app.main import create_dispatcher
+
+        self.args = args
+        self.update_type = Update
+        self.bot = Bot(
+            token=BENCH_TOKEN,
+            session=AiohttpSession(api=TelegramAPIServer.from_base(telegram_url)),
+            parse_mode="HTML",
+        )
+        self.dp = create_dispatcher()
+        if args.send_queue:
+            from app.bot.send_queue import SendQueueMiddleware, send_queue
+
+            self.send_queue = send_queue
+            self.bot.session.middleware(SendQueueMiddleware(send_queue))
+        else:
+            self.send_queue = None
+        self.queries = QueryCounter(engine)
+
+        self.update_latency: Dict[str, List[float]] = {"message": [], "callback_query": []}
+        self.queries_per_update: List[int] = []
+        self.analysis_latency: List[float] = []
+        self.profile_latency: List[float] = []
+        self.failures: Counter = Counter()
+
+    async def _feed(self, raw: Dict[str, Any]) -> float:
+        update = self.update_type.model_validate(raw, context={"bot": self.bot})
+        kind = "callback_query" if "callback_query" in raw else "message"
+        queries_before = self.queries.count
+        started = time.perf_counter()
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            self.failures[type(e).__name__] += 1
+        elapsed = time.perf_counter() - started
+        self.update_latency[kind].append(elapsed)
+        # Concurrent users share the engine, so this is an upper bound per update
+        self.queries_per_update.append(self.queries.count - queries_before)
+        return elapsed
+
+    async def simulate_user(self, user_id: int) -> None:
+        from app.bot.handlers.profiler import get_analysis_task
+
+        script = profiler_script(UpdateFactory(user_id))
+        started = time.perf_counter()
+        for raw in script[:-1]:
+            await self._feed(raw)
+            if self.args.think_time:
+                await asyncio.sleep(self.args.think_time)
+        # The last answer starts the analysis in the background; it sends the PDF
+        elapsed = await self._feed(script[-1])
+        task = get_analysis_task(user_id)
+        if task is not None:
+            started_analysis = time.perf_counter()
+            await task
+            elapsed += time.perf_counter() - started_analysis
+        self.analysis_latency.append(elapsed)
+        self.profile_latency.append(time.perf_counter() - started)
+
+    async def run(self) -> float:
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+
+        async def limited(user_id: int) -> None:
+            async with semaphore:
+                await self.simulate_user(user_id)
+
+        if self.send_queue:
+            self.send_queue.start()
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(limited(FIRST_USER_ID + i) for i in range(self.args.users)))
+        finally:
+            if self.send_queue:
+                # Later background sends go straight to the stub
+                await self.send_queue.stop()
+        return time.perf_counter() - started
+
+    async def close(self) -> None:
+        await self.bot.session.close()
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"Profiles: {report['users']} (concurrency {report['concurrency']}), wall time {report['wall_time']}s",
+        "",
+        f"{'latency, s':<22}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}",
+    ]
+    for name, summary in report["latency"].items():
+        lines.append(
+            f"{name:<22}{summary['p50']:>9.3f}{summary['p95']:>9.3f}{summary['p99']:>9.3f}{summary['max']:>9.3f}"
+        )
+    lines += [
+        "",
+        f"LLM calls per profile: {report['llm']['calls_per_profile']} "
+        f"({report['llm']['calls_by_kind']}, errors {report['llm']['errors']})",
+        f"DB queries per update: mean {report['db']['queries_per_update_mean']}, "
+        f"p95 {report['db']['queries_per_update_p95']}, total {report['db']['queries_total']}",
+        f"PDF conversions: {report['pdf']['conversions']}",
+        f"Telegram calls: {report['telegram']}",
+        *([f"Send queue: {report['send_queue']}"] if report["send_queue"] else []),
+        f"Peak RSS: {report['peak_rss_mb']} MB",
+    ]
+    if report["failures"]:
+        lines.append(f"Failures: {report['failures']}")
+    return "\n".join(lines)
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """Start the stubs, run the simulated users and build the report"""
+    llm = StubLLMServer(
+        latency_p50=args.llm_latency_p50,
+        latency_sigma=args.llm_latency_sigma,
+        tokens_per_second=args.tokens_per_second,
+        portrait_tokens=args.portrait_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    pdf = StubPDFServer(latency=args.pdf_latency)
+    telegram = FakeTelegramServer(latency=args.telegram_latency)
+    llm_url, pdf_url, telegram_url = await llm.start(), await pdf.start(), await telegram.start()
+
+    with tempfile.TemporaryDirectory(prefix="psycho-bench-") as tmp_dir:
+        configure_environment(args, llm_url, pdf_url, tmp_dir)
+        logger.remove()
+        logger.add(sys.stderr, level=args.log_level)
+
+        from app.core.database import close_db, init_db
+        from app.core.redis import close_redis, init_redis
+
+        if args.redis_url:
+            await init_redis()
+        await init_db()
+
+        bench = BenchmarkRun(args, telegram_url)
+        try:
+            wall_time = await bench.run()
+            # Let background work (block summaries, usage records) settle
+            pending = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            if pending:
+                await asyncio.wait(pending, timeout=30)
+        finally:
+            await bench.close()
+            await close_db()
+            if args.redis_url:
+                await close_redis()
+            await asyncio.gather(llm.stop(), pdf.stop(), telegram.stop())
+
+    llm_stats = llm.get_stats()
+    profiles = max(1, len(bench.profile_latency))
+    return {
+        "users": args.users,
+        "concurrency": args.concurrency,
+        "wall_time": round(wall_time, 2),
+        "latency": {
+            "message update": latency_summary(bench.update_latency["message"]),
+            "callback update": latency_summary(bench.update_latency["callback_query"]),
+            "analysis (last answer)": latency_summary(bench.analysis_latency),
+            "full profile": latency_summary(bench.profile_latency),
+        },
+        "llm": {
+            **llm_stats,
+            "calls_per_profile": round(llm_stats["calls"] / profiles, 2),
+        },
+        "db": {
+            "queries_total": bench.queries.count,
+            "queries_per_update_mean": round(statistics.fmean(bench.queries_per_update), 2)
+            if bench.queries_per_update else 0.0,
+            "queries_per_update_p95": percentile(bench.queries_per_update, 95),
+        },
+        "pdf": {"conversions": pdf.conversions, "html_bytes": pdf.html_bytes},
+        "telegram": telegram.get_stats(),
+        "send_queue": bench.send_queue.get_stats() if bench.send_queue else None,
+        "peak_rss_mb": peak_rss_mb(),
+        "failures": dict(bench.failures),
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the free-form profiler flow against local stubs")
+    parser.add_argument("--users", type=int, default=10, help="Simulated users, one profile each")
+    parser.add_argument("--concurrency", type=int, default=10, help="Users running at the same time")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Pause between a user's updates, s")
+    parser.add_argument("--llm-latency-p50", type=float, default=1.0, help="Median time to first token, s")
+    parser.add_argument("--llm-latency-sigma", type=float, default=0.5, help="Log-normal sigma of that latency")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="Stub generation speed")
+    parser.add_argument("--portrait-tokens", type=int, default=3000, help="Length of free-text answers")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of LLM requests that fail")
+    parser.add_argument("--error-status", type=int, default=503, help="HTTP status of injected failures")
+    parser.add_argument("--pdf-latency", type=float, default=0.2, help="CloudLayer stub latency, s")
+    parser.add_argument("--telegram-latency", type=float, default=0.0, help="Bot API stub latency, s")
+    parser.add_argument("--send-queue", action="store_true", help="Pace Bot API calls with the send queue")
+    parser.add_argument("--ai-rate-limit", type=float, default=0.0, help="AI_RATE_LIMIT_SECONDS for the run")
+    parser.add_argument("--database-url", default=None, help="Use this database instead of a temp SQLite")
+    parser.add_argument("--redis-url", default=None, help="Connect to Redis (cache, FSM) during the run")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for latency and error sampling")
+    parser.add_argument("--log-level", default="WARNING", help="Level of app logs printed to stderr")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run_benchmark(args))
+    print(json.dumps(report, ensure_ascii=False, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
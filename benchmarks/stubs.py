@@ -0,0 +1,228 @@
+"""Local stand-ins for OpenRouter, CloudLayer.io and the Telegram Bot API"""
+
+import asyncio
+import itertools
+import json
+import math
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+# Smallest valid PDF document
+MINIMAL_PDF = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[3 0 R]/Count 1>>endobj\n"
+    b"3 0 obj<</Type/Page/Parent 2 0 R/MediaBox[0 0 595 842]>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF\n"
+)
+
+PORTRAIT_PARAGRAPH = (
+    "ОБЩАЯ ХАРАКТЕРИСТИКА ЛИЧНОСТИ\n\n"
+    "Партнер демонстрирует устойчивые паттерны контроля и обесценивания. "
+    "В ответах пользователя прослеживается реакция на критику через контратаку, "
+    "перевод разговора на себя и отрицание очевидных событий.\n\n"
+)
+
+
+class StubServer:
+    """aiohttp application on a free localhost port"""
+
+    def __init__(self):
+        self.app = web.Application(client_max_size=64 * 1024 * 1024)
+        self._runner: Optional[web.AppRunner] = None
+        self.url = ""
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://{host}:{bound_port}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner:
+            await self._runner.cleanup()
+
+
+class StubLLMServer(StubServer):
+    """
+    OpenAI-compatible /chat/completions endpoint
+
+    Time to first token follows a log-normal distribution around
+    latency_p50; the answer is then produced at tokens_per_second (about
+    three characters per token). error_rate of requests fail with
+    error_status, 429 responses carry Retry-After.
+    """
+
+    def __init__(
+        self,
+        latency_p50: float = 1.0,
+        latency_sigma: float = 0.5,
+        tokens_per_second: float = 80.0,
+        portrait_tokens: int = 3000,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        seed: Optional[int] = None
+    ):
+        super().__init__()
+        self.latency_p50 = latency_p50
+        self.latency_sigma = latency_sigma
+        self.tokens_per_second = tokens_per_second
+        self.portrait_tokens = portrait_tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self._random = random.Random(seed)
+
+        # Metrics
+        self.calls = 0
+        self.errors = 0
+        self.calls_by_kind: Counter = Counter()
+        self.prompt_chars = 0
+
+        self.app.router.add_post("/chat/completions", self._handle)
+        self.app.router.add_post("/api/v1/chat/completions", self._handle)
+
+    def _first_token_delay(self) -> float:
+        if self.latency_p50 <= 0:
+            return 0.0
+        return self._random.lognormvariate(math.log(self.latency_p50), self.latency_sigma)
+
+    def _content(self, payload: Dict[str, Any]) -> str:
+        response_format = payload.get("response_format")
+        if isinstance(response_format, dict) and "json_schema" in response_format:
+            # Imported lazily: the app reads its settings (stub URLs) on import
+            from app.services.ai_providers import stub_from_schema
+
+            schema = response_format["json_schema"]["schema"]
+            return json.dumps(stub_from_schema(schema, schema.get("$defs", {})), ensure_ascii=False)
+
+        max_tokens = int(payload.get("max_tokens") or self.portrait_tokens)
+        target_chars = min(max_tokens, self.portrait_tokens) * 3
+        repeats = max(1, target_chars // len(PORTRAIT_PARAGRAPH))
+        return "ПСИХОЛОГИЧЕСКИЙ ПОРТРЕТ: Тестовый тип\n\n" + PORTRAIT_PARAGRAPH * repeats
+
+    def _usage(self, payload: Dict[str, Any], content: str) -> Dict[str, Any]:
+        prompt_chars = sum(len(json.dumps(message.get("content"), ensure_ascii=False))
+                           for message in payload.get("messages", []))
+        return {"prompt_tokens": prompt_chars // 3, "completion_tokens": len(content) // 3}
+
+    async def _handle(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        self.calls += 1
+        schema = (payload.get("response_format") or {})
+        kind = schema["json_schema"]["name"] if isinstance(schema, dict) and "json_schema" in schema else "text"
+        self.calls_by_kind[kind] += 1
+        self.prompt_chars += sum(len(str(message.get("content"))) for message in payload.get("messages", []))
+
+        await asyncio.sleep(self._first_token_delay())
+        if self._random.random() < self.error_rate:
+            self.errors += 1
+            headers = {"Retry-After": "1"} if self.error_status == 429 else {}
+            return web.json_response(
+                {"error": {"message": "injected failure"}}, status=self.error_status, headers=headers
+            )
+
+        content = self._content(payload)
+        usage = self._usage(payload, content)
+        if not payload.get("stream"):
+            await asyncio.sleep(usage["completion_tokens"] / self.tokens_per_second)
+            return web.json_response({
+                "choices": [{"message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        chunk_chars = 48
+        delay = chunk_chars / 3 / self.tokens_per_second
+        for i in range(0, len(content), chunk_chars):
+            event = {"choices": [{"delta": {"content": content[i:i + chunk_chars]}}]}
+            await response.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode())
+            await asyncio.sleep(delay)
+        await response.write(f"data: {json.dumps({'choices': [], 'usage': usage})}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "calls_by_kind": dict(self.calls_by_kind),
+            "prompt_chars": self.prompt_chars,
+        }
+
+
+class StubPDFServer(StubServer):
+    """CloudLayer.io v2 html->pdf endpoint answering with a tiny PDF"""
+
+    def __init__(self, latency: float = 0.2):
+        super().__init__()
+        self.latency = latency
+        self.conversions = 0
+        self.html_bytes = 0
+        self.app.router.add_post("/v2/html/pdf", self._convert)
+        self.app.router.add_get("/assets/report.pdf", self._asset)
+
+    async def _convert(self, request: web.Request) -> web.Response:
+        payload = await request.json()
+        self.conversions += 1
+        self.html_bytes += len(payload.get("html", ""))
+        await asyncio.sleep(self.latency)
+        return web.json_response({"url": f"{self.url}/assets/report.pdf"})
+
+    async def _asset(self, request: web.Request) -> web.Response:
+        return web.Response(body=MINIMAL_PDF, content_type="application/pdf")
+
+
+class FakeTelegramServer(StubServer):
+    """
+    Minimal Bot API: answers every method with a plausible result
+
+    Messages get increasing ids per chat; every call is counted by method
+    name so sends per profile can be reported.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls: Counter = Counter()
+        self._message_ids = itertools.count(1000)
+        self._file_ids = itertools.count(1)
+        self.app.router.add_route("*", "/bot{token}/{method}", self._handle)
+
+    def _message(self, form: Dict[str, Any], **extra: Any) -> Dict[str, Any]:
+        chat_id = int(form.get("chat_id") or 0)
+        return {
+            "message_id": int(form.get("message_id") or next(self._message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": 1, "is_bot": True, "first_name": "PsychoDetective"},
+            **extra,
+        }
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        form: Dict[str, Any] = dict(await request.post()) if request.can_read_body else {}
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method == "getMe":
+            result: Any = {"id": 1, "is_bot": True, "first_name": "PsychoDetective", "username": "bench_bot"}
+        elif method in ("sendMessage", "editMessageText"):
+            result = self._message(form, text=str(form.get("text", "")))
+        elif method == "sendDocument":
+            file_id = f"BENCH{next(self._file_ids)}"
+            result = self._message(form, document={"file_id": file_id, "file_unique_id": file_id})
+        else:
+            result = True
+        return web.json_response({"ok": True, "result": result})
+
+    def get_stats(self) -> Dict[str, Any]:
+        return dict(self.calls)
@@ -0,0 +1,296 @@
+"""
+Bulk regeneration of partner PDF reports
+
+Streams saved PartnerProfile rows with a server-side cursor, renders HTML
+and PDF for each one in a process pool and writes the PDFs to the report
+artifact store. Profiles get the new report_key, so the "📄 PDF отчет"
+button serves the new render. Reports already in the store are skipped
+unless --force is given, so an interrupted run can simply be restarted.
+
+Usage:
+    python -m scripts.regenerate_reports --workers 8
+    python -m scripts.regenerate_reports --since 2026-01-01 --limit 500 --force
+"""
+
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import sys
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from loguru import logger
+from sqlalchemy import func, select, update
+
+from app.core.database import close_db, get_session
+from app.models.profile import PartnerProfile
+from app.models.user import User
+from app.services.html_pdf_service import REPORT_TEMPLATE_VERSION, HTMLPDFService, report_render_stage
+from app.services.report_store import ReportArtifactStore, create_report_store, report_key
+
+# Profile columns a report is rendered from
+REPORT_COLUMNS = (
+    PartnerProfile.id,
+    PartnerProfile.partner_name,
+    PartnerProfile.psychological_profile,
+    PartnerProfile.red_flags,
+    PartnerProfile.manipulation_risk,
+    PartnerProfile.urgency_level,
+    PartnerProfile.personality_type,
+    User.telegram_id,
+)
+
+# Per-process state of a pool worker
+_worker_service: Optional[HTMLPDFService] = None
+_worker_store: Optional[ReportArtifactStore] = None
+_worker_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def build_job(row: Any) -> Dict[str, Any]:
+    """
+    Render job of one profile row: analysis data as the report reads it and its report key
+
+    Args:
+        row: Result row with REPORT_COLUMNS
+
+    Returns:
+        Picklable job dict
+    """
+    partner_name = row.partner_name or f"Партнер #{row.id}"
+    analysis = {
+        "psychological_profile": row.psychological_profile or "",
+        "red_flags": row.red_flags or [],
+        "manipulation_risk": row.manipulation_risk,
+        "urgency_level": getattr(row.urgency_level, "value", row.urgency_level),
+        "personality_type": row.personality_type,
+    }
+    payload = {"profile_id": row.id, "analysis": analysis, "user_id": row.telegram_id, "partner_name": partner_name}
+    return {
+        "profile_id": row.id,
+        "user_id": row.telegram_id,
+        "partner_name": partner_name,
+        "analysis": analysis,
+        "key": report_key(payload, REPORT_TEMPLATE_VERSION),
+    }
+
+
+def _init_worker(log_level: str) -> None:
+    logger.remove()
+    logger.add(sys.stderr, level=log_level)
+    # Per-report service logs would drown the progress lines
+    logging.basicConfig(level=logging.WARNING)
+    # Already in a worker process: no nested executor for the HTML render
+    report_render_stage.mode = "inline"
+    _ensure_worker_state()
+
+
+def _ensure_worker_state() -> None:
+    global _worker_service, _worker_store, _worker_loop
+    if _worker_loop is None:
+        _worker_service = HTMLPDFService()
+        _worker_store = create_report_store()
+        _worker_loop = asyncio.new_event_loop()
+
+
+async def _render_pdf(service: HTMLPDFService, job: Dict[str, Any]) -> bytes:
+    html_content = await report_render_stage.render(service, job["analysis"], job["partner_name"], job["user_id"])
+    return await service._convert_html_to_pdf_cloudlayer(html_content)
+
+
+async def _regenerate(job: Dict[str, Any]) -> int:
+    pdf_bytes = await _render_pdf(_worker_service, job)
+    if not await _worker_store.put(job["key"], pdf_bytes):
+        raise RuntimeError("report store write failed")
+    return len(pdf_bytes)
+
+
+def regenerate_report(job: Dict[str, Any]) -> Tuple[int, int]:
+    """Pool entry point: render one report into the store, returns (profile_id, PDF bytes)"""
+    _ensure_worker_state()
+    return job["profile_id"], _worker_loop.run_until_complete(_regenerate(job))
+
+
+class RegenerationProgress:
+    """Counters of a run and the periodic progress line"""
+
+    def __init__(self, total: int, interval: float):
+        self.total = total
+        self.interval = interval
+        self.started = time.monotonic()
+        self._last_report = self.started
+        self.rendered = 0
+        self.skipped = 0
+        self.failed: List[Tuple[int, str]] = []
+        self.bytes = 0
+
+    @property
+    def done(self) -> int:
+        return self.rendered + self.skipped + len(self.failed)
+
+    def maybe_report(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_report < self.interval:
+            return
+        self._last_report = now
+        elapsed = now - self.started
+        rate = self.rendered / elapsed if elapsed else 0.0
+        eta = (self.total - self.done) / rate if rate else 0.0
+        logger.info(
+            f"📄 {self.done}/{self.total} profiles: rendered {self.rendered}, skipped {self.skipped}, "
+            f"failed {len(self.failed)} | {rate:.2f} reports/s, "
+            f"{self.bytes / max(elapsed, 1e-9) / 1024:.0f} KB/s | ETA {eta / 60:.1f} min"
+        )
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = time.monotonic() - self.started
+        return {
+            "total": self.total,
+            "rendered": self.rendered,
+            "skipped": self.skipped,
+            "failed": len(self.failed),
+            "failed_profiles": [profile_id for profile_id, _ in self.failed[:50]],
+            "elapsed_s": round(elapsed, 1),
+            "reports_per_s": round(self.rendered / elapsed, 2) if elapsed else 0.0,
+            "pdf_mb": round(self.bytes / 1024 / 1024, 1),
+        }
+
+
+def _profiles_query(args: argparse.Namespace):
+    query = select(*REPORT_COLUMNS).join(User, User.id == PartnerProfile.user_id).where(
+        PartnerProfile.is_completed.is_(True)
+    )
+    if args.since:
+        query = query.where(PartnerProfile.created_at >= args.since)
+    return query.order_by(PartnerProfile.id)
+
+
+async def _save_report_keys(keys: List[Dict[str, Any]]) -> None:
+    """Point profiles at their new reports (ORM bulk UPDATE by primary key)"""
+    for start in range(0, len(keys), 500):
+        async with get_session() as session:
+            await session.execute(update(PartnerProfile), keys[start:start + 500])
+            await session.commit()
+
+
+async def run_regeneration(args: argparse.Namespace, executor: Optional[Executor] = None) -> Dict[str, Any]:
+    """
+    Stream profiles, render missing reports in the pool and store them
+
+    Args:
+        args: Parsed CLI arguments
+        executor: Pool to render in; a spawn process pool by default
+
+    Returns:
+        Run summary
+    """
+    store = create_report_store()
+    if store is None:
+        raise SystemExit("Report store is disabled (REPORT_STORE_ENABLED), nothing to write to")
+
+    async with get_session() as session:
+        total = await session.scalar(select(func.count()).select_from(_profiles_query(args).subquery()))
+    if args.limit:
+        total = min(total, args.limit)
+    progress = RegenerationProgress(total, args.progress_interval)
+    logger.info(f"🔁 Regenerating up to {total} reports with template {REPORT_TEMPLATE_VERSION}")
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(
+            max_workers=args.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(args.log_level,),
+            max_tasks_per_child=args.max_tasks_per_child,
+        )
+
+    loop = asyncio.get_running_loop()
+    # Bounds the jobs held in memory, the stream waits for free slots
+    slots = asyncio.Semaphore(args.max_in_flight)
+    pending: set = set()
+    # Saved after the scan: a write would compete with the open cursor on SQLite
+    new_keys: List[Dict[str, Any]] = []
+
+    async def run_job(job: Dict[str, Any]) -> None:
+        try:
+            _, size = await loop.run_in_executor(executor, regenerate_report, job)
+            progress.rendered += 1
+            progress.bytes += size
+            new_keys.append({"id": job["profile_id"], "report_key": job["key"]})
+        except Exception as e:
+            progress.failed.append((job["profile_id"], str(e)))
+            logger.warning(f"❌ Profile {job['profile_id']} failed: {e}")
+        finally:
+            slots.release()
+            progress.maybe_report()
+
+    try:
+        async with get_session() as session:
+            result = await session.stream(_profiles_query(args).execution_options(yield_per=args.yield_per))
+            seen = 0
+            async for row in result:
+                if args.limit and seen >= args.limit:
+                    break
+                seen += 1
+                job = build_job(row)
+                if not args.force and await store.exists(job["key"]):
+                    progress.skipped += 1
+                    new_keys.append({"id": job["profile_id"], "report_key": job["key"]})
+                    progress.maybe_report()
+                    continue
+                await slots.acquire()
+                task = asyncio.create_task(run_job(job))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            await result.close()
+        if pending:
+            await asyncio.gather(*pending)
+    finally:
+        if own_executor:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    await _save_report_keys(new_keys)
+    progress.maybe_report(force=True)
+    summary = progress.summary()
+    for profile_id, error in progress.failed[:20]:
+        logger.error(f"Profile {profile_id}: {error}")
+    return summary
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Re-render saved partner reports into the report store")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count(), help="Render processes")
+    parser.add_argument("--max-in-flight", type=int, default=0, help="Jobs queued at once (default: 2 per worker)")
+    parser.add_argument("--max-tasks-per-child", type=int, default=200, help="Reports before a worker is recycled")
+    parser.add_argument("--yield-per", type=int, default=200, help="Rows fetched per cursor round trip")
+    parser.add_argument("--since", type=datetime.fromisoformat, default=None, help="Only profiles created since")
+    parser.add_argument("--limit", type=int, default=0, help="Stop after this many profiles")
+    parser.add_argument("--force", action="store_true", help="Re-render reports that are already stored")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between progress lines")
+    parser.add_argument("--log-level", default="INFO")
+    args = parser.parse_args(argv)
+    args.max_in_flight = args.max_in_flight or 2 * args.workers
+    return args
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    try:
+        return await run_regeneration(args)
+    finally:
+        await close_db()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = parse_args(argv)
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+    summary = asyncio.run(_main(args))
+    logger.info(f"🏁 Done: {summary}")
+    sys.exit(1 if summary["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+"""Shared pytest configuration"""
+
+import os
+
+# Settings() requires these at import time; tests never touch real services
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("TELEGRAM_BOT_TOKEN", "123456:test-token")
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite:///:memory:")
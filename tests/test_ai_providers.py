@@ -0,0 +1,162 @@
+"""Tests for AI provider routing, failover and hedging"""
+
+import asyncio
+
+import pytest
+
+from app.services.ai_providers import AIRequest, ProviderError, ProviderRouter, StubProvider
+from app.services.ai_resilience import CircuitBreaker, RetryPolicy
+from app.services.ai_schemas import FreeFormProfileMetrics, json_schema_response_format
+from app.services.ai_service import AIService
+from app.utils.exceptions import AIServiceError
+
+
+def _request(**kwargs) -> AIRequest:
+    return AIRequest(system_prompt="system", user_prompt="user", max_tokens=100, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_failover_to_next_provider_and_health_drop():
+    broken = StubProvider(name="broken", failure_rate=1.0)
+    backup = StubProvider(name="backup", text="ok")
+    router = ProviderRouter(
+        [broken, backup],
+        retry_policy=RetryPolicy(attempts=1),
+        breaker_factory=lambda: CircuitBreaker(failure_threshold=100)
+    )
+
+    for _ in range(4):
+        response = await router.complete(_request())
+        assert response.provider == "backup"
+
+    # Broken provider fell below the threshold and is now tried last
+    assert [p.name for p in router.ordered()] == ["backup", "broken"]
+    assert router.get_metrics()["providers"]["broken:stub-model"]["failures"] == 4
+
+
+@pytest.mark.asyncio
+async def test_all_providers_down_raises():
+    router = ProviderRouter([StubProvider(failure_rate=1.0)], retry_policy=RetryPolicy(attempts=1))
+    with pytest.raises(AIServiceError):
+        await router.complete(_request())
+
+
+@pytest.mark.asyncio
+async def test_hedged_request_wins_on_slow_primary():
+    primary = StubProvider(name="primary", latency=0.01)
+    backup = StubProvider(name="backup", latency=0.0)
+    router = ProviderRouter([primary, backup], min_hedge_samples=5)
+
+    for _ in range(5):
+        await router.complete(_request())
+
+    primary.latency = 1.0
+    response = await router.complete_hedged(_request())
+
+    assert response.provider == "backup"
+    assert router.hedges_fired == 1
+    assert router.hedges_won == 1
+
+
+@pytest.mark.asyncio
+async def test_cancelled_hedged_request_cancels_primary():
+    primary = StubProvider(name="primary", latency=0.01)
+    router = ProviderRouter([primary, StubProvider(name="backup")], min_hedge_samples=5)
+    for _ in range(5):
+        await router.complete(_request())
+
+    primary.latency = 5.0
+    before = asyncio.all_tasks()
+    caller = asyncio.create_task(router.complete_hedged(_request()))
+    await asyncio.sleep(0.001)  # inside the wait for the primary's p95
+    caller.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await caller
+
+    assert not [task for task in asyncio.all_tasks() - before if not task.done()]
+
+
+@pytest.mark.asyncio
+async def test_stub_answers_schema_and_service_validates():
+    router = ProviderRouter([StubProvider()])
+    service = AIService(router=router)
+
+    metrics = await service._get_structured_response(
+        FreeFormProfileMetrics, "free_form_profile_metrics", "system", "user"
+    )
+    assert 0 <= metrics.overall_risk_score <= 100
+    assert metrics.key_concerns
+
+    response = await router.complete(_request(
+        response_format=json_schema_response_format(FreeFormProfileMetrics, "m")
+    ))
+    FreeFormProfileMetrics.model_validate_json(response.content)
+    assert router.get_metrics()["providers"]["stub:stub-model"]["p50"] is not None
+
+
+class _FlakyProvider(StubProvider):
+    """Fails with the given errors first, then answers"""
+
+    def __init__(self, errors):
+        super().__init__(name="flaky")
+        self.errors = list(errors)
+
+    async def complete(self, request):
+        if self.errors:
+            self.calls += 1
+            raise self.errors.pop(0)
+        return await super().complete(request)
+
+
+@pytest.mark.asyncio
+async def test_safe_failures_are_retried_with_retry_after():
+    provider = _FlakyProvider([
+        ProviderError("429", "flaky", status=429, retry_after=0.01, retryable=True, reason="http_429"),
+        ProviderError("503", "flaky", status=503, retryable=True, reason="http_503"),
+    ])
+    policy = RetryPolicy(attempts=3, base_delay=0.001)
+    router = ProviderRouter([provider], retry_policy=policy)
+
+    response = await router.complete(_request())
+
+    assert response.provider == "flaky"
+    assert provider.calls == 3
+    assert policy.get_stats()["retries_by_reason"] == {"http_429": 1, "http_503": 1}
+    assert policy.delay(0, retry_after=2.5) == 2.5
+    assert 0 <= policy.delay(3) <= 0.008
+
+
+@pytest.mark.asyncio
+async def test_unsafe_failures_are_not_retried():
+    provider = _FlakyProvider([ProviderError("400", "flaky", status=400, reason="http_400")])
+    router = ProviderRouter([provider], retry_policy=RetryPolicy(attempts=3, base_delay=0.001))
+
+    with pytest.raises(AIServiceError):
+        await router.complete(_request())
+    assert provider.calls == 1
+    assert router.breakers[provider.key].state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_breaker_opens_fails_fast_and_recovers():
+    provider = StubProvider(failure_rate=1.0)
+    router = ProviderRouter(
+        [provider],
+        retry_policy=RetryPolicy(attempts=1),
+        breaker_factory=lambda: CircuitBreaker(failure_threshold=2, recovery_time=0.05)
+    )
+
+    for _ in range(2):
+        with pytest.raises(AIServiceError):
+            await router.complete(_request())
+    assert router.get_metrics()["providers"][provider.key]["breaker"]["state"] == "open"
+
+    calls = provider.calls
+    with pytest.raises(AIServiceError, match="временно недоступен"):
+        await router.complete(_request())
+    assert provider.calls == calls
+
+    await asyncio.sleep(0.06)
+    provider.failure_rate = 0.0
+    await router.complete(_request())
+    assert router.breakers[provider.key].state == "closed"
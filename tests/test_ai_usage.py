@@ -0,0 +1,57 @@
+"""Tests for prompt caching layout and usage accounting"""
+
+from app.prompts.analysis_prompts import FREE_FORM_PROFILE_SYSTEM_PROMPT
+from app.services.ai_providers import build_default_router
+from app.services.ai_service import AIService
+from app.services.ai_usage import CallUsage, UsageTracker
+
+
+def test_system_block_is_static_and_marked_for_cache():
+    openrouter = build_default_router().providers[0]
+    content = openrouter._system_content(FREE_FORM_PROFILE_SYSTEM_PROMPT)
+    assert content[0]["cache_control"] == {"type": "ephemeral"}
+    assert "{" not in FREE_FORM_PROFILE_SYSTEM_PROMPT
+
+
+def test_dynamic_block_carries_answers_only():
+    service = AIService()
+    prompt = service._create_free_form_user_prompt(
+        [{"question": "Как он реагирует?", "answer": "Кричит", "block": "emotion"}],
+        "Иван", "муж", "35 лет"
+    )
+    assert "Кричит" in prompt and "Иван" in prompt
+    assert "КРИТИЧЕСКИ ВАЖНЫЕ ТРЕБОВАНИЯ" not in prompt
+
+
+def test_summarized_block_replaces_raw_answers_with_quotes():
+    service = AIService()
+    long_answer = "Он проверяет мой телефон каждый вечер. " * 40
+    prompt = service._create_free_form_user_prompt(
+        [
+            {"question": "Контроль?", "answer": long_answer, "block": "control"},
+            {"question": "Как он реагирует?", "answer": "Кричит", "block": "emotion"},
+        ],
+        "Иван", "муж", "35 лет",
+        block_summaries={"control": "ОЦЕНКА: 8"}
+    )
+
+    assert "ОЦЕНКА: 8" in prompt and "ЦИТАТЫ ИЗ ОТВЕТОВ" in prompt
+    assert long_answer not in prompt and "Он проверяет мой телефон" in prompt
+    # The block without a summary keeps its full answer
+    assert "Кричит" in prompt and "Контроль?" not in prompt
+
+
+def test_usage_tracks_cached_and_uncached_tokens():
+    tracker = UsageTracker()
+    tracker.record(CallUsage.from_response("portrait", "m", {
+        "prompt_tokens": 1500,
+        "completion_tokens": 4000,
+        "prompt_tokens_details": {"cached_tokens": 1200},
+    }))
+    tracker.record(CallUsage.from_response("portrait", "m", None))
+
+    stats = tracker.get_stats()["portrait"]
+    assert stats["calls"] == 2
+    assert stats["cached_tokens"] == 1200
+    assert stats["uncached_tokens"] == 300
+    assert stats["cache_hit_rate"] == 0.8
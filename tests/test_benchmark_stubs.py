@@ -0,0 +1,75 @@
+"""Tests for the local stubs used by the profiler benchmark"""
+
+import json
+
+import aiohttp
+import pytest
+
+from benchmarks.profiler_flow import percentile
+from benchmarks.stubs import FakeTelegramServer, StubLLMServer
+
+
+def test_percentile_nearest_rank():
+    values = [float(i) for i in range(1, 101)]
+
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_llm_stub_streams_and_answers_schemas():
+    server = StubLLMServer(latency_p50=0, tokens_per_second=100000, portrait_tokens=100)
+    url = await server.start()
+    schema = {"type": "object", "properties": {"score": {"type": "integer"}}, "required": ["score"]}
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.post(f"{url}/chat/completions", json={
+                "messages": [{"role": "user", "content": "привет"}], "stream": True
+            }) as response:
+                body = (await response.read()).decode()
+            async with session.post(f"{url}/chat/completions", json={
+                "messages": [],
+                "response_format": {"type": "json_schema", "json_schema": {"name": "metrics", "schema": schema}},
+            }) as response:
+                structured = await response.json()
+    finally:
+        await server.stop()
+
+    events = [line[len("data: "):] for line in body.splitlines() if line.startswith("data: ")]
+    assert events[-1] == "[DONE]"
+    assert json.loads(events[-2])["usage"]["completion_tokens"] > 0
+    assert "score" in json.loads(structured["choices"][0]["message"]["content"])
+    assert server.get_stats()["calls_by_kind"] == {"text": 1, "metrics": 1}
+
+
+@pytest.mark.asyncio
+async def test_llm_stub_injects_errors():
+    server = StubLLMServer(latency_p50=0, error_rate=1.0, error_status=429)
+    url = await server.start()
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.post(f"{url}/chat/completions", json={"messages": []}) as response:
+                assert response.status == 429
+                assert response.headers["Retry-After"] == "1"
+    finally:
+        await server.stop()
+
+    assert server.errors == 1
+
+
+@pytest.mark.asyncio
+async def test_fake_telegram_returns_messages_and_counts_calls():
+    server = FakeTelegramServer()
+    url = await server.start()
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.post(f"{url}/bot1:x/sendDocument", data={"chat_id": "42"}) as response:
+                result = (await response.json())["result"]
+            async with session.post(f"{url}/bot1:x/answerCallbackQuery", data={}) as response:
+                assert (await response.json())["result"] is True
+    finally:
+        await server.stop()
+
+    assert result["chat"]["id"] == 42 and result["document"]["file_id"].startswith("BENCH")
+    assert server.get_stats() == {"sendDocument": 1, "answerCallbackQuery": 1}
@@ -0,0 +1,99 @@
+"""Tests for background per-block summaries of free-form answers"""
+
+import asyncio
+
+import pytest
+
+from app.services.block_summary import (
+    BlockSummaryPipeline,
+    format_free_form_answers,
+    group_answers_by_block,
+    is_block_complete
+)
+
+QUESTIONS = {
+    "narcissism_q1": {"text": "Вопрос 1", "block": "narcissism"},
+    "narcissism_q2": {"text": "Вопрос 2", "block": "narcissism"},
+    "control_q1": {"text": "Вопрос 3", "block": "control"},
+}
+ORDER = ["narcissism_q1", "narcissism_q2", "control_q1"]
+
+
+class _FakeAIService:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.calls = []
+
+    async def summarize_block(self, block, answers, partner_name):
+        self.calls.append(block)
+        await asyncio.sleep(self.delay)
+        return f"резюме {block}: {len(answers)}"
+
+
+def test_block_completion_and_grouping():
+    answers = {"narcissism_q1": "a"}
+    assert not is_block_complete("narcissism", ORDER, QUESTIONS, answers)
+
+    answers["narcissism_q2"] = "b"
+    assert is_block_complete("narcissism", ORDER, QUESTIONS, answers)
+    assert not is_block_complete("control", ORDER, QUESTIONS, answers)
+
+    grouped = group_answers_by_block(format_free_form_answers(answers, QUESTIONS))
+    assert [answer["question_id"] for answer in grouped["narcissism"]] == ["narcissism_q1", "narcissism_q2"]
+
+
+@pytest.fixture
+def summarize_any_length(monkeypatch):
+    monkeypatch.setattr("app.services.block_summary.settings.BLOCK_SUMMARY_MIN_TOKENS", 0)
+
+
+@pytest.mark.asyncio
+async def test_ready_summaries_are_used_and_late_ones_never_awaited(summarize_any_length):
+    pipeline = BlockSummaryPipeline()
+    answers = format_free_form_answers(
+        {"narcissism_q1": "a", "narcissism_q2": "b", "control_q1": "c"}, QUESTIONS
+    )
+    grouped = group_answers_by_block(answers)
+
+    pipeline.schedule(_FakeAIService(), 1, "narcissism", grouped["narcissism"], "Иван")
+    pipeline.schedule(_FakeAIService(), 1, "narcissism", grouped["narcissism"], "Иван")
+    slow = _FakeAIService(delay=10)
+    pipeline.schedule(slow, 1, "control", grouped["control"], "Иван")
+    await asyncio.sleep(0.01)
+
+    summaries = await asyncio.wait_for(pipeline.collect(1, grouped), timeout=1)
+
+    # The slow block falls back to raw answers and its call is cancelled
+    assert summaries == {"narcissism": "резюме narcissism: 2"}
+    assert pipeline.get_stats()["scheduled"] == 2
+    assert pipeline.get_stats()["missing"] == 1
+    await asyncio.sleep(0)
+    assert pipeline.get_stats()["in_flight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_short_blocks_are_not_summarized():
+    pipeline = BlockSummaryPipeline()
+    grouped = group_answers_by_block(format_free_form_answers({"control_q1": "c"}, QUESTIONS))
+    ai_service = _FakeAIService()
+
+    pipeline.schedule(ai_service, 1, "control", grouped["control"], "Иван")
+
+    assert ai_service.calls == []
+    assert pipeline.get_stats()["skipped_short"] == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_summary_is_skipped(summarize_any_length):
+    class _FailingAIService(_FakeAIService):
+        async def summarize_block(self, block, answers, partner_name):
+            raise RuntimeError("boom")
+
+    pipeline = BlockSummaryPipeline()
+    grouped = group_answers_by_block(format_free_form_answers({"control_q1": "c"}, QUESTIONS))
+
+    pipeline.schedule(_FailingAIService(), 1, "control", grouped["control"], "Иван")
+    await asyncio.sleep(0.01)
+
+    assert await pipeline.collect(1, grouped) == {}
+    assert pipeline.get_stats()["failed"] == 1
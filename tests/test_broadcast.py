@@ -0,0 +1,128 @@
+"""Tests for the broadcast engine"""
+
+from collections import namedtuple
+from datetime import datetime, timezone
+
+import pytest
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+from aiogram.methods import SendMessage
+
+from app.services.broadcast import BroadcastAudience, BroadcastEngine, BroadcastJob, is_local_time_due
+
+Row = namedtuple("Row", "id telegram_id timezone notification_time")
+
+
+class FakeBot:
+    def __init__(self, blocked=(), gone=()):
+        self.blocked = set(blocked)
+        self.gone = set(gone)
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        method = SendMessage(chat_id=chat_id, text=text)
+        if chat_id in self.blocked:
+            raise TelegramForbiddenError(method=method, message="Forbidden: bot was blocked by the user")
+        if chat_id in self.gone:
+            raise TelegramBadRequest(method=method, message="Bad Request: chat not found")
+        self.sent.append(chat_id)
+
+
+def test_local_time_window_uses_user_timezone():
+    now = datetime(2026, 3, 1, 6, 0, tzinfo=timezone.utc)
+
+    assert is_local_time_due("Europe/Moscow", "09:00", now, 5)   # 09:00 MSK
+    assert not is_local_time_due("Asia/Tokyo", "09:00", now, 5)  # 15:00 there
+    assert is_local_time_due("Europe/Moscow", "09:04", now, 5)
+    assert not is_local_time_due("Europe/Moscow", "08:59", now, 5)
+    # Broken settings fall back to 09:00 Moscow
+    assert is_local_time_due("Mars/Olympus", "25:99", now, 1)
+
+
+def test_audience_query_is_keyset_page():
+    sql = str(BroadcastAudience(daily_tips=True).query(after_id=100, limit=500))
+
+    assert "users.id >" in sql and "ORDER BY users.id" in sql and "LIMIT" in sql
+    assert "daily_tips_enabled" in sql and "notifications_enabled" in sql
+
+
+@pytest.mark.asyncio
+async def test_deliver_separates_blocked_users():
+    engine = BroadcastEngine()
+    bot = FakeBot(blocked={2}, gone={3})
+
+    result = await engine.deliver(bot, [1, 2, 3, 4], "Привет")
+
+    assert result.sent == 2 and result.failed == 0
+    assert sorted(result.blocked) == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_run_checkpoints_pages_and_resumes(monkeypatch):
+    users = [Row(i, 1000 + i, "Europe/Moscow", "09:00") for i in range(1, 8)]
+    engine = BroadcastEngine(batch_size=3)
+    checkpoints, disabled = [], []
+
+    async def fetch(audience, after_id):
+        return [row for row in users if row.id > after_id][:engine.batch_size]
+
+    async def checkpoint(job):
+        checkpoints.append(job.last_user_id)
+
+    async def finish(job):
+        checkpoints.append(job.status)
+
+    async def disable(ids):
+        disabled.extend(ids)
+
+    monkeypatch.setattr(engine, "_fetch", fetch)
+    monkeypatch.setattr(engine, "_checkpoint", checkpoint)
+    monkeypatch.setattr(engine, "_finish", finish)
+    monkeypatch.setattr(engine, "disable_blocked", disable)
+
+    bot = FakeBot(blocked={1005})
+    job = BroadcastJob(id="j", text="x", audience=BroadcastAudience(), started_at=datetime.now(timezone.utc))
+    await engine._run(bot, job)
+
+    assert checkpoints == [3, 6, 7, "done"]
+    assert job.sent == 6 and job.blocked == 1 and disabled == [1005]
+
+    # A resumed job starts after the checkpointed user
+    resumed = BroadcastJob(
+        id="k", text="x", audience=BroadcastAudience(), started_at=job.started_at, last_user_id=6
+    )
+    bot = FakeBot()
+    await engine._run(bot, resumed)
+    assert bot.sent == [1007]
+
+
+@pytest.mark.asyncio
+async def test_run_stops_when_cancelled_elsewhere(monkeypatch):
+    users = [Row(i, 1000 + i, "Europe/Moscow", "09:00") for i in range(1, 8)]
+    engine = BroadcastEngine(batch_size=3)
+    finished = []
+
+    async def fetch(audience, after_id):
+        return [row for row in users if row.id > after_id][:engine.batch_size]
+
+    async def noop(*args):
+        pass
+
+    async def finish(job):
+        finished.append((job.status, job.last_user_id))
+
+    async def is_cancelled(job):
+        # Another worker sets the cancel flag while the first page is being sent
+        return job.last_user_id > 0
+
+    monkeypatch.setattr(engine, "_fetch", fetch)
+    monkeypatch.setattr(engine, "_checkpoint", noop)
+    monkeypatch.setattr(engine, "_finish", finish)
+    monkeypatch.setattr(engine, "_is_cancelled", is_cancelled)
+    monkeypatch.setattr(engine, "disable_blocked", noop)
+
+    bot = FakeBot()
+    job = BroadcastJob(id="j", text="x", audience=BroadcastAudience(), started_at=datetime.now(timezone.utc))
+    await engine._run(bot, job)
+
+    assert bot.sent == [1001, 1002, 1003]
+    assert finished == [("cancelled", 3)]
@@ -0,0 +1,104 @@
+"""Tests for per-chat serialized update processing"""
+
+import asyncio
+
+import pytest
+
+from app.bot.chat_dispatcher import ChatSerializer
+from app.core.redis import RELEASE_IF_OWNER_SCRIPT, redis_client
+
+
+async def _job(serializer, chat_id, tag, log, delay=0.01):
+    async with serializer.serialize(chat_id):
+        log.append(("start", chat_id, tag))
+        await asyncio.sleep(delay)
+        log.append(("end", chat_id, tag))
+
+
+@pytest.mark.asyncio
+async def test_same_chat_runs_in_order_without_overlap():
+    serializer = ChatSerializer(shards=4)
+    log = []
+
+    await asyncio.gather(*(_job(serializer, 1, i, log) for i in range(5)))
+
+    assert [entry[2] for entry in log if entry[0] == "start"] == [0, 1, 2, 3, 4]
+    # Every start is immediately followed by its own end
+    assert all(log[i][2] == log[i + 1][2] for i in range(0, len(log), 2))
+
+    stats = serializer.get_stats()
+    assert stats["acquisitions"] == 5
+    assert stats["contended"] == 4
+
+
+@pytest.mark.asyncio
+async def test_different_chats_run_concurrently():
+    serializer = ChatSerializer(shards=4)
+    log = []
+
+    await asyncio.gather(*(_job(serializer, chat_id, 0, log) for chat_id in range(5)))
+
+    # All chats started before any of them finished
+    assert [entry[0] for entry in log[:5]] == ["start"] * 5
+    assert serializer.get_stats()["contended"] == 0
+
+
+@pytest.mark.asyncio
+async def test_idle_slots_are_evicted():
+    serializer = ChatSerializer(shards=1, idle_ttl=0.0, sweep_interval=0.0)
+
+    async with serializer.serialize(1):
+        pass
+    assert serializer.active_chats == 1
+
+    await asyncio.sleep(0.001)
+    async with serializer.serialize(2):
+        assert serializer.active_chats == 1
+
+    assert serializer.get_stats()["evictions"] == 1
+
+
+@pytest.mark.asyncio
+async def test_none_chat_is_not_serialized():
+    serializer = ChatSerializer()
+
+    async with serializer.serialize(None):
+        pass
+
+    assert serializer.get_stats()["acquisitions"] == 0
+
+
+class _FakeRedis:
+    """SET NX and owner-checked release/renew shared by several serializers"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    async def eval(self, script, numkeys, key, token, *args):
+        if self.data.get(key) != token:
+            return 0
+        if script == RELEASE_IF_OWNER_SCRIPT:
+            del self.data[key]
+        return 1
+
+
+@pytest.mark.asyncio
+async def test_workers_sharing_redis_do_not_overlap_on_a_chat(monkeypatch):
+    monkeypatch.setattr(redis_client, "redis", _FakeRedis())
+    monkeypatch.setattr(redis_client, "is_available", True)
+    # Two worker processes, each with its own in-process locks
+    workers = [ChatSerializer(shards=4, distributed=True, lock_ttl=1.0) for _ in range(2)]
+    log = []
+
+    await asyncio.gather(*(_job(workers[i % 2], 1, i, log) for i in range(6)))
+
+    assert all(log[i][2] == log[i + 1][2] for i in range(0, len(log), 2))
+    assert sum(worker.remote_acquisitions for worker in workers) == 6
+    assert sum(worker.remote_contended for worker in workers) > 0
+    assert redis_client.redis.data == {}
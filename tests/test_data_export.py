@@ -0,0 +1,49 @@
+"""Tests for the user data export archive format"""
+
+import csv
+import io
+import json
+import zipfile
+from datetime import datetime, timezone
+
+from app.services.data_export import _EntryWriter
+from app.utils.enums import UrgencyLevel
+
+
+def write_entry(fmt, columns, partitions):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        writer = _EntryWriter(archive.open("table", "w"), fmt, columns)
+        for rows in partitions:
+            writer.write(rows)
+        writer.close()
+    with zipfile.ZipFile(buffer) as archive:
+        return archive.read("table").decode("utf-8")
+
+
+def test_jsonl_rows_keep_types_readable():
+    created = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+    text = write_entry(
+        "jsonl",
+        ["id", "urgency_level", "red_flags", "created_at"],
+        [[(1, UrgencyLevel.HIGH, ["контроль"], created)], [(2, None, None, created)]],
+    )
+
+    records = [json.loads(line) for line in text.splitlines()]
+    assert records[0] == {
+        "id": 1, "urgency_level": UrgencyLevel.HIGH.value, "red_flags": ["контроль"],
+        "created_at": "2026-03-01T12:00:00+00:00",
+    }
+    assert records[1]["id"] == 2 and records[1]["red_flags"] is None
+
+
+def test_csv_has_header_and_flattened_values():
+    text = write_entry(
+        "csv",
+        ["id", "price", "metadata", "end_date"],
+        [[(1, 9.99, {"promo": "да"}, None)]],
+    )
+
+    rows = list(csv.reader(io.StringIO(text)))
+    assert rows[0] == ["id", "price", "metadata", "end_date"]
+    assert rows[1] == ["1", "9.99", '{"promo": "да"}', ""]
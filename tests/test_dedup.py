@@ -0,0 +1,124 @@
+"""Tests for update deduplication"""
+
+import pytest
+from aiogram.types import Update
+
+from app.bot.middlewares.dedup import DeduplicationMiddleware
+from app.core.dedup import UpdateDeduplicator, _GenerationalSet, get_update_dedup_keys
+
+
+def _callback_update(update_id: int, callback_id: str) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "callback_query": {
+            "id": callback_id,
+            "from": {"id": 1, "is_bot": False, "first_name": "U"},
+            "chat_instance": "ci",
+            "data": "my_profiles",
+        },
+    })
+
+
+def test_keys_include_callback_query_id():
+    assert get_update_dedup_keys(_callback_update(5, "abc")) == ["u:5", "cq:abc"]
+    assert get_update_dedup_keys(Update(update_id=6)) == ["u:6"]
+
+
+def test_generational_set_expires_after_two_windows(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr("app.core.dedup.time.monotonic", lambda: now[0])
+    store = _GenerationalSet(ttl=10)
+
+    assert store.add("a")
+    assert not store.add("a")
+
+    now[0] += 11  # one rotation - still remembered in previous generation
+    assert not store.add("a")
+
+    now[0] += 25  # whole window skipped - forgotten
+    assert store.add("a")
+
+
+@pytest.mark.asyncio
+async def test_duplicate_update_and_callback_are_detected():
+    dedup = UpdateDeduplicator(ttl=60)
+
+    assert not await dedup.is_duplicate(_callback_update(1, "cb-1"))
+    assert await dedup.is_duplicate(_callback_update(1, "cb-1"))
+    # Same callback query delivered under a new update_id
+    assert await dedup.is_duplicate(_callback_update(2, "cb-1"))
+
+    metrics = dedup.get_metrics()
+    assert metrics["backend"] == "memory"
+    assert metrics["checked"] == 3
+    assert metrics["duplicates"] == 2
+
+
+@pytest.mark.asyncio
+async def test_forget_allows_redelivery():
+    dedup = UpdateDeduplicator(ttl=60)
+    update = _callback_update(3, "cb-3")
+
+    assert not await dedup.is_duplicate(update)
+    await dedup.forget(update)
+    assert not await dedup.is_duplicate(update)
+
+
+class FakeRedis:
+    """SET NX EX / EXPIRE / DELETE on a dict of key -> ttl"""
+
+    def __init__(self):
+        self.ttls = {}
+
+    async def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.ttls:
+            return None
+        self.ttls[key] = ex
+        return True
+
+    async def expire(self, key, seconds):
+        if key in self.ttls:
+            self.ttls[key] = seconds
+
+    async def delete(self, key):
+        self.ttls.pop(key, None)
+
+
+@pytest.mark.asyncio
+async def test_claim_is_short_until_update_is_processed(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr("app.core.dedup.redis_client.redis", fake)
+    monkeypatch.setattr("app.core.dedup.redis_client.is_available", True)
+    dedup = UpdateDeduplicator(ttl=86400, processing_ttl=600)
+    update = Update(update_id=7)
+
+    assert not await dedup.is_duplicate(update)
+    # A crashed worker's claim expires soon, so the redelivery gets processed
+    assert fake.ttls == {"dedup:u:7": 600}
+
+    await dedup.complete(update)
+    assert fake.ttls == {"dedup:u:7": 86400}
+    assert await dedup.is_duplicate(update)
+
+
+@pytest.mark.asyncio
+async def test_middleware_releases_failed_update():
+    dedup = UpdateDeduplicator(ttl=60)
+    middleware = DeduplicationMiddleware(dedup)
+    update = Update(update_id=8)
+    calls = []
+
+    async def failing(event, data):
+        calls.append(event.update_id)
+        raise RuntimeError("db down")
+
+    async def ok(event, data):
+        calls.append(event.update_id)
+
+    with pytest.raises(RuntimeError):
+        await middleware(failing, update, {})
+    # Redelivery is processed, then a further one is dropped
+    await middleware(ok, update, {})
+    await middleware(ok, update, {})
+
+    assert calls == [8, 8]
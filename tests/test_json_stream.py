@@ -0,0 +1,108 @@
+"""Tests for the incremental JSON parser and structured metrics models"""
+
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from app.services.ai_schemas import FreeFormProfileMetrics, ProfileMetrics, json_schema_response_format
+from app.utils.exceptions import StructuredOutputError
+from app.utils.json_stream import IncrementalJSONParser, parse_json_stream
+
+METRICS = {
+    "overall_risk_score": 72,
+    "urgency_level": "high",
+    "block_scores": {
+        "narcissism": 8.5, "control": 7.0, "gaslighting": 6.5,
+        "emotion": 7.5, "intimacy": 6.0, "social": 7.8
+    },
+    "red_flags": ["Контроль \"заботой\"", "Изоляция\nот друзей", "Ж😀"],
+    "personality_type": "Нарциссический контролер",
+}
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 1000])
+def test_chunked_feed_matches_json_loads(chunk_size):
+    text = "```json\n" + json.dumps(METRICS, ensure_ascii=True) + "\n```"
+    parser = IncrementalJSONParser()
+    for i in range(0, len(text), chunk_size):
+        parser.feed(text[i:i + chunk_size])
+
+    assert parser.close() == METRICS
+
+
+def test_fields_surface_before_document_ends():
+    seen = []
+    parser = IncrementalJSONParser(on_value=lambda path, value: seen.append((path, value)))
+
+    parser.feed('Вот результат: {"overall_risk_score": 72, "block_scores": {"control"')
+    assert ((("overall_risk_score",), 72)) in seen
+    assert not parser.done
+
+    parser.feed(': 7.0}, "red_flags": ["a", "b"]}')
+    assert (("block_scores", "control"), 7.0) in seen
+    assert (("red_flags", 1), "b") in seen
+    assert parser.done
+
+
+@pytest.mark.parametrize("text", [
+    '{"overall_risk_score": 72',
+    '{"a": 1 "b": 2}',
+    '{"a": tru}',
+    '{"a": [1, 2}',
+    'нет json',
+])
+def test_invalid_or_truncated_raises(text):
+    with pytest.raises(StructuredOutputError):
+        parse_json_stream(text)
+
+
+def test_metrics_model_validates_without_defaults():
+    metrics = ProfileMetrics.model_validate(METRICS)
+    assert metrics.urgency_level == "HIGH"
+    assert metrics.block_scores.control == 7.0
+
+    with pytest.raises(ValidationError):
+        ProfileMetrics.model_validate({k: v for k, v in METRICS.items() if k != "block_scores"})
+    with pytest.raises(ValidationError):
+        ProfileMetrics.model_validate({**METRICS, "overall_risk_score": 150})
+    with pytest.raises(ValidationError):
+        FreeFormProfileMetrics.model_validate(METRICS)
+
+
+def test_response_format_contains_schema():
+    response_format = json_schema_response_format(FreeFormProfileMetrics, "free_form_profile_metrics")
+    schema = response_format["json_schema"]["schema"]
+
+    assert response_format["type"] == "json_schema"
+    assert "key_concerns" in schema["required"]
+    assert schema["additionalProperties"] is False
+
+
+@pytest.mark.asyncio
+async def test_structured_response_reports_fields_and_rejects_invalid(monkeypatch):
+    from app.services.ai_service import AIService
+
+    service = AIService()
+    text = json.dumps(METRICS)
+
+    async def fake_stream(**kwargs):
+        for i in range(0, len(text), 10):
+            yield text[i:i + 10]
+
+    monkeypatch.setattr(service, "_stream_ai_response", fake_stream)
+    fields = []
+
+    async def on_field(name, value):
+        fields.append(name)
+
+    metrics = await service._get_structured_response(
+        ProfileMetrics, "profile_metrics", "system", "user", max_tokens=100, on_field=on_field
+    )
+    assert metrics.overall_risk_score == 72
+    assert fields[0] == "overall_risk_score"
+
+    with pytest.raises(StructuredOutputError):
+        await service._get_structured_response(
+            FreeFormProfileMetrics, "free_form_profile_metrics", "system", "user", max_tokens=100
+        )
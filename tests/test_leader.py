@@ -0,0 +1,45 @@
+"""Tests for Redis leader election"""
+
+import pytest
+
+from app.core.leader import LeaderElection
+from app.core.redis import redis_client
+
+
+class _FakeRedis:
+    """Minimal SET NX store"""
+
+    def __init__(self):
+        self.data = {}
+
+    async def set(self, key, value, nx=False, px=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    fake = _FakeRedis()
+    monkeypatch.setattr(redis_client, "redis", fake)
+    monkeypatch.setattr(redis_client, "is_available", True)
+    return fake
+
+
+@pytest.mark.asyncio
+async def test_only_one_worker_leads(fake_redis):
+    first = LeaderElection(name="test")
+    second = LeaderElection(name="test")
+
+    assert await first.try_acquire()
+    assert not await second.try_acquire()
+    assert fake_redis.data["leader:test"] == first.token
+
+
+@pytest.mark.asyncio
+async def test_single_worker_leads_without_redis(monkeypatch):
+    monkeypatch.setattr(redis_client, "is_available", False)
+
+    election = LeaderElection(name="test")
+    assert await election.try_acquire()
@@ -0,0 +1,50 @@
+"""Tests for event loop lag measurement and the report render stage"""
+
+import time
+
+import pytest
+
+from app.core.loop_monitor import LoopBlockProbe, LoopLagMonitor
+from app.services.html_pdf_service import HTMLPDFService, ReportRenderStage
+
+ANALYSIS = {
+    "overall_risk_score": 72,
+    "manipulation_risk": 7,
+    "urgency_level": "HIGH",
+    "red_flags": ["Контроль", "Изоляция"],
+    "psychological_profile": "ОБЩАЯ ХАРАКТЕРИСТИКА\n\nОн контролирует каждое решение.",
+}
+
+
+@pytest.mark.asyncio
+async def test_probe_measures_inline_blocking():
+    async with LoopBlockProbe() as probe:
+        time.sleep(0.15)
+
+    assert probe.max_lag >= 0.12
+
+
+def test_monitor_counts_stalls():
+    monitor = LoopLagMonitor(warn_threshold=0.1)
+    monitor.record(0.01)
+    monitor.record(0.3)
+
+    stats = monitor.get_stats()
+    assert stats["samples"] == 2 and stats["stalls"] == 1
+    assert stats["max_lag_ms"] == 300.0
+
+
+@pytest.mark.asyncio
+async def test_thread_render_matches_inline_and_does_not_block():
+    service = HTMLPDFService()
+    inline = ReportRenderStage("inline")
+    threaded = ReportRenderStage("thread", workers=1)
+    try:
+        expected = await inline.render(service, ANALYSIS, "Иван", 1)
+        html = await threaded.render(service, ANALYSIS, "Иван", 1)
+    finally:
+        threaded.shutdown()
+
+    # Timestamps in the report may differ by a minute at most
+    assert len(html) == len(expected) and "Иван" in html
+    assert threaded.get_stats()["renders"] == 1
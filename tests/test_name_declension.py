@@ -0,0 +1,38 @@
+"""Tests for Russian name declension"""
+
+from app.utils.name_declension import about_name, decline_name, decline_name_all
+
+
+def test_known_names_use_exact_forms():
+    assert decline_name_all("ольга") == (
+        "Ольга", "Ольги", "Ольге", "Ольгу", "Ольгой", "Ольге"
+    )
+    assert decline_name(" Павел ", "genitive") == "Павла"
+    assert decline_name("Пётр", "instrumental") == "Петром"
+
+
+def test_suffix_rules_for_unknown_names():
+    assert decline_name_all("Вера") == ("Вера", "Веры", "Вере", "Веру", "Верой", "Вере")
+    assert decline_name_all("Даша") == ("Даша", "Даши", "Даше", "Дашу", "Дашей", "Даше")
+    assert decline_name_all("Виктория").prepositional == "Виктории"
+    assert decline_name_all("Матвей").instrumental == "Матвеем"
+    assert decline_name_all("Тимур").dative == "Тимуру"
+    assert decline_name("Вероника", "genitive") == "Вероники"
+
+
+def test_indeclinable_and_empty_names():
+    assert decline_name("Нелли", "genitive") == "Нелли"
+    assert decline_name("John", "dative") == "John"
+    assert decline_name("Партнер #3", "genitive") == "Партнер #3"
+    assert decline_name(None, "genitive") == "партнера"
+    assert decline_name("Анна", "vocative") == "Анна"
+
+
+def test_about_name_picks_preposition():
+    assert about_name("Анна") == "об Анне"
+    assert about_name("Ольга", capitalize=True) == "Об Ольге"
+    assert about_name("Игорь") == "об Игоре"
+    assert about_name("Мария") == "о Марии"
+    assert about_name("Елена") == "о Елене"
+    assert about_name("Юлия") == "о Юлии"
+    assert about_name(None) == "о партнере"
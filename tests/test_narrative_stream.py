@@ -0,0 +1,69 @@
+"""Tests for the single-pass narrative formatter"""
+
+from app.utils.narrative_stream import NarrativeStreamFormatter, format_narrative
+
+PORTRAIT = (
+    "# Психологический портрет: Иван — нарцисс\n"
+    "ПЕРСОНАЛИЗИРОВАННЫЙ АНАЛИЗ\n"
+    "\n\n\n"
+    "ОБЩАЯ ХАРАКТЕРИСТИКА ЛИЧНОСТИ\n"
+    "\n"
+    "Он говорит <тихо> & уверенно.\n"
+    "Вторая строка абзаца.\n"
+    "\n\n"
+    "## Прогноз\n"
+    "Без изменений.\n\n"
+)
+
+
+def test_cleans_markdown_and_collapses_blank_lines():
+    result = format_narrative(PORTRAIT)
+
+    assert result.text == (
+        '<div class="analysis-main-title">ИВАН — НАРЦИСС</div>\n'
+        "\n"
+        "ОБЩАЯ ХАРАКТЕРИСТИКА ЛИЧНОСТИ\n"
+        "\n"
+        "Он говорит <тихо> & уверенно.\n"
+        "Вторая строка абзаца.\n"
+        "\n"
+        '<div class="analysis-section-header">ПРОГНОЗ</div>\n'
+        "Без изменений."
+    )
+
+
+def test_chunking_does_not_change_output():
+    whole = format_narrative(PORTRAIT)
+
+    for size in (1, 2, 7, 64):
+        formatter = NarrativeStreamFormatter()
+        for i in range(0, len(PORTRAIT), size):
+            formatter.feed(PORTRAIT[i:i + size])
+        assert formatter.close() == whole
+
+
+def test_pdf_and_telegram_fragments():
+    result = format_narrative(PORTRAIT)
+
+    assert '<h4 class="analysis-section-title">ОБЩАЯ ХАРАКТЕРИСТИКА ЛИЧНОСТИ</h4>' in result.pdf_html
+    assert '<p class="analysis-text">Он говорит <тихо> & уверенно.\nВторая строка абзаца.</p>' in result.pdf_html
+    assert "<b>ИВАН — НАРЦИСС</b>" in result.telegram_html
+    assert "Он говорит &lt;тихо&gt; &amp; уверенно." in result.telegram_html
+    assert "<div" not in result.telegram_html
+
+    # Already cleaned text gives the same PDF fragments
+    assert format_narrative(result.text, clean_markdown=False).pdf_html == result.pdf_html
+
+
+def test_paragraphs_are_reported_as_they_finish():
+    finished = []
+    formatter = NarrativeStreamFormatter(on_paragraph=finished.append)
+
+    formatter.feed("Первый абзац.\n")
+    assert finished == []
+    formatter.feed("\nВторой")
+    assert finished == ["Первый абзац."]
+    assert formatter.telegram_preview == "Первый абзац."
+
+    formatter.close()
+    assert finished == ["Первый абзац.", "Второй"]
@@ -0,0 +1,84 @@
+"""Tests for the scheduled notifications index and message composition"""
+
+from datetime import date, datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.notification_scheduler import (
+    NotificationScheduler,
+    _MemorySchedule,
+    next_fire_time,
+    wants_notifications,
+)
+
+
+def make_user(**fields):
+    defaults = dict(
+        id=1, telegram_id=100, timezone="Europe/Moscow", notification_time="09:00",
+        notifications_enabled=True, daily_tips_enabled=True, analysis_reminders_enabled=False,
+        weekly_stats_enabled=False, is_active=True, is_blocked=False, total_analyses=4,
+        last_analysis_date=None, registration_date=datetime(2026, 1, 1, tzinfo=timezone.utc),
+    )
+    defaults.update(fields)
+    return SimpleNamespace(**defaults)
+
+
+def test_next_fire_time_is_next_local_occurrence():
+    after = datetime(2026, 3, 1, 5, 0, tzinfo=timezone.utc)  # 08:00 in Moscow
+
+    assert next_fire_time("Europe/Moscow", "09:00", after) == datetime(2026, 3, 1, 6, 0, tzinfo=timezone.utc).timestamp()
+    # Already past today: tomorrow
+    assert next_fire_time("Europe/Moscow", "07:30", after) == datetime(2026, 3, 2, 4, 30, tzinfo=timezone.utc).timestamp()
+
+
+def test_next_fire_time_keeps_local_hour_across_dst():
+    # Berlin switches to summer time on 2026-03-29
+    after = datetime(2026, 3, 28, 9, 0, tzinfo=timezone.utc)
+
+    fire = next_fire_time("Europe/Berlin", "09:00", after)
+
+    assert fire == datetime(2026, 3, 29, 7, 0, tzinfo=timezone.utc).timestamp()
+
+
+def test_wants_notifications():
+    assert wants_notifications(make_user())
+    assert not wants_notifications(make_user(notifications_enabled=False))
+    assert not wants_notifications(make_user(is_active=False))
+    assert not wants_notifications(make_user(daily_tips_enabled=False))
+
+
+@pytest.mark.asyncio
+async def test_memory_schedule_pops_only_due_and_latest_entries():
+    schedule = _MemorySchedule()
+    await schedule.add({1: 100.0, 2: 200.0, 3: 50.0})
+    # Settings change moves user 3 later
+    await schedule.add({3: 300.0})
+    await schedule.remove(2)
+
+    assert await schedule.pop_due(150.0, limit=10) == [(1, 100.0)]
+    assert await schedule.pop_due(150.0, limit=10) == []
+    assert await schedule.pop_due(1000.0, limit=10) == [(3, 300.0)]
+    assert await schedule.size() == 0
+
+
+def test_compose_combines_enabled_notifications():
+    scheduler = NotificationScheduler(reminder_days=7)
+    monday = date(2026, 3, 2)
+    user = make_user(
+        analysis_reminders_enabled=True,
+        weekly_stats_enabled=True,
+        last_analysis_date=datetime(2026, 2, 23, 12, 0, tzinfo=timezone.utc),
+    )
+
+    text = scheduler.compose(user, monday, {1: 2})
+
+    assert "Совет дня" in text
+    assert "проанализировать" in text
+    assert "Анализов за 7 дней: 2" in text
+
+    # Tuesday: tip only, the reminder waits for the next 7 idle days
+    text = scheduler.compose(user, date(2026, 3, 3), {})
+    assert "Совет дня" in text and "проанализировать" not in text and "неделя" not in text
+
+    assert scheduler.compose(make_user(daily_tips_enabled=False), date(2026, 3, 3), {}) is None
@@ -0,0 +1,163 @@
+"""Tests for keyset (cursor) pagination helpers"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import Column, DateTime, Integer, create_engine, select
+from sqlalchemy.orm import DeclarativeBase, Session
+
+from app.utils.pagination import (
+    DIRECTION_NEXT,
+    DIRECTION_PREV,
+    build_page_callback,
+    decode_cursor,
+    encode_cursor,
+    fetch_keyset_page,
+    parse_page_callback,
+)
+
+
+class _Base(DeclarativeBase):
+    pass
+
+
+class _Row(_Base):
+    __tablename__ = "rows"
+
+    id = Column(Integer, primary_key=True)
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+
+class _AsyncSessionShim:
+    """Minimal async facade over a sync session (fetch_keyset_page only awaits execute)"""
+
+    def __init__(self, session: Session):
+        self._session = session
+
+    async def execute(self, query):
+        return self._session.execute(query)
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    _Base.metadata.create_all(engine)
+    base = datetime(2025, 1, 1)
+    with Session(engine) as sync_session:
+        # 25 rows, pairs share created_at to exercise the id tie-breaker
+        sync_session.add_all(
+            _Row(id=i, created_at=base + timedelta(minutes=i // 2))
+            for i in range(1, 26)
+        )
+        sync_session.commit()
+        yield _AsyncSessionShim(sync_session)
+    engine.dispose()
+
+
+async def _page(session, cursor=None, direction=DIRECTION_NEXT, limit=10):
+    return await fetch_keyset_page(
+        session, select(_Row), _Row, limit=limit, cursor=cursor, direction=direction
+    )
+
+
+def _ids(page):
+    return [row.id for row in page.items]
+
+
+class TestCursorEncoding:
+
+    def test_round_trip(self):
+        created_at = datetime(2025, 7, 13, 16, 4, 41, 123456, tzinfo=timezone.utc)
+        cursor = encode_cursor(created_at, 4242)
+
+        assert len(cursor) == 16
+        assert decode_cursor(cursor) == (created_at, 4242)
+
+    def test_naive_datetime_treated_as_utc(self):
+        naive = datetime(2025, 1, 1, 12, 0, 0)
+        decoded_at, row_id = decode_cursor(encode_cursor(naive, 1))
+
+        assert decoded_at == naive.replace(tzinfo=timezone.utc)
+        assert row_id == 1
+
+    @pytest.mark.parametrize("cursor", [None, "", "!!!", "abc", "AAAAAAAAAAAAAAAAAAAA"])
+    def test_malformed_cursor(self, cursor):
+        assert decode_cursor(cursor) is None
+
+
+class TestPageCallback:
+
+    def test_round_trip_fits_callback_limit(self):
+        cursor = encode_cursor(datetime.now(timezone.utc), 2**32 - 1)
+        data = build_page_callback("my_profiles_page", DIRECTION_PREV, cursor)
+
+        assert len(data.encode()) <= 64
+        assert parse_page_callback(data) == (DIRECTION_PREV, cursor)
+
+    def test_bad_direction_falls_back_to_first_page(self):
+        assert parse_page_callback("my_profiles_page:x:AAAA") == (DIRECTION_NEXT, None)
+
+    def test_missing_parts_falls_back_to_first_page(self):
+        assert parse_page_callback("my_profiles_page") == (DIRECTION_NEXT, None)
+
+
+class TestFetchKeysetPage:
+
+    @pytest.mark.asyncio
+    async def test_first_page_has_no_prev(self, session):
+        page = await _page(session)
+
+        assert _ids(page) == list(range(25, 15, -1))
+        assert page.prev_cursor is None
+        assert page.next_cursor is not None
+
+    @pytest.mark.asyncio
+    async def test_forward_walk_covers_all_rows_once(self, session):
+        seen, cursor = [], None
+        while True:
+            page = await _page(session, cursor)
+            seen.extend(_ids(page))
+            if not page.next_cursor:
+                break
+            cursor = page.next_cursor
+
+        assert seen == list(range(25, 0, -1))
+
+    @pytest.mark.asyncio
+    async def test_last_page_has_no_next(self, session):
+        second = await _page(session, (await _page(session)).next_cursor)
+        last = await _page(session, second.next_cursor)
+
+        assert _ids(last) == [5, 4, 3, 2, 1]
+        assert last.next_cursor is None
+        assert last.prev_cursor is not None
+
+    @pytest.mark.asyncio
+    async def test_prev_walk_returns_same_pages(self, session):
+        first = await _page(session)
+        second = await _page(session, first.next_cursor)
+        last = await _page(session, second.next_cursor)
+
+        back_to_second = await _page(session, last.prev_cursor, DIRECTION_PREV)
+        assert _ids(back_to_second) == _ids(second)
+        assert back_to_second.next_cursor is not None
+
+        back_to_first = await _page(session, back_to_second.prev_cursor, DIRECTION_PREV)
+        assert _ids(back_to_first) == _ids(first)
+        assert back_to_first.prev_cursor is None
+
+    @pytest.mark.asyncio
+    async def test_malformed_cursor_returns_first_page(self, session):
+        page = await _page(session, "garbage", DIRECTION_PREV)
+
+        assert _ids(page) == _ids(await _page(session))
+        assert page.prev_cursor is None
+
+    @pytest.mark.asyncio
+    async def test_cursor_past_end_returns_empty_page(self, session):
+        cursor = encode_cursor(datetime(2000, 1, 1), 1)
+        page = await _page(session, cursor)
+
+        assert page.items == []
+        assert page.next_cursor is None
+        assert page.prev_cursor is None
@@ -0,0 +1,97 @@
+"""Tests for report HTML minification and PDF recompression"""
+
+import zlib
+
+from app.services.pdf_optimizer import SizeStages, minify_html, optimize_html, optimize_pdf, remove_unused_css
+
+HTML = """<!DOCTYPE html>
+<html>
+<head>
+    <style>
+        /* layout */
+        @page { size: A4; @bottom-center { content: "Страница  " counter(page); } }
+        .used   { color: red; }
+        .unused { color: blue; }
+        div .used, .gone p { margin: 0 ; }
+        @media print { .unused { display: none; } .used { display: block; } }
+    </style>
+</head>
+<body>
+    <!-- header -->
+    <div class="used">
+        <strong>Партнер:</strong>   Анна
+    </div>
+</body>
+</html>
+"""
+
+
+def _pdf(objects, root=1):
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for num, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % num + body + b"\nendobj\n"
+    xref_at = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<</Size %d /Root %d 0 R>>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, root, xref_at)
+    return bytes(out)
+
+
+def _stream(data, compressed=False):
+    if compressed:
+        data = zlib.compress(data, 1)
+        return b"<</Length %d /Filter /FlateDecode>>\nstream\n" % len(data) + data + b"\nendstream"
+    return b"<</Length %d>>\nstream\n" % len(data) + data + b"\nendstream"
+
+
+def test_unused_rules_are_dropped_and_strings_kept():
+    html = minify_html(remove_unused_css(HTML))
+
+    assert ".unused" not in html and ".gone" not in html
+    assert "div .used{margin: 0}" in html
+    assert "@media print{.used{display: block}}" in html
+    assert 'content: "Страница  " counter(page)' in html
+    assert "<strong>Партнер:</strong> Анна</div>" in html
+    assert "header" not in html
+
+
+def test_stages_are_recorded():
+    stages = SizeStages()
+    optimize_html(HTML, stages)
+
+    assert [stage for stage, _ in stages.stages] == ["html", "css_pruned", "html_minified"]
+    sizes = [size for _, size in stages.stages]
+    assert sizes == sorted(sizes, reverse=True)
+
+
+def test_pdf_streams_recompressed_and_duplicates_merged():
+    content = b"BT /F1 12 Tf 72 712 Td (Report) Tj ET\n" * 200
+    pdf = _pdf([
+        b"<</Type /Catalog /Pages 2 0 R>>",
+        b"<</Type /Pages /Kids [3 0 R] /Count 1>>",
+        b"<</Type /Page /Parent 2 0 R /Contents [4 0 R 5 0 R 6 0 R]>>",
+        _stream(b"q 1 0 0 1 0 0 cm Q\n" * 100),
+        _stream(content, compressed=True),
+        _stream(content, compressed=True),
+    ])
+
+    optimized = optimize_pdf(pdf)
+
+    assert len(optimized) < len(pdf)
+    assert b"[4 0 R 5 0 R 5 0 R]" in optimized
+    assert b"6 0 obj" not in optimized
+    assert b"/Filter/FlateDecode" in optimized
+    stream = optimized.split(b"5 0 obj")[1].split(b"stream\n", 1)[1].split(b"\nendstream", 1)[0]
+    assert zlib.decompress(stream) == content
+    # A second pass reads its own output
+    assert optimize_pdf(optimized) == optimized
+
+
+def test_unsupported_pdf_is_returned_unchanged():
+    broken = b"%PDF-1.5\n1 0 obj\n<</Type /ObjStm>>\nendobj\nstartxref\n9\n%%EOF\n"
+
+    assert optimize_pdf(broken) is broken
+    assert optimize_pdf(b"not a pdf") == b"not a pdf"
@@ -0,0 +1,72 @@
+"""Tests for precomputed option-based questionnaire scoring"""
+
+import random
+
+import numpy as np
+import pytest
+
+from app.prompts.profiler_full_questions import (
+    QUESTION_ORDER,
+    SCORING_BLOCKS,
+    SCORING_TABLE,
+    calculate_block_score_matrix,
+    calculate_weighted_scores,
+    calculate_weighted_scores_batch,
+    get_all_questions,
+    get_safety_alerts,
+    validate_full_answers
+)
+from app.utils.enums import UrgencyLevel
+
+
+def _random_answers(rng):
+    return {
+        question_id: rng.randrange(len(question["options"]))
+        for question_id, question in get_all_questions().items()
+    }
+
+
+def test_single_score_matches_definition():
+    answers = {"narcissism_q1": 4, "control_q1": 0, "unknown_q": 2}
+    question = get_all_questions()["narcissism_q1"]
+
+    result = calculate_weighted_scores(answers)
+
+    assert result["raw_scores"]["narcissism"] == question["weight"] * 4
+    assert result["block_scores"]["narcissism"] == 10.0
+    assert result["block_scores"]["control"] == 0.0
+    assert result["max_scores"]["social"] == 0
+
+
+def test_batch_matches_single_scoring():
+    rng = random.Random(7)
+    answer_sets = [_random_answers(rng) for _ in range(200)] + [{}]
+
+    batch = calculate_weighted_scores_batch(answer_sets)
+
+    assert batch == [calculate_weighted_scores(answers) for answers in answer_sets]
+    assert batch[-1]["urgency_level"] == UrgencyLevel.LOW
+    assert calculate_weighted_scores_batch([]) == []
+
+
+def test_score_matrix_shape_and_table_is_immutable():
+    raw, maximum = calculate_block_score_matrix([{"control_q1": 3}, {}])
+
+    assert raw.shape == maximum.shape == (2, len(SCORING_BLOCKS))
+    assert raw[1].sum() == 0 and maximum[0, SCORING_BLOCKS.index("control")] > 0
+
+    with pytest.raises(ValueError):
+        SCORING_TABLE.answer_weights[0, 0] = 100
+    with pytest.raises(TypeError):
+        SCORING_TABLE.index["new"] = 0
+    assert isinstance(SCORING_TABLE.block_index, np.ndarray)
+
+
+def test_alerts_and_validation():
+    assert get_safety_alerts({"control_q1": 3, "control_q2": 1}) == [
+        "⚠️ КОНТРОЛЬ ВРЕМЕНИ: Партнер контролирует каждый ваш шаг"
+    ]
+
+    full = {question_id: 0 for question_id in QUESTION_ORDER}
+    assert validate_full_answers(full) == (True, "Все ответы валидны")
+    assert validate_full_answers({**full, QUESTION_ORDER[0]: 99})[0] is False
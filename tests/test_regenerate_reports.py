@@ -0,0 +1,31 @@
+"""Tests for bulk report regeneration jobs"""
+
+import pickle
+from types import SimpleNamespace
+
+from app.utils.enums import UrgencyLevel
+from scripts.regenerate_reports import build_job, parse_args
+
+
+def _row(**overrides):
+    row = dict(
+        id=5, partner_name=None, psychological_profile="Текст", red_flags=["Контроль"],
+        manipulation_risk=7.5, urgency_level=UrgencyLevel.HIGH, personality_type=None, telegram_id=42,
+    )
+    row.update(overrides)
+    return SimpleNamespace(**row)
+
+
+def test_job_is_picklable_and_keyed_by_content():
+    job = build_job(_row())
+
+    assert pickle.loads(pickle.dumps(job)) == job
+    assert job["partner_name"] == "Партнер #5"
+    assert job["analysis"]["urgency_level"] == "HIGH"
+    assert build_job(_row())["key"] == job["key"]
+    assert build_job(_row(manipulation_risk=3.0))["key"] != job["key"]
+
+
+def test_in_flight_defaults_to_two_jobs_per_worker():
+    assert parse_args(["--workers", "3"]).max_in_flight == 6
+    assert parse_args(["--workers", "3", "--max-in-flight", "4"]).max_in_flight == 4
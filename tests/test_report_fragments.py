@@ -0,0 +1,28 @@
+"""Tests for cached static sections of the PDF report"""
+
+from app.services.html_pdf_service import HTMLPDFService, ReportFragmentCache, risk_band
+
+
+def test_same_band_reuses_rendered_section(monkeypatch):
+    cache = ReportFragmentCache("test")
+    monkeypatch.setattr("app.services.html_pdf_service.report_fragment_cache", cache)
+    service = HTMLPDFService()
+
+    first = service._generate_high_risk_analysis("Иван", 75, {"control": 8}, [], {"narcissism": 9})
+    second = service._generate_high_risk_analysis("Олег", 76.5, {}, [], {"psychopathy": 4})
+
+    assert cache.misses == 1 and cache.hits == 1
+    assert "<strong>Иван</strong>" in first and "<strong>75%</strong>" in first
+    assert "<strong>Олег</strong>" in second and "<strong>76.5%</strong>" in second
+    assert "\x00" not in second
+    assert second == HTMLPDFService._generate_high_risk_analysis.__wrapped__(
+        service, "Олег", 76.5, {}, [], {"psychopathy": 4}
+    )
+
+
+def test_band_boundaries_follow_section_thresholds():
+    service = HTMLPDFService()
+
+    assert risk_band(69.9) != risk_band(70)
+    assert service._get_risk_recommendations(70) != service._get_risk_recommendations(69)
+    assert service._generate_action_plan(14) != service._generate_action_plan(15)
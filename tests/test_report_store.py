@@ -0,0 +1,68 @@
+"""Tests for the content-addressed report store and file_id reuse"""
+
+from types import SimpleNamespace
+
+import pytest
+
+from app.bot.handlers import profiler
+from app.services.report_store import LocalArtifactBackend, ReportArtifactStore, report_key
+
+PDF = b"%PDF-1.4\n" + b"stream of report bytes " * 200 + b"%%EOF\n"
+
+
+class _FakeMessage:
+    def __init__(self):
+        self.documents = []
+
+    async def answer_document(self, document, caption=None):
+        self.documents.append(document)
+        return SimpleNamespace(document=SimpleNamespace(file_id=f"FILE{len(self.documents)}"))
+
+
+def test_key_depends_on_payload_and_template_version():
+    payload = {"analysis": {"overall_risk_score": 80, "red_flags": ["a"]}, "user_id": 1}
+    reordered = {"user_id": 1, "analysis": {"red_flags": ["a"], "overall_risk_score": 80}}
+
+    assert report_key(payload, "1") == report_key(reordered, "1")
+    assert report_key(payload, "1") != report_key(payload, "2")
+    assert len(report_key(payload, "1")) == 64
+
+
+@pytest.mark.asyncio
+async def test_local_roundtrip_is_compressed(tmp_path):
+    store = ReportArtifactStore(LocalArtifactBackend(str(tmp_path)))
+    key = report_key({"a": 1}, "1")
+
+    assert await store.get(key) is None
+    assert await store.put(key, PDF)
+    assert await store.get(key) == PDF
+    assert await store.exists(key)
+
+    stored_file = next(tmp_path.rglob("*.zst"))
+    assert stored_file.stat().st_size < len(PDF)
+    assert store.get_stats()["hits"] == 1 and store.get_stats()["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_render_once_then_resend_by_file_id(tmp_path, monkeypatch):
+    store = ReportArtifactStore(LocalArtifactBackend(str(tmp_path)))
+    monkeypatch.setattr(profiler, "report_store", store)
+    renders = []
+
+    async def render():
+        renders.append(1)
+        return PDF
+
+    payload = {"analysis": {"overall_risk_score": 55}, "user_id": 7, "partner_name": "Иван"}
+    key, pdf_bytes = await profiler.load_or_render_report(payload, render)
+    message = _FakeMessage()
+    await profiler.send_report_document(message, key, pdf_bytes, "r.pdf", "отчет")
+
+    # Same analysis again: nothing rendered, nothing uploaded
+    key_again, pdf_again = await profiler.load_or_render_report(payload, render)
+    await profiler.send_report_document(message, key_again, pdf_again, "r.pdf", "отчет")
+
+    assert renders == [1]
+    assert key_again == key and pdf_again is None
+    assert message.documents[1] == "FILE1"
+    assert await store.get(key) == PDF
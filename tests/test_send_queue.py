@@ -0,0 +1,135 @@
+"""Tests for the outbound Telegram send queue"""
+
+import asyncio
+import time
+
+import pytest
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import EditMessageText, SendMessage
+
+from app.bot.send_queue import (
+    PRIORITY_INTERACTIVE,
+    PRIORITY_NOTIFICATION,
+    TelegramSendQueue,
+    notification_priority,
+)
+
+
+def recorder(log, name, delay=0.0):
+    async def make_request():
+        if delay:
+            await asyncio.sleep(delay)
+        log.append((name, time.monotonic()))
+        return name
+    return make_request
+
+
+@pytest.mark.asyncio
+async def test_chat_is_paced_after_burst():
+    queue = TelegramSendQueue(global_rate=100, chat_rate=10, chat_burst=2)
+    queue.start()
+    log = []
+    try:
+        results = await asyncio.gather(*(
+            queue.submit(1, SendMessage(chat_id=1, text=str(i)), recorder(log, i)) for i in range(5)
+        ))
+    finally:
+        await queue.stop()
+
+    assert results == [0, 1, 2, 3, 4]
+    assert [name for name, _ in log] == [0, 1, 2, 3, 4]
+    # Two burst tokens, then 10/s
+    assert log[-1][1] - log[0][1] >= 0.25
+
+
+@pytest.mark.asyncio
+async def test_interactive_replies_go_before_notifications():
+    queue = TelegramSendQueue(global_rate=5, chat_rate=10, chat_burst=1)
+    queue.start()
+    log = []
+    try:
+        # Drain the global bucket so both kinds wait together
+        await asyncio.gather(*(
+            queue.submit(1000 + i, SendMessage(chat_id=1000 + i, text="x"), recorder([], i)) for i in range(5)
+        ))
+        with notification_priority():
+            tips = [
+                asyncio.create_task(queue.submit(i, SendMessage(chat_id=i, text="tip"), recorder(log, "tip")))
+                for i in range(1, 4)
+            ]
+        await asyncio.sleep(0)
+        replies = [
+            asyncio.create_task(queue.submit(i, SendMessage(chat_id=i, text="hi"), recorder(log, "reply")))
+            for i in range(11, 14)
+        ]
+        await asyncio.gather(*tips, *replies)
+    finally:
+        await queue.stop()
+
+    assert [name for name, _ in log] == ["reply"] * 3 + ["tip"] * 3
+    assert queue.get_stats()["sent"] == 11
+
+
+@pytest.mark.asyncio
+async def test_superseded_edits_are_coalesced():
+    queue = TelegramSendQueue(global_rate=100, chat_rate=100, chat_burst=1)
+    queue.start()
+    log = []
+    try:
+        first = asyncio.create_task(
+            queue.submit(1, SendMessage(chat_id=1, text="start"), recorder(log, "send", delay=0.05))
+        )
+        await asyncio.sleep(0.01)
+        edits = [
+            asyncio.create_task(queue.submit(
+                1, EditMessageText(chat_id=1, message_id=7, text=f"{i}%"), recorder(log, f"{i}%")
+            ))
+            for i in (10, 50, 90)
+        ]
+        results = await asyncio.gather(first, *edits)
+    finally:
+        await queue.stop()
+
+    assert [name for name, _ in log] == ["send", "90%"]
+    assert results == ["send", "90%", "90%", "90%"]
+    assert queue.coalesced == 2
+
+
+@pytest.mark.asyncio
+async def test_retry_after_pauses_chat_and_retries():
+    queue = TelegramSendQueue(global_rate=100, chat_rate=100, chat_burst=1, max_retries=2)
+    queue.start()
+    calls = []
+    method = SendMessage(chat_id=5, text="x")
+
+    async def flaky():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise TelegramRetryAfter(method=method, message="Flood control", retry_after=1)
+        return "ok"
+
+    try:
+        assert await queue.submit(5, method, flaky, PRIORITY_INTERACTIVE) == "ok"
+    finally:
+        await queue.stop()
+
+    assert len(calls) == 2 and calls[1] - calls[0] >= 0.95
+    assert queue.retried == 1
+
+
+@pytest.mark.asyncio
+async def test_retry_limit_raises():
+    queue = TelegramSendQueue(global_rate=100, chat_rate=100, chat_burst=1, max_retries=0)
+    queue.start()
+    method = SendMessage(chat_id=5, text="x")
+
+    async def flooded():
+        raise TelegramRetryAfter(method=method, message="Flood control", retry_after=1)
+
+    try:
+        with pytest.raises(TelegramRetryAfter):
+            await queue.submit(5, method, flooded, PRIORITY_NOTIFICATION)
+    finally:
+        await queue.stop()
+
+    assert queue.failed == 1
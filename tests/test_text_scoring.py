@@ -0,0 +1,55 @@
+"""Tests for local lexicon scoring of free-form answers"""
+
+from app.prompts.profiler_full_questions import FREE_FORM_QUESTIONS
+from app.services.ai_schemas import FreeFormProfileMetrics, ProfileMetrics
+from app.services.text_scoring import score_answers
+
+
+def _answers(text_for):
+    return [
+        {"question_id": question_id, "answer": text_for(question), "block": question["block"]}
+        for question_id, question in FREE_FORM_QUESTIONS.items()
+    ]
+
+
+def test_toxic_examples_score_high_and_reproducibly():
+    answers = _answers(lambda question: question["example"])
+
+    scores = score_answers(answers)
+
+    assert scores == score_answers(answers)
+    assert scores.overall_risk_score >= 60
+    assert scores.urgency_level in ("HIGH", "CRITICAL")
+    assert scores.red_flags
+    assert all(0 <= value <= 10 for value in scores.block_scores.values())
+
+
+def test_calm_answers_score_low():
+    calm = "Он спокойно выслушал, извинился, мы вместе решили вопрос. Он уважает мои решения и доверяет мне."
+    scores = score_answers(_answers(lambda question: calm))
+
+    assert scores.overall_risk_score < 25
+    assert scores.red_flags == []
+    assert scores.personality_type == "Без выраженных токсичных паттернов"
+
+
+def test_negated_mentions_do_not_count():
+    negated = score_answers([{"block": "emotion", "answer": "Он никогда не кричит и не орет на меня"}])
+    direct = score_answers([{"block": "emotion", "answer": "Он кричит и орет на меня"}])
+
+    assert negated.block_scores["emotion"] < direct.block_scores["emotion"]
+    assert "Вспышки ярости" in direct.red_flags
+    assert "Вспышки ярости" not in negated.red_flags
+
+
+def test_answers_without_signals_have_low_confidence():
+    scores = score_answers(_answers(lambda question: "Обычный день, ходили в магазин за продуктами."))
+
+    assert scores.confidence < 0.1
+
+
+def test_converts_to_metrics_models():
+    scores = score_answers(_answers(lambda question: question["example"]))
+
+    assert FreeFormProfileMetrics.model_validate(scores.to_metrics(FreeFormProfileMetrics).model_dump())
+    assert not hasattr(scores.to_metrics(ProfileMetrics), "key_concerns")
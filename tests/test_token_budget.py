@@ -0,0 +1,63 @@
+"""Tests for token estimation and output budget planning"""
+
+import pytest
+
+from app.core.config import settings
+from app.services.token_budget import (
+    TokenEstimator,
+    fit_answers,
+    fit_text,
+    plan_output_tokens,
+    token_estimator,
+)
+from app.utils.exceptions import AIServiceError
+
+RUSSIAN = "Он постоянно проверяет мой телефон и злится, когда я встречаюсь с подругами. "
+
+
+def test_cyrillic_costs_more_tokens_than_latin():
+    estimator = TokenEstimator()
+    latin = "He keeps checking my phone and gets angry when I meet friends. "
+    assert estimator.estimate(RUSSIAN) > estimator.estimate(latin)
+    assert estimator.estimate("") == 0
+
+
+def test_calibration_moves_towards_reported_tokens():
+    estimator = TokenEstimator(alpha=0.5)
+    estimated = estimator.estimate(RUSSIAN * 10)
+    for _ in range(20):
+        estimator.observe(estimator.estimate(RUSSIAN * 10), int(estimated * 1.5))
+    assert estimator.estimate(RUSSIAN * 10) == pytest.approx(estimated * 1.5, rel=0.05)
+
+
+def test_output_budget_uses_target_cap_and_context(monkeypatch):
+    assert plan_output_tokens("profile_metrics", 2000) == 800
+    assert plan_output_tokens("free_form_portrait", 2000, requested=50000) == settings.MAX_TOKENS_PROFILING
+
+    monkeypatch.setattr(settings, "MODEL_CONTEXT_WINDOW", 10000)
+    assert plan_output_tokens("free_form_portrait", 5000) == 9500 - 5000
+    with pytest.raises(AIServiceError):
+        plan_output_tokens("free_form_portrait", 9400)
+
+
+def test_fit_text_keeps_head_and_tail():
+    text = "".join(f"Предложение номер {i}. " for i in range(200))
+    fitted = fit_text(text, 200)
+
+    assert token_estimator.estimate(fitted) <= 230
+    assert fitted.startswith("Предложение номер 0.")
+    assert "номер 199." in fitted
+    assert "[…]" in fitted
+
+
+def test_fit_answers_keeps_short_answers_intact():
+    answers = [
+        {"question": "q1", "answer": "Коротко."},
+        {"question": "q2", "answer": RUSSIAN * 100},
+        {"question": "q3", "answer": RUSSIAN * 100},
+    ]
+    fitted = fit_answers(answers, 600)
+
+    assert fitted[0] == answers[0]
+    assert all(token_estimator.estimate(a["answer"]) <= 320 for a in fitted)
+    assert fit_answers(answers[:1], 600) == answers[:1]
@@ -0,0 +1,78 @@
+"""Tests for the fast-ack webhook update queue"""
+
+import asyncio
+
+import pytest
+from aiogram.types import Update
+
+from app.bot.update_queue import UpdateQueue, get_update_chat_id
+
+
+def _message_update(update_id: int, chat_id: int, text: str = "hi") -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": chat_id, "type": "private"},
+            "from": {"id": chat_id, "is_bot": False, "first_name": "U"},
+            "text": text,
+        },
+    })
+
+
+class _RecordingDispatcher:
+    """Stand-in for Dispatcher.feed_update that records processing order"""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.order = []
+        self.running = 0
+        self.max_running = 0
+
+    async def feed_update(self, bot, update):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.delay)
+        self.order.append((update.message.chat.id, update.update_id))
+        self.running -= 1
+
+
+def test_chat_id_extraction():
+    assert get_update_chat_id(_message_update(1, 42)) == 42
+    assert get_update_chat_id(Update(update_id=2)) is None
+
+
+@pytest.mark.asyncio
+async def test_same_chat_is_ordered_other_chats_parallel():
+    dp = _RecordingDispatcher(delay=0.01)
+    queue = UpdateQueue(dp, bot=None, max_size=100, workers=8)
+    queue.start()
+
+    for i in range(1, 6):
+        queue.submit(_message_update(i, chat_id=1))
+    for i in range(6, 11):
+        queue.submit(_message_update(i, chat_id=100 + i))
+
+    await queue.stop()
+
+    chat_1 = [update_id for chat_id, update_id in dp.order if chat_id == 1]
+    assert chat_1 == [1, 2, 3, 4, 5]
+    assert dp.max_running > 1
+    assert queue.get_metrics()["processed"] == 10
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects():
+    dp = _RecordingDispatcher()
+    queue = UpdateQueue(dp, bot=None, max_size=1, workers=1)
+
+    assert queue.submit(_message_update(1, chat_id=1))
+    assert not queue.submit(_message_update(2, chat_id=1))
+    assert queue.get_metrics()["dropped"] == 1
+
+    queue.start()
+    await queue.stop()
+
+    assert len(dp.order) == 1
+    assert queue.depth == 0